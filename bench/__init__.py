@@ -0,0 +1,10 @@
+# bench/__init__.py
+from .load_generator import LoadGenerator, percentile
+from .agents import AGENTS, AgentAdapter
+
+__all__ = [
+    "LoadGenerator",
+    "percentile",
+    "AGENTS",
+    "AgentAdapter"
+]
@@ -0,0 +1,194 @@
+# Load-testing harness for the agents.
+#   python -m bench --agents tool_enhanced memory_enhanced --mode closed --concurrency 8 --requests 200
+#   python -m bench --agents all --mode open --rate 50 --duration 30 --latency-ms 300 --output results.json
+#   python -m bench --agents all --baseline results.json   # exits 1 on regression
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from bench.agents import AGENTS, REPO_ROOT
+from bench.load_generator import LoadGenerator
+
+RESULTS_SCHEMA_VERSION = 1
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_provider(args: argparse.Namespace) -> None:
+    """Points every agent at the mock provider unless --provider says otherwise. Must run before agents are imported."""
+    if args.provider == "mock":
+        os.environ["LLM_PROVIDER"] = "mock"
+        os.environ["MOCK_LATENCY_MS"] = str(args.latency_ms)
+        os.environ["MOCK_LATENCY_JITTER_MS"] = str(args.latency_jitter_ms)
+        if args.replay_file:
+            os.environ["MOCK_REPLAY_FILE"] = args.replay_file
+    elif args.provider:
+        os.environ["LLM_PROVIDER"] = args.provider
+
+
+def run_agent(name: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmarks one agent in this process."""
+    adapter = AGENTS[name]
+    adapter.load_class() # Fail fast on missing dependencies instead of counting every request as an error
+    generator = LoadGenerator(adapter.make_call, adapter.inputs, seed=args.seed)
+    setup_started = time.perf_counter()
+    generator.warm_up(args.warmup)
+    setup_s = time.perf_counter() - setup_started
+    if args.mode == "closed":
+        result = generator.run_closed_loop(args.concurrency, requests=args.requests, duration_s=args.duration if args.requests is None else None)
+    else:
+        result = generator.run_open_loop(args.rate, args.duration, max_workers=args.max_workers)
+    return {"agent": name, "warmup_requests": args.warmup, "warmup_s": setup_s, **result}
+
+
+def run_isolated(name: str, argv: List[str]) -> Dict[str, Any]:
+    """Benchmarks one agent in a child process, so CPU and memory figures are per agent."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        output_path = tmp.name
+    try:
+        command = [sys.executable, "-m", "bench", *argv, "--agents", name, "--in-process", "--quiet", "--output", output_path]
+        completed = subprocess.run(command, cwd=REPO_ROOT, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"agent": name, "failed": True, "stderr": completed.stderr[-2000:]}
+        with open(output_path) as f:
+            return json.load(f)["results"][0]
+    finally:
+        os.unlink(output_path)
+
+
+def compare_with_baseline(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Returns a description of every metric that regressed by more than `tolerance` (a fraction)."""
+    with open(baseline_path) as f:
+        baseline = {(r["agent"], r.get("mode")): r for r in json.load(f)["results"] if not r.get("failed")}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result["agent"], result.get("mode")))
+        if previous is None or result.get("failed"):
+            continue
+        if result["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{result['agent']}: throughput {previous['throughput_rps']:.2f} -> {result['throughput_rps']:.2f} rps")
+        for pct in ("p95", "p99"):
+            before, after = previous["latency_ms"][pct], result["latency_ms"][pct]
+            if after > before * (1 + tolerance):
+                regressions.append(f"{result['agent']}: {pct} latency {before:.1f} -> {after:.1f} ms")
+    return regressions
+
+
+def print_summary(results: List[Dict[str, Any]]) -> None:
+    print(f"{'agent':<18}{'mode':<8}{'reqs':>7}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'cpu':>7}{'peak MB':>10}")
+    for r in results:
+        if r.get("failed"):
+            print(f"{r['agent']:<18}FAILED: {r.get('stderr', '').strip().splitlines()[-1:]}")
+            continue
+        lat = r["latency_ms"]
+        print(f"{r['agent']:<18}{r['mode']:<8}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>9.2f}"
+              f"{lat['p50']:>10.1f}{lat['p95']:>10.1f}{lat['p99']:>10.1f}{r['cpu']['utilization']:>7.2f}{r['memory']['peak_rss_mb']:>10.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load generator for the agents in this repository.")
+    parser.add_argument("--agents", nargs="+", default=["all"], help=f"Agents to benchmark: {', '.join(AGENTS)} or 'all'.")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed loop: concurrent workers.")
+    parser.add_argument("--requests", type=int, default=None, help="Closed loop: total requests (default: run for --duration).")
+    parser.add_argument("--rate", type=float, default=20.0, help="Open loop: mean arrival rate (requests/second).")
+    parser.add_argument("--max-workers", type=int, default=64, help="Open loop: worker threads serving arrivals.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Run length in seconds.")
+    parser.add_argument("--warmup", type=int, default=5, help="Requests issued before measuring.")
+    parser.add_argument("--provider", default="mock", help="LLM provider for the agents ('mock' by default; '' keeps the environment's).")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Mock provider: simulated latency per LLM call.")
+    parser.add_argument("--latency-jitter-ms", type=float, default=50.0, help="Mock provider: uniform +/- jitter.")
+    parser.add_argument("--replay-file", default=None, help="Mock provider: JSONL recordings to replay.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write machine-readable results (JSON) here.")
+    parser.add_argument("--baseline", default=None, help="Previous results JSON; exit with status 1 on regression.")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression against --baseline.")
+    parser.add_argument("--in-process", action="store_true", help="Run all agents in this process instead of one child process each.")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    names = list(AGENTS) if args.agents == ["all"] else args.agents
+    unknown = [name for name in names if name not in AGENTS]
+    if unknown:
+        parser.error(f"Unknown agent(s): {', '.join(unknown)}. Choose from: {', '.join(AGENTS)}")
+
+    if args.in_process or len(names) == 1:
+        configure_provider(args)
+        results = []
+        for name in names:
+            try:
+                results.append(run_agent(name, args))
+            except Exception as e:
+                results.append({"agent": name, "failed": True, "stderr": f"{type(e).__name__}: {e}"})
+    else:
+        # Re-run ourselves per agent with the same options (minus the agent list and output handling)
+        passthrough = _strip_options(list(argv if argv is not None else sys.argv[1:]), {"--agents": -1, "--output": 1, "--baseline": 1, "--tolerance": 1})
+        results = [run_isolated(name, passthrough) for name in names]
+
+    report = {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "quiet", "in_process")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if not args.quiet:
+        print_summary(results)
+        if args.output:
+            print(f"\nResults written to {args.output}")
+
+    exit_code = 1 if any(r.get("failed") for r in results) else 0
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            exit_code = 1
+    return exit_code
+
+
+def _strip_options(argv: List[str], options: Dict[str, int]) -> List[str]:
+    """Removes options from argv. A value count of -1 means 'all following non-option values'."""
+    stripped: List[str] = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        name = arg.split("=", 1)[0]
+        if name in options:
+            if "=" not in arg:
+                count = options[name]
+                i += 1
+                if count == -1:
+                    while i < len(argv) and not argv[i].startswith("--"):
+                        i += 1
+                else:
+                    i += count
+            else:
+                i += 1
+            continue
+        stripped.append(arg)
+        i += 1
+    return stripped
+
+
+if __name__ == "__main__":
+    sys.exit(main())
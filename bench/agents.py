@@ -0,0 +1,81 @@
+# bench/agents.py
+# Adapters describing how to construct each agent and which method to drive.
+import importlib
+import os
+import sys
+from typing import Any, Callable, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class AgentAdapter:
+    """
+    Describes one benchmarkable agent.
+
+    Args:
+        name: Short name used on the command line.
+        directory: Agent directory relative to the repository root.
+        module: Module to import. Modules inside the agent directory use flat imports
+                (e.g. `from tools import ...`), so the directory is put on sys.path first.
+        class_name: Agent class in that module.
+        method: Method driven by the load generator. It receives one input string.
+        inputs: Sample inputs, cycled through by the load generator.
+        package_import: True if the module uses package-relative imports and must be
+                        imported as `<directory>.<module>` from the repository root.
+    """
+
+    def __init__(self, name: str, directory: str, module: str, class_name: str, method: str,
+                 inputs: List[str], package_import: bool = False):
+        self.name = name
+        self.directory = directory
+        self.module = module
+        self.class_name = class_name
+        self.method = method
+        self.inputs = inputs
+        self.package_import = package_import
+
+    def load_class(self) -> Any:
+        if REPO_ROOT not in sys.path:
+            sys.path.insert(0, REPO_ROOT)
+        if self.package_import:
+            module = importlib.import_module(f"{self.directory}.{self.module}")
+        else:
+            agent_dir = os.path.join(REPO_ROOT, self.directory)
+            if agent_dir not in sys.path:
+                sys.path.insert(0, agent_dir)
+            module = importlib.import_module(self.module)
+        return getattr(module, self.class_name)
+
+    def make_call(self) -> Callable[[str], Any]:
+        """Builds a fresh agent instance and returns its bound benchmark method."""
+        agent = self.load_class()()
+        return getattr(agent, self.method)
+
+
+AGENTS: Dict[str, AgentAdapter] = {
+    "react_rag": AgentAdapter(
+        "react_rag", "react_rag_agent", "agent", "ReActRAGAgent", "reason_and_act",
+        ["tell me about python", "what is AI?", "explain RAG", "describe Java", "info on react", "hello"],
+        package_import=True,
+    ),
+    "tool_enhanced": AgentAdapter(
+        "tool_enhanced", "tool_enhanced_agent", "agent", "ToolEnhancedAgent", "process_request",
+        ["What time is it?", "Calculate the sum of 10 and 25.5", "What's the weather in London?", "Hello there!"],
+    ),
+    "memory_enhanced": AgentAdapter(
+        "memory_enhanced", "memory_enhanced_agent", "agent", "MemoryEnhancedAgent", "chat",
+        ["Hello", "My name is Bob.", "I like blue.", "What is my name?", "Where do I live?"],
+    ),
+    "llm_enhanced": AgentAdapter(
+        "llm_enhanced", "llm_enhanced_agent", "agent", "LLMEnhancedAgent", "process_request",
+        ["Hello, world! What is the capital of France?", "Tell me a short story about a brave robot.", "What is 1+1?"],
+    ),
+    "self_reflecting": AgentAdapter(
+        "self_reflecting", "self_reflecting_agent", "agent", "SelfReflectingAgent", "process_request",
+        ["Write a short poem about the sea.", "Explain recursion to a child.", "Summarize the benefits of exercise."],
+    ),
+    "fixed_automation": AgentAdapter(
+        "fixed_automation", "fixed_automation_agent", "automation", "FixedAutomationAgent", "process_request",
+        ["hello there", "what is 5 plus 3?", "multiply 4 by 6", "tell me about yourself"],
+    ),
+}
@@ -0,0 +1,200 @@
+# bench/load_generator.py
+# Open-loop (Poisson arrivals) and closed-loop (fixed concurrency) load generation.
+import itertools
+import os
+import random
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list (pct in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (pct / 100.0) * (len(sorted_values) - 1)
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size of this process, from /proc on Linux or psutil if installed."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+class LoadResult:
+    """Latencies and resource usage collected during one run."""
+
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.errors = 0
+        self.error_samples: List[str] = []
+        self.lock = threading.Lock()
+
+    def record(self, latency_ms: float, error: Optional[BaseException] = None) -> None:
+        with self.lock:
+            self.latencies_ms.append(latency_ms)
+            if error is not None:
+                self.errors += 1
+                if len(self.error_samples) < 5:
+                    self.error_samples.append(f"{type(error).__name__}: {error}")
+
+
+class LoadGenerator:
+    """
+    Drives a blocking callable with synthetic traffic.
+
+    `make_call` is invoked once per worker thread, so each thread gets its own agent
+    instance (several agents keep per-request state on `self`).
+
+    - Closed loop: `concurrency` workers each issue the next request as soon as the previous
+      one returns. Measures sustainable throughput at that concurrency.
+    - Open loop: requests arrive as a Poisson process at `rate` per second regardless of how
+      fast they complete. Latency is measured from the scheduled arrival time, so queueing
+      delay under overload is included rather than hidden (no coordinated omission).
+    """
+
+    def __init__(self, make_call: Callable[[], Callable[[str], Any]], inputs: List[str], seed: Optional[int] = None):
+        if not inputs:
+            raise ValueError("LoadGenerator needs at least one input.")
+        self.make_call = make_call
+        self.inputs = inputs
+        self._rng = random.Random(seed)
+        self._local = threading.local()
+
+    def _call(self, user_input: str) -> None:
+        call = getattr(self._local, "call", None)
+        if call is None:
+            call = self.make_call()
+            self._local.call = call
+        call(user_input)
+
+    def warm_up(self, requests: int) -> None:
+        for user_input in itertools.islice(itertools.cycle(self.inputs), requests):
+            try:
+                self._call(user_input)
+            except Exception:
+                pass
+
+    def run_closed_loop(self, concurrency: int, requests: Optional[int] = None, duration_s: Optional[float] = None) -> Dict[str, Any]:
+        if requests is None and duration_s is None:
+            raise ValueError("Closed-loop runs need a request count or a duration.")
+        result = LoadResult()
+        counter = itertools.count()
+        deadline = time.perf_counter() + duration_s if duration_s else None
+
+        def worker() -> None:
+            while True:
+                n = next(counter)
+                if requests is not None and n >= requests:
+                    return
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                user_input = self.inputs[n % len(self.inputs)]
+                started = time.perf_counter()
+                try:
+                    self._call(user_input)
+                    result.record((time.perf_counter() - started) * 1000.0)
+                except Exception as e:
+                    result.record((time.perf_counter() - started) * 1000.0, e)
+
+        return self._measure(result, {"mode": "closed", "concurrency": concurrency}, lambda: self._run_workers(worker, concurrency))
+
+    def run_open_loop(self, rate: float, duration_s: float, max_workers: int = 64) -> Dict[str, Any]:
+        if rate <= 0:
+            raise ValueError("Open-loop rate must be positive.")
+        result = LoadResult()
+
+        def drive() -> None:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bench-open") as pool:
+                start = time.perf_counter()
+                arrival = start
+                n = 0
+                while True:
+                    arrival += self._rng.expovariate(rate)
+                    if arrival - start >= duration_s:
+                        break
+                    sleep_for = arrival - time.perf_counter()
+                    if sleep_for > 0:
+                        time.sleep(sleep_for)
+                    pool.submit(self._timed_call, self.inputs[n % len(self.inputs)], arrival, result)
+                    n += 1
+
+        return self._measure(result, {"mode": "open", "target_rate_rps": rate, "max_workers": max_workers}, drive)
+
+    def _timed_call(self, user_input: str, scheduled_at: float, result: LoadResult) -> None:
+        try:
+            self._call(user_input)
+            result.record((time.perf_counter() - scheduled_at) * 1000.0)
+        except Exception as e:
+            result.record((time.perf_counter() - scheduled_at) * 1000.0, e)
+
+    @staticmethod
+    def _run_workers(worker: Callable[[], None], concurrency: int) -> None:
+        threads = [threading.Thread(target=worker, name=f"bench-closed-{i}") for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    @staticmethod
+    def _measure(result: LoadResult, params: Dict[str, Any], run: Callable[[], None]) -> Dict[str, Any]:
+        rss_before = current_rss_mb()
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.perf_counter()
+        run()
+        wall_s = time.perf_counter() - started
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+        latencies = sorted(result.latencies_ms)
+        completed = len(latencies)
+        user_s = usage_after.ru_utime - usage_before.ru_utime
+        system_s = usage_after.ru_stime - usage_before.ru_stime
+        return {
+            **params,
+            "requests": completed,
+            "errors": result.errors,
+            "error_rate": (result.errors / completed) if completed else 0.0,
+            "error_samples": result.error_samples,
+            "duration_s": wall_s,
+            "throughput_rps": (completed - result.errors) / wall_s if wall_s > 0 else 0.0,
+            "latency_ms": {
+                "mean": (sum(latencies) / completed) if completed else 0.0,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "max": latencies[-1] if latencies else 0.0,
+            },
+            "cpu": {
+                "user_s": user_s,
+                "system_s": system_s,
+                # CPU seconds per wall second; above 1.0 means more than one core busy
+                "utilization": (user_s + system_s) / wall_s if wall_s > 0 else 0.0,
+                "cpu_ms_per_request": ((user_s + system_s) * 1000.0 / completed) if completed else 0.0,
+            },
+            "memory": {
+                "rss_mb_before": rss_before,
+                "rss_mb_after": current_rss_mb(),
+                "peak_rss_mb": peak_rss_mb(),
+            },
+        }
@@ -1,7 +1,18 @@
 # common/__init__.py
-from .llm_config import get_llm_provider_instance, get_llm_provider_config
+from .llm_config import (
+    get_llm_provider_instance,
+    get_llm_provider_config,
+    get_llm_config_snapshot,
+    reload_llm_config,
+    start_llm_config_watcher,
+    LLMConfigSnapshot
+)
 
 __all__ = [
     "get_llm_provider_instance",
-    "get_llm_provider_config"
+    "get_llm_provider_config",
+    "get_llm_config_snapshot",
+    "reload_llm_config",
+    "start_llm_config_watcher",
+    "LLMConfigSnapshot"
 ]
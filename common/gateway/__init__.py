@@ -0,0 +1,18 @@
+# common/gateway/__init__.py
+from .cache import ResponseCache
+from .rate_limit import RateLimiter, TokenBucket
+from .batching import RequestBatcher
+from .http_server import JSONHTTPServer, HTTPError, HTTPRequest
+from .server import GatewayServer, run_gateway
+
+__all__ = [
+    "ResponseCache",
+    "RateLimiter",
+    "TokenBucket",
+    "RequestBatcher",
+    "JSONHTTPServer",
+    "HTTPError",
+    "HTTPRequest",
+    "GatewayServer",
+    "run_gateway"
+]
@@ -0,0 +1,69 @@
+# Run the OpenAI-compatible LLM gateway:
+#   python -m common.gateway --provider mock --mock-latency-ms 200
+# Then point agents at it:
+#   LLM_PROVIDER=openai OPENAI_BASE_URL=http://127.0.0.1:8800/v1 OPENAI_API_KEY=gateway OPENAI_MODEL=mock/mock
+import argparse
+import os
+
+from .rate_limit import RateLimiter
+from .cache import ResponseCache
+from .server import run_gateway
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible gateway over common.llm_providers.")
+    parser.add_argument("--host", default=os.environ.get("GATEWAY_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("GATEWAY_PORT", 8800)))
+    parser.add_argument("--provider", default=os.environ.get("GATEWAY_PROVIDER", os.environ.get("LLM_PROVIDER")),
+                        help="Upstream provider for bare model names (ollama, openai, gemini, bedrock, mock).")
+    parser.add_argument("--model", default=os.environ.get("GATEWAY_MODEL"), help="Default upstream model.")
+    parser.add_argument("--cache-size", type=int, default=int(os.environ.get("GATEWAY_CACHE_SIZE", 10000)))
+    parser.add_argument("--cache-ttl", type=float, default=float(os.environ.get("GATEWAY_CACHE_TTL", 3600)))
+    parser.add_argument("--cache-max-temperature", type=float, default=float(os.environ.get("GATEWAY_CACHE_MAX_TEMPERATURE", 0.0)),
+                        help="Cache and coalesce only requests at or below this temperature.")
+    parser.add_argument("--client-rate", type=float, default=float(os.environ.get("GATEWAY_CLIENT_RATE", 0)),
+                        help="Requests/second per client (Authorization header or peer address). 0 disables.")
+    parser.add_argument("--client-burst", type=float, default=None)
+    parser.add_argument("--global-rate", type=float, default=float(os.environ.get("GATEWAY_GLOBAL_RATE", 0)),
+                        help="Requests/second across all clients. 0 disables.")
+    parser.add_argument("--global-burst", type=float, default=None)
+    parser.add_argument("--batch-window-ms", type=float, default=float(os.environ.get("GATEWAY_BATCH_WINDOW_MS", 5)))
+    parser.add_argument("--max-batch-size", type=int, default=int(os.environ.get("GATEWAY_MAX_BATCH_SIZE", 32)))
+    parser.add_argument("--max-concurrency", type=int, default=int(os.environ.get("GATEWAY_MAX_CONCURRENCY", 8)),
+                        help="Maximum concurrent upstream calls.")
+    parser.add_argument("--mock-latency-ms", type=float, default=None, help="Simulated latency for the mock provider.")
+    parser.add_argument("--mock-replay-file", default=None, help="JSONL recordings for the mock provider.")
+    args = parser.parse_args()
+
+    rate_limiter = None
+    if args.client_rate > 0 or args.global_rate > 0:
+        rate_limiter = RateLimiter(
+            per_client_rate=args.client_rate,
+            per_client_burst=args.client_burst,
+            global_rate=args.global_rate,
+            global_burst=args.global_burst,
+        )
+
+    mock_kwargs = {}
+    if args.mock_latency_ms is not None:
+        mock_kwargs["latency_ms"] = args.mock_latency_ms
+    if args.mock_replay_file:
+        mock_kwargs["replay_file"] = args.mock_replay_file
+
+    run_gateway(
+        provider_name=args.provider,
+        default_model=args.model,
+        host=args.host,
+        port=args.port,
+        cache=ResponseCache(max_entries=args.cache_size, ttl_seconds=args.cache_ttl),
+        cache_max_temperature=args.cache_max_temperature,
+        rate_limiter=rate_limiter,
+        batch_window_ms=args.batch_window_ms,
+        max_batch_size=args.max_batch_size,
+        max_concurrency=args.max_concurrency,
+        provider_kwargs={"mock": mock_kwargs} if mock_kwargs else None,
+    )
+
+
+if __name__ == "__main__":
+    main()
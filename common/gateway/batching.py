@@ -0,0 +1,102 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class RequestBatcher:
+    """
+    Collects chat requests that arrive within a short window and dispatches them together.
+
+    - Requests are grouped by `group_key` (provider and model), so one batch targets one upstream model.
+    - Identical requests (same fingerprint) share one upstream call, both within a batch and
+      with a call that is already in flight.
+    - Distinct requests run on the shared upstream executor, with at most `max_concurrency`
+      upstream calls at a time across all batches.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, executor: Executor, window_ms: float = 5.0, max_batch_size: int = 32, max_concurrency: int = 8):
+        self.executor = executor
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending: Dict[str, List[Tuple[Optional[str], Callable[[], str], asyncio.Future]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.batches_dispatched = 0
+        self.requests_batched = 0
+        self.upstream_calls = 0
+        self.coalesced_requests = 0
+
+    async def submit(self, group_key: str, fingerprint: Optional[str], call: Callable[[], str]) -> str:
+        """
+        Queues `call` (a blocking upstream request) and waits for its result.
+        Pass `fingerprint=None` for requests that must never be shared (e.g. sampled at high temperature).
+        """
+        if fingerprint is not None and fingerprint in self._inflight:
+            self.coalesced_requests += 1
+            return await asyncio.shield(self._inflight[fingerprint])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(group_key, [])
+        batch.append((fingerprint, call, future))
+        if len(batch) >= self.max_batch_size:
+            self._flush(group_key)
+        elif group_key not in self._timers:
+            self._timers[group_key] = loop.call_later(self.window_seconds, self._flush, group_key)
+        return await future
+
+    def _flush(self, group_key: str) -> None:
+        timer = self._timers.pop(group_key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(group_key, [])
+        if not batch:
+            return
+        self.batches_dispatched += 1
+        self.requests_batched += len(batch)
+
+        # Fan identical requests in the batch out from a single upstream call.
+        waiters: Dict[object, List[asyncio.Future]] = {}
+        calls: Dict[object, Callable[[], str]] = {}
+        for fingerprint, call, future in batch:
+            key = fingerprint if fingerprint is not None else future
+            if key in waiters:
+                self.coalesced_requests += 1
+            waiters.setdefault(key, []).append(future)
+            calls.setdefault(key, call)
+
+        for key, call in calls.items():
+            shared = asyncio.ensure_future(self._run_upstream(call))
+            if isinstance(key, str):
+                self._inflight[key] = shared
+            shared.add_done_callback(lambda done, key=key: self._resolve(key, done, waiters[key]))
+
+    async def _run_upstream(self, call: Callable[[], str]) -> str:
+        async with self._semaphore:
+            self.upstream_calls += 1
+            return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+
+    def _resolve(self, key: object, done: asyncio.Future, futures: List[asyncio.Future]) -> None:
+        if isinstance(key, str) and self._inflight.get(key) is done:
+            del self._inflight[key]
+        for future in futures:
+            if future.done():
+                continue
+            if done.cancelled():
+                future.cancel()
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches_dispatched": self.batches_dispatched,
+            "requests_batched": self.requests_batched,
+            "mean_batch_size": (self.requests_batched / self.batches_dispatched) if self.batches_dispatched else 0.0,
+            "upstream_calls": self.upstream_calls,
+            "coalesced_requests": self.coalesced_requests,
+            "inflight": len(self._inflight),
+        }
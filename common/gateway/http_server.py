@@ -0,0 +1,175 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# A handler receives the parsed request and returns (status_code, json_body).
+Handler = Callable[["HTTPRequest"], Awaitable[Tuple[int, Any]]]
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+STATUS_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """Raised by handlers to return an error status with a JSON error body."""
+
+    def __init__(self, status: int, message: str, error_type: str = "invalid_request_error"):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.error_type = error_type
+
+    def to_body(self) -> Dict[str, Any]:
+        # Same shape as OpenAI error responses, so OpenAI SDK clients surface the message.
+        return {"error": {"message": self.message, "type": self.error_type}}
+
+
+class HTTPRequest:
+    """A parsed HTTP request. `json()` decodes the body lazily."""
+
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes, peer: str):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+        self.peer = peer
+
+    def json(self) -> Any:
+        if not self.body:
+            raise HTTPError(400, "Request body is empty; expected JSON.")
+        try:
+            return json.loads(self.body)
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Request body is not valid JSON: {e}")
+
+
+class JSONHTTPServer:
+    """
+    Minimal asyncio HTTP/1.1 server for JSON APIs.
+    Supports keep-alive and Content-Length bodies, which is all the OpenAI SDK and
+    `urllib` clients need. It has no third-party dependencies, so it runs anywhere the agents do.
+    Listens on TCP (host/port) or, if `unix_socket` is given, on a Unix domain socket.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8800, unix_socket: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self._routes: Dict[Tuple[str, str], Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def route(self, method: str, path: str, handler: Handler) -> None:
+        self._routes[(method.upper(), path.rstrip("/") or "/")] = handler
+
+    async def start(self) -> None:
+        if self.unix_socket:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=self.unix_socket)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+            # Port 0 asks the OS for a free port; report the one actually bound.
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    @property
+    def address(self) -> str:
+        return f"unix:{self.unix_socket}" if self.unix_socket else f"http://{self.host}:{self.port}"
+
+    async def _read_request(self, reader: asyncio.StreamReader, peer: str) -> Optional[HTTPRequest]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None  # Client closed the connection between requests
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request headers too large.")
+        if len(head) > MAX_HEADER_BYTES:
+            raise HTTPError(413, "Request headers too large.")
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, f"Malformed request line: {lines[0]!r}")
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            raise HTTPError(411, "Chunked request bodies are not supported; send Content-Length.")
+        length = int(headers.get("content-length", "0") or 0)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes.")
+        body = await reader.readexactly(length) if length else b""
+        path = target.split("?", 1)[0].rstrip("/") or "/"
+        return HTTPRequest(method.upper(), path, headers, body, peer)
+
+    async def _dispatch(self, request: HTTPRequest) -> Tuple[int, Any]:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                raise HTTPError(405, f"Method {request.method} not allowed for {request.path}.")
+            raise HTTPError(404, f"No route for {request.path}.")
+        return await handler(request)
+
+    @staticmethod
+    def _encode_response(status: int, payload: Any, keep_alive: bool) -> bytes:
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {STATUS_REASONS.get(status, 'Unknown')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer_info = writer.get_extra_info("peername")
+        peer = peer_info[0] if isinstance(peer_info, tuple) else "unix"
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader, peer)
+                    if request is None:
+                        break
+                    keep_alive = request.headers.get("connection", "").lower() != "close"
+                    status, payload = await self._dispatch(request)
+                except HTTPError as e:
+                    status, payload = e.status, e.to_body()
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    status, payload = 500, HTTPError(500, f"{type(e).__name__}: {e}", "server_error").to_body()
+                writer.write(self._encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
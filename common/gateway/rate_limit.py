@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """
+    Async token bucket. `rate` tokens are added per second up to `burst`.
+    Callers wait for a token up to `max_wait_seconds`; beyond that `acquire` returns False.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None, max_wait_seconds: float = 5.0):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.max_wait_seconds = max_wait_seconds
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> bool:
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        wait_seconds = (1.0 - self._tokens) / self.rate
+        if wait_seconds > self.max_wait_seconds:
+            return False
+        # Reserve the token now so concurrent waiters queue up behind each other.
+        self._tokens -= 1.0
+        await asyncio.sleep(wait_seconds)
+        return True
+
+
+class RateLimiter:
+    """
+    Per-client token buckets plus an optional global bucket protecting the upstream.
+    A rate of 0 (or less) disables that limit.
+    """
+
+    def __init__(
+        self,
+        per_client_rate: float = 0.0,
+        per_client_burst: Optional[float] = None,
+        global_rate: float = 0.0,
+        global_burst: Optional[float] = None,
+        max_wait_seconds: float = 5.0,
+    ):
+        self.per_client_rate = per_client_rate
+        self.per_client_burst = per_client_burst
+        self.max_wait_seconds = max_wait_seconds
+        self._client_buckets: Dict[str, TokenBucket] = {}
+        self._global_bucket = (
+            TokenBucket(global_rate, global_burst, max_wait_seconds) if global_rate > 0 else None
+        )
+        self.rejected = 0
+
+    async def acquire(self, client_key: str) -> bool:
+        if self.per_client_rate > 0:
+            bucket = self._client_buckets.get(client_key)
+            if bucket is None:
+                bucket = TokenBucket(self.per_client_rate, self.per_client_burst, self.max_wait_seconds)
+                self._client_buckets[client_key] = bucket
+            if not await bucket.acquire():
+                self.rejected += 1
+                return False
+        if self._global_bucket is not None and not await self._global_bucket.acquire():
+            self.rejected += 1
+            return False
+        return True
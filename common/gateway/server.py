@@ -0,0 +1,250 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.llm_providers.client import get_llm_client, SUPPORTED_PROVIDERS, DEFAULT_PROVIDER
+from common.llm_providers.base_llm_provider import BaseLLMProvider
+from .batching import RequestBatcher
+from .cache import ResponseCache, request_fingerprint
+from .http_server import JSONHTTPServer, HTTPError, HTTPRequest
+
+# Request fields forwarded as keyword arguments when the upstream is OpenAI itself.
+FORWARDED_PARAMS = ("top_p", "stop", "presence_penalty", "frequency_penalty", "seed")
+
+
+class GatewayServer:
+    """
+    OpenAI-compatible HTTP gateway in front of `common.llm_providers`.
+
+    Many agent processes point `OpenAIProvider(base_url=...)` at one gateway, so they share:
+    - one provider instance (and its upstream connection pool) per provider name,
+    - one response cache for deterministic requests,
+    - per-client and global rate limits,
+    - request batching/coalescing with bounded upstream concurrency.
+
+    Models are addressed as "<provider>/<model>" (e.g. "ollama/mistral") or as a bare
+    model name, which is routed to `provider_name`.
+    """
+
+    def __init__(
+        self,
+        provider_name: Optional[str] = None,
+        default_model: Optional[str] = None,
+        host: str = "127.0.0.1",
+        port: int = 8800,
+        cache: Optional[ResponseCache] = None,
+        cache_max_temperature: float = 0.0,
+        rate_limiter: Optional[Any] = None,
+        batch_window_ms: float = 5.0,
+        max_batch_size: int = 32,
+        max_concurrency: int = 8,
+        provider_kwargs: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        """
+        Args:
+            provider_name: Upstream provider for bare model names. Defaults to LLM_PROVIDER or "ollama".
+            default_model: Model used when a request names none (or names "default").
+            host, port: Listen address. Port 0 picks a free port.
+            cache: Shared response cache. A default-sized one is created if None.
+            cache_max_temperature: Only requests at or below this temperature are cached or coalesced,
+                                   so sampled responses stay independent by default.
+            rate_limiter: Optional `RateLimiter`; requests over the limit get HTTP 429.
+            batch_window_ms, max_batch_size, max_concurrency: `RequestBatcher` settings.
+            provider_kwargs: Constructor kwargs per provider name, e.g. {"mock": {"latency_ms": 200}}.
+        """
+        self.provider_name = (provider_name or DEFAULT_PROVIDER).lower()
+        if self.provider_name not in SUPPORTED_PROVIDERS:
+            raise ValueError(f"Unsupported gateway provider: '{self.provider_name}'. Supported providers are: {list(SUPPORTED_PROVIDERS.keys())}")
+        self.default_model = default_model
+        self.cache = cache if cache is not None else ResponseCache()
+        self.cache_max_temperature = cache_max_temperature
+        self.rate_limiter = rate_limiter
+        self.provider_kwargs = provider_kwargs or {}
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="gateway-upstream")
+        self.batch_window_ms = batch_window_ms
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.batcher: Optional[RequestBatcher] = None  # Created on the serving event loop
+        self._providers: Dict[str, BaseLLMProvider] = {}
+        self.http = JSONHTTPServer(host=host, port=port)
+        self.http.route("POST", "/v1/chat/completions", self.handle_chat_completions)
+        self.http.route("GET", "/v1/models", self.handle_models)
+        self.http.route("GET", "/health", self.handle_health)
+        self.http.route("GET", "/metrics", self.handle_metrics)
+        self.requests_total = 0
+        self.errors_total = 0
+        self.started_at = time.time()
+
+    # --- Provider registry ---
+
+    def get_provider(self, provider_name: str) -> BaseLLMProvider:
+        """Returns the shared provider instance for `provider_name`, creating it on first use."""
+        provider = self._providers.get(provider_name)
+        if provider is None:
+            kwargs = dict(self.provider_kwargs.get(provider_name, {}))
+            if provider_name == self.provider_name and self.default_model and "default_model" not in kwargs:
+                kwargs["default_model"] = self.default_model
+            provider = get_llm_client(provider_name, **kwargs)
+            self._providers[provider_name] = provider
+        return provider
+
+    def resolve_model(self, requested_model: Optional[str]) -> Tuple[str, Optional[str]]:
+        """Splits a request's model field into (provider_name, model_name)."""
+        if not requested_model or requested_model == "default":
+            return self.provider_name, self.default_model
+        prefix, sep, rest = requested_model.partition("/")
+        if sep and prefix.lower() in SUPPORTED_PROVIDERS:
+            return prefix.lower(), rest or None
+        return self.provider_name, requested_model
+
+    # --- Handlers ---
+
+    async def handle_chat_completions(self, request: HTTPRequest) -> Tuple[int, Any]:
+        self.requests_total += 1
+        payload = request.json()
+        messages = payload.get("messages")
+        if not isinstance(messages, list) or not messages:
+            raise HTTPError(400, "'messages' must be a non-empty list.")
+        if payload.get("stream"):
+            raise HTTPError(400, "Streaming responses are not supported by this gateway.")
+        if payload.get("n", 1) != 1:
+            raise HTTPError(400, "Only n=1 is supported by this gateway.")
+
+        client_key = request.headers.get("authorization") or request.peer
+        if self.rate_limiter is not None and not await self.rate_limiter.acquire(client_key):
+            raise HTTPError(429, "Rate limit exceeded.", "rate_limit_error")
+
+        provider_name, model = self.resolve_model(payload.get("model"))
+        try:
+            provider = self.get_provider(provider_name)
+        except Exception as e:
+            self.errors_total += 1
+            raise HTTPError(503, f"Upstream provider '{provider_name}' is unavailable: {e}", "upstream_error")
+        try:
+            model = provider._get_model_name(model)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+        temperature = float(payload.get("temperature", 0.7))
+        max_tokens = payload.get("max_tokens") or payload.get("max_completion_tokens")
+        response_format = payload.get("response_format") or {}
+        request_json_output = response_format.get("type") == "json_object"
+        # Only OpenAI understands these natively; other providers would reject unknown kwargs.
+        extra = {name: payload[name] for name in FORWARDED_PARAMS if payload.get(name) is not None} if provider_name == "openai" else {}
+
+        cacheable = temperature <= self.cache_max_temperature
+        fingerprint = None
+        if cacheable:
+            fingerprint = request_fingerprint(
+                provider_name, model, messages,
+                {"temperature": temperature, "max_tokens": max_tokens, "json": request_json_output, **extra},
+            )
+            cached = self.cache.get(fingerprint)
+            if cached is not None:
+                return 200, self._completion_body(model, messages, cached, cached_response=True)
+
+        def call_upstream() -> str:
+            chat_kwargs: Dict[str, Any] = dict(extra)
+            if max_tokens is not None:
+                chat_kwargs["max_tokens"] = int(max_tokens)
+            return provider.chat(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                request_json_output=request_json_output,
+                **chat_kwargs
+            )
+
+        try:
+            content = await self.batcher.submit(f"{provider_name}/{model}", fingerprint, call_upstream)
+        except Exception as e:
+            self.errors_total += 1
+            raise HTTPError(502, f"Upstream error from {provider_name}/{model}: {type(e).__name__} - {e}", "upstream_error")
+
+        if fingerprint is not None:
+            self.cache.put(fingerprint, content)
+        return 200, self._completion_body(model, messages, content)
+
+    async def handle_models(self, request: HTTPRequest) -> Tuple[int, Any]:
+        data = [
+            {"id": f"{name}/{provider.default_model}", "object": "model", "owned_by": name}
+            for name, provider in self._providers.items()
+            if provider.default_model
+        ]
+        if self.default_model and not any(item["owned_by"] == self.provider_name for item in data):
+            data.append({"id": f"{self.provider_name}/{self.default_model}", "object": "model", "owned_by": self.provider_name})
+        return 200, {"object": "list", "data": data}
+
+    async def handle_health(self, request: HTTPRequest) -> Tuple[int, Any]:
+        return 200, {"status": "ok", "provider": self.provider_name}
+
+    async def handle_metrics(self, request: HTTPRequest) -> Tuple[int, Any]:
+        return 200, self.stats()
+
+    # --- Helpers ---
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # Rough whitespace estimate; upstream providers do not all report usage.
+        return len(text.split())
+
+    def _completion_body(self, model: str, messages: List[Dict[str, str]], content: str, cached_response: bool = False) -> Dict[str, Any]:
+        prompt_tokens = sum(self._estimate_tokens(str(m.get("content", ""))) for m in messages)
+        completion_tokens = self._estimate_tokens(content or "")
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+            "system_fingerprint": "gateway-cache" if cached_response else "gateway",
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "rate_limited_total": self.rate_limiter.rejected if self.rate_limiter is not None else 0,
+            "cache": self.cache.stats(),
+            "batching": self.batcher.stats() if self.batcher is not None else {},
+            "providers": sorted(self._providers.keys()),
+        }
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        self.batcher = RequestBatcher(
+            self.executor,
+            window_ms=self.batch_window_ms,
+            max_batch_size=self.max_batch_size,
+            max_concurrency=self.max_concurrency,
+        )
+        await self.http.start()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        print(f"LLM gateway listening on {self.http.address}/v1 (upstream provider: {self.provider_name})")
+        await self.http.serve_forever()
+
+    async def close(self) -> None:
+        await self.http.close()
+        self.executor.shutdown(wait=False)
+
+
+def run_gateway(**kwargs: Any) -> None:
+    """Blocking helper: builds a `GatewayServer` from kwargs and serves until interrupted."""
+    server = GatewayServer(**kwargs)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("\nLLM gateway stopped.")
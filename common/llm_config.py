@@ -1,19 +1,29 @@
+import json
 import os
-from typing import Optional, Dict, Any
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Iterator, List
 from common.llm_providers import (
     BaseLLMProvider,
     OllamaProvider,
     OpenAIProvider,
     GeminiProvider,
-    BedrockProvider
+    BedrockProvider,
+    MockProvider,
+    OllamaBatchDispatcher
 )
 
 # Environment variable names
 ENV_LLM_PROVIDER = "LLM_PROVIDER"
 ENV_OLLAMA_MODEL = "OLLAMA_MODEL"
 ENV_OLLAMA_HOST = "OLLAMA_HOST" # Optional
+ENV_OLLAMA_BATCHING = "OLLAMA_BATCHING" # Optional, "true" routes calls through the shared micro-batching dispatcher
+ENV_OLLAMA_NUM_PARALLEL = "OLLAMA_NUM_PARALLEL" # Optional, should match the Ollama server's setting
 ENV_OPENAI_MODEL = "OPENAI_MODEL"
 ENV_OPENAI_API_KEY = "OPENAI_API_KEY" # Provider also checks this
+ENV_OPENAI_BASE_URL = "OPENAI_BASE_URL" # Optional, e.g. the local gateway (python -m common.gateway)
 ENV_GEMINI_MODEL = "GEMINI_MODEL"
 ENV_GOOGLE_API_KEY = "GOOGLE_API_KEY" # Provider also checks this
 ENV_BEDROCK_MODEL = "BEDROCK_MODEL"
@@ -21,6 +31,12 @@ ENV_AWS_REGION = "AWS_BEDROCK_REGION" # More specific than just AWS_REGION for B
 ENV_AWS_ACCESS_KEY_ID = "AWS_ACCESS_KEY_ID" # For explicit Bedrock creds
 ENV_AWS_SECRET_ACCESS_KEY = "AWS_SECRET_ACCESS_KEY" # For explicit Bedrock creds
 ENV_AWS_SESSION_TOKEN = "AWS_SESSION_TOKEN" # For explicit Bedrock creds
+ENV_MOCK_MODEL = "MOCK_MODEL"
+ENV_MOCK_REPLAY_FILE = "MOCK_REPLAY_FILE" # Optional JSONL recordings to replay
+ENV_MOCK_LATENCY_MS = "MOCK_LATENCY_MS" # Optional simulated latency per call
+ENV_LLM_CONFIG_FILE = "LLM_CONFIG_FILE" # Optional YAML/TOML/JSON file overlaying the variables above
+ENV_LLM_CONFIG_WATCH = "LLM_CONFIG_WATCH" # "false" disables hot reload of LLM_CONFIG_FILE
+ENV_LLM_CONFIG_WATCH_INTERVAL = "LLM_CONFIG_WATCH_INTERVAL" # Seconds between file checks
 
 
 # Default values
@@ -30,69 +46,466 @@ DEFAULT_OPENAI_MODEL = "gpt-3.5-turbo"
 DEFAULT_GEMINI_MODEL = "gemini-pro"
 # Example: "anthropic.claude-3-sonnet-20240229-v1:0" or "meta.llama3-8b-instruct-v1:0"
 DEFAULT_BEDROCK_MODEL = "anthropic.claude-3-sonnet-20240229-v1:0"
+DEFAULT_MOCK_MODEL = "mock"
+DEFAULT_CONFIG_WATCH_INTERVAL = 2.0
 
-def get_llm_provider_config() -> Dict[str, Any]:
+SUPPORTED_PROVIDER_NAMES = ["ollama", "openai", "gemini", "bedrock", "mock"]
+
+# Keys of the provider config dict returned by get_llm_provider_config(), per provider.
+PROVIDER_CONFIG_KEYS: Dict[str, List[str]] = {
+    "ollama": ["model", "host", "batching", "num_parallel"],
+    "openai": ["model", "api_key", "base_url"],
+    "gemini": ["model", "api_key"],
+    "bedrock": ["model", "aws_region_name", "aws_access_key_id", "aws_secret_access_key", "aws_session_token"],
+    "mock": ["model", "replay_file", "latency_ms"],
+}
+
+@dataclass(frozen=True)
+class LLMConfigSnapshot:
+    """
+    Immutable, validated LLM configuration.
+    Built once from environment variables plus the optional LLM_CONFIG_FILE and shared
+    until the next reload, instead of re-reading os.environ for every agent.
+    Equality ignores the bookkeeping fields, so `old == new` means "nothing changed".
+    """
+    provider_name: str
+    model: Optional[str] = None
+    host: Optional[str] = None
+    batching: bool = False
+    num_parallel: Optional[int] = None
+    api_key: Optional[str] = field(default=None, repr=False)
+    base_url: Optional[str] = None
+    aws_region_name: Optional[str] = None
+    aws_access_key_id: Optional[str] = field(default=None, repr=False)
+    aws_secret_access_key: Optional[str] = field(default=None, repr=False)
+    aws_session_token: Optional[str] = field(default=None, repr=False)
+    replay_file: Optional[str] = None
+    latency_ms: float = 0.0
+    source_file: Optional[str] = field(default=None, compare=False)
+    version: int = field(default=0, compare=False)
+    loaded_at: float = field(default=0.0, compare=False)
+
+    def as_provider_config(self) -> Dict[str, Any]:
+        """Returns the provider config dict in the shape get_llm_provider_config() has always used."""
+        config: Dict[str, Any] = {"provider_name": self.provider_name}
+        for key in PROVIDER_CONFIG_KEYS[self.provider_name]:
+            config[key] = getattr(self, key)
+        return config
+
+def _load_config_file(path: str) -> Dict[str, str]:
     """
-    Reads LLM provider configuration from environment variables.
-    Returns a dictionary with provider name and relevant settings.
+    Reads a YAML, TOML or JSON settings file.
+    Keys are the environment variable names above (case-insensitive), e.g. `LLM_PROVIDER: openai`.
     """
-    provider_name = os.environ.get(ENV_LLM_PROVIDER, DEFAULT_LLM_PROVIDER).lower()
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError as e:
+        raise ValueError(f"Could not read LLM config file '{path}': {e}")
+
+    if extension == ".toml":
+        try:
+            import tomllib
+        except ImportError: # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("Reading TOML config files requires Python 3.11+ or the 'tomli' package.")
+        data = tomllib.loads(raw.decode("utf-8"))
+    elif extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Reading YAML config files requires the 'PyYAML' package (pip install pyyaml).")
+        data = yaml.safe_load(raw) or {}
+    elif extension == ".json":
+        data = json.loads(raw)
+    else:
+        raise ValueError(f"Unsupported LLM config file type '{extension}'. Use .yaml, .yml, .toml or .json.")
 
-    config: Dict[str, Any] = {"provider_name": provider_name}
+    if not isinstance(data, dict):
+        raise ValueError(f"LLM config file '{path}' must contain a mapping of settings.")
+    settings: Dict[str, str] = {}
+    for key, value in data.items():
+        if value is None:
+            continue
+        if isinstance(value, (dict, list)):
+            raise ValueError(f"LLM config key '{key}' in '{path}' must be a single value, not {type(value).__name__}.")
+        settings[str(key).upper()] = str(value).lower() if isinstance(value, bool) else str(value)
+    return settings
+
+def _parse_number(name: str, raw: Optional[str], cast: Any) -> Any:
+    if raw is None or raw == "":
+        return None
+    try:
+        return cast(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got '{raw}'.")
+
+def load_llm_config_snapshot(config_file: Optional[str] = None, version: int = 0) -> LLMConfigSnapshot:
+    """
+    Reads and validates the LLM configuration into an immutable snapshot.
+    Values come from environment variables, overlaid by `config_file` (or LLM_CONFIG_FILE) if given.
+    The file wins over the environment so that editing it can change a running process.
+
+    Raises:
+        ValueError: For an unsupported provider, malformed values or an unreadable file.
+    """
+    config_file = config_file if config_file else os.environ.get(ENV_LLM_CONFIG_FILE)
+    file_settings = _load_config_file(config_file) if config_file else {}
+
+    def setting(name: str, default: Optional[str] = None) -> Optional[str]:
+        if name in file_settings:
+            return file_settings[name]
+        return os.environ.get(name, default)
+
+    provider_name = (setting(ENV_LLM_PROVIDER, DEFAULT_LLM_PROVIDER) or DEFAULT_LLM_PROVIDER).lower()
+    values: Dict[str, Any] = {"provider_name": provider_name}
 
     if provider_name == "ollama":
-        config["model"] = os.environ.get(ENV_OLLAMA_MODEL, DEFAULT_OLLAMA_MODEL)
-        config["host"] = os.environ.get(ENV_OLLAMA_HOST) # Will be None if not set, provider handles default
+        values["model"] = setting(ENV_OLLAMA_MODEL, DEFAULT_OLLAMA_MODEL)
+        values["host"] = setting(ENV_OLLAMA_HOST) # Will be None if not set, provider handles default
+        values["batching"] = (setting(ENV_OLLAMA_BATCHING, "false") or "").lower() in ("1", "true", "yes")
+        values["num_parallel"] = _parse_number(ENV_OLLAMA_NUM_PARALLEL, setting(ENV_OLLAMA_NUM_PARALLEL), int)
     elif provider_name == "openai":
-        config["model"] = os.environ.get(ENV_OPENAI_MODEL, DEFAULT_OPENAI_MODEL)
-        config["api_key"] = os.environ.get(ENV_OPENAI_API_KEY) # Provider will re-check but good to pass if explicitly set
+        values["model"] = setting(ENV_OPENAI_MODEL, DEFAULT_OPENAI_MODEL)
+        values["api_key"] = setting(ENV_OPENAI_API_KEY) # Provider will re-check but good to pass if explicitly set
+        values["base_url"] = setting(ENV_OPENAI_BASE_URL)
     elif provider_name == "gemini":
-        config["model"] = os.environ.get(ENV_GEMINI_MODEL, DEFAULT_GEMINI_MODEL)
-        config["api_key"] = os.environ.get(ENV_GOOGLE_API_KEY)
+        values["model"] = setting(ENV_GEMINI_MODEL, DEFAULT_GEMINI_MODEL)
+        values["api_key"] = setting(ENV_GOOGLE_API_KEY)
     elif provider_name == "bedrock":
-        config["model"] = os.environ.get(ENV_BEDROCK_MODEL, DEFAULT_BEDROCK_MODEL)
-        config["aws_region_name"] = os.environ.get(ENV_AWS_REGION)
-        config["aws_access_key_id"] = os.environ.get(ENV_AWS_ACCESS_KEY_ID)
-        config["aws_secret_access_key"] = os.environ.get(ENV_AWS_SECRET_ACCESS_KEY)
-        config["aws_session_token"] = os.environ.get(ENV_AWS_SESSION_TOKEN)
+        values["model"] = setting(ENV_BEDROCK_MODEL, DEFAULT_BEDROCK_MODEL)
+        values["aws_region_name"] = setting(ENV_AWS_REGION)
+        values["aws_access_key_id"] = setting(ENV_AWS_ACCESS_KEY_ID)
+        values["aws_secret_access_key"] = setting(ENV_AWS_SECRET_ACCESS_KEY)
+        values["aws_session_token"] = setting(ENV_AWS_SESSION_TOKEN)
+    elif provider_name == "mock":
+        values["model"] = setting(ENV_MOCK_MODEL, DEFAULT_MOCK_MODEL)
+        values["replay_file"] = setting(ENV_MOCK_REPLAY_FILE)
+        values["latency_ms"] = _parse_number(ENV_MOCK_LATENCY_MS, setting(ENV_MOCK_LATENCY_MS), float) or 0.0
     else:
-        supported_providers = ["ollama", "openai", "gemini", "bedrock"]
-        raise ValueError(f"Unsupported LLM_PROVIDER: '{provider_name}'. Supported providers are: {', '.join(supported_providers)}.")
+        raise ValueError(f"Unsupported LLM_PROVIDER: '{provider_name}'. Supported providers are: {', '.join(SUPPORTED_PROVIDER_NAMES)}.")
 
-    return config
+    return LLMConfigSnapshot(**values, source_file=config_file, version=version, loaded_at=time.time())
 
-def get_llm_provider_instance() -> BaseLLMProvider:
+def create_llm_provider(snapshot: LLMConfigSnapshot) -> BaseLLMProvider:
     """
-    Instantiates and returns the configured LLM provider based on environment variables.
+    Instantiates a new, unshared provider for the given snapshot.
     """
-    config = get_llm_provider_config()
-    provider_name = config["provider_name"]
-    model = config.get("model") # Model might not be needed by all providers in config dict if they have own defaults
+    provider_name = snapshot.provider_name
+    model = snapshot.model
 
     # print(f"[llm_config DEBUG] Instantiating provider: {provider_name} with model: {model}")
 
     if provider_name == "ollama":
-        return OllamaProvider(default_model=model, host=config.get("host"))
+        provider = OllamaProvider(default_model=model, host=snapshot.host)
+        if snapshot.batching:
+            # The registry shares this instance process-wide, so all agents share the server's parallel slots
+            return OllamaBatchDispatcher(provider, num_slots=snapshot.num_parallel)
+        return provider
     elif provider_name == "openai":
         # OpenAIProvider's __init__ will raise ValueError if API key is missing
-        return OpenAIProvider(default_model=model, api_key=config.get("api_key"))
+        return OpenAIProvider(default_model=model, api_key=snapshot.api_key, base_url=snapshot.base_url)
     elif provider_name == "gemini":
         # GeminiProvider's __init__ will raise ValueError if API key is missing
-        return GeminiProvider(default_model=model, api_key=config.get("api_key"))
+        return GeminiProvider(default_model=model, api_key=snapshot.api_key)
     elif provider_name == "bedrock":
         # BedrockProvider's __init__ will raise ValueError if region is missing and not in env
         return BedrockProvider(
             default_model=model,
-            aws_region_name=config.get("aws_region_name"),
-            aws_access_key_id=config.get("aws_access_key_id"),
-            aws_secret_access_key=config.get("aws_secret_access_key"),
-            aws_session_token=config.get("aws_session_token")
+            aws_region_name=snapshot.aws_region_name,
+            aws_access_key_id=snapshot.aws_access_key_id,
+            aws_secret_access_key=snapshot.aws_secret_access_key,
+            aws_session_token=snapshot.aws_session_token
+        )
+    elif provider_name == "mock":
+        return MockProvider(
+            default_model=model,
+            replay_file=snapshot.replay_file,
+            latency_ms=snapshot.latency_ms
         )
 
-    # This line should ideally not be reached due to validation in get_llm_provider_config
+    # This line should ideally not be reached due to validation in load_llm_config_snapshot
     # but as a safeguard:
     raise ValueError(f"Failed to instantiate provider for unknown or unhandled provider name: '{provider_name}'")
 
+def _close_provider(provider: BaseLLMProvider) -> None:
+    close = getattr(provider, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception as e:
+            print(f"Warning: error while closing retired LLM provider {provider!r}: {e}")
+
+class _ProviderGeneration:
+    """One provider built from one snapshot, plus the number of calls still using it."""
+
+    def __init__(self, snapshot: LLMConfigSnapshot, provider: BaseLLMProvider):
+        self.snapshot = snapshot
+        self.provider = provider
+        self.in_flight = 0
+        self.retired = False
+
+class LLMProviderRegistry:
+    """
+    Holds the provider built from the current snapshot and swaps it atomically on reload.
+    Every call leases the current generation. A replaced generation keeps serving the
+    calls already using it and is closed only after the last one returns, so a reload
+    never drops an in-flight request.
+    """
+
+    def __init__(self, snapshot: LLMConfigSnapshot):
+        self._cond = threading.Condition()
+        self._snapshot = snapshot
+        self._current: Optional[_ProviderGeneration] = None
+        self._retired: List[_ProviderGeneration] = []
+
+    @property
+    def snapshot(self) -> LLMConfigSnapshot:
+        return self._snapshot
+
+    def _current_generation(self) -> _ProviderGeneration:
+        # Must hold self._cond. Builds lazily so that importing never touches the network.
+        if self._current is None:
+            self._current = _ProviderGeneration(self._snapshot, create_llm_provider(self._snapshot))
+        return self._current
+
+    def provider(self) -> BaseLLMProvider:
+        """Returns the current provider, building it on first use (configuration errors propagate)."""
+        with self._cond:
+            return self._current_generation().provider
+
+    @contextmanager
+    def lease(self) -> Iterator[BaseLLMProvider]:
+        """Context manager that pins the current provider for the duration of one call."""
+        with self._cond:
+            generation = self._current_generation()
+            generation.in_flight += 1
+        try:
+            yield generation.provider
+        finally:
+            self._release(generation)
+
+    def _release(self, generation: _ProviderGeneration) -> None:
+        to_close = None
+        with self._cond:
+            generation.in_flight -= 1
+            if generation.retired and generation.in_flight == 0 and generation in self._retired:
+                self._retired.remove(generation)
+                to_close = generation
+            self._cond.notify_all()
+        if to_close is not None:
+            _close_provider(to_close.provider)
+
+    def swap(self, snapshot: LLMConfigSnapshot) -> bool:
+        """
+        Makes `snapshot` current. The new provider is built before the swap, so a failure
+        (e.g. a missing API key) leaves the old one serving. Returns False if nothing changed.
+        """
+        with self._cond:
+            if snapshot == self._snapshot:
+                return False
+            build_now = self._current is not None
+        new_generation = _ProviderGeneration(snapshot, create_llm_provider(snapshot)) if build_now else None
+
+        to_close = None
+        with self._cond:
+            old = self._current
+            self._snapshot = snapshot
+            self._current = new_generation
+            if old is not None:
+                old.retired = True
+                if old.in_flight == 0:
+                    to_close = old
+                else:
+                    self._retired.append(old)
+        if to_close is not None:
+            _close_provider(to_close.provider)
+        return True
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every replaced provider has finished its in-flight calls."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._retired, timeout=timeout)
+
+class ManagedLLMProvider(BaseLLMProvider):
+    """
+    Provider handle returned by get_llm_provider_instance().
+    Each call leases whichever provider the registry holds at that moment, so existing agents
+    follow a hot-reloaded configuration without being recreated, and share one warmed provider
+    (and its connections) for the whole process.
+    """
+
+    def __init__(self, registry: LLMProviderRegistry):
+        # default_model is derived from the registry, so the base initializer is not used.
+        self.registry = registry
+        self.api_key = None
+
+    @property
+    def default_model(self) -> Optional[str]:
+        return self.registry.snapshot.model
+
+    @property
+    def current_provider(self) -> BaseLLMProvider:
+        return self.registry.provider()
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        request_json_output: bool = False,
+        **kwargs: Any
+    ) -> str:
+        if max_tokens is not None: # Otherwise keep each provider's own default
+            kwargs["max_tokens"] = max_tokens
+        with self.registry.lease() as provider:
+            return provider.chat(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                request_json_output=request_json_output,
+                **kwargs
+            )
+
+    def __getattr__(self, name: str) -> Any:
+        # Provider-specific attributes (e.g. OllamaBatchDispatcher.stats) resolve on the current provider.
+        if name == "registry":
+            raise AttributeError(name)
+        return getattr(self.registry.provider(), name)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.registry.provider()!r})"
+
+class LLMConfigWatcher:
+    """
+    Polls the config file's modification time and hot-reloads it when it changes.
+    Polling keeps it dependency-free and portable. An invalid edit is reported and
+    ignored, leaving the previous snapshot active.
+    """
+
+    def __init__(self, path: str, interval: float = DEFAULT_CONFIG_WATCH_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_signature = self._signature()
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start(self) -> "LLMConfigWatcher":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="llm-config-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def check_now(self) -> bool:
+        """Reloads if the file changed since the last check. Returns True if a reload was attempted."""
+        signature = self._signature()
+        if signature is None or signature == self._last_signature:
+            return False
+        self._last_signature = signature
+        try:
+            snapshot = reload_llm_config(self.path)
+            print(f"LLM config watcher: active configuration is version {snapshot.version} ({snapshot.provider_name}/{snapshot.model}).")
+        except Exception as e:
+            print(f"LLM config watcher: ignoring invalid change to '{self.path}': {type(e).__name__} - {e}")
+        return True
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.check_now()
+
+_registry: Optional[LLMProviderRegistry] = None
+_registry_lock = threading.Lock()
+_managed_provider: Optional[ManagedLLMProvider] = None
+_watcher: Optional[LLMConfigWatcher] = None
+
+def _get_registry() -> LLMProviderRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = LLMProviderRegistry(load_llm_config_snapshot())
+            start_watcher = _registry.snapshot.source_file and os.environ.get(ENV_LLM_CONFIG_WATCH, "true").lower() not in ("0", "false", "no")
+        else:
+            start_watcher = False
+    if start_watcher:
+        start_llm_config_watcher(_registry.snapshot.source_file)
+    return _registry
+
+def get_llm_config_snapshot() -> LLMConfigSnapshot:
+    """
+    Returns the active configuration snapshot, loading it on first use.
+    """
+    return _get_registry().snapshot
+
+def reload_llm_config(config_file: Optional[str] = None) -> LLMConfigSnapshot:
+    """
+    Re-reads the environment and config file and atomically swaps in a new provider if anything changed.
+    Calls already running on the previous provider finish normally.
+
+    Raises:
+        ValueError: If the new configuration is invalid; the previous one stays active.
+    """
+    registry = _get_registry()
+    current = registry.snapshot
+    snapshot = load_llm_config_snapshot(config_file or current.source_file, version=current.version + 1)
+    if registry.swap(snapshot):
+        print(f"LLM config reloaded: version {snapshot.version}, provider '{snapshot.provider_name}', model '{snapshot.model}'.")
+    return registry.snapshot
+
+def start_llm_config_watcher(config_file: Optional[str] = None, interval: Optional[float] = None) -> LLMConfigWatcher:
+    """
+    Starts (once per process) the background watcher that hot-reloads the config file.
+    Called automatically when LLM_CONFIG_FILE is set, unless LLM_CONFIG_WATCH=false.
+    """
+    global _watcher
+    path = config_file or os.environ.get(ENV_LLM_CONFIG_FILE)
+    if not path:
+        raise ValueError(f"No config file to watch: pass config_file or set {ENV_LLM_CONFIG_FILE}.")
+    if interval is None:
+        interval = _parse_number(ENV_LLM_CONFIG_WATCH_INTERVAL, os.environ.get(ENV_LLM_CONFIG_WATCH_INTERVAL), float) or DEFAULT_CONFIG_WATCH_INTERVAL
+    with _registry_lock:
+        if _watcher is None:
+            _watcher = LLMConfigWatcher(path, interval=interval).start()
+        return _watcher
+
+def get_llm_provider_config() -> Dict[str, Any]:
+    """
+    Returns the active LLM provider configuration as a dictionary with the provider name and relevant settings.
+    Values come from the cached snapshot (environment variables plus the optional LLM_CONFIG_FILE);
+    call reload_llm_config() to pick up changes.
+    """
+    return get_llm_config_snapshot().as_provider_config()
+
+def get_llm_provider_instance() -> BaseLLMProvider:
+    """
+    Returns the process-wide provider for the active configuration.
+    The provider is built on the first call (configuration errors are raised here) and then shared,
+    so new agents reuse its warmed connections; it follows config reloads automatically.
+    """
+    global _managed_provider
+    registry = _get_registry()
+    registry.provider() # Build now so configuration errors surface to the caller, as before
+    with _registry_lock:
+        if _managed_provider is None:
+            _managed_provider = ManagedLLMProvider(registry)
+        return _managed_provider
+
 if __name__ == "__main__":
     # Example usage and testing
     print("--- LLM Configuration Test ---")
@@ -114,9 +527,10 @@ if __name__ == "__main__":
                 print(f"  {key}: {value if value else 'Not set/Using default'}")
 
         print("\n--- Attempting to Instantiate Provider ---")
-        provider_instance = get_llm_provider_instance()
+        provider_instance = get_llm_provider_instance().current_provider
         print(f"Successfully instantiated provider: {type(provider_instance).__name__}")
         print(f"Default model for this provider instance: {provider_instance.default_model}")
+        print(f"Configuration snapshot: {get_llm_config_snapshot()}")
 
         if isinstance(provider_instance, OllamaProvider):
              print("Ollama specific: Ensure Ollama server is running and model is pulled for actual use.")
@@ -1,16 +1,23 @@
 # common/llm_providers/__init__.py
 from .base import LLMProvider
+from .base_llm_provider import BaseLLMProvider
 from .ollama_provider import OllamaProvider
 from .openai_provider import OpenAIProvider
 from .gemini_provider import GeminiProvider
 from .bedrock_provider import BedrockProvider
+from .mock_provider import MockProvider
+from .ollama_dispatcher import OllamaBatchDispatcher, get_shared_ollama_dispatcher
 from .client import get_llm_client
 
 __all__ = [
     "LLMProvider",
+    "BaseLLMProvider",
     "OllamaProvider",
     "OpenAIProvider",
     "GeminiProvider",
     "BedrockProvider",
+    "MockProvider",
+    "OllamaBatchDispatcher",
+    "get_shared_ollama_dispatcher",
     "get_llm_client"
 ]
@@ -325,20 +325,3 @@ class BedrockProvider(BaseLLMProvider):
             raise ConnectionError(f"AWS Boto3 error during Bedrock chat completion with model {effective_model_id}: {e_boto}") from e_boto
         except Exception as e:
             raise Exception(f"Error during Bedrock chat completion with model {effective_model_id}: {type(e).__name__} - {e}")
-
-```python
-# common/llm_providers/__init__.py
-from .base_llm_provider import BaseLLMProvider
-from .ollama_provider import OllamaProvider
-from .openai_provider import OpenAIProvider
-from .gemini_provider import GeminiProvider
-from .bedrock_provider import BedrockProvider # Add this
-
-__all__ = [
-    "BaseLLMProvider",
-    "OllamaProvider",
-    "OpenAIProvider",
-    "GeminiProvider",
-    "BedrockProvider" # Add this
-]
-```
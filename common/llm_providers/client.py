@@ -5,12 +5,14 @@ from .ollama_provider import OllamaProvider
 from .openai_provider import OpenAIProvider
 from .gemini_provider import GeminiProvider
 from .bedrock_provider import BedrockProvider
+from .mock_provider import MockProvider
 
 SUPPORTED_PROVIDERS = {
     "ollama": OllamaProvider,
     "openai": OpenAIProvider,
     "gemini": GeminiProvider,
     "bedrock": BedrockProvider,
+    "mock": MockProvider, # Offline replay/canned responses for load testing
 }
 
 DEFAULT_PROVIDER = "ollama" # Default to Ollama if not specified
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from .base_llm_provider import BaseLLMProvider
+from typing import List, Dict, Any, Optional
+
+# Canned JSON reply used when JSON output is requested and no recording matches.
+# It carries the keys the agents in this repository read from their JSON calls
+# (ReAct analysis, tool selection, memory chat), so every agent can run end-to-end.
+DEFAULT_MOCK_JSON_RESPONSE: Dict[str, Any] = {
+    "intent": "information_seeking",
+    "search_query": "",
+    "llm_response": "This is a mock answer.",
+    "tool_name": "unknown",
+    "arguments": {},
+    "response": "This is a mock response.",
+    "new_facts_to_store": None,
+}
+
+class MockProvider(BaseLLMProvider):
+    """
+    Offline LLM provider that replays recorded responses or returns canned ones.
+    Intended for load testing and for running the agents without a live LLM service.
+    """
+
+    def __init__(
+        self,
+        default_model: Optional[str] = "mock",
+        replay_file: Optional[str] = None,
+        latency_ms: Optional[float] = None,
+        latency_jitter_ms: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the mock provider.
+        Args:
+            default_model: Model name reported back to callers. It is part of the replay key.
+            replay_file: Optional JSONL file of recordings. Each line is an object with
+                         "messages" (and optionally "model") plus the recorded "response".
+                         If None, attempts to load from MOCK_REPLAY_FILE env var.
+            latency_ms: Simulated latency per call. Defaults to MOCK_LATENCY_MS env var or 0.
+            latency_jitter_ms: Uniform +/- jitter added to the latency. Defaults to MOCK_LATENCY_JITTER_MS or 0.
+            seed: Optional seed for the jitter, for reproducible load tests.
+        """
+        super().__init__(default_model=default_model)
+        self.replay_file = replay_file if replay_file else os.environ.get("MOCK_REPLAY_FILE")
+        self.latency_ms = float(latency_ms if latency_ms is not None else os.environ.get("MOCK_LATENCY_MS", 0))
+        self.latency_jitter_ms = float(
+            latency_jitter_ms if latency_jitter_ms is not None else os.environ.get("MOCK_LATENCY_JITTER_MS", 0)
+        )
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recordings: Dict[str, str] = {}
+        self.call_count = 0
+        self.replay_hits = 0
+        if self.replay_file:
+            self.load_recordings(self.replay_file)
+
+    @staticmethod
+    def replay_key(messages: List[Dict[str, str]], model: Optional[str] = None) -> str:
+        """Stable key for a (model, messages) pair, used to look up recordings."""
+        canonical = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def load_recordings(self, path: str) -> int:
+        """
+        Loads recordings from a JSONL file. Returns the number of recordings loaded.
+        Recordings without a "model" key match any model.
+        """
+        if not os.path.exists(path):
+            raise ValueError(f"Mock replay file not found: '{path}'")
+        loaded = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    key = self.replay_key(record["messages"], record.get("model"))
+                    self._recordings[key] = record["response"]
+                    loaded += 1
+                except (json.JSONDecodeError, KeyError) as e:
+                    print(f"Warning: MockProvider skipped invalid recording on line {line_number} of '{path}': {e}")
+        return loaded
+
+    def add_recording(self, messages: List[Dict[str, str]], response: str, model: Optional[str] = None) -> None:
+        """Registers a single recording in memory."""
+        self._recordings[self.replay_key(messages, model)] = response
+
+    def _simulate_latency(self) -> None:
+        delay_ms = self.latency_ms
+        if self.latency_jitter_ms:
+            with self._lock:
+                delay_ms += self._rng.uniform(-self.latency_jitter_ms, self.latency_jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        request_json_output: bool = False,
+        **kwargs: Any
+    ) -> str:
+        """
+        Returns a recorded response for the request if one exists, otherwise a canned one.
+
+        Some agents pass `format_json=True` instead of `request_json_output`; both are honoured.
+        """
+        effective_model = self._get_model_name(model)
+        wants_json = request_json_output or bool(kwargs.get("format_json"))
+        self._simulate_latency()
+
+        for key in (self.replay_key(messages, effective_model), self.replay_key(messages)):
+            if key in self._recordings:
+                with self._lock:
+                    self.call_count += 1
+                    self.replay_hits += 1
+                return self._recordings[key]
+        with self._lock:
+            self.call_count += 1
+
+        last_user_content = next(
+            (m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), ""
+        )
+        if wants_json:
+            canned = dict(DEFAULT_MOCK_JSON_RESPONSE)
+            canned["search_query"] = last_user_content[:200]
+            return json.dumps(canned)
+        return f"Mock response from {effective_model} to: {last_user_content[:200]}"
@@ -0,0 +1,275 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .base_llm_provider import BaseLLMProvider
+from .ollama_provider import OllamaProvider
+
+DEFAULT_NUM_SLOTS = 4 # Ollama's own default for OLLAMA_NUM_PARALLEL on most hosts
+DEFAULT_WINDOW_MS = 10.0
+DEFAULT_SWITCH_AFTER_MS = 2000.0
+
+
+class _PendingRequest:
+    __slots__ = ("messages", "model", "kwargs", "future", "enqueued_at")
+
+    def __init__(self, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any]):
+        self.messages = messages
+        self.model = model
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class _ModelSlots:
+    """Queue and slot-occupancy bookkeeping for one model."""
+
+    def __init__(self, created_at: float):
+        self.queue: Deque[_PendingRequest] = deque()
+        self.busy = 0
+        self.peak_busy = 0
+        self.busy_slot_seconds = 0.0
+        self.last_change = created_at
+        self.created_at = created_at
+        self.completed = 0
+        self.failed = 0
+        self.batches = 0
+        self.total_queue_wait = 0.0
+        self.max_queue_wait = 0.0
+
+    def account(self, now: float) -> None:
+        self.busy_slot_seconds += self.busy * (now - self.last_change)
+        self.last_change = now
+
+
+class OllamaBatchDispatcher(BaseLLMProvider):
+    """
+    Micro-batching dispatcher in front of `OllamaProvider`.
+
+    Concurrent `chat` calls are queued per model. A scheduler thread collects the requests
+    that arrive within `window_ms` and releases them together, never running more requests
+    for a model than the server has parallel slots (`OLLAMA_NUM_PARALLEL`). Extra requests wait
+    here instead of piling up inside Ollama, so the server stays saturated without being
+    oversubscribed. With `max_loaded_models` set, models that are not already running are held
+    back until a loaded one drains, which avoids unload/reload thrashing; a model whose oldest
+    request has waited `switch_after_ms` stops new dispatches to the others so it gets its turn.
+
+    It is a drop-in `BaseLLMProvider`: callers use `chat()` exactly as with `OllamaProvider`.
+    """
+
+    def __init__(
+        self,
+        provider: Optional[OllamaProvider] = None,
+        num_slots: Optional[int] = None,
+        window_ms: float = DEFAULT_WINDOW_MS,
+        max_loaded_models: Optional[int] = None,
+        switch_after_ms: float = DEFAULT_SWITCH_AFTER_MS,
+    ):
+        """
+        Args:
+            provider: The wrapped provider. A default `OllamaProvider()` is created if None.
+            num_slots: Parallel requests per model the server handles. Defaults to the
+                       OLLAMA_NUM_PARALLEL env var, else 4. Match it to the server's setting.
+            window_ms: How long the first queued request for a model waits for companions.
+            max_loaded_models: Models allowed to run at once. Defaults to OLLAMA_MAX_LOADED_MODELS
+                               if set, else unlimited.
+            switch_after_ms: Queue age after which a waiting model pre-empts new dispatches to others.
+        """
+        self.provider = provider if provider is not None else OllamaProvider()
+        super().__init__(default_model=self.provider.default_model)
+        self.num_slots = int(num_slots or os.environ.get("OLLAMA_NUM_PARALLEL") or DEFAULT_NUM_SLOTS)
+        if self.num_slots < 1:
+            raise ValueError("num_slots must be at least 1.")
+        if max_loaded_models is None and os.environ.get("OLLAMA_MAX_LOADED_MODELS"):
+            max_loaded_models = int(os.environ["OLLAMA_MAX_LOADED_MODELS"])
+        self.max_loaded_models = max_loaded_models
+        self.window_seconds = window_ms / 1000.0
+        self.switch_after_seconds = switch_after_ms / 1000.0
+
+        # Never run more upstream calls than there are slots across the models allowed at once.
+        self.capacity = self.num_slots * (max_loaded_models or 8)
+        self._executor = ThreadPoolExecutor(max_workers=self.capacity, thread_name_prefix="ollama-slot")
+        self._cond = threading.Condition()
+        self._models: Dict[str, _ModelSlots] = {}
+        self._total_busy = 0
+        self._closed = False
+        self._scheduler = threading.Thread(target=self._schedule_loop, name="ollama-dispatcher", daemon=True)
+        self._scheduler.start()
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        request_json_output: bool = False,
+        **kwargs: Any
+    ) -> str:
+        """Queues the request for its model and blocks until a slot has served it."""
+        future = self.submit(
+            messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            request_json_output=request_json_output,
+            **kwargs
+        )
+        return future.result()
+
+    def submit(self, messages: List[Dict[str, str]], model: Optional[str] = None, **kwargs: Any) -> Future:
+        """Non-blocking variant of `chat`; returns a Future with the response content."""
+        effective_model = self._get_model_name(model)
+        request = _PendingRequest(messages, effective_model, kwargs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("OllamaBatchDispatcher is closed.")
+            slots = self._models.get(effective_model)
+            if slots is None:
+                slots = _ModelSlots(time.monotonic())
+                self._models[effective_model] = slots
+            slots.queue.append(request)
+            self._cond.notify_all()
+        return request.future
+
+    # --- Scheduling ---
+
+    def _pick_batches(self, now: float) -> Tuple[List[Tuple[str, List[_PendingRequest]]], Optional[float]]:
+        """
+        Chooses which queued requests to release now. Must hold `self._cond`.
+        Returns the batches plus the seconds until the next window expires (None if nothing waits).
+        """
+        loaded = {name for name, slots in self._models.items() if slots.busy > 0}
+        starving = None
+        if self.max_loaded_models:
+            for name, slots in self._models.items():
+                if slots.queue and name not in loaded and now - slots.queue[0].enqueued_at >= self.switch_after_seconds:
+                    starving = name
+                    break
+
+        batches: List[Tuple[str, List[_PendingRequest]]] = []
+        next_deadline: Optional[float] = None
+        # Loaded models first, oldest queue first, so warm models keep their slots full.
+        order = sorted(
+            (name for name, slots in self._models.items() if slots.queue),
+            key=lambda name: (name not in loaded, self._models[name].queue[0].enqueued_at),
+        )
+        for name in order:
+            slots = self._models[name]
+            free = min(self.num_slots - slots.busy, self.capacity - self._total_busy)
+            if free <= 0:
+                continue
+            if starving is not None and name != starving:
+                continue # Let the loaded models drain so the starving one can load
+            if self.max_loaded_models and name not in loaded and len(loaded) >= self.max_loaded_models:
+                continue
+            waited = now - slots.queue[0].enqueued_at
+            if waited < self.window_seconds and len(slots.queue) < free:
+                remaining = self.window_seconds - waited
+                next_deadline = remaining if next_deadline is None else min(next_deadline, remaining)
+                continue
+            batch = [slots.queue.popleft() for _ in range(min(free, len(slots.queue)))]
+            slots.account(now)
+            slots.busy += len(batch)
+            slots.peak_busy = max(slots.peak_busy, slots.busy)
+            slots.batches += 1
+            self._total_busy += len(batch)
+            loaded.add(name)
+            for request in batch:
+                wait = now - request.enqueued_at
+                slots.total_queue_wait += wait
+                slots.max_queue_wait = max(slots.max_queue_wait, wait)
+            batches.append((name, batch))
+        return batches, next_deadline
+
+    def _schedule_loop(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not any(slots.queue for slots in self._models.values()):
+                        return
+                    batches, next_deadline = self._pick_batches(time.monotonic())
+                    if batches:
+                        break
+                    self._cond.wait(timeout=next_deadline)
+            for _, batch in batches:
+                for request in batch:
+                    self._executor.submit(self._run, request)
+
+    def _run(self, request: _PendingRequest) -> None:
+        ok = False
+        try:
+            result = self.provider.chat(messages=request.messages, model=request.model, **request.kwargs)
+            request.future.set_result(result)
+            ok = True
+        except BaseException as e:
+            request.future.set_exception(e)
+        finally:
+            with self._cond:
+                slots = self._models[request.model]
+                slots.account(time.monotonic())
+                slots.busy -= 1
+                self._total_busy -= 1
+                if ok:
+                    slots.completed += 1
+                else:
+                    slots.failed += 1
+                self._cond.notify_all()
+
+    # --- Introspection / lifecycle ---
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model slot occupancy, queue depth and queueing delay."""
+        now = time.monotonic()
+        per_model = {}
+        with self._cond:
+            for name, slots in self._models.items():
+                slots.account(now)
+                elapsed = max(now - slots.created_at, 1e-9)
+                dispatched = slots.completed + slots.failed + slots.busy
+                per_model[name] = {
+                    "busy_slots": slots.busy,
+                    "peak_busy_slots": slots.peak_busy,
+                    "queued": len(slots.queue),
+                    "slot_utilization": slots.busy_slot_seconds / (self.num_slots * elapsed),
+                    "completed": slots.completed,
+                    "failed": slots.failed,
+                    "batches": slots.batches,
+                    "mean_batch_size": (dispatched / slots.batches) if slots.batches else 0.0,
+                    "mean_queue_wait_ms": (slots.total_queue_wait / dispatched * 1000.0) if dispatched else 0.0,
+                    "max_queue_wait_ms": slots.max_queue_wait * 1000.0,
+                }
+        return {"num_slots": self.num_slots, "max_loaded_models": self.max_loaded_models, "models": per_model}
+
+    def close(self, wait: bool = True) -> None:
+        """Stops accepting requests; queued ones are still served before the scheduler exits."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            self._scheduler.join()
+        self._executor.shutdown(wait=wait)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(provider={self.provider!r}, num_slots={self.num_slots})"
+
+
+_shared_dispatchers: Dict[Tuple[Optional[str], Optional[str]], OllamaBatchDispatcher] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_ollama_dispatcher(default_model: Optional[str] = "mistral", host: Optional[str] = None, **dispatcher_kwargs: Any) -> OllamaBatchDispatcher:
+    """
+    Returns one dispatcher per (host, default_model) for the whole process, so every agent
+    instance (e.g. each Streamlit session) shares the same slot accounting.
+    """
+    key = (host, default_model)
+    with _shared_lock:
+        dispatcher = _shared_dispatchers.get(key)
+        if dispatcher is None:
+            provider = OllamaProvider(default_model=default_model, host=host)
+            dispatcher = OllamaBatchDispatcher(provider, **dispatcher_kwargs)
+            _shared_dispatchers[key] = dispatcher
+        return dispatcher
@@ -9,18 +9,21 @@ class OpenAIProvider(BaseLLMProvider):
     LLM provider for interacting with OpenAI models (GPT-3.5, GPT-4, etc.).
     """
 
-    def __init__(self, api_key: Optional[str] = None, default_model: Optional[str] = "gpt-3.5-turbo"):
+    def __init__(self, api_key: Optional[str] = None, default_model: Optional[str] = "gpt-3.5-turbo", base_url: Optional[str] = None):
         """
         Initialize the OpenAI provider.
         Args:
             api_key: OpenAI API key. If None, attempts to load from OPENAI_API_KEY env var.
             default_model: Default OpenAI model to use.
+            base_url: Optional OpenAI-compatible endpoint (e.g. the local gateway at http://localhost:8800/v1).
+                      If None, attempts to load from OPENAI_BASE_URL env var, else the official API is used.
         """
         resolved_api_key = api_key if api_key else os.environ.get("OPENAI_API_KEY")
         if not resolved_api_key:
             raise ValueError("OpenAI API key not provided and not found in OPENAI_API_KEY environment variable.")
 
         super().__init__(api_key=resolved_api_key, default_model=default_model)
+        self.base_url = base_url if base_url else os.environ.get("OPENAI_BASE_URL")
         # Initialize the OpenAI client.
         # As of openai SDK v1.0.0+, client instantiation is:
         # self.client = openai.OpenAI(api_key=self.api_key)
@@ -29,10 +32,15 @@ class OpenAIProvider(BaseLLMProvider):
         try:
             # Try to use the new OpenAI client structure (SDK v1.0.0+)
             if hasattr(openai, "OpenAI"):
-                self.client = openai.OpenAI(api_key=self.api_key)
+                if self.base_url:
+                    self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url)
+                else:
+                    self.client = openai.OpenAI(api_key=self.api_key)
                 self._is_new_sdk = True
             else: # Fallback for older openai SDK versions (pre v1.0.0)
                 openai.api_key = self.api_key
+                if self.base_url:
+                    openai.api_base = self.base_url
                 self.client = openai # The module itself acts as a client
                 self._is_new_sdk = False
         except Exception as e:
@@ -57,7 +65,8 @@ class OpenAIProvider(BaseLLMProvider):
         if request_json_output:
             # Check if model is likely to support JSON mode (heuristic based on common model names)
             # Models like gpt-3.5-turbo-1106, gpt-4-1106-preview, gpt-4-turbo-preview support this.
-            if "1106" in effective_model or "gpt-4" in effective_model or "turbo" in effective_model: # Broader check
+            # OpenAI-compatible endpoints set via base_url (e.g. the local gateway) accept response_format for any model.
+            if "1106" in effective_model or "gpt-4" in effective_model or "turbo" in effective_model or self.base_url: # Broader check
                  response_format_param = {"type": "json_object"}
             else:
                 # For older models, we can't guarantee JSON output via an API parameter.
@@ -118,6 +118,9 @@ if __name__ == '__main__':
     try:
         agent = FixedAutomationAgent()
         print(f"Agent initialized: {agent.name}")
+    except Exception as e: # Catch configuration or connection errors during initialization
+        print(f"Error initializing agent: {type(e).__name__} - {e}")
+        raise SystemExit(1)
 
     commands_to_test = [
         "hello there",
@@ -112,6 +112,9 @@ if __name__ == '__main__':
     try:
         agent = MemoryEnhancedAgent()
         print(f"Agent initialized: {agent.name}")
+    except Exception as e: # Catch configuration or connection errors during initialization
+        print(f"Error initializing agent: {type(e).__name__} - {e}")
+        raise SystemExit(1)
     print(f"Starting chat with {agent.name}...")
 
     test_dialogue = [
@@ -1,12 +1,54 @@
 # agent.py
-from .tools import retrieve_information # Corrected import path, assuming tools.py is in the same dir
+from .tools import retrieve_many, retrieve_fused, format_hits, query_similarity, stored_chunk_versions, query_embeddings, chunk_embeddings, NO_RESULTS_MESSAGE # Corrected import path, assuming tools.py is in the same dir
+from .answer_cache import AnswerCache, chunk_versions, context_fingerprint
+from .intent_router import ROUTER_STEP_PREFIX, get_intent_router, log_outcome
+from .reranker import DEFAULT_RERANK_BUDGET_MS, DEFAULT_RERANK_CANDIDATES, get_reranker
+from .context_builder import DEFAULT_CONTEXT_CANDIDATES, DEFAULT_CONTEXT_TOKENS, ContextBuilder
+from .metadata_filter import parse_filter
 from common.llm_providers.client import get_llm_client, SUPPORTED_PROVIDERS, DEFAULT_PROVIDER
-from typing import List, Dict, Optional # For type hinting
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List, Dict, Optional, Tuple # For type hinting
 import json
+import os
 import re
+import threading
+import time
+
+DEFAULT_SPECULATION_THRESHOLD = 0.9 # Minimum cosine similarity between the raw input and the LLM's search query to reuse speculative hits
+CONTEXT_HITS = 2 # Retrieved chunks passed to synthesis
+MAX_SEARCH_QUERIES = int(os.environ.get("RAG_MAX_SEARCH_QUERIES", 3)) # Search queries per question with multi-query expansion, the main one included
+ANSWER_CACHE_SIZE = int(os.environ.get("RAG_ANSWER_CACHE_SIZE", 256)) # Answers kept by the process-wide answer cache
+
+_speculation_pool: Optional[ThreadPoolExecutor] = None
+_speculation_pool_lock = threading.Lock()
+
+def _get_speculation_pool() -> ThreadPoolExecutor:
+    """Process-wide pool for speculative retrievals, shared by all agent instances."""
+    global _speculation_pool
+    with _speculation_pool_lock:
+        if _speculation_pool is None:
+            _speculation_pool = ThreadPoolExecutor(max_workers=int(os.environ.get("RAG_SPECULATION_WORKERS", 4)), thread_name_prefix="rag-speculative")
+        return _speculation_pool
+
+_answer_cache = AnswerCache(max_entries=ANSWER_CACHE_SIZE)
+
+def get_answer_cache() -> AnswerCache:
+    """Process-wide answer cache, shared by all agent instances (entries are scoped by agent configuration)."""
+    return _answer_cache
+
+def _timed_retrieve(query: str, n_results: int, where: Optional[Dict[str, Any]] = None) -> Tuple[List[dict], float]:
+    started = time.perf_counter()
+    hits = retrieve_many([query], n_results=n_results, where=where)[0]
+    return hits, (time.perf_counter() - started) * 1000.0
 
 class ReActRAGAgent:
-    def __init__(self, provider_name: Optional[str] = None, model_name: Optional[str] = None, **provider_kwargs):
+    def __init__(self, provider_name: Optional[str] = None, model_name: Optional[str] = None,
+                 speculative_retrieval: Optional[bool] = None, speculation_threshold: float = DEFAULT_SPECULATION_THRESHOLD,
+                 rerank: Optional[bool] = None, rerank_candidates: int = DEFAULT_RERANK_CANDIDATES,
+                 rerank_budget_ms: float = DEFAULT_RERANK_BUDGET_MS, context_tokens: Optional[int] = None,
+                 context_candidates: int = DEFAULT_CONTEXT_CANDIDATES, where: Optional[Any] = None,
+                 answer_cache: Optional[bool] = None, intent_router: Optional[bool] = None,
+                 multi_query: Optional[bool] = None, max_search_queries: int = MAX_SEARCH_QUERIES, **provider_kwargs):
         """
         Initializes the ReActRAGAgent using a specified provider and model
         via the common LLM client factory.
@@ -15,8 +57,70 @@ class ReActRAGAgent:
             provider_name (str, optional): Name of the LLM provider.
             model_name (str, optional): The specific model name to use.
                                         Consider models good at JSON output and reasoning.
+            speculative_retrieval (bool, optional): Start retrieving on the raw user input while the
+                                        analysis LLM call is in flight. Defaults to the
+                                        RAG_SPECULATIVE_RETRIEVAL env var, else off.
+            speculation_threshold (float): Cosine similarity between the raw input and the generated
+                                        search query above which the speculative hits are reused.
+            rerank (bool, optional): Retrieve `rerank_candidates` hits and keep the best ones by
+                                        cross-encoder score (see reranker.py). Defaults to the
+                                        RAG_RERANK env var, else off.
+            rerank_candidates (int): First-stage hits considered when reranking.
+            rerank_budget_ms (float): Cross-encoder inference time allowed per request.
+            context_tokens (int, optional): Token budget for the synthesis context. When set, the
+                                        best `context_candidates` hits are diversified with MMR and
+                                        packed into it at sentence granularity (see context_builder.py)
+                                        instead of passing the top 2 hits verbatim. Defaults to the
+                                        RAG_CONTEXT_TOKENS env var, else off.
+            context_candidates (int): Hits the context builder chooses from.
+            where (str or dict, optional): Metadata filter every retrieval of this agent is restricted
+                                        to, e.g. "tenant = acme" for a per-tenant agent (see
+                                        metadata_filter.py). Malformed filters raise here.
+            answer_cache (bool, optional): Answer repeated questions from the process-wide answer
+                                        cache (see answer_cache.py) when retrieval on the question
+                                        returns the same chunks, unchanged, as when it was answered.
+                                        Costs one retrieval up front, which doubles as the speculative
+                                        one. Defaults to the RAG_ANSWER_CACHE env var, else off.
+            intent_router (bool, optional): Classify the intent with the local router trained by
+                                        `python -m react_rag_agent.intent_router train` and skip the
+                                        LLM analysis call when it is confident. Information-seeking
+                                        queries then use the raw input as the search query, saving an
+                                        LLM call; direct answers still take one call, with the same
+                                        framing the analysis prompt uses, so they save none. Defaults
+                                        to the RAG_INTENT_ROUTER env var, else off. Without a trained
+                                        router this is a no-op.
+            multi_query (bool, optional): Ask the analysis step for alternative search queries
+                                        (paraphrases or sub-questions) besides the main one, retrieve
+                                        for all of them in one batched call and fuse the rankings
+                                        with reciprocal rank fusion. Defaults to the RAG_MULTI_QUERY
+                                        env var, else off.
+            max_search_queries (int): Search queries retrieved per question, the main one included.
             **provider_kwargs: Additional args for the provider's constructor.
         """
+        if speculative_retrieval is None:
+            speculative_retrieval = os.environ.get("RAG_SPECULATIVE_RETRIEVAL", "").lower() in ("1", "true", "yes")
+        self.speculative_retrieval = speculative_retrieval
+        self.speculation_threshold = speculation_threshold
+        if rerank is None:
+            rerank = os.environ.get("RAG_RERANK", "").lower() in ("1", "true", "yes")
+        self.rerank = rerank
+        self.rerank_candidates = rerank_candidates
+        self.rerank_budget_ms = rerank_budget_ms
+        if context_tokens is None:
+            context_tokens = DEFAULT_CONTEXT_TOKENS
+        self.context_candidates = context_candidates
+        self.context_builder = ContextBuilder(context_tokens, embed_query=lambda query: query_embeddings([query])[0], chunk_embeddings=chunk_embeddings) if context_tokens > 0 else None
+        self.where = parse_filter(where)
+        if answer_cache is None:
+            answer_cache = os.environ.get("RAG_ANSWER_CACHE", "").lower() in ("1", "true", "yes")
+        self.answer_cache = answer_cache
+        if intent_router is None:
+            intent_router = os.environ.get("RAG_INTENT_ROUTER", "").lower() in ("1", "true", "yes")
+        self.intent_router = intent_router
+        if multi_query is None:
+            multi_query = os.environ.get("RAG_MULTI_QUERY", "").lower() in ("1", "true", "yes")
+        self.multi_query = multi_query
+        self.max_search_queries = max(1, max_search_queries)
         try:
             self.llm_client = get_llm_client(provider_name, **provider_kwargs)
             self.actual_provider_name = self.llm_client.__class__.__name__.replace("Provider", "")
@@ -42,20 +146,182 @@ class ReActRAGAgent:
                 raise ValueError(f"No model_name specified and could not determine a default for ReActRAGAgent with provider '{self.actual_provider_name}'.")
 
         self.name = f"ReAct-RAG Agent ({self.actual_provider_name}/{self.llm_model})"
+        # Everything besides the question and the knowledge base that shapes an answer
+        self._answer_scope = json.dumps([self.name, self.where, self.rerank, context_tokens, self.context_candidates,
+                                         self.multi_query, self.max_search_queries], sort_keys=True)
         self.current_thought_process = []
 
     def _log_step(self, step_description: str):
         self.current_thought_process.append(step_description)
 
+    def _candidate_count(self) -> int:
+        count = CONTEXT_HITS
+        if self.context_builder is not None:
+            count = max(count, self.context_candidates)
+        if self.rerank:
+            count = max(count, self.rerank_candidates)
+        return count
+
+    def _select_context(self, search_query: str, hits: List[dict], timings: Dict[str, Any]) -> List[dict]:
+        """Narrows retrieved candidates to the hits used for synthesis: reranking, then context building."""
+        if self.context_builder is None:
+            return self._rerank_hits(search_query, hits, CONTEXT_HITS, timings)
+        hits = self._rerank_hits(search_query, hits, self.context_candidates, timings)
+        started = time.perf_counter()
+        try:
+            packed, stats = self.context_builder.build(search_query, hits)
+        except Exception as e:
+            self._log_step(f"Context building failed ({e}); using the top {CONTEXT_HITS} hits.")
+            return hits[:CONTEXT_HITS]
+        timings["context_ms"] = (time.perf_counter() - started) * 1000.0
+        timings["context_tokens"] = stats["tokens"]
+        self._log_step(f"Packed {stats['chunks']} of {stats['candidates']} candidates into {stats['tokens']} of {self.context_builder.token_budget} "
+                       f"context tokens (candidates held {stats['candidate_tokens']}; {stats['duplicate_sentences']} duplicate and "
+                       f"{stats['trimmed_sentences']} over-budget sentences dropped).")
+        return packed
+
+    def _rerank_hits(self, search_query: str, hits: List[dict], top_k: int, timings: Dict[str, Any]) -> List[dict]:
+        """Keeps the `top_k` best candidates by cross-encoder score, within the rerank budget."""
+        if not self.rerank or len(hits) <= 1:
+            return hits[:top_k]
+        started = time.perf_counter()
+        reranker = get_reranker()
+        try:
+            reranked = reranker.rerank(search_query, hits, top_k=top_k, budget_ms=self.rerank_budget_ms)
+        except Exception as e:
+            self._log_step(f"Reranking failed ({e}); using first-stage order.")
+            return hits[:top_k]
+        timings["rerank_ms"] = (time.perf_counter() - started) * 1000.0
+        if reranker.is_unavailable():
+            self._log_step("Cross-encoder is unavailable (its model failed to load); using first-stage order.")
+            return reranked
+        scored = sum(1 for hit in reranked if hit["rerank_score"] is not None)
+        self._log_step(f"Reranked {len(hits)} candidates with the cross-encoder in {timings['rerank_ms']:.1f} ms; kept {[hit['id'] for hit in reranked]}.")
+        if scored < len(reranked):
+            self._log_step(f"Rerank budget of {self.rerank_budget_ms:.0f} ms ran out; {len(reranked) - scored} kept hit(s) are in first-stage order.")
+        return reranked
+
+    def _reuse_speculative_retrieval(self, speculative_future: Optional[Future], search_query: str, user_input: str,
+                                     timings: Dict[str, Any]) -> Optional[List[dict]]:
+        """
+        Returns the speculative hits if the generated search query is close enough to the
+        raw input they were retrieved for, else None so the caller retrieves with the search query.
+        A discarded speculation is cancelled, freeing its pool worker if it has not started yet.
+        """
+        if speculative_future is None:
+            return None
+        timings["speculative_reused"] = False
+        try:
+            similarity = query_similarity(search_query, user_input)
+        except Exception as e:
+            speculative_future.cancel()
+            self._log_step(f"Could not compare search query with the original input: {e}")
+            return None
+        timings["speculation_similarity"] = similarity
+        if similarity < self.speculation_threshold:
+            speculative_future.cancel()
+            self._log_step(f"Speculative retrieval discarded (similarity {similarity:.2f} < {self.speculation_threshold:.2f}); re-querying.")
+            return None
+        try:
+            hits, speculative_ms = speculative_future.result()
+        except Exception as e:
+            self._log_step(f"Speculative retrieval failed ({e}); re-querying.")
+            return None
+        timings["speculative_retrieval_ms"] = speculative_ms
+        timings["speculative_reused"] = True
+        self._log_step(f"Reusing speculative retrieval (similarity {similarity:.2f}, took {speculative_ms:.1f} ms in parallel with analysis).")
+        return hits
+
+    def _cached_answer(self, user_input: str, timings: Dict[str, Any]) -> Tuple[Optional[dict], Optional[tuple], Optional[Tuple[List[dict], float]]]:
+        """
+        Retrieves on the raw input and looks up the answer cache under the fingerprint of the hits.
+
+        Returns:
+            Tuple of (the cached result, or None on a miss; the cache key to store the new answer under,
+            None if the probe failed; the probe's (hits, milliseconds), for reuse as speculative retrieval).
+        """
+        try:
+            probe = _timed_retrieve(user_input, self._candidate_count(), self.where)
+        except Exception as e:
+            self._log_step(f"Answer cache probe retrieval failed ({e}); answering without the cache.")
+            return None, None, None
+        timings["cache_probe_ms"] = probe[1]
+        timings["answer_cache_hit"] = False
+        cache = get_answer_cache()
+        key = cache.key(self._answer_scope, user_input, context_fingerprint(probe[0]))
+        entry = cache.get(key)
+        if entry is None:
+            return None, key, probe
+        try:
+            current = stored_chunk_versions(list(entry["sources"]))
+        except Exception as e:
+            self._log_step(f"Could not check the cached answer's sources ({e}); answering again.")
+            current = None
+        if current != entry["sources"]:
+            cache.invalidate(key)
+            self._log_step("Discarded the cached answer: chunks it was synthesized from have been re-indexed or deleted.")
+            return None, key, probe
+        timings["answer_cache_hit"] = True
+        timings["total_ms"] = probe[1]
+        result = dict(entry["result"], timings=timings)
+        result["thought_process"] = entry["result"]["thought_process"] + [
+            f"Answer cache hit: same question and unchanged context {list(entry['sources'])}; returned the stored answer after a {probe[1]:.1f} ms probe."]
+        self.current_thought_process = result["thought_process"]
+        return result, key, probe
+
+    def _route_intent(self, user_input: str, timings: Dict[str, Any]) -> Optional[str]:
+        """The local router's intent for `user_input` if it is confident enough, else None (ask the LLM)."""
+        if not self.intent_router:
+            return None
+        started = time.perf_counter()
+        try:
+            router = get_intent_router()
+            if router is None:
+                return None
+            intent, confidence, confident = router.route(query_embeddings([user_input])[0]) # Cached, and reused by retrieval
+        except Exception as e:
+            self._log_step(f"Intent router failed ({e}); asking the LLM.")
+            return None
+        timings["router_ms"] = (time.perf_counter() - started) * 1000.0
+        timings["router_confidence"] = confidence
+        if not confident:
+            self._log_step(f"Intent router unsure ('{intent}' at {confidence:.2f}, threshold {router.threshold}); asking the LLM.")
+            return None
+        self._log_step(f"{ROUTER_STEP_PREFIX} '{intent}' at confidence {confidence:.2f} (threshold {router.threshold:.2f}); skipping the LLM analysis call.")
+        timings["routed_intent"] = intent
+        return intent
+
     def reason_and_act(self, user_input: str) -> dict:
         """
         Implements an LLM-driven ReAct (Reason, Act) and RAG (Retrieval Augmented Generation) flow.
         """
         self.current_thought_process = [] # Reset for each request
         self._log_step(f"Received user input: \"{user_input}\"")
+        request_started = time.perf_counter()
+        timings: Dict[str, Any] = {}
+
+        cache_key, probe = None, None
+        if self.answer_cache:
+            cached, cache_key, probe = self._cached_answer(user_input, timings)
+            if cached is not None:
+                return cached
+
+        # Speculatively retrieve on the raw input while the analysis call runs; reused in Phase 2 if the
+        # generated search query turns out to be (nearly) the same question.
+        speculative_future: Optional[Future] = None
+        if self.speculative_retrieval and probe is not None:
+            speculative_future = Future() # The answer cache probe already retrieved on the raw input
+            speculative_future.set_result(probe)
+        elif self.speculative_retrieval:
+            speculative_future = _get_speculation_pool().submit(_timed_retrieve, user_input, self._candidate_count(), self.where)
+            self._log_step("Started speculative retrieval on the original input in parallel with analysis.")
 
         # --- Phase 1: Query Analysis & Search Query Formulation (LLM Call 1) ---
         self._log_step("Phase 1: Analyzing query with LLM...")
+        expansion_instruction = ""
+        if self.multi_query and self.max_search_queries > 1:
+            expansion_instruction = f"""
+          - If the query has several parts, or relevant documents may word it differently, also add up to {self.max_search_queries - 1} alternative search queries (sub-questions or paraphrases) as "search_queries": {{"intent": "information_seeking", "search_query": "...", "search_queries": ["...", "..."]}}"""
         analysis_prompt = f"""Analyze the following user query: "{user_input}"
         Determine the user's intent and how to best respond.
         Possible intents are:
@@ -65,7 +331,7 @@ class ReActRAGAgent:
         If the intent is "information_seeking":
           - Extract or generate a concise search query suitable for a vector database lookup.
           - The search query should capture the core information need.
-          - Respond in JSON format: {{"intent": "information_seeking", "search_query": "your_generated_search_query"}}
+          - Respond in JSON format: {{"intent": "information_seeking", "search_query": "your_generated_search_query"}}{expansion_instruction}
 
         If the intent is "direct_answer":
           - Provide a direct, helpful answer to the query if possible.
@@ -78,47 +344,87 @@ class ReActRAGAgent:
         intent = "direct_answer" # Default intent
         search_query = None
         direct_llm_answer = None
+        extra_search_queries = [] # Optional alternative phrasings from the analysis, retrieved in the same batch
         llm_analysis_error = None
 
-        try:
-            analysis_content_str = self.llm_client.chat( # Use new client and pass model
-                model=self.llm_model,
-                messages=[{'role': 'user', 'content': analysis_prompt}],
-                format_json=True
-            )
-            self._log_step(f"LLM Analysis raw output: {analysis_content_str}")
-            analysis_data = json.loads(analysis_content_str)
-
-            intent = analysis_data.get("intent", "direct_answer")
-            search_query = analysis_data.get("search_query")
-            direct_llm_answer = analysis_data.get("llm_response")
-            self._log_step(f"LLM determined intent: '{intent}'")
-            if search_query:
-                self._log_step(f"LLM generated search query: '{search_query}'")
-            if direct_llm_answer:
-                 self._log_step(f"LLM provided direct answer draft: '{direct_llm_answer[:60]}...'")
-
-        except json.JSONDecodeError as e:
-            llm_analysis_error = f"Error parsing JSON from LLM query analysis ({self.actual_provider_name}/{self.llm_model}): {type(e).__name__} - {e}. Raw: {analysis_content_str}"
-            self._log_step(llm_analysis_error)
-            intent = "information_seeking"; search_query = user_input; direct_llm_answer = None # Fallback
-            self._log_step(f"Fallback due to JSON error: Defaulting to intent 'information_seeking' with original input as search query.")
-        except Exception as e: # Catch other LLM call errors
-            llm_analysis_error = f"Error during LLM query analysis ({self.actual_provider_name}/{self.llm_model}): {type(e).__name__} - {e}"
-            self._log_step(llm_analysis_error)
-            intent = "information_seeking"; search_query = user_input; direct_llm_answer = None # Fallback
-            self._log_step(f"Fallback due to LLM error: Defaulting to intent 'information_seeking' with original input as search query.")
+        phase_started = time.perf_counter()
+        routed_intent = self._route_intent(user_input, timings)
+        if routed_intent == "information_seeking":
+            intent, search_query = routed_intent, user_input
+        elif routed_intent == "direct_answer":
+            intent = routed_intent
+            # Same framing as the analysis prompt's direct_answer branch, so the answer does not depend on who decided
+            direct_prompt = f"""The user said: "{user_input}"
+        This is a general question, greeting, or statement that you can answer directly.
+        Provide a direct, helpful answer to the query if possible.
+        """
+            try:
+                direct_llm_answer = self.llm_client.chat(model=self.llm_model, messages=[{'role': 'user', 'content': direct_prompt}], format_json=False)
+            except Exception as e:
+                llm_analysis_error = f"Error answering directly ({self.actual_provider_name}/{self.llm_model}): {type(e).__name__} - {e}"
+                self._log_step(llm_analysis_error)
+        else:
+            try:
+                analysis_content_str = self.llm_client.chat( # Use new client and pass model
+                    model=self.llm_model,
+                    messages=[{'role': 'user', 'content': analysis_prompt}],
+                    format_json=True
+                )
+                self._log_step(f"LLM Analysis raw output: {analysis_content_str}")
+                analysis_data = json.loads(analysis_content_str)
+
+                intent = analysis_data.get("intent", "direct_answer")
+                search_query = analysis_data.get("search_query")
+                direct_llm_answer = analysis_data.get("llm_response")
+                extra_search_queries = [q for q in analysis_data.get("search_queries") or [] if isinstance(q, str) and q.strip()][:self.max_search_queries - 1]
+                self._log_step(f"LLM determined intent: '{intent}'")
+                log_outcome(user_input, intent, search_query)
+                if search_query:
+                    self._log_step(f"LLM generated search query: '{search_query}'")
+                if direct_llm_answer:
+                     self._log_step(f"LLM provided direct answer draft: '{direct_llm_answer[:60]}...'")
+
+            except json.JSONDecodeError as e:
+                llm_analysis_error = f"Error parsing JSON from LLM query analysis ({self.actual_provider_name}/{self.llm_model}): {type(e).__name__} - {e}. Raw: {analysis_content_str}"
+                self._log_step(llm_analysis_error)
+                intent = "information_seeking"; search_query = user_input; direct_llm_answer = None # Fallback
+                self._log_step(f"Fallback due to JSON error: Defaulting to intent 'information_seeking' with original input as search query.")
+            except Exception as e: # Catch other LLM call errors
+                llm_analysis_error = f"Error during LLM query analysis ({self.actual_provider_name}/{self.llm_model}): {type(e).__name__} - {e}"
+                self._log_step(llm_analysis_error)
+                intent = "information_seeking"; search_query = user_input; direct_llm_answer = None # Fallback
+                self._log_step(f"Fallback due to LLM error: Defaulting to intent 'information_seeking' with original input as search query.")
+
+        timings["analysis_ms"] = (time.perf_counter() - phase_started) * 1000.0
+        cacheable = llm_analysis_error is None # Answers produced on an error path are not reused
+        sources: Dict[str, str] = {}
 
         # --- Phase 2: Retrieval (if intent is "information_seeking") ---
+        phase_started = time.perf_counter()
         retrieved_info = None
-        action_taken_for_ui = "LLM Analysis" # Initial action
+        analysis_label = "Intent Router" if routed_intent else "LLM Analysis" # The router skips the analysis call
+        action_taken_for_ui = analysis_label if routed_intent != "direct_answer" else f"{analysis_label} -> LLM Direct Answer" # Initial action
 
         if intent == "information_seeking" and search_query:
             self._log_step(f"Phase 2: Retrieving information from ChromaDB with query: '{search_query}'")
-            action_taken_for_ui = f"LLM Analysis -> ChromaDB Retrieval (query: '{search_query}')"
+            action_taken_for_ui = f"{analysis_label} -> ChromaDB Retrieval (query: '{search_query}')"
             try:
-                retrieved_info = retrieve_information(search_query, n_results=2) # Retrieve top 2 results
-                if "No relevant document found" in retrieved_info:
+                if extra_search_queries:
+                    if speculative_future is not None:
+                        speculative_future.cancel() # Fused retrieval replaces it
+                    queries = list(dict.fromkeys([search_query] + extra_search_queries))
+                    self._log_step(f"Retrieving for {len(queries)} search queries in one batch, fused by rank: {queries}")
+                    hits = retrieve_fused(queries, n_results=self._candidate_count(), where=self.where)
+                    timings["search_queries"] = len(queries)
+                else:
+                    hits = self._reuse_speculative_retrieval(speculative_future, search_query, user_input, timings)
+                    if hits is None:
+                        hits = retrieve_many([search_query], n_results=self._candidate_count(), where=self.where)[0]
+                versions = chunk_versions(hits) # Before context packing trims texts
+                hits = self._select_context(search_query, hits, timings)
+                sources = {hit["id"]: versions[hit["id"]] for hit in hits if hit["id"] in versions}
+                retrieved_info = format_hits(hits)
+                if NO_RESULTS_MESSAGE in retrieved_info:
                     self._log_step(f"Observation: Retrieval from ChromaDB found no document for '{search_query}'.")
                     retrieved_info = None # Standardize "not found" to None
                 else:
@@ -126,11 +432,17 @@ class ReActRAGAgent:
             except Exception as e:
                 self._log_step(f"Error during ChromaDB retrieval: {e}")
                 retrieved_info = None
+                cacheable = False
         elif intent == "information_seeking" and not search_query:
             self._log_step("Phase 2: Skipped retrieval because LLM analysis did not provide a search query, though intent was information_seeking.")
+        if speculative_future is not None and not speculative_future.done():
+            speculative_future.cancel() # No retrieval ran (direct answer, or no search query) or retrieval failed
+
 
+        timings["retrieval_ms"] = (time.perf_counter() - phase_started) * 1000.0
 
         # --- Phase 3: Response Synthesis (LLM Call 2 or direct answer) ---
+        phase_started = time.perf_counter()
         self._log_step("Phase 3: Synthesizing final response...")
         final_response = None
 
@@ -145,7 +457,6 @@ class ReActRAGAgent:
             Based on this information and the user's original query, please formulate a comprehensive and helpful answer.
             If the retrieved context seems irrelevant, you can state that you found some information but it might not directly answer the query, then try to answer generally if possible.
             """
-            try:
             try:
                 final_response = self.llm_client.chat( # Use new client and pass model
                     model=self.llm_model,
@@ -156,12 +467,14 @@ class ReActRAGAgent:
             except Exception as e:
                 self._log_step(f"Error during LLM response synthesis ({self.actual_provider_name}/{self.llm_model}): {e}")
                 final_response = "I found some information, but encountered an issue trying to synthesize a final answer. You can review the retrieved data."
+                cacheable = False
 
         elif direct_llm_answer: # From Phase 1, intent was "direct_answer"
             self._log_step("Using direct answer from LLM Phase 1.")
             final_response = direct_llm_answer
 
         else: # Fallback if no retrieval and no direct answer, or if analysis failed badly
+            cacheable = False
             if llm_analysis_error: # If analysis failed, try a general response
                  self._log_step("Attempting fallback LLM response due to earlier analysis error.")
                  try:
@@ -177,24 +490,35 @@ class ReActRAGAgent:
                 self._log_step("No information retrieved and no direct answer from LLM analysis. Providing a default response.")
                 final_response = f"I'm not sure how to respond to '{user_input}'. Could you try rephrasing?"
 
-        return {
+        timings["synthesis_ms"] = (time.perf_counter() - phase_started) * 1000.0
+        timings["total_ms"] = (time.perf_counter() - request_started) * 1000.0
+        self._log_step("Timings (ms): " + ", ".join(f"{k[:-3]}={v:.1f}" for k, v in timings.items() if k.endswith("_ms")))
+
+        result = {
             "thought_process": self.current_thought_process,
             "action_taken": action_taken_for_ui, # More descriptive action string
             "query_for_retrieval": search_query,
             "retrieved_info": retrieved_info,
-            "final_response": final_response
+            "final_response": final_response,
+            "timings": timings
         }
+        if cache_key is not None and cacheable:
+            get_answer_cache().put(cache_key, dict(result, thought_process=list(self.current_thought_process)), sources)
+        return result
 
 if __name__ == '__main__':
     # Ensure your chosen LLM provider is configured via environment variables
     # (e.g., LLM_PROVIDER, OLLAMA_MODEL, OPENAI_API_KEY, etc.)
     # and that any necessary services (like Ollama server) are running.
-    # Also ensure ChromaDB is populated: `python react_rag_agent/knowledge_base_manager.py`
+    # Also ensure ChromaDB is populated: `python -m react_rag_agent.knowledge_base_manager`
 
     print("Instantiating ReActRAGAgent (will use configured LLM provider)...")
     try:
         agent = ReActRAGAgent()
         print(f"Agent initialized: {agent.name}")
+    except Exception as e: # Catch configuration or connection errors during initialization
+        print(f"Error initializing agent: {type(e).__name__} - {e}")
+        raise SystemExit(1)
 
     test_inputs = [
         "hello",
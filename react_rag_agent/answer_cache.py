@@ -0,0 +1,96 @@
+# answer_cache.py
+# Bounded LRU of agent answers, so a repeated question over an unchanged knowledge base skips both LLM calls.
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from react_rag_agent.embedding_cache import normalize_query
+from react_rag_agent.index_manifest import content_hash
+
+
+def chunk_versions(hits: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Version of each hit's chunk: the digest of its stored text, which changes whenever it is re-indexed with new content."""
+    return {hit["id"]: content_hash(hit["text"] or "") for hit in hits}
+
+
+def context_fingerprint(hits: List[Dict[str, Any]]) -> str:
+    """Digest of a ranked hit list (IDs and versions, in order); changes when retrieval would return other chunks or other text."""
+    digest = hashlib.blake2b(digest_size=16)
+    for chunk_id, version in chunk_versions(hits).items():
+        digest.update(f"{chunk_id}\0{version}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU cache of agent results, keyed on (scope, normalized query, context fingerprint).
+
+    The scope identifies the agent configuration that produced the answer (model, filters, ...).
+    The fingerprint is taken from a retrieval on the raw query, so when the knowledge base changes in
+    a way that alters what that query retrieves, the key changes and the old entry is simply never
+    hit again. Each entry also records the versions of the chunks its answer was synthesized from,
+    which the caller re-checks against the store on a hit (see ReActRAGAgent) and discards the entry
+    with invalidate() if any of them was re-indexed or deleted since.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Args:
+            max_entries: Maximum number of answers kept. 0 disables the cache.
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(scope: str, query: str, fingerprint: str) -> Tuple[str, str, str]:
+        return (scope, normalize_query(query), fingerprint)
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[Dict[str, Any]]:
+        """The entry stored under `key` ("result" and "sources", the chunk versions it depends on), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple[str, str, str], result: Dict[str, Any], sources: Dict[str, str]) -> None:
+        """Stores an agent result together with the versions of the chunks it was synthesized from."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = {"result": result, "sources": dict(sources)}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Tuple[str, str, str]) -> None:
+        """Drops a stale entry; the lookup that found it counts as a miss."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+                self.hits -= 1
+                self.misses += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,2 @@
+# Benchmarks for the ReAct + RAG agent's retrieval stack. Run each module from the repository root:
+#   python -m react_rag_agent.benchmarks.<name> --help
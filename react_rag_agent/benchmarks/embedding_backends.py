@@ -0,0 +1,85 @@
+# Compares embedding backends against the PyTorch reference: cosine parity, query latency and batch throughput.
+#   python -m react_rag_agent.benchmarks.embedding_backends --backends torch onnx onnx-int8 torch-int8
+# Exits with status 1 if an fp32 backend (which claims the reference's vector space) fails the parity threshold.
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from bench.load_generator import percentile
+from react_rag_agent.benchmarks.embedding_throughput import synthetic_texts
+from react_rag_agent.embedding_backends import (
+    DEFAULT_PARITY_THRESHOLD,
+    FP32_BACKENDS,
+    SUPPORTED_BACKENDS,
+    embedding_space_id,
+    load_sentence_transformer,
+    parity_report,
+)
+from react_rag_agent.knowledge_base_manager import EMBEDDING_MODEL_NAME
+
+QUERIES = ["What is Python?", "Tell me about AI", "Explain RAG technology", "What is ReAct?", "Information on Java language"]
+
+
+def query_latency_ms(model: Any, repeats: int) -> Dict[str, float]:
+    samples = []
+    for i in range(repeats):
+        started = time.perf_counter()
+        model.encode(QUERIES[i % len(QUERIES)])
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return {"p50": percentile(samples, 50), "p99": percentile(samples, 99), "mean": sum(samples) / len(samples)}
+
+
+def batch_throughput(model: Any, texts: List[str], batch_size: int) -> float:
+    started = time.perf_counter()
+    model.encode(texts, batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - started)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parity and speed of the embedding backends.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--backends", nargs="+", default=list(SUPPORTED_BACKENDS), choices=SUPPORTED_BACKENDS)
+    parser.add_argument("--texts", type=int, default=256, help="Texts for the parity check and throughput run.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--query-repeats", type=int, default=50)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_PARITY_THRESHOLD)
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    texts = synthetic_texts(args.texts)
+    reference = load_sentence_transformer(args.model, "torch")
+    results = []
+    failed = False
+    for backend in args.backends:
+        started = time.perf_counter()
+        model = reference if backend == "torch" else load_sentence_transformer(args.model, backend)
+        load_s = time.perf_counter() - started
+        model.encode(QUERIES) # Warm-up
+        parity = parity_report(reference, model, texts, threshold=args.threshold)
+        result = {
+            "backend": backend,
+            "embedding_space_id": embedding_space_id(args.model, backend),
+            "load_s": load_s,
+            "parity": parity,
+            "query_latency_ms": query_latency_ms(model, args.query_repeats),
+            "batch_sentences_per_sec": batch_throughput(model, texts, args.batch_size),
+        }
+        results.append(result)
+        if backend in FP32_BACKENDS and not parity["compatible"]:
+            failed = True
+        print(f"{backend:<11} parity min/mean cos {parity['min_cosine']:.4f}/{parity['mean_cosine']:.4f} "
+              f"nn-agree {parity['nearest_neighbour_agreement']:.2f}  query p50 {result['query_latency_ms']['p50']:.1f} ms "
+              f"p99 {result['query_latency_ms']['p99']:.1f} ms  batch {result['batch_sentences_per_sec']:.1f}/s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"model": args.model, "cpu_count": os.cpu_count(), "results": results}, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+# Bulk-encoding throughput (sentences/sec) by worker count, with and without length-sorted batching.
+#   python -m react_rag_agent.benchmarks.embedding_throughput --workers 1 2 4 --texts 2000
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from react_rag_agent.embedding_engine import LocalEmbeddingEngine, MultiProcessEmbeddingEngine
+
+_WORDS = ("retrieval augmented generation vector database embedding model chunk token overlap language python "
+          "java agent reasoning acting knowledge base query document index latency throughput memory").split()
+
+
+def synthetic_texts(count: int, min_words: int = 5, max_words: int = 180, seed: int = 0) -> List[str]:
+    """Texts with a skewed length mix (mostly short, some near the chunk limit), like real chunk tails and headers."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = int(min_words + (max_words - min_words) * rng.random() ** 2)
+        texts.append(" ".join(rng.choice(_WORDS) for _ in range(words)))
+    return texts
+
+
+def measure(engine: Any, texts: List[str], repeats: int) -> Dict[str, Any]:
+    engine.encode(texts[: engine.batch_size]) # Warm-up: first call pays for lazy init and kernel selection
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        engine.encode(texts)
+        samples.append(len(texts) / (time.perf_counter() - started))
+    return {"sentences_per_sec": max(samples), "samples": samples}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Embedding throughput by worker count.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1])
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    texts = synthetic_texts(args.texts)
+    results = []
+    configurations = [("in-process, unsorted", 1, False), ("in-process, length-sorted", 1, True)]
+    configurations += [(f"{n} workers, length-sorted", n, True) for n in sorted(set(args.workers)) if n > 1]
+    for label, workers, sort_by_length in configurations:
+        if workers == 1:
+            engine = LocalEmbeddingEngine(batch_size=args.batch_size, sort_by_length=sort_by_length)
+        else:
+            engine = MultiProcessEmbeddingEngine(num_workers=workers, batch_size=args.batch_size, sort_by_length=sort_by_length)
+        with engine:
+            result = measure(engine, texts, args.repeats)
+        results.append({"configuration": label, "workers": workers, "length_sorted": sort_by_length, **result})
+        print(f"{label:<28} {result['sentences_per_sec']:>9.1f} sentences/s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpu_count": os.cpu_count(), "texts": args.texts, "batch_size": args.batch_size, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# IVF-PQ vs exact search in NumpyVectorStore: recall@k against latency over nprobe and refine settings.
+#   python -m react_rag_agent.benchmarks.ivfpq --chunks 1000000 --nprobe 1 4 16 64 --refine 0 4
+# Builds one store of synthetic vectors (the same generator as benchmarks/vector_store.py), takes
+# the exact top k from flat search, then trains the index and sweeps the query-time settings.
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from bench.load_generator import percentile
+from react_rag_agent.benchmarks.vector_store import BATCH_SIZE, CLUSTERS, synthetic_batch
+from react_rag_agent.vector_store import NumpyVectorStore
+
+
+def timed_queries(store: NumpyVectorStore, queries: np.ndarray, n_results: int):
+    ids, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = store.query(query_embeddings=[query], n_results=n_results, include=["distances"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids.append(result["ids"][0])
+    return ids, sorted(latencies)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="IVF-PQ recall/latency benchmark.")
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--centre-scale", type=float, default=1.0,
+                        help="Scale of the cluster centres against the noise; lower overlaps clusters, so neighbours span more lists.")
+    parser.add_argument("--lists", type=int, default=None, help="Inverted lists (default: about sqrt(chunks)).")
+    parser.add_argument("--subquantizers", type=int, default=48, help="Bytes per PQ code.")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--refine", type=int, nargs="+", default=[0, 4])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=10)
+    parser.add_argument("--work-dir", default=None, help="Where the store is built (default: a temporary directory).")
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    centres = args.centre_scale * np.random.default_rng(12345).standard_normal((CLUSTERS, args.dim), dtype=np.float32)
+    queries = synthetic_batch(args.queries, 10**9 + args.chunks, args.dim, centres)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="ivfpq_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    path = os.path.join(work_dir, f"ivfpq_{args.chunks}")
+    shutil.rmtree(path, ignore_errors=True)
+    results = []
+    try:
+        store = NumpyVectorStore(path, name="bench", index="flat")
+        for start in range(0, args.chunks, BATCH_SIZE):
+            size = min(BATCH_SIZE, args.chunks - start)
+            store.upsert(ids=[f"c{i}" for i in range(start, start + size)], embeddings=synthetic_batch(size, start, args.dim, centres))
+        truth, latencies = timed_queries(store, queries, args.n_results)
+        flat = {"index": "flat", "chunks": args.chunks, "centre_scale": args.centre_scale, "query_p50_ms": percentile(latencies, 50),
+                "query_p99_ms": percentile(latencies, 99), f"recall@{args.n_results}": 1.0, "index_mb": args.chunks * args.dim * 4 / 2**20}
+        results.append(flat)
+        print(f"flat: p50 {flat['query_p50_ms']:.2f} ms, p99 {flat['query_p99_ms']:.2f} ms, vectors {flat['index_mb']:.0f} MB")
+
+        started = time.perf_counter()
+        store.build_index(n_lists=args.lists, m=args.subquantizers)
+        build_seconds = time.perf_counter() - started
+        codes_mb = args.chunks * (args.subquantizers + 4) / 2**20 # PQ code + int32 list per row
+        print(f"IVF-PQ: {store._ivf.n_lists} lists, built in {build_seconds:.1f}s, codes {codes_mb:.0f} MB")
+        store.index = "ivfpq"
+        for refine in args.refine:
+            for nprobe in args.nprobe:
+                store.nprobe, store.refine = nprobe, refine
+                found, latencies = timed_queries(store, queries, args.n_results)
+                recall = float(np.mean([len(set(a) & set(b)) / args.n_results for a, b in zip(found, truth)]))
+                row = {"index": "ivfpq", "chunks": args.chunks, "centre_scale": args.centre_scale, "lists": store._ivf.n_lists,
+                       "subquantizers": args.subquantizers, "nprobe": nprobe, "refine": refine, "build_s": build_seconds, "query_p50_ms": percentile(latencies, 50),
+                       "query_p99_ms": percentile(latencies, 99), f"recall@{args.n_results}": recall, "index_mb": codes_mb}
+                results.append(row)
+                print(f"nprobe {nprobe:>3} refine {refine}: p50 {row['query_p50_ms']:.2f} ms, p99 {row['query_p99_ms']:.2f} ms, recall {recall:.3f}")
+        store.close()
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# BM25 index build rate, query latency and size on a synthetic Zipf-distributed corpus.
+#   python -m react_rag_agent.benchmarks.lexical_index --chunks 1000000 --terms-per-chunk 60
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from bench.load_generator import percentile
+from react_rag_agent.lexical_index import BM25Index
+
+
+def zipf_texts(rng: np.random.Generator, count: int, terms_per_chunk: int, vocabulary: List[str], exponent: float) -> List[str]:
+    """Chunks whose term frequencies follow Zipf's law, as natural-language vocabularies roughly do."""
+    term_ids = rng.zipf(exponent, size=(count, terms_per_chunk)) % len(vocabulary)
+    return [" ".join(vocabulary[i] for i in row) for row in term_ids]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="BM25 index build and query benchmark.")
+    parser.add_argument("--chunks", type=int, default=200_000)
+    parser.add_argument("--terms-per-chunk", type=int, default=60)
+    parser.add_argument("--vocabulary", type=int, default=200_000)
+    parser.add_argument("--zipf", type=float, default=1.15, help="Zipf exponent of term frequencies.")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--terms-per-query", type=int, default=4)
+    parser.add_argument("--n-results", type=int, default=20)
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    vocabulary = [f"t{i}" for i in range(args.vocabulary)]
+    index = BM25Index()
+    batch = 5000
+    generate_seconds = 0.0
+    started = time.perf_counter()
+    for offset in range(0, args.chunks, batch):
+        generated = time.perf_counter()
+        texts = zipf_texts(rng, min(batch, args.chunks - offset), args.terms_per_chunk, vocabulary, args.zipf)
+        generate_seconds += time.perf_counter() - generated
+        index.add([f"doc{offset + i}.txt#0" for i in range(len(texts))], texts)
+    build_seconds = time.perf_counter() - started - generate_seconds
+    print(f"Indexed {args.chunks} chunks in {build_seconds:.1f}s ({args.chunks / build_seconds:.0f} chunks/s): {index.stats()}")
+
+    queries = [" ".join(text.split()[:args.terms_per_query]) for text in zipf_texts(rng, args.queries, args.terms_per_query, vocabulary, args.zipf)]
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, args.n_results)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    print(f"Query latency over {len(queries)} queries: p50 {percentile(latencies, 50):.2f} ms, p99 {percentile(latencies, 99):.2f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.bm25.npz")
+        started = time.perf_counter()
+        index.save(path)
+        save_seconds = time.perf_counter() - started
+        file_bytes = os.path.getsize(path)
+        started = time.perf_counter()
+        BM25Index(path)
+        load_seconds = time.perf_counter() - started
+    print(f"Saved {file_bytes / 2**20:.0f} MB in {save_seconds:.1f}s, loaded in {load_seconds:.1f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "chunks": args.chunks,
+                "terms_per_chunk": args.terms_per_chunk,
+                "build_s": build_seconds,
+                "chunks_per_sec": args.chunks / build_seconds,
+                "query_p50_ms": percentile(latencies, 50),
+                "query_p99_ms": percentile(latencies, 99),
+                "file_bytes": file_bytes,
+                "save_s": save_seconds,
+                "load_s": load_seconds,
+                "index": index.stats(),
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# Filtered vector search: query latency and recall against the fraction of the collection a `where` filter keeps.
+#   python -m react_rag_agent.benchmarks.metadata_filter --chunks 100000 --backends numpy chroma --ivfpq
+# Every chunk gets a "bucket" (its position mod 1000) and a "tenant" (t0..t9); range filters on the bucket
+# select 0.1% .. 50% of rows, and a tenant equality 10%. Recall is measured against exact search over the
+# rows each filter keeps; with --ivfpq the NumPy store is also timed with its approximate index.
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bench.load_generator import percentile
+from react_rag_agent.benchmarks.vector_store import BATCH_SIZE, CLUSTERS, synthetic_batch
+from react_rag_agent.metadata_filter import matches, parse_filter
+
+FILTERS = [None, "bucket < 1", "bucket < 10", "tenant = t3", "bucket < 100", "bucket < 500"]
+
+
+def chunk_metadata(i: int) -> Dict[str, Any]:
+    return {"bucket": i % 1000, "tenant": f"t{(i // 1000) % 10}"}
+
+
+def exact_filtered(queries: np.ndarray, chunks: int, dim: int, centres: np.ndarray, where: Optional[Dict[str, Any]],
+                   n_results: int) -> List[List[str]]:
+    keep = np.array([where is None or matches(where, chunk_metadata(i)) for i in range(chunks)])
+    scores = np.concatenate([queries @ synthetic_batch(min(BATCH_SIZE, chunks - start), start, dim, centres).T
+                             for start in range(0, chunks, BATCH_SIZE)], axis=1)
+    scores[:, ~keep] = -np.inf
+    top = np.argsort(-scores, axis=1)[:, :min(n_results, int(keep.sum()))]
+    return [[f"c{i}" for i in row] for row in top]
+
+
+def timed_queries(store: Any, queries: np.ndarray, n_results: int, where: Optional[Dict[str, Any]], as_list: bool):
+    ids, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = store.query(query_embeddings=[query.tolist() if as_list else query], n_results=n_results, where=where, include=["distances"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids.append(result["ids"][0])
+    return ids, sorted(latencies)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Filtered vector search benchmark.")
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--backends", nargs="+", default=["numpy"], choices=["numpy", "chroma"])
+    parser.add_argument("--ivfpq", action="store_true", help="Also time the NumPy store with an IVF-PQ index.")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--n-results", type=int, default=10)
+    parser.add_argument("--work-dir", default=None, help="Where stores are built (default: a temporary directory).")
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    centres = np.random.default_rng(12345).standard_normal((CLUSTERS, args.dim), dtype=np.float32)
+    queries = synthetic_batch(args.queries, 10**9 + args.chunks, args.dim, centres)
+    filters = [parse_filter(expression) for expression in FILTERS]
+    truth = [exact_filtered(queries, args.chunks, args.dim, centres, where, args.n_results) for where in filters]
+    selectivities = [float(np.mean([where is None or matches(where, chunk_metadata(i)) for i in range(args.chunks)])) for where in filters]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="metadata_filter_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    try:
+        for backend in args.backends:
+            path = os.path.join(work_dir, f"{backend}_{args.chunks}")
+            shutil.rmtree(path, ignore_errors=True)
+            if backend == "numpy":
+                from react_rag_agent.vector_store import NumpyVectorStore
+                store = NumpyVectorStore(path, name="bench", index="flat")
+            else:
+                import chromadb
+                store = chromadb.PersistentClient(path=path).get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+            for start in range(0, args.chunks, BATCH_SIZE):
+                size = min(BATCH_SIZE, args.chunks - start)
+                vectors = synthetic_batch(size, start, args.dim, centres)
+                store.upsert(ids=[f"c{i}" for i in range(start, start + size)], embeddings=vectors if backend == "numpy" else vectors.tolist(),
+                             metadatas=[chunk_metadata(i) for i in range(start, start + size)])
+            indexes = ["flat"]
+            if backend == "numpy":
+                started = time.perf_counter()
+                store.get(where=filters[1], include=[]) # Builds the metadata index over the existing rows
+                print(f"numpy: metadata index over {args.chunks} rows built in {time.perf_counter() - started:.2f}s, {store._metadata_index.stats()}")
+                if args.ivfpq:
+                    store.build_index()
+                    indexes.append("ivfpq")
+            for index in indexes:
+                if backend == "numpy":
+                    store.index = index
+                for expression, where, expected, selectivity in zip(FILTERS, filters, truth, selectivities):
+                    found, latencies = timed_queries(store, queries, args.n_results, where, as_list=backend == "chroma")
+                    recall = float(np.mean([len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(found, expected)]))
+                    row = {"backend": backend if backend == "chroma" else f"numpy-{index}", "chunks": args.chunks, "filter": expression,
+                           "selectivity": selectivity, "query_p50_ms": percentile(latencies, 50), "query_p99_ms": percentile(latencies, 99),
+                           f"recall@{args.n_results}": recall}
+                    results.append(row)
+                    print(f"{row['backend']:>12} {str(expression):>14} ({selectivity:6.1%}): p50 {row['query_p50_ms']:7.2f} ms, "
+                          f"p99 {row['query_p99_ms']:7.2f} ms, recall {recall:.3f}")
+            if backend == "numpy":
+                store.close()
+            shutil.rmtree(path, ignore_errors=True)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+# Near-duplicate detection at ingest: MinHash throughput, LSH lookup cost as the index grows, and accuracy.
+#   python -m react_rag_agent.benchmarks.near_duplicates --chunks 10000 100000 --duplicate-share 0.2
+# Chunks are 150 random words; a share of them are copies of an earlier chunk with 0-10% of their words
+# replaced (near-duplicates at Jaccard ~0.6-1.0). Accuracy uses exact Jaccard at the index threshold: precision
+# of each detection against the kept chunk it matched, recall over copies of kept chunks. MinHash estimates
+# have a standard error of ~0.04, so pairs close to the threshold go either way; the "clear" figures leave a
+# 0.05 margin (detections at threshold - 0.05 or more, copies at threshold + 0.05 or more).
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from react_rag_agent.near_duplicates import DEFAULT_THRESHOLD, NearDuplicateIndex, shingle_hashes
+
+WORDS_PER_CHUNK = 150
+VOCABULARY = 20_000
+
+
+def synthetic_chunks(count: int, duplicate_share: float, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    chunks: List[Dict[str, Any]] = []
+    for i in range(count):
+        if chunks and rng.random() < duplicate_share:
+            source = rng.randrange(len(chunks))
+            words = chunks[source]["text"].split()
+            for _ in range(rng.randint(0, WORDS_PER_CHUNK // 10)):
+                words[rng.randrange(len(words))] = f"w{rng.randrange(VOCABULARY)}"
+            chunks.append({"id": f"c{i}", "text": " ".join(words), "source": chunks[source]["id"]})
+        else:
+            chunks.append({"id": f"c{i}", "text": " ".join(f"w{rng.randrange(VOCABULARY)}" for _ in range(WORDS_PER_CHUNK)), "source": None})
+    return chunks
+
+
+def jaccard(a: str, b: str) -> float:
+    sa, sb = set(shingle_hashes(a).tolist()), set(shingle_hashes(b).tolist())
+    return len(sa & sb) / len(sa | sb) if sa | sb else 1.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Near-duplicate detection benchmark.")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--duplicate-share", type=float, default=0.2)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    results = []
+    for count in args.chunks:
+        chunks = synthetic_chunks(count, args.duplicate_share)
+        texts = {chunk["id"]: chunk["text"] for chunk in chunks}
+        index = NearDuplicateIndex(threshold=args.threshold)
+        signature_s = lookup_s = 0.0
+        found: Dict[str, str] = {}
+        lookup_ms_by_decile: List[float] = []
+        decile_started, decile = time.perf_counter(), max(count // 10, 1)
+        for i, chunk in enumerate(chunks):
+            started = time.perf_counter()
+            signature = index.signature(chunk["text"])
+            signed = time.perf_counter()
+            match = index.find(signature)
+            if match is None:
+                index.add(chunk["id"], signature)
+            else:
+                index.record_duplicate(chunk["id"], *match)
+                found[chunk["id"]] = match[0]
+            signature_s += signed - started
+            lookup_s += time.perf_counter() - signed
+            if (i + 1) % decile == 0:
+                lookup_ms_by_decile.append((time.perf_counter() - decile_started) * 1000 / decile)
+                decile_started = time.perf_counter()
+
+        matched = [jaccard(texts[chunk_id], texts[kept_id]) for chunk_id, kept_id in found.items()]
+        copies = [jaccard(chunk["text"], texts[chunk["source"]]) for chunk in chunks if chunk["source"] in index]
+        copy_found = [chunk["id"] in found for chunk in chunks if chunk["source"] in index]
+        truth = [hit for hit, value in zip(copy_found, copies) if value >= args.threshold]
+        clear = [hit for hit, value in zip(copy_found, copies) if value >= args.threshold + 0.05]
+        detected = set(found)
+        row = {
+            "chunks": count,
+            "threshold": args.threshold,
+            "bands": index.bands,
+            "rows_per_band": index.rows,
+            "dedup_ratio": len(detected) / count,
+            "precision": float(np.mean([value >= args.threshold for value in matched])) if matched else 1.0,
+            "recall": float(np.mean(truth)) if truth else 1.0,
+            "precision_clear": float(np.mean([value >= args.threshold - 0.05 for value in matched])) if matched else 1.0,
+            "recall_clear": float(np.mean(clear)) if clear else 1.0,
+            "signatures_per_s": count / signature_s,
+            "lookups_per_s": count / lookup_s,
+            "ms_per_chunk_first_decile": lookup_ms_by_decile[0] if lookup_ms_by_decile else None,
+            "ms_per_chunk_last_decile": lookup_ms_by_decile[-1] if lookup_ms_by_decile else None,
+        }
+        results.append(row)
+        print(f"{count:>8} chunks: {row['dedup_ratio']:.1%} skipped, precision {row['precision']:.3f} ({row['precision_clear']:.3f} clear), "
+              f"recall {row['recall']:.3f} ({row['recall_clear']:.3f} clear), "
+              f"{row['signatures_per_s']:.0f} signatures/s, {row['lookups_per_s']:.0f} lookups/s, "
+              f"{row['ms_per_chunk_first_decile']:.3f} -> {row['ms_per_chunk_last_decile']:.3f} ms/chunk (first vs last 10%)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+# Retrieval quality and latency suite: recall@k, MRR and nDCG@k on a labelled query set, with query
+# latency, index build time and memory, for each retrieval configuration (store, index, mode, reranking).
+#   python -m react_rag_agent.benchmarks.retrieval --corpus docs/ --root docs --queries labels.jsonl --output run.json
+#   python -m react_rag_agent.benchmarks.retrieval ... --compare baseline.json # Exit code 1 on a regression
+# Labels are JSONL lines {"query": "...", "relevant": ["setup.md", ...]}; relevant IDs are document IDs
+# (paths relative to --root, or "id" fields of a JSONL corpus), or chunk IDs ("setup.md#3") for
+# chunk-level judgements. An optional "expansions" list holds alternative search queries (paraphrases or
+# sub-questions, as the agent's analysis step would write them) for the multi-query configurations.
+# Without --corpus and --queries the agent's sample documents and a built-in query set are used. Each
+# configuration builds its own index and runs in a fresh interpreter, so environment settings, build
+# time and peak memory are its own.
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from bench.load_generator import percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Environment each named configuration runs under; "rerank" switches to two-stage retrieval, and "multi_query"
+# retrieves for each query and its expansions in one batch and fuses the rankings (tools.retrieve_fused)
+CONFIGS: Dict[str, Dict[str, Any]] = {
+    "chroma-dense": {"env": {"RAG_VECTOR_STORE": "chroma", "RAG_RETRIEVAL_MODE": "dense"}},
+    "chroma-hybrid": {"env": {"RAG_VECTOR_STORE": "chroma", "RAG_RETRIEVAL_MODE": "hybrid"}},
+    "numpy-dense": {"env": {"RAG_VECTOR_STORE": "numpy", "RAG_RETRIEVAL_MODE": "dense"}},
+    "numpy-hybrid": {"env": {"RAG_VECTOR_STORE": "numpy", "RAG_RETRIEVAL_MODE": "hybrid"}},
+    "numpy-ivfpq-hybrid": {"env": {"RAG_VECTOR_STORE": "numpy", "RAG_VECTOR_INDEX": "ivfpq", "RAG_RETRIEVAL_MODE": "hybrid"}, "build_index": True},
+    "chroma-hybrid-rerank": {"env": {"RAG_VECTOR_STORE": "chroma", "RAG_RETRIEVAL_MODE": "hybrid"}, "rerank": True},
+    "chroma-dense-multiquery": {"env": {"RAG_VECTOR_STORE": "chroma", "RAG_RETRIEVAL_MODE": "dense"}, "multi_query": True},
+    "chroma-hybrid-multiquery": {"env": {"RAG_VECTOR_STORE": "chroma", "RAG_RETRIEVAL_MODE": "hybrid"}, "multi_query": True},
+}
+DEFAULT_CONFIGS = ["chroma-dense", "chroma-hybrid", "numpy-hybrid"]
+# Metrics where lower is better; everything else compared by --compare is higher-is-better
+_LOWER_IS_BETTER = ("query_p50_ms", "query_p99_ms", "build_s", "max_rss_mb")
+
+SAMPLE_QUERIES = [
+    {"query": "Who created Python?", "relevant": ["doc1"],
+     "expansions": ["who designed the Python programming language", "origin and history of Python"]},
+    {"query": "When was Python first released?", "relevant": ["doc1"],
+     "expansions": ["Python initial release year", "history of the Python programming language"]},
+    {"query": "object-oriented language for enterprise applications", "relevant": ["doc2"],
+     "expansions": ["class-based programming language for business software", "programming languages used in large enterprise systems"]},
+    {"query": "Java", "relevant": ["doc2"],
+     "expansions": ["Java programming language", "Java object-oriented language"]},
+    {"query": "What is artificial intelligence?", "relevant": ["doc3"],
+     "expansions": ["definition of AI", "machines that simulate human intelligence"]},
+    {"query": "machine learning, natural language processing and computer vision", "relevant": ["doc3"],
+     "expansions": ["subfields of artificial intelligence", "AI research areas"]},
+    {"query": "agents that interleave reasoning traces with actions", "relevant": ["doc4"],
+     "expansions": ["language model agents that reason and act", "ReAct prompting"]},
+    {"query": "What is the ReAct paradigm?", "relevant": ["doc4"],
+     "expansions": ["ReAct reasoning and acting in language models", "combining chain-of-thought reasoning with tool use"]},
+    {"query": "retrieval augmented generation", "relevant": ["doc5"],
+     "expansions": ["RAG technique", "augmenting language model answers with retrieved documents"]},
+    {"query": "How can a language model give more factual, up-to-date answers?", "relevant": ["doc5"],
+     "expansions": ["grounding language model responses in external knowledge", "retrieving documents to reduce hallucinations"]},
+]
+
+
+def ranked_keys(hits: List[Dict[str, Any]], chunk_level: bool) -> List[str]:
+    """Hit IDs, or their documents' IDs for document-level labels, deduplicated in rank order."""
+    keys: List[str] = []
+    for hit in hits:
+        key = hit["id"] if chunk_level else ((hit.get("metadata") or {}).get("document_id") or hit["id"].split("#")[0])
+        if key not in keys:
+            keys.append(key)
+    return keys
+
+
+def score_ranking(ranked: List[str], relevant: List[str], k: int) -> Dict[str, float]:
+    """recall@k, reciprocal rank of the first relevant result, and binary-gain nDCG@k for one query."""
+    relevant_set = set(relevant)
+    top = ranked[:k]
+    found = [i for i, key in enumerate(top) if key in relevant_set]
+    dcg = sum(1.0 / math.log2(i + 2) for i in found)
+    ideal = sum(1.0 / math.log2(i + 2) for i in range(min(len(relevant_set), k)))
+    return {f"recall@{k}": len(found) / len(relevant_set), "mrr": 1.0 / (found[0] + 1) if found else 0.0, f"ndcg@{k}": dcg / ideal if ideal else 0.0}
+
+
+def _peak_rss_mb() -> float:
+    try: # ru_maxrss survives exec on Linux, so it would report the parent's peak
+        return next(int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmHWM")) / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_config(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds the index and runs the queries for one configuration; runs in the worker process."""
+    import react_rag_agent.knowledge_base_manager as kb
+    from react_rag_agent import tools
+    from react_rag_agent.ingestion import IngestionPipeline, TokenChunker
+
+    warm_up = kb.warm_up() # Model loading is start-up cost, not index building
+    started = time.perf_counter()
+    collection = kb.get_or_create_collection(kb.COLLECTION_NAME)
+    if spec["corpus"] is None or spec["corpus"][0].endswith(".jsonl"):
+        if spec["corpus"] is None:
+            documents = kb.SAMPLE_DOCUMENTS_FOR_DB
+        else:
+            with open(spec["corpus"][0], encoding="utf-8") as f:
+                documents = [json.loads(line) for line in f if line.strip()]
+        kb.add_documents_to_collection(collection, documents)
+    else:
+        chunker = TokenChunker(spec["chunk_tokens"], spec["overlap_tokens"], tokenizer=getattr(kb.get_embedding_model(), "tokenizer", None))
+        IngestionPipeline(collection=collection, chunker=chunker, progress_every=0).run(spec["corpus"], root=spec["root"])
+    index_built = False
+    if spec.get("build_index") and isinstance(collection, kb.NumpyVectorStore):
+        from react_rag_agent.ivfpq import PQ_CENTROIDS
+        if collection.count() >= PQ_CENTROIDS: # k-means needs at least one training row per sub-centroid
+            collection.build_index()
+            index_built = True
+    build_seconds = time.perf_counter() - started
+
+    def retrieve(labelled: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if spec.get("rerank"):
+            return tools.retrieve_reranked(labelled["query"], n_results=spec["k"])
+        if spec.get("multi_query"):
+            return tools.retrieve_fused([labelled["query"]] + labelled.get("expansions", []), n_results=spec["k"])
+        return tools.retrieve_many([labelled["query"]], n_results=spec["k"])[0]
+
+    retrieve(spec["queries"][0]) # Opens the index and fills lazy caches outside the timed queries
+    per_query, latencies = [], []
+    for labelled in spec["queries"]:
+        query_started = time.perf_counter()
+        hits = retrieve(labelled)
+        latencies.append((time.perf_counter() - query_started) * 1000)
+        chunk_level = any("#" in relevant for relevant in labelled["relevant"])
+        ranked = ranked_keys(hits, chunk_level)
+        per_query.append(dict(score_ranking(ranked, labelled["relevant"], spec["k"]), query=labelled["query"], retrieved=ranked[:spec["k"]]))
+    latencies.sort()
+    metrics = {key: sum(row[key] for row in per_query) / len(per_query) for key in per_query[0] if key not in ("query", "retrieved")}
+    return dict(metrics, chunks=collection.count(), warm_up_s=sum(warm_up.values()), build_s=build_seconds, index_built=index_built,
+                query_p50_ms=percentile(latencies, 50), query_p99_ms=percentile(latencies, 99),
+                max_rss_mb=_peak_rss_mb(), per_query=per_query)
+
+
+def run_in_worker(name: str, spec: Dict[str, Any], work_dir: str, extra_env: Dict[str, str]) -> Dict[str, Any]:
+    config_dir = os.path.join(work_dir, name)
+    shutil.rmtree(config_dir, ignore_errors=True)
+    os.makedirs(config_dir)
+    spec_path = os.path.join(config_dir, "spec.json")
+    with open(spec_path, "w") as f:
+        json.dump(spec, f)
+    env = dict(os.environ, **CONFIGS[name]["env"], **extra_env)
+    env["PYTHONPATH"] = os.pathsep.join([REPO_ROOT] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    # The collection lives under ./chroma_db_data, so each configuration gets a fresh one in its own directory
+    completed = subprocess.run([sys.executable, "-W", "ignore", "-m", "react_rag_agent.benchmarks.retrieval", "--worker", spec_path],
+                               cwd=config_dir, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "worker failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, k: int, tolerance: float) -> List[str]:
+    """Regressions of `results` against a previous run: quality down, or latency up, by more than `tolerance` (relative)."""
+    with open(baseline_path) as f:
+        baseline = {row["config"]: row for row in json.load(f)["results"] if "error" not in row}
+    regressions = []
+    for row in results:
+        previous = baseline.get(row["config"])
+        if previous is None or "error" in row:
+            continue
+        for metric in (f"recall@{k}", "mrr", f"ndcg@{k}", "query_p50_ms", "query_p99_ms"):
+            if metric not in previous or metric not in row:
+                continue
+            old, new = previous[metric], row[metric]
+            worse = new > old * (1 + tolerance) if metric in _LOWER_IS_BETTER else new < old * (1 - tolerance)
+            change = f"{old:.4g} -> {new:.4g}"
+            print(f"  {row['config']:>22} {metric:>14}: {change}{'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append(f"{row['config']} {metric}: {change}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency benchmark.")
+    parser.add_argument("--corpus", nargs="+", default=None, help="Files or directories to ingest, or one JSONL of {\"id\", \"text\"} documents.")
+    parser.add_argument("--root", default=None, help="Document IDs are paths relative to this directory.")
+    parser.add_argument("--queries", default=None, help="JSONL of {\"query\", \"relevant\": [...]} lines.")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS, choices=list(CONFIGS))
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="Extra environment for every configuration, e.g. RAG_EMBEDDING_MODEL=...")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--chunk-tokens", type=int, default=None)
+    parser.add_argument("--overlap-tokens", type=int, default=None)
+    parser.add_argument("--work-dir", default=None, help="Where indexes are built (default: a temporary directory).")
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    parser.add_argument("--compare", default=None, help="A previous --output to compare against; exits with 1 on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Relative change --compare tolerates.")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        with open(args.worker) as f:
+            print(json.dumps(run_config(json.load(f))))
+        return 0
+
+    from react_rag_agent.ingestion import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+    else:
+        queries = SAMPLE_QUERIES
+    corpus = [os.path.abspath(path) for path in args.corpus] if args.corpus else None
+    spec = {"corpus": corpus, "root": os.path.abspath(args.root) if args.root else None, "queries": queries, "k": args.k,
+            "chunk_tokens": args.chunk_tokens or DEFAULT_CHUNK_TOKENS, "overlap_tokens": args.overlap_tokens or DEFAULT_OVERLAP_TOKENS}
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="retrieval_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    try:
+        for name in args.configs:
+            try:
+                row = dict(run_in_worker(name, dict(spec, **{key: value for key, value in CONFIGS[name].items() if key != "env"}), work_dir, extra_env), config=name)
+                print(f"{name:>22}: recall@{args.k} {row[f'recall@{args.k}']:.3f}, MRR {row['mrr']:.3f}, nDCG@{args.k} {row[f'ndcg@{args.k}']:.3f}, "
+                      f"p50 {row['query_p50_ms']:.1f} ms, p99 {row['query_p99_ms']:.1f} ms, build {row['build_s']:.1f}s ({row['chunks']} chunks), "
+                      f"peak RSS {row['max_rss_mb']:.0f} MB")
+            except RuntimeError as e:
+                row = {"config": name, "error": str(e)}
+                print(f"{name:>22}: FAILED: {e}")
+            results.append(row)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    run = {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip() or None,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "queries": len(queries),
+        "queries_sha1": hashlib.sha1(json.dumps(queries, sort_keys=True).encode("utf-8")).hexdigest(),
+        "corpus": corpus,
+        "k": args.k,
+        "env": extra_env,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"run": run, "results": results}, f, indent=2)
+    if args.compare:
+        print(f"Against {args.compare}:")
+        regressions = compare(results, args.compare, args.k, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): " + "; ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+# Retrieval service under concurrent load: throughput, request latency and batch size against the micro-batching window.
+#   python -m react_rag_agent.benchmarks.retrieval_service --clients 1 4 16 --windows 0 2 5 --requests 20
+# For each window a service is started on a Unix socket over the sample documents, and `clients` threads each send
+# `requests` single-query retrieve calls through the thin client (as concurrent agent processes would).
+# A window of 0 also caps batches at one request, i.e. no batching.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from bench.load_generator import percentile
+from react_rag_agent.benchmarks.retrieval import REPO_ROOT
+from react_rag_agent.retrieval_client import RetrievalClient, RetrievalServiceError
+
+
+def start_service(work_dir: str, window_ms: float) -> "tuple[subprocess.Popen, RetrievalClient]":
+    socket_path = os.path.join(work_dir, "retrieval.sock")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([REPO_ROOT] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    command = [sys.executable, "-W", "ignore", "-m", "react_rag_agent.retrieval_service", "--unix-socket", socket_path,
+               "--batch-window-ms", str(window_ms)] + (["--max-batch", "1"] if window_ms <= 0 else [])
+    process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = RetrievalClient(f"unix:{socket_path}", query_cache_size=0)
+    deadline = time.time() + 300
+    while True:
+        try:
+            client.request("GET", "/health")
+            return process, client
+        except RetrievalServiceError:
+            if process.poll() is not None or time.time() > deadline:
+                process.kill()
+                raise RuntimeError(f"Retrieval service did not start (exit code {process.poll()}).")
+            time.sleep(0.5)
+
+
+def run_load(client: RetrievalClient, clients: int, requests: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def worker(c: int) -> None:
+        for r in range(requests):
+            started = time.perf_counter()
+            client.retrieve([f"client {c} question {r}: what is retrieval augmented generation?"], n_results=3)
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    before = client.metrics()["batching"]
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(c,)) for c in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    after = client.metrics()["batching"]
+    latencies.sort()
+    batches = after["batches_dispatched"] - before["batches_dispatched"]
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "requests_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "mean_batch_queries": (after["queries_batched"] - before["queries_batched"]) / batches if batches else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Retrieval service load benchmark.")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2], help="Batching windows in ms; 0 disables batching.")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client.")
+    parser.add_argument("--work-dir", default=None, help="Where the service keeps its collection (default: a temporary directory).")
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    from react_rag_agent.knowledge_base_manager import SAMPLE_DOCUMENTS_FOR_DB
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="retrieval_service_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    try:
+        for window_ms in args.windows:
+            shutil.rmtree(os.path.join(work_dir, "chroma_db_data"), ignore_errors=True)
+            process, client = start_service(work_dir, window_ms)
+            try:
+                client.ingest(documents=SAMPLE_DOCUMENTS_FOR_DB)
+                client.retrieve(["warm-up"], n_results=3)
+                for clients in args.clients:
+                    row = dict(run_load(client, clients, args.requests), window_ms=window_ms)
+                    results.append(row)
+                    print(f"window {window_ms:4.1f} ms, {clients:3d} clients: {row['requests_per_s']:7.1f} req/s, p50 {row['p50_ms']:7.1f} ms, "
+                          f"p99 {row['p99_ms']:7.1f} ms, {row['mean_batch_queries']:.1f} queries/batch")
+            finally:
+                client.close()
+                process.terminate()
+                process.wait()
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# Measures what importing knowledge_base_manager costs a process, before and after warm-up.
+#   python -m react_rag_agent.benchmarks.startup_time --runs 5
+# Each scenario runs in a fresh interpreter so module and model caches don't carry over.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_PRELUDE = "import time; _t = time.perf_counter()\n"
+_REPORT = "\nprint(time.perf_counter() - _t)\n"
+
+SCENARIOS: Dict[str, str] = {
+    # What tools.py / app_ui.py now pay just by importing the module
+    "import (lazy)": "import react_rag_agent.knowledge_base_manager as kb",
+    # What every importer used to pay: the client and model were created at import time
+    "import + eager init": "import react_rag_agent.knowledge_base_manager as kb\nkb.get_chroma_client(); kb.get_embedding_model()",
+    # Explicit warm-up, including the first encode
+    "import + warm_up()": "import react_rag_agent.knowledge_base_manager as kb\nkb.warm_up()",
+}
+
+
+def time_scenario(code: str, runs: int) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _PRELUDE + code + _REPORT],
+            cwd=REPO_ROOT, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "scenario failed")
+        samples.append(float(completed.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Start-up cost of react_rag_agent.knowledge_base_manager.")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, code in SCENARIOS.items():
+        try:
+            samples = time_scenario(code, args.runs)
+            results[name] = {"median_s": statistics.median(samples), "min_s": min(samples), "samples": samples}
+            print(f"{name:<22} median {results[name]['median_s']:.3f}s  min {results[name]['min_s']:.3f}s")
+        except RuntimeError as e:
+            results[name] = {"error": str(e)}
+            print(f"{name:<22} FAILED: {e}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"runs": args.runs, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
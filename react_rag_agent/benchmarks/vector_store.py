@@ -0,0 +1,161 @@
+# NumpyVectorStore vs Chroma: build rate, cold open, query latency, recall and footprint on synthetic vectors.
+#   python -m react_rag_agent.benchmarks.vector_store --sizes 10000 100000 1000000
+# Opening and querying run in a fresh interpreter per store, so start-up time and peak RSS are those
+# of a process that only serves queries. Recall is measured against exact search over the same vectors.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bench.load_generator import percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BATCH_SIZE = 5000 # Below Chroma's maximum batch size
+CLUSTERS = 1000 # Vectors are drawn around random centres, so neighbourhoods are not uniform noise
+
+_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import numpy as np
+backend, path, queries_path, n_results = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+if backend == "numpy":
+    from react_rag_agent.vector_store import NumpyVectorStore
+    store = NumpyVectorStore(path, name="bench")
+else:
+    import chromadb
+    store = chromadb.PersistentClient(path=path).get_collection("bench")
+opened = time.perf_counter()
+queries = np.load(queries_path)
+ids, latencies = [], []
+for i, query in enumerate(queries):
+    t = time.perf_counter()
+    result = store.query(query_embeddings=[query.tolist()], n_results=n_results, include=["documents", "metadatas", "distances"])
+    latencies.append((time.perf_counter() - t) * 1000)
+    ids.append(result["ids"][0])
+    if i == 0:
+        first_query = time.perf_counter()
+try: # ru_maxrss survives exec on Linux, so it would report the parent's peak
+    max_rss_mb = next(int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmHWM")) / 1024
+except OSError:
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({"open_s": opened - started, "first_query_s": first_query - started, "latencies_ms": latencies,
+                  "ids": ids, "max_rss_mb": max_rss_mb}))
+"""
+
+
+def synthetic_batch(size: int, start: int, dim: int, centres: np.ndarray) -> np.ndarray:
+    rng = np.random.default_rng(start) # Seeded by position, so every backend gets the same vectors
+    vectors = centres[rng.integers(0, len(centres), size)] + 0.5 * rng.standard_normal((size, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def build(backend: str, path: str, chunks: int, dim: int, centres: np.ndarray, dtype: str) -> float:
+    if backend == "numpy":
+        from react_rag_agent.vector_store import NumpyVectorStore
+        store = NumpyVectorStore(path, name="bench", dtype=dtype)
+    else:
+        import chromadb
+        store = chromadb.PersistentClient(path=path).get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+    seconds = 0.0
+    for start in range(0, chunks, BATCH_SIZE):
+        size = min(BATCH_SIZE, chunks - start)
+        vectors = synthetic_batch(size, start, dim, centres)
+        ids = [f"doc{i // 8}.txt#{i % 8}" for i in range(start, start + size)]
+        texts = [f"Synthetic chunk {i} of the vector store benchmark, standing in for about a paragraph of text." for i in range(start, start + size)]
+        metadatas = [{"document_id": f"doc{i // 8}.txt", "chunk_index": i % 8} for i in range(start, start + size)]
+        started = time.perf_counter()
+        store.upsert(ids=ids, embeddings=vectors if backend == "numpy" else vectors.tolist(), documents=texts, metadatas=metadatas)
+        seconds += time.perf_counter() - started
+    return seconds
+
+
+def exact_neighbours(queries: np.ndarray, chunks: int, dim: int, centres: np.ndarray, n_results: int) -> List[List[str]]:
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, chunks, BATCH_SIZE):
+        scores = queries @ synthetic_batch(min(BATCH_SIZE, chunks - start), start, dim, centres).T
+        best_scores = np.concatenate([best_scores, scores], axis=1)
+        best_rows = np.concatenate([best_rows, np.tile(np.arange(start, start + scores.shape[1]), (len(queries), 1))], axis=1)
+        keep = np.argsort(-best_scores, axis=1)[:, :n_results]
+        best_scores, best_rows = np.take_along_axis(best_scores, keep, axis=1), np.take_along_axis(best_rows, keep, axis=1)
+    return [[f"doc{i // 8}.txt#{i % 8}" for i in row] for row in best_rows]
+
+
+def probe(backend: str, path: str, queries_path: str, n_results: int) -> Dict[str, Any]:
+    completed = subprocess.run([sys.executable, "-W", "ignore", "-c", _PROBE, backend, path, queries_path, str(n_results)],
+                               cwd=REPO_ROOT, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "probe failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="NumpyVectorStore vs Chroma benchmark.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"], choices=["numpy", "chroma"])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"], help="Storage dtype of the NumPy store.")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--n-results", type=int, default=10)
+    parser.add_argument("--work-dir", default=None, help="Where stores are built (default: a temporary directory).")
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    centres = np.random.default_rng(12345).standard_normal((CLUSTERS, args.dim), dtype=np.float32)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="vector_store_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    try:
+        for chunks in args.sizes:
+            queries = synthetic_batch(args.queries, 10**9 + chunks, args.dim, centres)
+            queries_path = os.path.join(work_dir, f"queries_{chunks}.npy")
+            np.save(queries_path, queries)
+            truth = exact_neighbours(queries, chunks, args.dim, centres, args.n_results)
+            for backend in args.backends:
+                path = os.path.join(work_dir, f"{backend}_{chunks}")
+                shutil.rmtree(path, ignore_errors=True)
+                build_seconds = build(backend, path, chunks, args.dim, centres, args.dtype)
+                measured = probe(backend, path, queries_path, args.n_results)
+                latencies = sorted(measured["latencies_ms"])
+                recall = float(np.mean([len(set(found) & set(expected)) / args.n_results for found, expected in zip(measured["ids"], truth)]))
+                row = {
+                    "backend": backend if backend == "chroma" else f"numpy-{args.dtype}",
+                    "chunks": chunks,
+                    "build_s": build_seconds,
+                    "chunks_per_sec": chunks / build_seconds,
+                    "disk_mb": directory_bytes(path) / 2**20,
+                    "open_s": measured["open_s"],
+                    "first_query_s": measured["first_query_s"],
+                    "query_p50_ms": percentile(latencies, 50),
+                    "query_p99_ms": percentile(latencies, 99),
+                    f"recall@{args.n_results}": recall,
+                    "max_rss_mb": measured["max_rss_mb"],
+                }
+                results.append(row)
+                print(f"{row['backend']:>13} {chunks:>8} chunks: build {build_seconds:7.1f}s ({row['chunks_per_sec']:6.0f}/s), "
+                      f"disk {row['disk_mb']:6.0f} MB, open {row['open_s']:.2f}s, first query {row['first_query_s']:.2f}s, "
+                      f"p50 {row['query_p50_ms']:.2f} ms, p99 {row['query_p99_ms']:.2f} ms, recall {recall:.3f}, RSS {row['max_rss_mb']:.0f} MB")
+                shutil.rmtree(path, ignore_errors=True)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# Time to first query after a restart: cold vs warmed-up processes, a NumPy store opened from its log vs one
+# restored from a snapshot (binary row table), and Chroma.
+#   python -m react_rag_agent.benchmarks.warm_start --chunks 100000 1000000 [--backends numpy chroma] [--drop-caches]
+# A synthetic collection (random unit vectors of the embedding model's dimension, short texts, BM25 index) is
+# written through the knowledge base manager. Each measurement is a fresh interpreter that imports the stack,
+# optionally runs knowledge_base_manager.warm_up() with dummy queries, and then answers one hybrid query through
+# tools.retrieve_many; "ready" is when it could take traffic, "first query" is that query's latency.
+# --drop-caches empties the OS page cache before every process (needs root), so files are read from disk as after
+# a reboot or on a new host; without it they are usually still cached from the previous step.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from react_rag_agent.benchmarks.retrieval import REPO_ROOT
+
+_BUILD = """
+import sys, time
+import numpy as np
+from react_rag_agent import knowledge_base_manager as kb
+chunks = int(sys.argv[1])
+started = time.perf_counter()
+collection = kb.get_or_create_collection()
+lexical_index = kb.get_lexical_index()
+dim = kb.get_embedding_model().get_sentence_embedding_dimension()
+rng = np.random.default_rng(0)
+vocabulary = np.array([f"term{i}" for i in range(20000)])
+for start in range(0, chunks, 5000):
+    size = min(5000, chunks - start)
+    ids = [f"doc{i // 8}.txt#{i % 8}" for i in range(start, start + size)]
+    words = vocabulary[rng.zipf(1.3, (size, 40)) % len(vocabulary)]
+    texts = [" ".join(row) for row in words]
+    vectors = rng.standard_normal((size, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    collection.upsert(ids=ids, embeddings=vectors if kb.VECTOR_STORE_BACKEND == "numpy" else vectors.tolist(), documents=texts,
+                      metadatas=[{"source": "bench", "document_id": chunk_id.split("#")[0]} for chunk_id in ids])
+    lexical_index.add(ids, texts)
+lexical_index.optimize()
+lexical_index.save()
+print(time.perf_counter() - started)
+"""
+
+_SNAPSHOT = """
+import json
+from react_rag_agent import snapshots
+created = snapshots.create_snapshot()
+restored = snapshots.restore_snapshot()
+print(json.dumps({"create_s": created["seconds"], "restore_s": restored["seconds"], "snapshot_mb": created["bytes"] / 2**20}))
+"""
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+warm = sys.argv[1] == "1"
+from react_rag_agent import knowledge_base_manager as kb, tools
+imported = time.perf_counter()
+timings = kb.warm_up(collection_name=kb.COLLECTION_NAME, dummy_queries=3) if warm else {}
+ready = time.perf_counter()
+hits = tools.retrieve_many(["term17 term204 how do I rotate the access keys"], n_results=3, mode="hybrid")
+first = time.perf_counter()
+tools.retrieve_many(["term9 term311 which settings control the cache"], n_results=3, mode="hybrid")
+second = time.perf_counter()
+print(json.dumps({"import_s": imported - started, "ready_s": ready - started, "first_query_ms": (first - ready) * 1000,
+                  "time_to_first_query_s": first - started, "second_query_ms": (second - first) * 1000,
+                  "warm_up": timings, "hits": len(hits[0])}))
+"""
+
+
+def run_script(script: str, args: List[str], cwd: str, backend: str) -> str:
+    env = dict(os.environ, RAG_VECTOR_STORE=backend, RAG_RETRIEVAL_SERVICE="")
+    env["PYTHONPATH"] = os.pathsep.join([REPO_ROOT] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    completed = subprocess.run([sys.executable, "-W", "ignore", "-c", script] + args, cwd=cwd, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "script failed")
+    return completed.stdout.strip().splitlines()[-1]
+
+
+def drop_caches() -> bool:
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def probe(work_dir: str, backend: str, config: str, chunks: int, warm: bool, cold_cache: bool) -> Dict[str, Any]:
+    if cold_cache and not drop_caches():
+        print("Cannot drop the page cache (needs root); measuring with it warm.")
+    row = dict(json.loads(run_script(_PROBE, ["1" if warm else "0"], work_dir, backend)),
+               config=config, chunks=chunks, warm=warm, cold_cache=cold_cache)
+    print(f"{config:>15} {chunks:>8} chunks, {'warm-up' if warm else 'cold   '}: ready {row['ready_s']:6.2f}s, "
+          f"first query {row['first_query_ms']:8.1f} ms, time to first query {row['time_to_first_query_s']:6.2f}s, "
+          f"second query {row['second_query_ms']:6.1f} ms"
+          + (f" (warm-up: {', '.join(f'{step} {seconds:.2f}s' for step, seconds in row['warm_up'].items())})" if warm else ""))
+    return row
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time to first query after a restart, with and without snapshots and warm-up.")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--backends", nargs="+", default=["numpy"], choices=["numpy", "chroma"])
+    parser.add_argument("--drop-caches", action="store_true", help="Empty the OS page cache before each process (needs root).")
+    parser.add_argument("--work-dir", default=None, help="Where collections are built (default: a temporary directory).")
+    parser.add_argument("--output", default=None, help="Write results as JSON here.")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="warm_start_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    try:
+        for chunks in args.chunks:
+            for backend in args.backends:
+                directory = os.path.join(work_dir, f"{backend}_{chunks}")
+                shutil.rmtree(directory, ignore_errors=True)
+                os.makedirs(directory)
+                build_s = float(run_script(_BUILD, [str(chunks)], directory, backend))
+                print(f"{backend:>15} {chunks:>8} chunks: built in {build_s:.1f}s")
+                config = "numpy-log" if backend == "numpy" else backend
+                for warm in (False, True):
+                    results.append(dict(probe(directory, backend, config, chunks, warm, args.drop_caches), build_s=build_s))
+                if backend != "numpy":
+                    shutil.rmtree(directory, ignore_errors=True)
+                    continue
+                snapshot = json.loads(run_script(_SNAPSHOT, [], directory, backend))
+                print(f"{'numpy-snapshot':>15} {chunks:>8} chunks: snapshot of {snapshot['snapshot_mb']:.0f} MB created in "
+                      f"{snapshot['create_s']:.1f}s, restored in {snapshot['restore_s']:.1f}s")
+                for warm in (False, True):
+                    results.append(dict(probe(directory, backend, "numpy-snapshot", chunks, warm, args.drop_caches), **snapshot))
+                shutil.rmtree(directory, ignore_errors=True)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+# context_builder.py
+# Turns retrieved hits into synthesis context: diverse (MMR), deduplicated and packed into a token budget.
+import math
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_CONTEXT_TOKENS = int(os.environ.get("RAG_CONTEXT_TOKENS", 0)) # Synthesis context budget; 0 disables the builder
+DEFAULT_CONTEXT_CANDIDATES = int(os.environ.get("RAG_CONTEXT_CANDIDATES", 8)) # Hits the builder chooses from
+DEFAULT_MMR_LAMBDA = 0.5 # 1.0 = pure relevance, 0.0 = pure diversity; at 0.5 a near-duplicate loses to any comparably relevant alternative
+CHUNK_OVERHEAD_TOKENS = 12 # The "Doc ID ... (Similarity: ...): " prefix format_hits puts before each chunk
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+_TERMINAL_PUNCTUATION = (".", "!", "?", '."', ".'", ".)", "!)", "?)")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about 4 characters per token for English under common LLM tokenizers)."""
+    return math.ceil(len(text) / 4)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END_RE.split(text) if sentence and sentence.strip()]
+
+
+def mmr_select(query_vector: np.ndarray, candidate_vectors: np.ndarray, k: int, lambda_mult: float = DEFAULT_MMR_LAMBDA,
+               relevance: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Maximal marginal relevance: repeatedly picks the candidate maximizing
+    lambda * relevance - (1 - lambda) * (max similarity to anything already picked).
+
+    The candidate-candidate similarity matrix is computed once and each step is a vectorized
+    update of the running max similarity, so selecting k of n costs O(n^2 d + n k).
+
+    Args:
+        query_vector: (dim,) query embedding.
+        candidate_vectors: (n, dim) candidate embeddings.
+        k: Number of candidates to select.
+        lambda_mult: Relevance/diversity trade-off.
+        relevance: Optional (n,) relevance scores in [0, 1] (e.g. reranker scores) used instead of
+                   cosine similarity to the query.
+
+    Returns:
+        List[int]: Indices of the selected candidates, in selection order.
+    """
+    n = len(candidate_vectors)
+    if n == 0 or k <= 0:
+        return []
+    vectors = candidate_vectors / np.maximum(np.linalg.norm(candidate_vectors, axis=1, keepdims=True), 1e-12)
+    if relevance is None:
+        relevance = vectors @ (query_vector / max(float(np.linalg.norm(query_vector)), 1e-12))
+    similarity = vectors @ vectors.T
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    while len(selected) < min(k, n):
+        scores = np.where(available, lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def trim_fragments(text: str, metadata: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Sentences of a chunk, without the partial sentences a token-window chunker leaves at its edges.
+    A leading fragment is dropped only if the chunk does not start its document and the text starts
+    mid-sentence (lower-case); a trailing one only if the text does not end a sentence. Chunks
+    without position metadata, such as whole documents, are kept intact.
+    """
+    sentences = split_sentences(text)
+    if len(sentences) <= 1 or not metadata or "char_start" not in metadata:
+        return sentences
+    if metadata.get("char_start", 0) > 0 and sentences[0][:1].islower():
+        sentences = sentences[1:]
+    if len(sentences) > 1 and not sentences[-1].endswith(_TERMINAL_PUNCTUATION):
+        sentences = sentences[:-1]
+    return sentences
+
+
+class ContextBuilder:
+    """
+    Sits between retrieval and synthesis:
+
+        candidates -> MMR over their embeddings -> sentence-level dedup and trimming -> token budget
+
+    Adjacent chunks of one document overlap, and near-duplicate passages are common in real
+    corpora; sending them twice costs prompt tokens and synthesis time without adding facts.
+    MMR orders the candidates so each pick adds something new, then chunks are packed whole while
+    they fit; the first one that does not fit contributes its leading sentences, and packing stops.
+    """
+
+    def __init__(
+        self,
+        token_budget: int,
+        lambda_mult: float = DEFAULT_MMR_LAMBDA,
+        max_chunks: Optional[int] = None,
+        token_counter: Callable[[str], int] = estimate_tokens,
+        embed_query: Optional[Callable[[str], np.ndarray]] = None,
+        chunk_embeddings: Optional[Callable[[List[str]], np.ndarray]] = None,
+    ):
+        """
+        Args:
+            token_budget: Maximum tokens of context, including per-chunk formatting overhead.
+            lambda_mult: MMR relevance/diversity trade-off.
+            max_chunks: Optional cap on chunks used, regardless of budget.
+            token_counter: Counts tokens of a text. Defaults to a character-based estimate; pass the
+                           synthesis model's tokenizer for exact budgets.
+            embed_query: Query text -> embedding. Defaults to knowledge_base_manager.embed_query (cached).
+            chunk_embeddings: Chunk IDs -> (n, dim) stored embeddings, for hits that do not carry an
+                              "embedding". Defaults to fetching them from the agent's collection.
+        """
+        self.token_budget = token_budget
+        self.lambda_mult = lambda_mult
+        self.max_chunks = max_chunks
+        self.token_counter = token_counter
+        self._embed_query = embed_query
+        self._chunk_embeddings = chunk_embeddings
+
+    def _vectors(self, query: str, hits: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        if self._embed_query is None or self._chunk_embeddings is None:
+            from react_rag_agent.knowledge_base_manager import COLLECTION_NAME, embed_query, get_chunk_embeddings, get_collection
+            self._embed_query = self._embed_query or embed_query
+            self._chunk_embeddings = self._chunk_embeddings or (lambda ids: get_chunk_embeddings(get_collection(COLLECTION_NAME), ids))
+        missing = [hit["id"] for hit in hits if hit.get("embedding") is None]
+        fetched = dict(zip(missing, self._chunk_embeddings(missing))) if missing else {}
+        vectors = np.stack([np.asarray(hit["embedding"] if hit.get("embedding") is not None else fetched[hit["id"]], dtype=np.float32) for hit in hits])
+        return np.asarray(self._embed_query(query), dtype=np.float32), vectors
+
+    @staticmethod
+    def _relevance(hits: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+        # Reranker scores, when every hit has one, are a better relevance signal than embedding cosine
+        scores = [hit.get("rerank_score") for hit in hits]
+        if any(score is None for score in scores):
+            return None
+        scores = np.asarray(scores, dtype=np.float32)
+        spread = float(scores.max() - scores.min())
+        return (scores - scores.min()) / spread if spread > 0 else np.ones(len(scores), dtype=np.float32)
+
+    def build(self, query: str, hits: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Selects and trims hits for the synthesis prompt.
+
+        Args:
+            query: The search query the hits were retrieved for.
+            hits: Candidates with "id", "text" and optionally "metadata", "embedding", "rerank_score".
+
+        Returns:
+            Tuple of (hits to format, in MMR order, with "text" trimmed to whole, unseen sentences;
+            stats with candidate and packed token counts).
+        """
+        stats = {"candidates": len(hits), "candidate_tokens": sum(self.token_counter(hit["text"]) for hit in hits),
+                 "chunks": 0, "tokens": 0, "duplicate_sentences": 0, "trimmed_sentences": 0}
+        if not hits:
+            return [], stats
+        order = list(range(len(hits)))
+        if len(hits) > 1:
+            query_vector, vectors = self._vectors(query, hits)
+            order = mmr_select(query_vector, vectors, len(hits), self.lambda_mult, self._relevance(hits))
+
+        packed: List[Dict[str, Any]] = []
+        seen_sentences = set()
+        used = 0
+        for index in order:
+            if self.max_chunks is not None and len(packed) >= self.max_chunks:
+                break
+            hit = hits[index]
+            sentences, keys = [], []
+            for sentence in trim_fragments(hit["text"], hit.get("metadata")):
+                key = " ".join(sentence.lower().split())
+                if key in seen_sentences or key in keys:
+                    stats["duplicate_sentences"] += 1
+                    continue
+                keys.append(key)
+                sentences.append(sentence)
+            if not sentences:
+                continue
+            remaining = self.token_budget - used - CHUNK_OVERHEAD_TOKENS
+            kept, kept_tokens = [], 0
+            for sentence in sentences:
+                tokens = self.token_counter(sentence) + 1
+                if kept_tokens + tokens > remaining:
+                    break
+                kept.append(sentence)
+                kept_tokens += tokens
+            stats["trimmed_sentences"] += len(sentences) - len(kept)
+            if not kept:
+                continue # Its first sentence alone is over the budget; a later candidate may still fit
+            seen_sentences.update(keys[:len(kept)])
+            packed.append(dict({key: value for key, value in hit.items() if key != "embedding"}, text=" ".join(kept)))
+            used += kept_tokens + CHUNK_OVERHEAD_TOKENS
+            if len(kept) < len(sentences):
+                break # Budget reached
+        if not packed:
+            # Every candidate opens with a sentence longer than the whole budget: rather than passing
+            # no context at all, cut the top candidate's first sentence at the budget
+            hit = hits[order[0]]
+            sentences = trim_fragments(hit["text"], hit.get("metadata")) or [hit["text"]]
+            text, tokens = self._truncate(sentences[0], self.token_budget - CHUNK_OVERHEAD_TOKENS)
+            if text:
+                packed.append(dict({key: value for key, value in hit.items() if key != "embedding"}, text=text))
+                used = tokens + CHUNK_OVERHEAD_TOKENS
+        stats.update({"chunks": len(packed), "tokens": used})
+        return packed, stats
+
+    def _truncate(self, sentence: str, budget: int) -> Tuple[str, int]:
+        """The longest word prefix of `sentence` that fits in `budget` tokens, and its token count."""
+        words = sentence.split()
+        low, high = 0, len(words) # Binary search over the number of words kept
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.token_counter(" ".join(words[:middle])) + 1 <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        text = " ".join(words[:low])
+        return text, (self.token_counter(text) + 1 if text else 0)
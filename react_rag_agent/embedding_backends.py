@@ -0,0 +1,126 @@
+# embedding_backends.py
+# Inference backends for the SentenceTransformer: PyTorch (default), ONNX Runtime, and int8 dynamically quantized variants.
+import os
+import platform
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+SUPPORTED_BACKENDS = ("torch", "onnx", "onnx-int8", "torch-int8")
+# Backends that compute the same fp32 function as PyTorch and therefore share its vector space.
+# Quantized backends drift slightly, so collections embedded with them are tracked separately.
+FP32_BACKENDS = ("torch", "onnx")
+DEFAULT_PARITY_THRESHOLD = 0.99 # Minimum cosine agreement with the PyTorch embeddings of the same text
+
+
+def default_quantization_config() -> str:
+    """ONNX Runtime dynamic-quantization target for this CPU; RAG_ONNX_QUANTIZATION overrides it."""
+    configured = os.environ.get("RAG_ONNX_QUANTIZATION")
+    if configured:
+        return configured
+    return "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2" # avx2 runs on any x86-64 from the last decade
+
+
+def default_export_dir(model_name: str) -> str:
+    """Where exported ONNX files for `model_name` are kept, so the export happens once per host."""
+    base = os.environ.get("RAG_EMBEDDING_EXPORT_DIR", "embedding_exports")
+    return os.path.join(base, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name.strip("/")))
+
+
+def embedding_space_id(model_name: str, backend: str) -> str:
+    """
+    Identifies which vectors a (model, backend) pair produces. Collections and manifests record it;
+    a different ID means existing vectors are not comparable and the collection must be re-embedded.
+    """
+    return model_name if backend in FP32_BACKENDS else f"{model_name}+{backend}"
+
+
+def _load_onnx(model_name: str, export_dir: str, file_name: Optional[str] = None) -> Any:
+    from sentence_transformers import SentenceTransformer
+    # Name the graph explicitly: once a quantized file sits next to model.onnx, the default lookup is ambiguous
+    model_kwargs = {"file_name": file_name or "onnx/model.onnx"}
+    if os.path.exists(os.path.join(export_dir, "onnx", "model.onnx")):
+        return SentenceTransformer(export_dir, backend="onnx", device="cpu", model_kwargs=model_kwargs)
+    # Exports (or, for hub models that ship one, downloads) the ONNX graph, then keeps it for next time
+    model = SentenceTransformer(model_name, backend="onnx", device="cpu")
+    model.save_pretrained(export_dir)
+    if file_name:
+        return SentenceTransformer(export_dir, backend="onnx", device="cpu", model_kwargs=model_kwargs)
+    return model
+
+
+def _quantized_file_name(export_dir: str, config: str) -> Optional[str]:
+    # ONNX Runtime picks unsigned weights for some targets (avx2 -> model_quint8_avx2.onnx), signed for others
+    for prefix in ("qint8", "quint8"):
+        file_name = f"onnx/model_{prefix}_{config}.onnx"
+        if os.path.exists(os.path.join(export_dir, file_name)):
+            return file_name
+    return None
+
+
+def load_sentence_transformer(model_name: str, backend: str = "torch", export_dir: Optional[str] = None) -> Any:
+    """
+    Loads `model_name` for CPU inference with the requested backend.
+
+    Args:
+        model_name: Hub name or local directory of the SentenceTransformer.
+        backend: "torch" (PyTorch fp32), "onnx" (ONNX Runtime fp32), "onnx-int8" (ONNX Runtime with
+                 int8 dynamically quantized weights) or "torch-int8" (PyTorch dynamic quantization
+                 of the Linear layers).
+        export_dir: Where ONNX exports are stored and reused. Defaults to default_export_dir().
+
+    Returns:
+        A SentenceTransformer; `encode` behaves the same for every backend.
+    """
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unsupported embedding backend '{backend}'. Choose from: {', '.join(SUPPORTED_BACKENDS)}")
+    from sentence_transformers import SentenceTransformer
+    export_dir = export_dir or default_export_dir(model_name)
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "torch-int8":
+        import torch
+        model = SentenceTransformer(model_name, device="cpu")
+        transformer = model[0].auto_model
+        model[0].auto_model = torch.ao.quantization.quantize_dynamic(transformer, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+    if backend == "onnx":
+        return _load_onnx(model_name, export_dir)
+
+    # onnx-int8: quantize the fp32 export once, then load the quantized graph
+    config = default_quantization_config()
+    file_name = _quantized_file_name(export_dir, config)
+    if file_name is None:
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        export_dynamic_quantized_onnx_model(_load_onnx(model_name, export_dir), config, export_dir)
+        file_name = _quantized_file_name(export_dir, config)
+        if file_name is None:
+            raise RuntimeError(f"Quantized ONNX export for '{config}' not found in {export_dir}.")
+    return _load_onnx(model_name, export_dir, file_name=file_name)
+
+
+def parity_report(reference: Any, candidate: Any, texts: List[str], threshold: float = DEFAULT_PARITY_THRESHOLD) -> Dict[str, Any]:
+    """
+    Cosine agreement between two models' embeddings of the same texts. `compatible` is True when
+    every text's embeddings agree to at least `threshold`, i.e. the candidate can query (and add to)
+    a collection built with the reference without re-indexing.
+    """
+    expected = np.asarray(reference.encode(texts), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts), dtype=np.float32)
+    norms = np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    cosines = np.einsum("ij,ij->i", expected, actual) / np.maximum(norms, 1e-12)
+    # Neighbour ranking is what retrieval depends on: compare each text's nearest other text under both models
+    expected_unit = expected / np.maximum(np.linalg.norm(expected, axis=1, keepdims=True), 1e-12)
+    actual_unit = actual / np.maximum(np.linalg.norm(actual, axis=1, keepdims=True), 1e-12)
+    expected_nn = np.argmax(expected_unit @ expected_unit.T - 2 * np.eye(len(texts)), axis=1)
+    actual_nn = np.argmax(actual_unit @ actual_unit.T - 2 * np.eye(len(texts)), axis=1)
+    return {
+        "texts": len(texts),
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "nearest_neighbour_agreement": float((expected_nn == actual_nn).mean()) if len(texts) > 1 else 1.0,
+        "threshold": threshold,
+        "compatible": bool(cosines.min() >= threshold),
+    }
@@ -0,0 +1,105 @@
+# embedding_cache.py
+# Bounded LRU of query embeddings, so repeated questions skip the SentenceTransformer forward pass.
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def normalize_query(text: str, lowercase: bool = True) -> str:
+    """
+    Cache key for a query: surrounding and repeated whitespace removed, lower-cased by default.
+    Lower-casing is safe for uncased models such as all-MiniLM-L6-v2, whose tokenizer does it anyway.
+    """
+    normalized = " ".join(text.split())
+    return normalized.lower() if lowercase else normalized
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU cache from normalized query text to its embedding.
+    Embeddings are kept as read-only float32 NumPy vectors (1.5 KB each for a 384-dim model)
+    rather than Python float lists, which take roughly 20x the memory.
+    """
+
+    def __init__(self, max_entries: int = 1024, lowercase: bool = True):
+        """
+        Args:
+            max_entries: Maximum number of embeddings kept. 0 disables the cache.
+            lowercase: Whether queries differing only in case share an entry. Disable for cased models.
+        """
+        self.max_entries = max_entries
+        self.lowercase = lowercase
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = normalize_query(text, self.lowercase)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text: str, embedding: Any) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        vector.setflags(write=False) # Shared between callers; nobody may modify it in place
+        if self.max_entries <= 0:
+            return vector
+        key = normalize_query(text, self.lowercase)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
+
+    def get_or_compute(self, text: str, encode: Callable[[str], Any]) -> np.ndarray:
+        """Returns the cached embedding for `text`, computing and storing it with `encode` on a miss."""
+        vector = self.get(text)
+        if vector is None:
+            # Encoding happens outside the lock; two threads missing on the same text both encode, which is harmless.
+            vector = self.put(text, encode(normalize_query(text, self.lowercase)))
+        return vector
+
+    def get_or_compute_many(self, texts: List[str], encode_batch: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Embeddings for several queries as one (len(texts), dim) float32 matrix. All misses are
+        encoded together in a single `encode_batch` call, and duplicates within `texts` once.
+        """
+        vectors: List[Optional[np.ndarray]] = [self.get(text) for text in texts]
+        missing: Dict[str, List[int]] = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(normalize_query(texts[i], self.lowercase), []).append(i)
+        if missing:
+            keys = list(missing)
+            for key, embedding in zip(keys, np.asarray(encode_batch(keys), dtype=np.float32)):
+                vector = self.put(key, embedding)
+                for i in missing[key]:
+                    vectors[i] = vector
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(vectors)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "memory_bytes": sum(vector.nbytes for vector in self._entries.values()),
+            }
@@ -0,0 +1,189 @@
+# embedding_engine.py
+# Bulk embedding engines for ingestion: in-process or spread over worker processes, with length-sorted batches.
+import multiprocessing
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_SORT_WINDOW = 4096 # Texts sorted together; larger windows mean less padding but more memory per call
+
+
+def length_sorted_batches(texts: List[str], batch_size: int) -> List[List[int]]:
+    """
+    Groups text indices into batches of similar length (longest first). A transformer batch is
+    padded to its longest member, so mixing a 10-token and a 250-token chunk wastes ~96% of the
+    short one's compute; sorting first keeps each batch close to uniform.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+class EmbeddingEngine:
+    """
+    Turns lists of texts into a (len(texts), dim) float32 matrix, preserving input order.
+    Subclasses implement `_encode_batches`; the base class handles length sorting and stats.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, sort_by_length: bool = True, sort_window: int = DEFAULT_SORT_WINDOW):
+        self.batch_size = batch_size
+        self.sort_by_length = sort_by_length
+        self.sort_window = sort_window
+        self._stats_lock = threading.Lock()
+        self.texts_encoded = 0
+        self.batches_encoded = 0
+        self.encode_seconds = 0.0
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        started = time.perf_counter()
+        parts = []
+        batches = 0
+        for offset in range(0, len(texts), self.sort_window):
+            window = texts[offset:offset + self.sort_window]
+            if self.sort_by_length:
+                index_batches = length_sorted_batches(window, self.batch_size)
+            else:
+                index_batches = [list(range(i, min(i + self.batch_size, len(window)))) for i in range(0, len(window), self.batch_size)]
+            vectors = self._encode_batches([[window[i] for i in batch] for batch in index_batches])
+            result = np.empty((len(window), vectors[0].shape[1]), dtype=np.float32)
+            for batch, batch_vectors in zip(index_batches, vectors):
+                result[batch] = batch_vectors # Scatter back to the caller's order
+            parts.append(result)
+            batches += len(index_batches)
+        with self._stats_lock:
+            self.texts_encoded += len(texts)
+            self.batches_encoded += batches
+            self.encode_seconds += time.perf_counter() - started
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        return self.encode(texts)
+
+    def _encode_batches(self, batches: List[List[str]]) -> List[np.ndarray]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "engine": self.__class__.__name__,
+                "texts": self.texts_encoded,
+                "batches": self.batches_encoded,
+                "encode_s": self.encode_seconds,
+                "sentences_per_sec": self.texts_encoded / self.encode_seconds if self.encode_seconds else 0.0,
+            }
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "EmbeddingEngine":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class LocalEmbeddingEngine(EmbeddingEngine):
+    """Encodes in this process with the shared SentenceTransformer (or the given model)."""
+
+    def __init__(self, model: Any = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._model = model
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            from react_rag_agent.knowledge_base_manager import get_embedding_model
+            self._model = get_embedding_model()
+        return self._model
+
+    def _encode_batches(self, batches: List[List[str]]) -> List[np.ndarray]:
+        return [np.asarray(self.model.encode(batch, batch_size=len(batch)), dtype=np.float32) for batch in batches]
+
+
+# --- Worker-process side ---
+
+_worker_model: Any = None
+
+
+def _init_worker(model_name: str, backend: str, torch_threads: int) -> None:
+    global _worker_model
+    import torch
+    torch.set_num_threads(torch_threads) # Without this every worker grabs all cores and they thrash
+    from react_rag_agent.embedding_backends import load_sentence_transformer
+    _worker_model = load_sentence_transformer(model_name, backend)
+
+
+def _encode_in_worker(batch: List[str]) -> np.ndarray:
+    return np.asarray(_worker_model.encode(batch, batch_size=len(batch)), dtype=np.float32)
+
+
+class MultiProcessEmbeddingEngine(EmbeddingEngine):
+    """
+    Spreads length-sorted batches over `num_workers` processes, each holding one copy of the model
+    (loaded once per worker at start-up, ~90 MB for all-MiniLM-L6-v2) and limited to
+    `torch_threads` intra-op threads so workers x threads matches the cores. On CPU-only hosts this
+    beats a single process using all cores, because per-batch tokenization and pooling are
+    single-threaded and small-batch matrix products don't scale across many threads.
+    Workers are spawned, so scripts that create this engine need an `if __name__ == "__main__":` guard.
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        model_name: Optional[str] = None,
+        torch_threads: Optional[int] = None,
+        backend: Optional[str] = None,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            num_workers: Worker processes. Defaults to the number of CPU cores.
+            model_name: Model to load in each worker. Defaults to the agent's embedding model.
+            torch_threads: Intra-op threads per worker. Defaults to cores // num_workers (at least 1).
+            backend: Inference backend (see embedding_backends). Defaults to the agent's EMBEDDING_BACKEND.
+            **kwargs: batch_size, sort_by_length and sort_window, as for EmbeddingEngine.
+        """
+        super().__init__(**kwargs)
+        if model_name is None or backend is None:
+            from react_rag_agent.knowledge_base_manager import EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME
+            model_name = model_name or EMBEDDING_MODEL_NAME
+            backend = backend or EMBEDDING_BACKEND
+        cores = os.cpu_count() or 1
+        self.num_workers = max(1, num_workers or cores)
+        self.torch_threads = torch_threads or max(1, cores // self.num_workers)
+        self.model_name = model_name
+        self.backend = backend
+        # spawn, not fork: forking a process that already initialized torch threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(self.num_workers, initializer=_init_worker, initargs=(model_name, backend, self.torch_threads))
+
+    def _encode_batches(self, batches: List[List[str]]) -> List[np.ndarray]:
+        return self._pool.map(_encode_in_worker, batches, chunksize=1)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update({"workers": self.num_workers, "torch_threads_per_worker": self.torch_threads})
+        return stats
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+
+
+def create_embedding_engine(num_workers: Optional[int] = None, batch_size: Optional[int] = None, **kwargs: Any) -> EmbeddingEngine:
+    """
+    Builds the engine for bulk encoding. `num_workers` defaults to the RAG_EMBEDDING_WORKERS env var;
+    0 or 1 means in-process. `batch_size` defaults to RAG_EMBEDDING_BATCH_SIZE, else 32.
+    """
+    if num_workers is None:
+        num_workers = int(os.environ.get("RAG_EMBEDDING_WORKERS", 0))
+    if batch_size is None:
+        batch_size = int(os.environ.get("RAG_EMBEDDING_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+    if num_workers > 1:
+        return MultiProcessEmbeddingEngine(num_workers=num_workers, batch_size=batch_size, **kwargs)
+    return LocalEmbeddingEngine(batch_size=batch_size, **kwargs)
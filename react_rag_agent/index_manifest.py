@@ -0,0 +1,214 @@
+# index_manifest.py
+# Content-hash manifest of what is in the collection, so re-indexing only touches what changed.
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def content_hash(text: str) -> str:
+    """Short content digest used to detect edited documents and chunks."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class IndexManifest:
+    """
+    Records, per document, the hash of its full text and the hash of every chunk written for it:
+
+        {"documents": {doc_id: {"hash": ..., "fingerprint": ..., "chunks": {chunk_id: chunk_hash}}}}
+
+    A sync compares the current corpus against it: unchanged documents are skipped without
+    chunking or embedding (unchanged files without even being read, via their size/mtime
+    fingerprint), edited documents re-embed only chunks whose hash changed, chunks that no longer
+    exist are deleted, and documents missing from the corpus can be pruned.
+
+    `settings` (embedding model, chunk sizes, ...) are stored alongside; if they differ from the
+    ones the manifest was built with, every document is treated as changed so the collection is
+    re-embedded consistently, while the recorded chunk IDs still allow orphans to be removed.
+    """
+
+    def __init__(self, path: Optional[str] = None, settings: Optional[Dict[str, Any]] = None, save_interval_s: float = 5.0):
+        self.path = path
+        self.settings = settings or {}
+        self.save_interval_s = save_interval_s
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.settings_changed = False
+        self._lock = threading.Lock()
+        self._last_saved = 0.0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.documents = data.get("documents", {})
+            if data.get("settings", {}) != self.settings:
+                print(f"Index settings changed ({data.get('settings')} -> {self.settings}); all documents will be re-embedded.")
+                self.settings_changed = True
+                for entry in self.documents.values():
+                    entry["hash"] = None
+                    entry["fingerprint"] = None
+                    entry["chunks"] = {chunk_id: None for chunk_id in entry.get("chunks", {})}
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def chunk_count(self) -> int:
+        return sum(len(entry.get("chunks", {})) for entry in self.documents.values())
+
+    def is_unchanged(self, document_id: str, document_hash: Optional[str] = None, fingerprint: Optional[str] = None) -> bool:
+        """True if the document is recorded with the same fingerprint (if given) or content hash."""
+        entry = self.documents.get(document_id)
+        if entry is None or entry.get("hash") is None:
+            return False
+        if fingerprint is not None and entry.get("fingerprint") == fingerprint:
+            return True
+        return document_hash is not None and entry["hash"] == document_hash
+
+    def plan(self, document_id: str, chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[str], Dict[str, str]]:
+        """
+        Diffs a document's new chunks (dicts with "id" and "text") against the manifest.
+
+        Returns:
+            Tuple of (chunks to embed and upsert, chunk IDs to delete, new chunk-hash map to commit).
+        """
+        previous = (self.documents.get(document_id) or {}).get("chunks", {})
+        chunk_hashes = {chunk["id"]: content_hash(chunk["text"]) for chunk in chunks}
+        changed = [chunk for chunk in chunks if previous.get(chunk["id"]) != chunk_hashes[chunk["id"]]]
+        removed = [chunk_id for chunk_id in previous if chunk_id not in chunk_hashes]
+        return changed, removed, chunk_hashes
+
+    def commit(self, document_id: str, document_hash: str, chunk_hashes: Dict[str, str], fingerprint: Optional[str] = None) -> None:
+        """Records a document as fully written. Call only after its chunks are in the collection."""
+        with self._lock:
+            self.documents[document_id] = {"hash": document_hash, "fingerprint": fingerprint, "chunks": chunk_hashes}
+
+    def update_fingerprint(self, document_id: str, fingerprint: Optional[str]) -> None:
+        """Records a new file fingerprint for a document whose content turned out to be unchanged."""
+        with self._lock:
+            if document_id in self.documents:
+                self.documents[document_id]["fingerprint"] = fingerprint
+
+    def invalidate_chunks(self, chunk_ids: Iterable[str]) -> List[str]:
+        """
+        Marks chunks as not written, so the next sync re-chunks their documents and writes them again
+        even though the documents are unchanged. Returns the affected document IDs.
+        """
+        affected = []
+        with self._lock:
+            for chunk_id in chunk_ids:
+                entry = self.documents.get(chunk_id.rsplit("#", 1)[0])
+                if entry is None or chunk_id not in entry.get("chunks", {}):
+                    continue
+                entry["chunks"][chunk_id] = None
+                entry["hash"] = entry["fingerprint"] = None
+                affected.append(chunk_id.rsplit("#", 1)[0])
+        return sorted(set(affected))
+
+    def remove(self, document_id: str) -> List[str]:
+        """Forgets a document and returns the chunk IDs that were recorded for it."""
+        with self._lock:
+            entry = self.documents.pop(document_id, None)
+        return list((entry or {}).get("chunks", {}))
+
+    def missing(self, seen_document_ids: Iterable[str]) -> List[str]:
+        """Recorded documents that are not in `seen_document_ids`, i.e. were deleted from the corpus."""
+        seen = set(seen_document_ids)
+        return [document_id for document_id in self.documents if document_id not in seen]
+
+    def save(self, force: bool = True) -> None:
+        """Writes the manifest atomically; with force=False at most once per `save_interval_s`."""
+        if not self.path:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_saved < self.save_interval_s:
+            return
+        with self._lock:
+            payload = json.dumps({"settings": self.settings, "documents": self.documents, "updated_at": time.time()})
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+        self._last_saved = now
+
+
+def delete_chunks(collection: Any, chunk_ids: List[str], batch_size: int = 5000, lexical_index: Any = None) -> None:
+    """Deletes chunks from the collection and, if given, from the BM25 index kept alongside it."""
+    for i in range(0, len(chunk_ids), batch_size):
+        collection.delete(ids=chunk_ids[i:i + batch_size])
+    if lexical_index is not None:
+        lexical_index.delete(chunk_ids)
+
+
+def sync_documents(
+    collection: Any,
+    documents: List[Dict[str, Any]],
+    manifest: IndexManifest,
+    encode: Callable[[List[str]], Any],
+    prune: bool = True,
+    batch_size: int = 100,
+    lexical_index: Any = None,
+) -> Dict[str, int]:
+    """
+    Brings `collection` in line with a small in-memory corpus of unchunked documents (each
+    document is one chunk whose ID is the document ID), re-embedding only what changed. A document
+    counts as changed when its text or its metadata differs from what was last written. Metadata is
+    stored like add_documents_to_collection stores it: "source" and the write's "timestamp",
+    overridden by the document's own keys.
+
+    Args:
+        collection: Target collection.
+        documents: Dicts with "id", "text" and optionally "metadata".
+        manifest: Manifest describing the collection's current contents; updated and saved.
+        encode: Batch embedding function (texts -> vectors).
+        prune: Delete documents recorded in the manifest but absent from `documents`.
+        batch_size: Documents per embedding batch / collection write.
+        lexical_index: BM25 index (lexical_index.BM25Index) to keep in step with the collection; saved at the end.
+
+    Returns:
+        Dict[str, int]: Counts of "unchanged", "upserted" and "deleted" chunks.
+    """
+    stats = {"unchanged": 0, "upserted": 0, "deleted": 0}
+    pending: List[Tuple[Dict[str, Any], str, Dict[str, str]]] = []
+    written_at = int(time.time())
+    for document in documents:
+        # Canonical JSON of the metadata is hashed with the text; the timestamp is not, or every sync would rewrite everything
+        hashed = {"id": document["id"],
+                  "text": document["text"] + "\n" + json.dumps(document.get("metadata") or {}, sort_keys=True, separators=(",", ":"))}
+        document_hash = content_hash(hashed["text"])
+        if manifest.is_unchanged(document["id"], document_hash):
+            stats["unchanged"] += 1
+            continue
+        changed, removed, chunk_hashes = manifest.plan(document["id"], [hashed])
+        if removed:
+            delete_chunks(collection, removed, lexical_index=lexical_index)
+            stats["deleted"] += len(removed)
+        if changed:
+            pending.append((document, document_hash, chunk_hashes))
+        else:
+            manifest.commit(document["id"], document_hash, chunk_hashes)
+
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i + batch_size]
+        embeddings = encode([document["text"] for document, _, _ in batch])
+        collection.upsert(
+            ids=[document["id"] for document, _, _ in batch],
+            embeddings=embeddings.tolist() if hasattr(embeddings, "tolist") else embeddings,
+            documents=[document["text"] for document, _, _ in batch],
+            metadatas=[{"source": "local_kb", "timestamp": written_at, **(document.get("metadata") or {})} for document, _, _ in batch],
+        )
+        if lexical_index is not None:
+            lexical_index.add([document["id"] for document, _, _ in batch], [document["text"] for document, _, _ in batch])
+        for document, document_hash, chunk_hashes in batch:
+            manifest.commit(document["id"], document_hash, chunk_hashes)
+        stats["upserted"] += len(batch)
+
+    if prune:
+        for document_id in manifest.missing(document["id"] for document in documents):
+            orphans = manifest.remove(document_id)
+            delete_chunks(collection, orphans, lexical_index=lexical_index)
+            stats["deleted"] += len(orphans)
+    manifest.save()
+    if lexical_index is not None:
+        lexical_index.save()
+    return stats
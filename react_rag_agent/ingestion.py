@@ -0,0 +1,604 @@
+# ingestion.py
+# Streaming ingestion: files are read one at a time, split into overlapping token windows, embedded in
+# batches and written to Chroma while the next batch is being encoded.
+#   python -m react_rag_agent.ingestion docs/ notes.md --state-file .ingest_state.json
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from react_rag_agent.embedding_engine import create_embedding_engine
+from react_rag_agent.index_manifest import IndexManifest, content_hash, delete_chunks
+from react_rag_agent.knowledge_base_manager import (
+    COLLECTION_NAME,
+    DEDUPLICATE,
+    EMBEDDING_SPACE_ID,
+    collection_data_path,
+    get_embedding_engine,
+    get_embedding_model,
+    get_lexical_index,
+    get_near_duplicate_index,
+    get_or_create_collection,
+    near_duplicate_index_path,
+)
+from react_rag_agent.lexical_index import BM25Index, ensure_consistent
+from react_rag_agent.near_duplicates import NearDuplicateIndex, ensure_consistent as ensure_dedup_consistent
+
+SUPPORTED_EXTENSIONS = (".txt", ".md", ".pdf", ".html", ".htm")
+DEFAULT_CHUNK_TOKENS = 200 # all-MiniLM-L6-v2 truncates at 256 word pieces; leave room for special tokens
+DEFAULT_OVERLAP_TOKENS = 40
+DEFAULT_BATCH_SIZE = 64
+
+
+# --- Reading ---
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collects visible text, skipping scripts, styles and other non-content elements."""
+
+    _SKIP = {"script", "style", "noscript", "template", "head"}
+    _BLOCK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article", "pre", "blockquote"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def read_text_file(path: str) -> str:
+    """Extracts the text of one supported file. PDF support needs the optional `pypdf` package."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        try:
+            from pypdf import PdfReader
+        except ImportError as e:
+            raise ImportError("Reading PDF files requires 'pypdf' (pip install pypdf).") from e
+        return "\n\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if extension in (".html", ".htm"):
+        extractor = _HTMLTextExtractor()
+        extractor.feed(text)
+        extractor.close()
+        lines = (" ".join(line.split()) for line in "".join(extractor.parts).splitlines())
+        text = "\n".join(line for line in lines if line)
+    return text
+
+
+def iter_source_files(paths: Iterable[str]) -> Iterator[str]:
+    """Yields supported files under the given files/directories, in a stable order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif os.path.isfile(path):
+            yield path
+        else:
+            print(f"Skipping '{path}': not a file or directory.")
+
+
+def file_fingerprint(path: str) -> str:
+    """Cheap change marker for resume bookkeeping: size and modification time."""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def default_manifest_path(collection_name: str = COLLECTION_NAME) -> str:
+    return collection_data_path(collection_name, ".manifest.json")
+
+
+def document_id_for(path: str, root: Optional[str] = None) -> str:
+    """Stable document ID: the path relative to `root` (or as given), with forward slashes."""
+    relative = os.path.relpath(path, root) if root else path
+    return relative.replace(os.sep, "/")
+
+
+# --- Chunking ---
+
+class TokenChunker:
+    """
+    Splits text into windows of at most `chunk_tokens` tokens that overlap by `overlap_tokens`,
+    counted with the embedding model's own tokenizer so no chunk is silently truncated at encode time.
+    Falls back to whitespace-separated words when no tokenizer with offset mappings is available.
+    """
+
+    def __init__(self, chunk_tokens: int = DEFAULT_CHUNK_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS, tokenizer: Any = None):
+        if chunk_tokens <= 0:
+            raise ValueError("chunk_tokens must be positive.")
+        if not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("overlap_tokens must be in [0, chunk_tokens).")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.tokenizer = tokenizer
+
+    def _token_spans(self, text: str) -> List[Tuple[int, int]]:
+        if self.tokenizer is not None:
+            try:
+                encoded = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+                return [tuple(span) for span in encoded["offset_mapping"]]
+            except (TypeError, NotImplementedError, KeyError):
+                self.tokenizer = None # Slow tokenizers have no offsets; use words from now on
+        spans = []
+        position = 0
+        for word in text.split():
+            start = text.index(word, position)
+            position = start + len(word)
+            spans.append((start, position))
+        return spans
+
+    def chunk(self, text: str) -> List[Dict[str, Any]]:
+        """Returns the chunks of `text` as dicts with "text", "char_start", "char_end" and "tokens"."""
+        spans = self._token_spans(text)
+        chunks = []
+        step = self.chunk_tokens - self.overlap_tokens
+        for first in range(0, len(spans), step):
+            window = spans[first:first + self.chunk_tokens]
+            start, end = window[0][0], window[-1][1]
+            chunks.append({"text": text[start:end], "char_start": start, "char_end": end, "tokens": len(window)})
+            if first + self.chunk_tokens >= len(spans):
+                break
+        return chunks
+
+
+# --- Resume state ---
+
+class IngestionState:
+    """
+    Which documents have been fully written, persisted as JSON so an interrupted run can resume.
+    A document counts as done only after its last chunk is in the collection.
+    """
+
+    def __init__(self, path: Optional[str] = None, save_interval_s: float = 5.0):
+        self.path = path
+        self.save_interval_s = save_interval_s
+        self.completed: Dict[str, str] = {} # document ID -> file fingerprint at ingestion time
+        self._lock = threading.Lock()
+        self._last_saved = 0.0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.completed = json.load(f).get("completed", {})
+
+    def is_done(self, document_id: str, fingerprint: str) -> bool:
+        return self.completed.get(document_id) == fingerprint
+
+    def mark_done(self, document_id: str, fingerprint: str) -> None:
+        with self._lock:
+            self.completed[document_id] = fingerprint
+
+    def save(self, force: bool = True) -> None:
+        """Writes the state file; with force=False at most once per `save_interval_s`."""
+        if not self.path:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_saved < self.save_interval_s:
+            return
+        with self._lock:
+            snapshot = dict(self.completed)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"completed": snapshot, "updated_at": time.time()}, f)
+        os.replace(tmp_path, self.path) # Atomic, so a crash never leaves a truncated state file
+        self._last_saved = now
+
+
+# --- Pipeline ---
+
+class IngestionStats:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.documents = 0
+        self.skipped_documents = 0
+        self.failed_documents = 0
+        self.deleted_chunks = 0
+        self.duplicate_chunks = 0
+        self.chunks = 0
+        self.tokens = 0
+        self.encode_seconds = 0.0
+        self.write_seconds = 0.0
+        self.dedup_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            "documents": self.documents,
+            "skipped_documents": self.skipped_documents,
+            "failed_documents": self.failed_documents,
+            "deleted_chunks": self.deleted_chunks,
+            "chunks": self.chunks,
+            "tokens": self.tokens,
+            "elapsed_s": elapsed,
+            "docs_per_sec": self.documents / elapsed if elapsed > 0 else 0.0,
+            "chunks_per_sec": self.chunks / elapsed if elapsed > 0 else 0.0,
+            "encode_s": self.encode_seconds,
+            "write_s": self.write_seconds,
+            "duplicate_chunks": self.duplicate_chunks,
+            # Share of the chunks checked this run that were skipped as near-duplicates
+            "dedup_ratio": self.duplicate_chunks / (self.chunks + self.duplicate_chunks) if self.duplicate_chunks else 0.0,
+            "dedup_s": self.dedup_seconds,
+        }
+
+
+class IngestionPipeline:
+    """
+    Streams files into a Chroma collection without materializing the corpus:
+
+        read file -> chunk -> batch -> encode (caller thread) -> upsert (writer thread)
+
+    Encoding batch N+1 overlaps with writing batch N; the writer queue is bounded, so memory
+    stays at a couple of batches regardless of corpus size. Chunks are upserted under
+    "<document id>#<chunk index>", which makes re-running after a crash idempotent.
+
+    With a manifest (see index_manifest.IndexManifest) the run is incremental: unchanged files are
+    skipped by fingerprint or content hash, edited files re-embed only the chunks whose text
+    changed, their vanished chunks are deleted, and with `prune` documents no longer present
+    under `paths` are removed from the collection.
+
+    The collection's BM25 index (see lexical_index) is updated with every write and delete and
+    saved at the end of the run; if it is out of step with the collection when the run starts
+    (e.g. the previous run was killed), it is rebuilt from the collection first.
+    """
+
+    def __init__(
+        self,
+        collection: Any = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        chunker: Optional[TokenChunker] = None,
+        state_file: Optional[str] = None,
+        encode: Optional[Callable[[List[str]], Any]] = None,
+        progress_every: int = 10,
+        manifest_file: Optional[str] = None,
+        prune: bool = False,
+        embedding_model_id: Optional[str] = None,
+        lexical_index: Optional[BM25Index] = None,
+        index_lexical: bool = True,
+        source: str = "local_kb",
+        tenant: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        deduplicate: bool = DEDUPLICATE,
+        near_duplicate_index: Optional[NearDuplicateIndex] = None,
+    ):
+        """
+        Args:
+            collection: Target collection. Defaults to the agent's collection.
+            batch_size: Chunks per embedding batch / collection write.
+            chunker: Chunking strategy. Defaults to a TokenChunker over the embedding model's tokenizer.
+            state_file: JSON file recording completed documents, enabling resume. None disables resume.
+            encode: Batch embedding function (texts -> vectors), e.g. an EmbeddingEngine.
+                    Defaults to knowledge_base_manager.get_embedding_engine().
+            progress_every: Print a progress line every this many batches (0 disables).
+            manifest_file: Content-hash manifest enabling incremental sync. None disables it.
+            prune: With a manifest, delete documents that are recorded but no longer found under the
+                   ingested paths. Only use it when the paths cover the whole corpus.
+            embedding_model_id: Identifies the vectors `encode` produces, for the manifest. Defaults to
+                   the agent's EMBEDDING_SPACE_ID; a different value triggers re-embedding of everything.
+            lexical_index: BM25 index to maintain. Defaults to the collection's index next to the Chroma data.
+            index_lexical: Set to False to leave the BM25 index alone (hybrid retrieval then falls back to dense).
+            source: "source" metadata of every chunk written.
+            tenant: "tenant" metadata of every chunk written, for filtered retrieval (see metadata_filter.py).
+            tags: "tags" list metadata of every chunk written. Chunks also carry "timestamp", their file's
+                  modification time in epoch seconds, so retrieval can filter by recency.
+            deduplicate: Skip chunks that nearly repeat a chunk already kept (MinHash with LSH banding, see
+                  near_duplicates.py). Skipped chunks are not embedded; the index records which kept chunk
+                  each was folded into. If a kept chunk is later deleted or rewritten, the documents of its
+                  duplicates are queued for re-ingestion on the next run (with a manifest).
+            near_duplicate_index: Index used with `deduplicate`. Defaults to the collection's index next to the Chroma data.
+        """
+        self.collection = collection if collection is not None else get_or_create_collection(COLLECTION_NAME)
+        self.batch_size = batch_size
+        self.chunker = chunker
+        self.state = IngestionState(state_file)
+        self.encode = encode
+        self.progress_every = progress_every
+        self.prune = prune
+        self.manifest: Optional[IndexManifest] = None
+        if manifest_file:
+            settings_chunker = chunker or TokenChunker()
+            self.manifest = IndexManifest(manifest_file, settings={
+                "embedding_model": embedding_model_id or EMBEDDING_SPACE_ID,
+                "chunk_tokens": settings_chunker.chunk_tokens,
+                "overlap_tokens": settings_chunker.overlap_tokens,
+            })
+        self.lexical_index: Optional[BM25Index] = None
+        if index_lexical:
+            self.lexical_index = lexical_index if lexical_index is not None else get_lexical_index(self.collection.name)
+        self.dedup: Optional[NearDuplicateIndex] = None
+        if deduplicate:
+            self.dedup = near_duplicate_index if near_duplicate_index is not None else get_near_duplicate_index(self.collection.name)
+        self.chunk_metadata: Dict[str, Any] = {"source": source}
+        if tenant is not None:
+            self.chunk_metadata["tenant"] = tenant
+        if tags:
+            self.chunk_metadata["tags"] = list(tags) # Chroma rejects empty lists
+        self.stats = IngestionStats()
+
+    def _encode(self, texts: List[str]) -> Any:
+        if self.encode is not None:
+            return self.encode(texts)
+        return get_embedding_engine().encode(texts)
+
+    def _chunker(self) -> TokenChunker:
+        if self.chunker is None:
+            self.chunker = TokenChunker(tokenizer=getattr(get_embedding_model(), "tokenizer", None))
+        return self.chunker
+
+    def iter_chunks(self, paths: Iterable[str], root: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yields chunk records for every document that needs (re-)embedding. The final chunk of each
+        document carries "document_done" so the writer can mark it complete after writing it.
+        """
+        chunker = self._chunker()
+        for path in iter_source_files(paths):
+            document_id = document_id_for(path, root)
+            fingerprint = file_fingerprint(path)
+            self._seen_documents.add(document_id)
+            if self.manifest is not None and self.manifest.is_unchanged(document_id, fingerprint=fingerprint):
+                self.stats.skipped_documents += 1
+                continue
+            if self.state.is_done(document_id, fingerprint):
+                self.stats.skipped_documents += 1
+                continue
+            try:
+                text = read_text_file(path)
+            except Exception as e:
+                print(f"Error reading '{path}': {e}")
+                self.stats.failed_documents += 1
+                continue
+            document_hash = content_hash(text)
+            if self.manifest is not None and self.manifest.is_unchanged(document_id, document_hash):
+                self.manifest.update_fingerprint(document_id, fingerprint) # Touched but not edited
+                self.stats.skipped_documents += 1
+                continue
+
+            modified = int(os.path.getmtime(path))
+            records = []
+            for index, chunk in enumerate(chunker.chunk(text)):
+                records.append({
+                    "id": f"{document_id}#{index}",
+                    "text": chunk["text"],
+                    "tokens": chunk["tokens"],
+                    "metadata": {
+                        **self.chunk_metadata,
+                        "document_id": document_id,
+                        "path": path,
+                        "chunk_index": index,
+                        "char_start": chunk["char_start"],
+                        "char_end": chunk["char_end"],
+                        "timestamp": modified,
+                    },
+                    "document_done": None,
+                })
+            done = {"document_id": document_id, "fingerprint": fingerprint, "hash": document_hash, "chunk_hashes": None}
+            if self.manifest is not None:
+                records, removed, done["chunk_hashes"] = self.manifest.plan(document_id, records)
+                if removed:
+                    delete_chunks(self.collection, removed, lexical_index=self.lexical_index)
+                    self.stats.deleted_chunks += len(removed)
+                    self._forget_kept(removed)
+            if self.dedup is not None:
+                records = self._skip_near_duplicates(records)
+            if not records: # Nothing to (re-)write, but don't revisit it
+                self._complete_document(done)
+                continue
+            records[-1]["document_done"] = done
+            yield from records
+
+    def _skip_near_duplicates(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        kept = []
+        for record in records:
+            signature = self.dedup.signature(record["text"])
+            match = self.dedup.find(signature, exclude=record["id"])
+            was_kept = record["id"] in self.dedup
+            if was_kept: # Rewritten: chunks folded into its old text may not be near-duplicates of the new one
+                self._forget_kept([record["id"]])
+            if match is None:
+                self.dedup.add(record["id"], signature)
+                kept.append(record)
+                continue
+            self.dedup.record_duplicate(record["id"], *match)
+            self.stats.duplicate_chunks += 1
+            if was_kept: # Its previous text is still stored
+                delete_chunks(self.collection, [record["id"]], lexical_index=self.lexical_index)
+                self.stats.deleted_chunks += 1
+        self.stats.dedup_seconds += time.perf_counter() - started
+        return kept
+
+    def _forget_kept(self, chunk_ids: List[str]) -> None:
+        """Drops deleted or rewritten chunks from the near-duplicate index, re-queueing the documents of their duplicates."""
+        if self.dedup is None:
+            return
+        orphans = self.dedup.remove(chunk_ids)
+        if orphans and self.manifest is not None:
+            documents = self.manifest.invalidate_chunks(orphans)
+            print(f"{len(orphans)} near-duplicate chunk(s) lost the chunk they were folded into; "
+                  f"{len(documents)} document(s) will be re-ingested on the next run.")
+
+    def _complete_document(self, done: Dict[str, Any]) -> None:
+        self.state.mark_done(done["document_id"], done["fingerprint"])
+        if self.manifest is not None:
+            self.manifest.commit(done["document_id"], done["hash"], done["chunk_hashes"], done["fingerprint"])
+        self.stats.documents += 1
+
+    def prune_missing(self) -> int:
+        """Deletes documents recorded in the manifest but not seen in this run. Returns chunks deleted."""
+        deleted = 0
+        for document_id in self.manifest.missing(self._seen_documents):
+            orphans = self.manifest.remove(document_id)
+            delete_chunks(self.collection, orphans, lexical_index=self.lexical_index)
+            self._forget_kept(orphans)
+            deleted += len(orphans)
+        self.stats.deleted_chunks += deleted
+        return deleted
+
+    def _batches(self, chunks: Iterator[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        batch: List[Dict[str, Any]] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _write(self, batch: List[Dict[str, Any]], embeddings: Any) -> None:
+        started = time.perf_counter()
+        self.collection.upsert(
+            ids=[chunk["id"] for chunk in batch],
+            embeddings=embeddings.tolist() if hasattr(embeddings, "tolist") else embeddings,
+            documents=[chunk["text"] for chunk in batch],
+            metadatas=[chunk["metadata"] for chunk in batch],
+        )
+        if self.lexical_index is not None:
+            self.lexical_index.add([chunk["id"] for chunk in batch], [chunk["text"] for chunk in batch])
+        self.stats.write_seconds += time.perf_counter() - started
+        self.stats.chunks += len(batch)
+        self.stats.tokens += sum(chunk["tokens"] for chunk in batch)
+        for chunk in batch:
+            if chunk["document_done"] is not None:
+                self._complete_document(chunk["document_done"])
+        self.state.save(force=False)
+        if self.manifest is not None:
+            self.manifest.save(force=False)
+
+    def _writer_loop(self, pending: "queue.Queue", errors: List[BaseException]) -> None:
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            if errors:
+                continue # Drain after a failure so the producer never blocks on a full queue
+            try:
+                self._write(*item)
+            except BaseException as e:
+                errors.append(e)
+
+    def run(self, paths: Iterable[str], root: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ingests every supported file under `paths`. Document IDs are paths relative to `root`
+        (or as given). Returns the run statistics, including docs/sec and chunks/sec.
+        """
+        self.stats = IngestionStats()
+        self._seen_documents = set()
+        if self.lexical_index is not None:
+            ensure_consistent(self.lexical_index, self.collection)
+        if self.dedup is not None:
+            ensure_dedup_consistent(self.dedup, self.collection)
+        pending: "queue.Queue" = queue.Queue(maxsize=2)
+        errors: List[BaseException] = []
+        writer = threading.Thread(target=self._writer_loop, args=(pending, errors), name="ingest-writer", daemon=True)
+        writer.start()
+        try:
+            for batch_number, batch in enumerate(self._batches(self.iter_chunks(paths, root)), start=1):
+                if errors:
+                    break
+                started = time.perf_counter()
+                embeddings = self._encode([chunk["text"] for chunk in batch])
+                self.stats.encode_seconds += time.perf_counter() - started
+                pending.put((batch, embeddings))
+                if self.progress_every and batch_number % self.progress_every == 0:
+                    self.print_progress()
+        finally:
+            pending.put(None)
+            writer.join()
+            self.state.save()
+        if errors:
+            raise errors[0]
+        if self.prune and self.manifest is not None:
+            self.prune_missing()
+        if self.manifest is not None:
+            self.manifest.save()
+        if self.lexical_index is not None:
+            started = time.perf_counter()
+            self.lexical_index.save()
+            self.stats.write_seconds += time.perf_counter() - started
+        if self.dedup is not None:
+            self.dedup.save()
+        return self.stats.as_dict()
+
+    def print_progress(self) -> None:
+        s = self.stats.as_dict()
+        print(f"Ingested {s['documents']} docs / {s['chunks']} chunks ({s['skipped_documents']} skipped, {s['deleted_chunks']} chunks deleted) "
+              f"in {s['elapsed_s']:.1f}s: {s['docs_per_sec']:.1f} docs/s, {s['chunks_per_sec']:.1f} chunks/s")
+        if self.dedup is not None:
+            checked = s['chunks'] + s['duplicate_chunks']
+            print(f"Near-duplicates: {s['duplicate_chunks']} of {checked} chunks skipped ({s['dedup_ratio']:.1%}), "
+                  f"checked in {s['dedup_s']:.1f}s ({checked / s['dedup_s'] if s['dedup_s'] > 0 else 0.0:.0f} chunks/s)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Stream files into the RAG agent's ChromaDB collection.")
+    parser.add_argument("paths", nargs="+", help="Files or directories (txt, md, pdf, html).")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--root", default=None, help="Document IDs are paths relative to this directory.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS)
+    parser.add_argument("--state-file", default=None, help="Resume bookkeeping; documents completed in earlier runs are skipped.")
+    parser.add_argument("--manifest", default=None, help="Content-hash manifest for incremental sync (default: next to the Chroma data).")
+    parser.add_argument("--no-manifest", action="store_true", help="Embed every chunk, ignoring and not updating the manifest.")
+    parser.add_argument("--prune", action="store_true", help="Delete documents no longer present under the given paths.")
+    parser.add_argument("--workers", type=int, default=None, help="Embedding worker processes (default: RAG_EMBEDDING_WORKERS, else in-process).")
+    parser.add_argument("--no-lexical-index", action="store_true", help="Do not maintain the BM25 index used for hybrid retrieval.")
+    parser.add_argument("--source", default="local_kb", help="'source' metadata of the chunks written.")
+    parser.add_argument("--tenant", default=None, help="'tenant' metadata of the chunks written, for filtered retrieval.")
+    parser.add_argument("--tag", dest="tags", action="append", default=None,
+                        help="Add to the 'tags' metadata of the chunks written (repeatable). Like --source and --tenant it only reaches "
+                             "chunks this run writes; with the manifest, unchanged documents keep their old metadata.")
+    parser.add_argument("--dedup", action="store_true", default=DEDUPLICATE,
+                        help="Skip chunks that are near-duplicates of chunks already kept (default: RAG_DEDUP).")
+    parser.add_argument("--dedup-threshold", type=float, default=None,
+                        help="Estimated Jaccard similarity of word shingles at which a chunk counts as a duplicate (default: RAG_DEDUP_THRESHOLD, else 0.85).")
+    parser.add_argument("--encode-batch-size", type=int, default=None, help="Texts per forward pass (default: RAG_EMBEDDING_BATCH_SIZE, else 32).")
+    args = parser.parse_args(argv)
+
+    engine = create_embedding_engine(num_workers=args.workers, batch_size=args.encode_batch_size)
+    chunker = TokenChunker(args.chunk_tokens, args.overlap_tokens, tokenizer=getattr(get_embedding_model(), "tokenizer", None))
+    pipeline = IngestionPipeline(
+        collection=get_or_create_collection(args.collection),
+        batch_size=args.batch_size,
+        chunker=chunker,
+        state_file=args.state_file,
+        manifest_file=None if args.no_manifest else (args.manifest or default_manifest_path(args.collection)),
+        prune=args.prune,
+        encode=engine.encode,
+        index_lexical=not args.no_lexical_index,
+        source=args.source,
+        tenant=args.tenant,
+        tags=args.tags,
+        deduplicate=args.dedup,
+        near_duplicate_index=NearDuplicateIndex(near_duplicate_index_path(args.collection), threshold=args.dedup_threshold)
+                             if args.dedup and args.dedup_threshold is not None else None,
+    )
+    try:
+        pipeline.run(args.paths, root=args.root)
+    finally:
+        engine.close()
+    pipeline.print_progress()
+    print(f"Embedding engine: {engine.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,315 @@
+# intent_router.py
+# Local intent classifier over the query embeddings retrieval already computes, so that queries it is
+# confident about skip the agent's LLM analysis call.
+#   python -m react_rag_agent.intent_router train --log intent_log.jsonl
+#   python -m react_rag_agent.intent_router report
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from react_rag_agent.knowledge_base_manager import CHROMA_DATA_PATH, EMBEDDING_SPACE_ID, embed_queries
+
+INTENTS = ("direct_answer", "information_seeking") # Class 0 and class 1
+ROUTER_PATH = os.environ.get("RAG_INTENT_ROUTER_PATH", os.path.join(CHROMA_DATA_PATH, "intent_router.npz"))
+INTENT_LOG_PATH = os.environ.get("RAG_INTENT_LOG") # JSONL the agent appends LLM-analysis outcomes to, the router's training data
+DEFAULT_TARGET_ACCURACY = 0.98 # Held-out accuracy required of the queries the router answers on its own
+DEFAULT_FOLDS = 5
+_MIN_CONFIDENT_EXAMPLES = 20 # A threshold is only trusted if this many held-out queries clear it
+_THRESHOLDS = np.round(np.arange(0.5, 1.0, 0.025), 3)
+
+_INPUT_RE = re.compile(r'^Received user input: "(.*)"$', re.S)
+_INTENT_RE = re.compile(r"^LLM determined intent: '([a-z_]+)'$")
+_FALLBACK_PREFIX = "Fallback due to" # Analysis failed; the intent was not the LLM's
+ROUTER_STEP_PREFIX = "Intent router:" # Thought-process steps of routed requests start with this
+
+_log_lock = threading.Lock()
+_router: Optional["IntentRouter"] = None
+_router_mtime: Optional[float] = None
+_router_lock = threading.Lock()
+
+
+def _fit_logistic(features: np.ndarray, labels: np.ndarray, l2: float = 1.0, iterations: int = 25) -> np.ndarray:
+    # L2-regularized logistic regression by Newton's method (IRLS); returns weights with the bias last
+    X = np.hstack([features, np.ones((len(features), 1))]).astype(np.float64)
+    y = labels.astype(np.float64)
+    penalty = l2 * np.eye(X.shape[1])
+    penalty[-1, -1] = 0.0 # The bias is not regularized
+    weights = np.zeros(X.shape[1])
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-np.clip(X @ weights, -30, 30)))
+        gradient = X.T @ (p - y) + penalty @ weights
+        hessian = (X * (p * (1 - p))[:, None]).T @ X + penalty
+        step = np.linalg.solve(hessian + 1e-9 * np.eye(X.shape[1]), gradient)
+        weights -= step
+        if np.abs(step).max() < 1e-6:
+            break
+    return weights
+
+
+def calibration_report(probabilities: np.ndarray, labels: np.ndarray, target_accuracy: float = DEFAULT_TARGET_ACCURACY,
+                       bins: int = 10) -> Dict[str, Any]:
+    """
+    How far the router's confidence can be trusted, from held-out predictions.
+
+    Args:
+        probabilities: P(information_seeking) per query.
+        labels: True class per query (1 = information_seeking).
+        target_accuracy: Accuracy the routed (confident) queries must reach.
+        bins: Reliability-diagram bins over confidence in [0.5, 1].
+
+    Returns:
+        Dict with overall "accuracy", expected calibration error "ece", the reliability "bins"
+        (confidence range, count, mean confidence, accuracy), per-threshold "coverage" and
+        accuracy of the queries at or above it, and the chosen "threshold": the lowest one
+        whose routed queries reach `target_accuracy` (None if no threshold does).
+    """
+    predicted = (probabilities >= 0.5).astype(int)
+    confidence = np.maximum(probabilities, 1.0 - probabilities)
+    correct = predicted == labels
+    edges = np.linspace(0.5, 1.0, bins + 1)
+    which = np.clip(np.searchsorted(edges, confidence, side="right") - 1, 0, bins - 1)
+    reliability, ece = [], 0.0
+    for b in range(bins):
+        members = which == b
+        if not members.any():
+            continue
+        mean_confidence, accuracy = float(confidence[members].mean()), float(correct[members].mean())
+        ece += members.sum() / len(labels) * abs(mean_confidence - accuracy)
+        reliability.append({"range": [float(edges[b]), float(edges[b + 1])], "count": int(members.sum()),
+                            "confidence": mean_confidence, "accuracy": accuracy})
+    thresholds, chosen = [], None
+    for threshold in _THRESHOLDS:
+        routed = confidence >= threshold
+        accuracy = float(correct[routed].mean()) if routed.any() else None
+        thresholds.append({"threshold": float(threshold), "coverage": float(routed.mean()), "accuracy": accuracy})
+        if chosen is None and routed.sum() >= _MIN_CONFIDENT_EXAMPLES and accuracy >= target_accuracy:
+            chosen = float(threshold)
+    return {"examples": int(len(labels)), "accuracy": float(correct.mean()), "ece": float(ece), "bins": reliability,
+            "thresholds": thresholds, "target_accuracy": target_accuracy, "threshold": chosen}
+
+
+class IntentRouter:
+    """
+    Binary classifier "direct_answer" vs "information_seeking" over normalized query embeddings.
+
+    * "logistic": L2-regularized logistic regression on the embedding.
+    * "centroid": nearest class centroid by cosine; the score is the margin between the two similarities.
+
+    Training holds out each fold in turn. The out-of-fold scores calibrate the model (a sigmoid
+    fitted to them, i.e. Platt scaling) and give the calibration report and the confidence
+    threshold, so all three reflect queries the model did not see; the final model is then fit on
+    all of them. Queries below the threshold are left to the LLM.
+    """
+
+    def __init__(self, method: str, weights: Optional[np.ndarray] = None, centroids: Optional[np.ndarray] = None,
+                 calibration: Tuple[float, float] = (1.0, 0.0), threshold: Optional[float] = None,
+                 embedding_space: str = EMBEDDING_SPACE_ID, report: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            method: "logistic" or "centroid".
+            weights: Logistic weights with the bias last, for "logistic".
+            centroids: (2, dim) unit class centroids, for "centroid".
+            calibration: (scale, bias) of the sigmoid mapping scores to P(information_seeking).
+            threshold: Minimum confidence (max class probability) to route without the LLM; None never routes.
+            embedding_space: Embedding space the router was trained in; it only applies to the same one.
+            report: Calibration report from training.
+        """
+        if method not in ("logistic", "centroid"):
+            raise ValueError(f"Unknown intent router method {method!r}.")
+        self.method = method
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+        self.centroids = None if centroids is None else np.asarray(centroids, dtype=np.float32)
+        self.calibration = np.asarray(calibration, dtype=np.float64)
+        self.threshold = threshold
+        self.embedding_space = embedding_space
+        self.report = report or {}
+
+    @staticmethod
+    def _normalize(embeddings: np.ndarray) -> np.ndarray:
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+    @classmethod
+    def _fit(cls, method: str, X: np.ndarray, y: np.ndarray) -> "IntentRouter":
+        if method == "logistic":
+            return cls(method, weights=_fit_logistic(X, y, l2=0.1))
+        centroids = np.stack([X[y == c].mean(axis=0) for c in (0, 1)])
+        return cls(method, centroids=centroids / np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12))
+
+    @classmethod
+    def train(cls, embeddings: np.ndarray, labels: List[str], method: str = "logistic", target_accuracy: float = DEFAULT_TARGET_ACCURACY,
+              folds: int = DEFAULT_FOLDS, seed: int = 0) -> "IntentRouter":
+        """
+        Trains on labelled query embeddings and picks the confidence threshold from out-of-fold predictions.
+
+        Args:
+            embeddings: (n, dim) query embeddings.
+            labels: Intent per query, one of INTENTS.
+            method: "logistic" or "centroid".
+            target_accuracy: Held-out accuracy required of routed queries (see calibration_report()).
+            folds: Cross-validation folds.
+            seed: Fold assignment seed.
+        """
+        X = cls._normalize(embeddings)
+        y = np.array([INTENTS.index(label) for label in labels])
+        if len(set(y.tolist())) < 2 or np.bincount(y).min() < folds:
+            raise ValueError(f"Need at least {folds} logged examples of each intent, got {dict(zip(INTENTS, np.bincount(y, minlength=2).tolist()))}.")
+        fold_of = np.random.default_rng(seed).permutation(len(y)) % folds
+        held_out = np.empty(len(y))
+        for fold in range(folds):
+            train = fold_of != fold
+            held_out[~train] = cls._fit(method, X[train], y[train])._scores(X[~train])
+        router = cls._fit(method, X, y)
+        router.calibration = _fit_logistic(held_out[:, None], y, l2=1e-3)
+        router.report = calibration_report(router._calibrated(held_out), y, target_accuracy)
+        router.threshold = router.report["threshold"]
+        return router
+
+    def _scores(self, X: np.ndarray) -> np.ndarray:
+        if self.method == "centroid":
+            return X @ self.centroids[1] - X @ self.centroids[0]
+        return X @ self.weights[:-1] + self.weights[-1]
+
+    def _calibrated(self, scores: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-np.clip(self.calibration[0] * scores + self.calibration[1], -30, 30)))
+
+    def predict_proba(self, embeddings: np.ndarray) -> np.ndarray:
+        """P(information_seeking) for each embedding."""
+        return self._calibrated(self._scores(self._normalize(embeddings)))
+
+    def route(self, embedding: np.ndarray) -> Tuple[str, float, bool]:
+        """
+        Returns:
+            Tuple of (predicted intent, confidence in it, whether the confidence clears the threshold).
+        """
+        p = float(self.predict_proba(embedding)[0])
+        intent, confidence = (INTENTS[1], p) if p >= 0.5 else (INTENTS[0], 1.0 - p)
+        return intent, confidence, self.threshold is not None and confidence >= self.threshold
+
+    def save(self, path: str = ROUTER_PATH) -> None:
+        """Writes the router to `path` (.npz) atomically."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, method=self.method, weights=self.weights if self.weights is not None else np.empty(0),
+                 centroids=self.centroids if self.centroids is not None else np.empty(0), calibration=self.calibration,
+                 threshold=np.nan if self.threshold is None else self.threshold, embedding_space=self.embedding_space,
+                 report=json.dumps(self.report))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = ROUTER_PATH) -> "IntentRouter":
+        with np.load(path) as data:
+            threshold = float(data["threshold"])
+            return cls(str(data["method"]), data["weights"] if data["weights"].size else None, data["centroids"] if data["centroids"].size else None,
+                       tuple(data["calibration"]), None if np.isnan(threshold) else threshold, str(data["embedding_space"]),
+                       json.loads(str(data["report"])))
+
+
+def get_intent_router(path: str = ROUTER_PATH) -> Optional[IntentRouter]:
+    """
+    The trained router at `path`, reloaded when the file changes; None if there is none, or if it was
+    trained on another embedding space than the one queries are embedded in now.
+    """
+    global _router, _router_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _router_lock:
+        if mtime != _router_mtime:
+            _router_mtime = mtime
+            _router = IntentRouter.load(path)
+            if _router.embedding_space != EMBEDDING_SPACE_ID:
+                print(f"Intent router '{path}' was trained on embedding space '{_router.embedding_space}', not '{EMBEDDING_SPACE_ID}'; ignoring it.")
+                _router = None
+        return _router
+
+
+def log_outcome(user_input: str, intent: str, search_query: Optional[str], path: Optional[str] = INTENT_LOG_PATH) -> None:
+    """Appends one LLM-analysis outcome to the intent log (a no-op without a log path)."""
+    if not path or intent not in INTENTS:
+        return
+    line = json.dumps({"user_input": user_input, "intent": intent, "search_query": search_query})
+    with _log_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def examples_from_log(paths: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Labelled queries from JSONL logs. Each line is either a log_outcome() record or an agent result
+    with its "thought_process"; for the latter the input and the LLM's intent are read from the steps,
+    and results whose analysis fell back or was decided by the router itself are skipped. A query
+    logged several times keeps its last intent.
+
+    Returns:
+        Tuple of (queries, intents).
+    """
+    labelled: Dict[str, str] = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                user_input, intent = record.get("user_input"), record.get("intent")
+                if intent is None and record.get("thought_process"):
+                    steps = record["thought_process"]
+                    if any(step.startswith((_FALLBACK_PREFIX, ROUTER_STEP_PREFIX)) for step in steps):
+                        continue
+                    for step in steps:
+                        input_match, intent_match = _INPUT_RE.match(step), _INTENT_RE.match(step)
+                        if input_match:
+                            user_input = input_match.group(1)
+                        if intent_match:
+                            intent = intent_match.group(1)
+                if user_input and intent in INTENTS:
+                    labelled[" ".join(user_input.split())] = intent
+    return list(labelled), list(labelled.values())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train or inspect the agent's local intent router.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train from logged outcomes and save the router.")
+    train.add_argument("--log", nargs="+", default=[INTENT_LOG_PATH] if INTENT_LOG_PATH else None, required=not INTENT_LOG_PATH,
+                       help="JSONL logs of outcomes or agent results (default: RAG_INTENT_LOG).")
+    train.add_argument("--method", default="logistic", choices=["logistic", "centroid"])
+    train.add_argument("--target-accuracy", type=float, default=DEFAULT_TARGET_ACCURACY)
+    train.add_argument("--folds", type=int, default=DEFAULT_FOLDS)
+    train.add_argument("--output", default=ROUTER_PATH)
+    report = commands.add_parser("report", help="Print the calibration report of a saved router.")
+    report.add_argument("--path", default=ROUTER_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        router = IntentRouter.load(args.path)
+        print(json.dumps(dict(router.report, method=router.method, embedding_space=router.embedding_space), indent=2))
+        return 0
+    queries, intents = examples_from_log(args.log)
+    print(f"{len(queries)} labelled queries: " + ", ".join(f"{intent} {intents.count(intent)}" for intent in INTENTS))
+    router = IntentRouter.train(embed_queries(queries), intents, method=args.method, target_accuracy=args.target_accuracy, folds=args.folds)
+    result = router.report
+    print(f"Held-out accuracy {result['accuracy']:.3f}, expected calibration error {result['ece']:.3f}")
+    for row in result["bins"]:
+        print(f"  confidence {row['range'][0]:.2f}-{row['range'][1]:.2f}: {row['count']:>5} queries, mean confidence {row['confidence']:.3f}, accuracy {row['accuracy']:.3f}")
+    for row in result["thresholds"]:
+        if row["accuracy"] is not None:
+            print(f"  threshold {row['threshold']:.3f}: routes {row['coverage']:6.1%} of queries at accuracy {row['accuracy']:.3f}")
+    if result["threshold"] is None:
+        print(f"No threshold reaches accuracy {args.target_accuracy} on {_MIN_CONFIDENT_EXAMPLES}+ held-out queries; the router will defer every query to the LLM.")
+    else:
+        print(f"Threshold {result['threshold']:.3f}: queries at or above it skip the LLM analysis call.")
+    router.save(args.output)
+    print(f"Saved intent router to '{args.output}'.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
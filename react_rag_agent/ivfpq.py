@@ -0,0 +1,198 @@
+# ivfpq.py
+# Inverted-file index over product-quantized residuals (IVF-PQ): approximate nearest-neighbour
+# search for collections too large to scan exactly or to hold as float32 in memory.
+import math
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+DEFAULT_NPROBE = int(os.environ.get("RAG_IVF_NPROBE", 16)) # Inverted lists scanned per query
+DEFAULT_SUBQUANTIZERS = int(os.environ.get("RAG_PQ_SUBQUANTIZERS", 48)) # Bytes per encoded vector; lowered to a divisor of the dimension unless set
+SUBQUANTIZERS_SET = "RAG_PQ_SUBQUANTIZERS" in os.environ # An explicit RAG_PQ_SUBQUANTIZERS must divide the dimension
+PQ_CENTROIDS = 256 # Per subquantizer, so each sub-vector code is one uint8
+DEFAULT_TRAIN_SAMPLE = 100_000
+DEFAULT_KMEANS_ITERATIONS = 12
+_PQ_TRAIN_ROWS = 64 * PQ_CENTROIDS # Residuals each codebook is trained on; more adds training time, not accuracy
+_ASSIGN_BLOCK_ROWS = 16384 # Rows whose distances to all centroids are computed at once
+
+
+def default_list_count(rows: int) -> int:
+    """About sqrt(rows) inverted lists: 1M vectors -> 1000 lists of ~1000, so nprobe=16 scans ~1.6%."""
+    return int(min(4096, max(16, round(math.sqrt(rows)))))
+
+
+def subquantizer_count(dim: int, m: Optional[int] = None) -> int:
+    """
+    Subquantizers for `dim`-dimensional vectors. An explicit `m` or RAG_PQ_SUBQUANTIZERS is used as
+    given and raises ValueError unless it divides dim; otherwise the largest divisor of dim up to
+    DEFAULT_SUBQUANTIZERS (48 for 384 or 768 dimensions, 32 for 1024 or 64).
+    """
+    if m is None and not SUBQUANTIZERS_SET:
+        return max(d for d in range(1, min(DEFAULT_SUBQUANTIZERS, dim) + 1) if dim % d == 0)
+    m = m or DEFAULT_SUBQUANTIZERS
+    if m < 1 or dim % m:
+        raise ValueError(f"{m} subquantizers do not divide dimension {dim}; set RAG_PQ_SUBQUANTIZERS to a divisor of it.")
+    return m
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, centroid_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) for each row, computed in blocks to bound memory."""
+    if centroid_norms is None:
+        centroid_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK_ROWS):
+        block = vectors[start:start + _ASSIGN_BLOCK_ROWS]
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2; ||x||^2 does not change the argmin
+        assignments[start:start + len(block)] = np.argmin(centroid_norms - 2.0 * (block @ centroids.T), axis=1)
+    return assignments
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = DEFAULT_KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means with centroids initialized from random rows. Each iteration is one blocked matrix
+    product for assignment and one sort + reduceat for the means; empty clusters are re-seeded with
+    random rows.
+
+    Returns:
+        np.ndarray: (k, dim) float32 centroids.
+    """
+    rng = np.random.default_rng(seed)
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    if len(data) < k:
+        raise ValueError(f"k-means needs at least {k} training vectors, got {len(data)}.")
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(data, centroids)
+        order = np.argsort(assignments, kind="stable")
+        clusters, starts, counts = np.unique(assignments[order], return_index=True, return_counts=True)
+        centroids[clusters] = np.add.reduceat(data[order], starts, axis=0) / counts[:, None]
+        empty = np.setdiff1d(np.arange(k), clusters)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    """
+    Coarse quantizer + product quantizer, in the style of Jégou et al. (2011):
+
+    * k-means centroids split the space into inverted lists; a vector belongs to its nearest one.
+    * The vector's residual (vector - centroid) is cut into `m` sub-vectors, and each sub-vector is
+      replaced by the index of its nearest of 256 sub-centroids: `m` bytes per vector instead of
+      4 * dim (48 bytes vs 1536 for 384-dim float32).
+    * A query visits the `nprobe` lists nearest to it. Per list it builds an (m, 256) table of
+      squared distances from its residual to every sub-centroid, after which the distance to any
+      encoded vector is m table lookups summed (asymmetric distance computation: the query stays
+      exact, only the database side is quantized). Lookups for all candidates of all probed lists
+      are one vectorized gather.
+
+    This class only holds the trained quantizers and does the arithmetic; which rows live in which
+    list, and their codes, are kept by the caller (see vector_store.NumpyVectorStore).
+    """
+
+    def __init__(self, centroids: np.ndarray, codebooks: np.ndarray, trained_rows: int = 0):
+        """
+        Args:
+            centroids: (n_lists, dim) coarse centroids.
+            codebooks: (m, 256, dim // m) sub-centroids per subquantizer.
+            trained_rows: Size of the collection the index was trained for, so owners can tell when to retrain.
+        """
+        self.trained_rows = trained_rows
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.codebooks = np.ascontiguousarray(codebooks, dtype=np.float32)
+        self.n_lists, self.dim = self.centroids.shape
+        self.m, _, self.dsub = self.codebooks.shape
+        self._centroid_norms = (self.centroids ** 2).sum(axis=1)
+        self._codebook_norms = (self.codebooks ** 2).sum(axis=2) # (m, 256)
+        self._codebooks_t = np.ascontiguousarray(self.codebooks.transpose(0, 2, 1)) # (m, dsub, 256)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, n_lists: Optional[int] = None, m: Optional[int] = None,
+              sample_size: int = DEFAULT_TRAIN_SAMPLE, iterations: int = DEFAULT_KMEANS_ITERATIONS, seed: int = 0) -> "IVFPQIndex":
+        """
+        Trains the coarse centroids and the residual codebooks on a random sample of `vectors`.
+
+        Args:
+            vectors: (n, dim) training data, typically the collection itself.
+            n_lists: Inverted lists. Defaults to default_list_count(n).
+            m: Subquantizers (bytes per code); must divide dim. Defaults to subquantizer_count(dim).
+            sample_size: Rows sampled for training.
+            iterations: k-means iterations for both quantizers.
+            seed: Sampling and initialization seed.
+        """
+        dim = vectors.shape[1]
+        m = subquantizer_count(dim, m)
+        n_lists = n_lists or default_list_count(len(vectors))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False))
+        data = np.asarray(vectors[sample], dtype=np.float32)
+        centroids = kmeans(data, n_lists, iterations, seed)
+        data = data[np.sort(rng.choice(len(data), min(_PQ_TRAIN_ROWS, len(data)), replace=False))]
+        residuals = data - centroids[nearest_centroids(data, centroids)]
+        codebooks = np.stack([kmeans(residuals[:, j * (dim // m):(j + 1) * (dim // m)], PQ_CENTROIDS, iterations, seed + 1 + j)
+                              for j in range(m)])
+        return cls(centroids, codebooks, trained_rows=len(vectors))
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Inverted list of each vector, as int32."""
+        return nearest_centroids(np.asarray(vectors, dtype=np.float32), self.centroids, self._centroid_norms)
+
+    def encode(self, vectors: np.ndarray, lists: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            Tuple of (int32 list per vector, (n, m) uint8 codes of the residuals).
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        lists = self.assign(vectors) if lists is None else lists
+        residuals = (vectors - self.centroids[lists]).reshape(len(vectors), self.m, self.dsub)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = nearest_centroids(residuals[:, j], self.codebooks[j], self._codebook_norms[j])
+        return lists, codes
+
+    def decode(self, lists: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Approximate vectors from their lists and codes."""
+        parts = self.codebooks[np.arange(self.m)[None, :], codes.astype(np.int64)] # (n, m, dsub)
+        return self.centroids[lists] + parts.reshape(len(codes), self.dim)
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """The `nprobe` lists nearest to `query`, nearest first."""
+        distances = self._centroid_norms - 2.0 * (self.centroids @ query)
+        nprobe = min(nprobe, self.n_lists)
+        nearest = np.argpartition(distances, nprobe - 1)[:nprobe] if nprobe < self.n_lists else np.arange(self.n_lists)
+        return nearest[np.argsort(distances[nearest], kind="stable")]
+
+    def distance_tables(self, query: np.ndarray, lists: np.ndarray) -> np.ndarray:
+        """(len(lists), m, 256) squared distances from each list's query residual to every sub-centroid."""
+        residuals = (query[None, :] - self.centroids[lists]).reshape(len(lists), self.m, self.dsub)
+        cross = np.matmul(residuals.transpose(1, 0, 2), self._codebooks_t).transpose(1, 0, 2) # Batched BLAS, unlike einsum
+        return (residuals ** 2).sum(axis=2)[:, :, None] - 2.0 * cross + self._codebook_norms[None, :, :]
+
+    def adc(self, tables: np.ndarray, probe_index: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        """
+        Approximate squared distances of encoded vectors to the query.
+
+        Args:
+            tables: Output of distance_tables().
+            probe_index: For each vector, the position of its list in the tables.
+            columns: (m, n) uint8 codes, transposed so each subquantizer's codes are contiguous.
+        """
+        # One gather per subquantizer over a contiguous column is ~2x faster than a single (n, m) gather
+        by_subquantizer = np.ascontiguousarray(tables.transpose(1, 0, 2)).reshape(self.m, -1)
+        base = probe_index.astype(np.int64) * PQ_CENTROIDS
+        distances = np.zeros(columns.shape[1], dtype=np.float32)
+        for j in range(self.m):
+            distances += by_subquantizer[j][base + columns[j]]
+        return distances
+
+    def save(self, path: str) -> None:
+        """Writes the quantizers to `path` (.npz) atomically."""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, codebooks=self.codebooks, trained_rows=self.trained_rows)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["codebooks"], int(data["trained_rows"]))
@@ -1,29 +1,215 @@
+import os
+import shutil
+import threading
+import time
 import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
+import numpy as np
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Union
+
+from react_rag_agent.embedding_backends import embedding_space_id, load_sentence_transformer
+from react_rag_agent.embedding_cache import QueryEmbeddingCache
+from react_rag_agent.embedding_engine import EmbeddingEngine, create_embedding_engine
+from react_rag_agent.lexical_index import BM25Index
+from react_rag_agent.metadata_filter import Where, parse_filter
+from react_rag_agent.near_duplicates import NearDuplicateIndex, ensure_consistent as ensure_dedup_consistent
+from react_rag_agent.vector_store import NumpyVectorStore, VectorStore
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 # Define constants
 CHROMA_DATA_PATH = "chroma_db_data"  # Folder to store ChromaDB data
 COLLECTION_NAME = "rag_documents"
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2" # Efficient and good quality model
-
-# Initialize ChromaDB client (persistent)
-try:
-    client = chromadb.PersistentClient(path=CHROMA_DATA_PATH)
-except Exception as e:
-    print(f"Error initializing ChromaDB client: {e}")
-    print("Please ensure ChromaDB is installed and configured correctly.")
-    # A fallback or further error handling could be implemented here.
-    # For this script, we'll let it raise if critical.
-    raise
-
-# Initialize sentence transformer model
-try:
-    embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-except Exception as e:
-    print(f"Error initializing SentenceTransformer model '{EMBEDDING_MODEL_NAME}': {e}")
-    print("Please ensure 'sentence-transformers' is installed and the model name is correct.")
-    raise
+EMBEDDING_MODEL_NAME = os.environ.get("RAG_EMBEDDING_MODEL", "all-MiniLM-L6-v2") # Efficient and good quality model; the env var allows a local path
+EMBEDDING_BACKEND = os.environ.get("RAG_EMBEDDING_BACKEND", "torch") # torch, onnx, onnx-int8 or torch-int8; see embedding_backends.py
+# Which vector space stored embeddings belong to. Manifests record it, so switching to a backend with a
+# different ID (the quantized ones) makes the next ingestion run re-embed the collection.
+EMBEDDING_SPACE_ID = embedding_space_id(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND)
+VECTOR_STORE_BACKEND = os.environ.get("RAG_VECTOR_STORE", "chroma") # chroma, or numpy for the memory-mapped exact-search store in vector_store.py
+QUERY_CACHE_SIZE = int(os.environ.get("RAG_QUERY_CACHE_SIZE", 1024)) # Query embeddings kept in memory; 0 disables
+DEDUPLICATE = os.environ.get("RAG_DEDUP", "0").lower() in ("1", "true", "yes") # Skip near-duplicate chunks on write; see near_duplicates.py
+WARM_UP_QUERIES = int(os.environ.get("RAG_WARM_UP_QUERIES", 3)) # Throwaway queries a serving process runs before taking traffic
+_WARM_UP_QUERIES = ["what is this document about?", "how do I configure it", "error when installing"]
+
+# The ChromaDB client and the embedding model are created on first use rather than at import.
+# Loading the model (and importing torch with it) dominates process start-up, and tools.py and
+# app_ui.py import this module even when they never embed anything. Call warm_up() to pay the
+# cost up front, e.g. before serving the first request.
+_client: Optional[chromadb.ClientAPI] = None
+_embedding_model: Optional["SentenceTransformer"] = None
+_embedding_engine: Optional[EmbeddingEngine] = None
+_client_lock = threading.Lock()
+_model_lock = threading.Lock()
+
+# Collection handles are cached per name so hot paths skip Chroma's get_or_create round-trip.
+# Anything that deletes or recreates a collection must go through invalidate_collection_cache().
+_collections: Dict[str, VectorStore] = {}
+_collections_lock = threading.RLock()
+
+_query_embedding_cache = QueryEmbeddingCache(max_entries=QUERY_CACHE_SIZE)
+
+# BM25 indexes are kept next to the Chroma data, one per collection, and reloaded when another
+# process (an ingestion run) has saved a newer version.
+_lexical_indexes: Dict[str, BM25Index] = {}
+_lexical_lock = threading.Lock()
+
+# Near-duplicate (MinHash) indexes, likewise one per collection, used only by writes with deduplication on.
+_dedup_indexes: Dict[str, NearDuplicateIndex] = {}
+
+
+def get_chroma_client() -> chromadb.ClientAPI:
+    """Returns the process-wide persistent ChromaDB client, opening it on first call."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    _client = chromadb.PersistentClient(path=CHROMA_DATA_PATH)
+                except Exception as e:
+                    print(f"Error initializing ChromaDB client: {e}")
+                    print("Please ensure ChromaDB is installed and configured correctly.")
+                    raise
+    return _client
+
+
+def get_embedding_model() -> "SentenceTransformer":
+    """Returns the process-wide SentenceTransformer, loading it on first call."""
+    global _embedding_model
+    if _embedding_model is None:
+        with _model_lock:
+            if _embedding_model is None:
+                try:
+                    _embedding_model = load_sentence_transformer(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND)
+                except Exception as e:
+                    print(f"Error initializing SentenceTransformer model '{EMBEDDING_MODEL_NAME}' ({EMBEDDING_BACKEND} backend): {e}")
+                    print("Please ensure 'sentence-transformers' is installed and the model name is correct.")
+                    raise
+    return _embedding_model
+
+
+def get_embedding_engine() -> EmbeddingEngine:
+    """
+    Returns the process-wide engine used for bulk (document) encoding. It runs in-process unless
+    RAG_EMBEDDING_WORKERS asks for a multi-process pool; query encoding always stays in-process.
+    """
+    global _embedding_engine
+    if _embedding_engine is None:
+        with _model_lock:
+            if _embedding_engine is None:
+                _embedding_engine = create_embedding_engine()
+    return _embedding_engine
+
+
+def warm_up(load_model: bool = True, open_client: bool = True, collection_name: Optional[str] = None,
+            dummy_queries: int = 0) -> Dict[str, float]:
+    """
+    Eagerly creates the shared client and model and runs one throwaway encode, so the first
+    real query doesn't pay for lazy initialization or first-call kernel setup.
+
+    With `collection_name`, also opens that collection and its BM25 index, reads through the pages
+    a NumPy store's queries scan, and runs `dummy_queries` throwaway queries through both
+    retrievers, so Chroma has loaded its HNSW index and the OS page cache holds what the first real
+    query touches.
+
+    Returns:
+        Dict[str, float]: Seconds spent on each step ("client", "model", "first_encode", and with a
+                          collection "collection", "prefetch", "lexical_index", "dummy_queries").
+    """
+    timings = {}
+    if open_client and VECTOR_STORE_BACKEND == "chroma":
+        started = time.perf_counter()
+        get_chroma_client()
+        timings["client"] = time.perf_counter() - started
+    if load_model:
+        started = time.perf_counter()
+        model = get_embedding_model()
+        timings["model"] = time.perf_counter() - started
+        started = time.perf_counter()
+        model.encode(["warm-up"])
+        timings["first_encode"] = time.perf_counter() - started
+    if collection_name is not None:
+        started = time.perf_counter()
+        collection = get_collection(collection_name)
+        timings["collection"] = time.perf_counter() - started
+        if isinstance(collection, NumpyVectorStore):
+            started = time.perf_counter()
+            collection.prefetch()
+            timings["prefetch"] = time.perf_counter() - started
+        started = time.perf_counter()
+        lexical_index = get_lexical_index(collection_name)
+        timings["lexical_index"] = time.perf_counter() - started
+        if dummy_queries > 0 and collection.count() > 0:
+            started = time.perf_counter()
+            queries = [_WARM_UP_QUERIES[i % len(_WARM_UP_QUERIES)] for i in range(dummy_queries)]
+            collection.query(query_embeddings=embed_queries(queries).tolist(), n_results=10, include=["documents", "metadatas", "distances"])
+            for query in queries:
+                lexical_index.search(query, 10)
+            timings["dummy_queries"] = time.perf_counter() - started
+    return timings
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    return _query_embedding_cache
+
+
+def embed_query(query_text: str) -> np.ndarray:
+    """Embedding of a query as a float32 vector, served from the LRU cache when the query was seen before."""
+    return _query_embedding_cache.get_or_compute(query_text, lambda text: get_embedding_model().encode(text))
+
+
+def embed_queries(query_texts: List[str]) -> np.ndarray:
+    """Embeddings of several queries as a (n, dim) float32 matrix; uncached ones are encoded in one batched forward pass."""
+    return _query_embedding_cache.get_or_compute_many(query_texts, lambda texts: get_embedding_model().encode(texts))
+
+
+def collection_data_path(collection_name: str, suffix: str) -> str:
+    """
+    Path of a file or directory kept next to a collection's vectors, such as its manifest or BM25
+    index. Outside the default Chroma backend the backend name is part of it, so stores of
+    different backends never share (and disagree with) each other's state.
+    """
+    backend = "" if VECTOR_STORE_BACKEND == "chroma" else f".{VECTOR_STORE_BACKEND}"
+    return os.path.join(CHROMA_DATA_PATH, f"{collection_name}{backend}{suffix}")
+
+
+def vector_store_path(collection_name: str = COLLECTION_NAME) -> str:
+    return collection_data_path(collection_name, ".vectors")
+
+
+def lexical_index_path(collection_name: str = COLLECTION_NAME) -> str:
+    return collection_data_path(collection_name, ".bm25.npz")
+
+
+def get_lexical_index(collection_name: str = COLLECTION_NAME) -> BM25Index:
+    """The BM25 index for `collection_name`, loaded from disk on first use (empty if none was built yet)."""
+    with _lexical_lock:
+        index = _lexical_indexes.get(collection_name)
+        if index is None or index.is_stale():
+            index = _lexical_indexes[collection_name] = BM25Index(lexical_index_path(collection_name))
+        return index
+
+
+def near_duplicate_index_path(collection_name: str = COLLECTION_NAME) -> str:
+    return collection_data_path(collection_name, ".minhash.npz")
+
+
+def get_near_duplicate_index(collection_name: str = COLLECTION_NAME) -> NearDuplicateIndex:
+    """The near-duplicate index for `collection_name`, loaded from disk on first use (empty if none was built yet)."""
+    with _lexical_lock:
+        index = _dedup_indexes.get(collection_name)
+        if index is None:
+            index = _dedup_indexes[collection_name] = NearDuplicateIndex(near_duplicate_index_path(collection_name))
+        return index
+
+
+def __getattr__(name: str) -> Any:
+    # Back-compat for code that imported the old module-level globals directly
+    if name == "client":
+        return get_chroma_client()
+    if name == "embedding_model":
+        return get_embedding_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 class ChromaEmbeddingFunction(chromadb.EmbeddingFunction):
     """
@@ -31,16 +217,29 @@ class ChromaEmbeddingFunction(chromadb.EmbeddingFunction):
     if we want ChromaDB to handle the embedding generation directly during add/query.
     For this manager, we are doing manual embedding before adding.
     However, this class is good for reference or future use.
+    It shares the process-wide model instead of loading a second copy.
     """
     def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self._model = None
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        if self._model is None:
+            if self.model_name == EMBEDDING_MODEL_NAME:
+                self._model = get_embedding_model()
+            else:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+        return self._model
 
     def __call__(self, input_texts: chromadb.Documents) -> chromadb.Embeddings:
         return self.model.encode(input_texts).tolist()
 
-def get_or_create_collection(collection_name: str = COLLECTION_NAME) -> chromadb.Collection:
+def get_or_create_collection(collection_name: str = COLLECTION_NAME) -> VectorStore:
     """
-    Gets or creates the ChromaDB collection.
+    Gets or creates the collection in the configured vector store (RAG_VECTOR_STORE): a ChromaDB
+    collection, or a NumpyVectorStore under CHROMA_DATA_PATH. Both expose the VectorStore methods.
     Uses the custom embedding function if ChromaDB is to generate embeddings.
     For manual embedding, embedding_function can be None or a compatible default.
     To use our specific SentenceTransformer model via Chroma's internal mechanism,
@@ -58,7 +257,7 @@ def get_or_create_collection(collection_name: str = COLLECTION_NAME) -> chromadb
         # or add documents without providing embeddings.
         # For now, we'll use a simple default or allow Chroma to handle it.
         # ef = ChromaEmbeddingFunction() # If we wanted Chroma to do the embeddings
-        # collection = client.get_or_create_collection(name=collection_name, embedding_function=ef)
+        # collection = get_chroma_client().get_or_create_collection(name=collection_name, embedding_function=ef)
 
         # When adding embeddings manually, embedding_function is not used for that operation.
         # It is used if you `collection.add(documents=["text"])` without `embeddings` param.
@@ -67,102 +266,293 @@ def get_or_create_collection(collection_name: str = COLLECTION_NAME) -> chromadb
         # Using `sentence_transformers.SentenceTransformer(EMBEDDING_MODEL_NAME).encode("test").shape[0]` for dim
         # For `all-MiniLM-L6-v2`, dimension is 384.
         # ef_metadata = {"hnsw:space": "cosine"} # Optional: configure space
-        collection = client.get_or_create_collection(
-            name=collection_name,
-            # metadata=ef_metadata # Not strictly needed unless customizing index
-        )
+        if VECTOR_STORE_BACKEND == "numpy":
+            collection = NumpyVectorStore(vector_store_path(collection_name), name=collection_name)
+        elif VECTOR_STORE_BACKEND == "chroma":
+            collection = get_chroma_client().get_or_create_collection(
+                name=collection_name,
+                # metadata=ef_metadata # Not strictly needed unless customizing index
+            )
+        else:
+            raise ValueError(f"Unknown vector store backend '{VECTOR_STORE_BACKEND}'; use chroma or numpy.")
         print(f"Collection '{collection_name}' retrieved or created successfully.")
+        with _collections_lock:
+            _collections[collection_name] = collection
         return collection
     except Exception as e:
         print(f"Error getting or creating collection '{collection_name}': {e}")
         raise
 
-def add_documents_to_collection(collection: chromadb.Collection, documents: List[Dict[str, str]], batch_size: int = 100):
+def get_collection(collection_name: str = COLLECTION_NAME) -> VectorStore:
+    """
+    Cached variant of get_or_create_collection for per-query paths: the handle is looked up
+    once per process and reused until invalidate_collection_cache() drops it.
+    """
+    collection = _collections.get(collection_name)
+    if collection is None:
+        with _collections_lock:
+            collection = _collections.get(collection_name)
+            if collection is None:
+                collection = get_or_create_collection(collection_name)
+    return collection
+
+
+def invalidate_collection_cache(collection_name: Optional[str] = None) -> None:
+    """Forgets the cached handle for one collection, or for all of them if no name is given."""
+    with _collections_lock:
+        if collection_name is None:
+            _collections.clear()
+        else:
+            _collections.pop(collection_name, None)
+
+
+def invalidate_index_cache(collection_name: str = COLLECTION_NAME) -> None:
+    """Forgets the loaded BM25 and near-duplicate indexes of a collection, e.g. after their files were replaced."""
+    with _lexical_lock:
+        _lexical_indexes.pop(collection_name, None)
+        _dedup_indexes.pop(collection_name, None)
+
+
+def delete_collection(collection_name: str = COLLECTION_NAME) -> None:
+    """Deletes a collection and drops its cached handle."""
+    with _collections_lock:
+        collection = _collections.get(collection_name)
+    invalidate_collection_cache(collection_name)
+    if VECTOR_STORE_BACKEND == "numpy":
+        if isinstance(collection, NumpyVectorStore):
+            collection.close()
+        shutil.rmtree(vector_store_path(collection_name), ignore_errors=True)
+    else:
+        get_chroma_client().delete_collection(name=collection_name)
+    invalidate_index_cache(collection_name)
+    for path in (lexical_index_path(collection_name), near_duplicate_index_path(collection_name)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def add_documents_to_collection(collection: VectorStore, documents: List[Dict[str, str]], batch_size: int = 100,
+                                deduplicate: bool = DEDUPLICATE) -> Dict[str, int]:
     """
-    Adds documents to the ChromaDB collection with their embeddings.
+    Adds documents to the ChromaDB collection with their embeddings. A document whose ID is already
+    stored replaces it, in the collection and in the BM25 index alike.
 
     Args:
-        collection (chromadb.Collection): The collection to add documents to.
+        collection (VectorStore): The collection to add documents to.
         documents (List[Dict[str, str]]): A list of documents, where each document
-                                           is a dictionary with "id" and "text" keys.
+                                           is a dictionary with "id" and "text" keys, and optionally
+                                           "metadata" (e.g. tenant, tags) to store with it.
         batch_size (int): Number of documents to process and add in a single batch.
+        deduplicate (bool): Skip documents whose text nearly repeats one already stored or earlier in
+                            `documents` (MinHash, see near_duplicates.py). Which kept document each one
+                            was folded into is recorded in the collection's near-duplicate index.
+
+    Returns:
+        Dict[str, int]: "added" documents (new or replaced) and "duplicates" skipped.
     """
     num_documents = len(documents)
+    lexical_index = get_lexical_index(collection.name)
+    dedup_index = get_near_duplicate_index(collection.name) if deduplicate else None
+    if dedup_index is not None:
+        ensure_dedup_consistent(dedup_index, collection)
+    added_at = int(time.time())
+    added = duplicates = 0
     for i in range(0, num_documents, batch_size):
         batch_documents = documents[i:i + batch_size]
+        if dedup_index is not None:
+            batch_documents = _skip_near_duplicates(collection, dedup_index, batch_documents)
+            duplicates += min(batch_size, num_documents - i) - len(batch_documents)
+            if not batch_documents:
+                continue
 
         ids = [doc["id"] for doc in batch_documents]
         texts = [doc["text"] for doc in batch_documents]
 
         print(f"Generating embeddings for batch {i//batch_size + 1} ({len(ids)} documents)...")
-        embeddings = embedding_model.encode(texts).tolist()
+        embeddings = get_embedding_engine().encode(texts).tolist()
 
         try:
-            print(f"Adding documents to collection: {ids}")
+            print(f"Adding {len(ids)} documents to collection ({ids[0]} .. {ids[-1]})")
             # We can also store the original text as metadata if preferred,
             # and use `documents` parameter for something else or not at all if text is in metadata.
-            # Here, `documents` parameter in `collection.add` stores the text itself.
-            collection.add(
+            # Here, `documents` parameter in `collection.upsert` stores the text itself.
+            # upsert, not add: add leaves existing IDs untouched while the BM25 index below would take
+            # the new text, and the two indexes would disagree
+            collection.upsert(
                 ids=ids,
                 embeddings=embeddings,
                 documents=texts, # Storing the text content directly with the vector
-                metadatas=[{"source": "local_kb"} for _ in ids] # Example metadata
+                metadatas=[{"source": "local_kb", "timestamp": added_at, **(doc.get("metadata") or {})} for doc in batch_documents]
             )
+            lexical_index.add(ids, texts)
+            added += len(ids)
             print(f"Batch {i//batch_size + 1} added successfully.")
         except Exception as e:
             print(f"Error adding batch {i//batch_size + 1} to collection: {e}")
             # Consider how to handle partial batch failures if necessary
-    print(f"All {num_documents} documents processed.")
+    lexical_index.save()
+    if dedup_index is not None:
+        dedup_index.save()
+        print(f"All {num_documents} documents processed ({duplicates} near-duplicates skipped).")
+    else:
+        print(f"All {num_documents} documents processed.")
+    return {"added": added, "duplicates": duplicates}
+
+
+def _skip_near_duplicates(collection: VectorStore, dedup_index: NearDuplicateIndex, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The documents that are not near-duplicates of a kept one; the others are recorded in `dedup_index`."""
+    kept = []
+    for doc in documents:
+        signature = dedup_index.signature(doc["text"])
+        match = dedup_index.find(signature, exclude=doc["id"])
+        if match is None:
+            dedup_index.add(doc["id"], signature)
+            kept.append(doc)
+            continue
+        if doc["id"] in dedup_index: # An earlier version was stored; the ID now repeats another document
+            orphans = dedup_index.remove([doc["id"]])
+            if orphans:
+                print(f"Near-duplicates {orphans} were folded into '{doc['id']}', which changed; add them again to keep them.")
+            collection.delete(ids=[doc["id"]])
+            get_lexical_index(collection.name).delete([doc["id"]])
+        dedup_index.record_duplicate(doc["id"], *match)
+    return kept
 
 
-def query_collection(collection: chromadb.Collection, query_text: str, n_results: int = 1) -> Dict[str, Any]:
+def query_collection(collection: VectorStore, query_text: str, n_results: int = 1,
+                     where: Optional[Union[str, Where]] = None) -> Dict[str, Any]:
     """
     Queries the collection using the given query text.
 
     Args:
-        collection (chromadb.Collection): The collection to query.
+        collection (VectorStore): The collection to query.
         query_text (str): The text to search for.
         n_results (int): The number of results to return.
+        where (Optional[Union[str, Where]]): Metadata filter, either an expression such as
+                                             "tenant = acme and tags contains faq" or a Chroma
+                                             `where` dict; see metadata_filter.py.
 
     Returns:
         Dict[str, Any]: The query results from ChromaDB.
                         Typically includes 'ids', 'documents', 'distances', 'metadatas'.
     """
-    print(f"Generating embedding for query: '{query_text}'")
-    query_embedding = embedding_model.encode(query_text).tolist()
+    query_embedding = embed_query(query_text).tolist()
 
     try:
         results = collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results,
+            where=parse_filter(where),
             include=['documents', 'distances', 'metadatas'] # Specify what to include in results
         )
-        print(f"Query executed successfully. Found {len(results.get('ids', [[]])[0])} results.")
         return results
     except Exception as e:
         print(f"Error querying collection: {e}")
         raise
 
+def query_collection_many(collection: VectorStore, query_texts: List[str], n_results: int = 1,
+                          where: Optional[Union[str, Where]] = None) -> Dict[str, Any]:
+    """
+    Queries the collection for several query texts at once: one batched embedding pass and
+    one vectorized Chroma query instead of a round-trip per query.
+
+    Args:
+        collection (VectorStore): The collection to query.
+        query_texts (List[str]): The texts to search for.
+        n_results (int): The number of results to return per query.
+        where (Optional[Union[str, Where]]): Metadata filter applied to every query; see query_collection().
+
+    Returns:
+        Dict[str, Any]: ChromaDB query results; 'ids', 'documents', 'distances' and 'metadatas'
+                        each hold one list per entry of `query_texts`, in the same order.
+    """
+    if not query_texts:
+        return {"ids": [], "documents": [], "distances": [], "metadatas": []}
+    query_embeddings = embed_queries(query_texts).tolist()
+    try:
+        return collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=parse_filter(where),
+            include=['documents', 'distances', 'metadatas']
+        )
+    except Exception as e:
+        print(f"Error querying collection with {len(query_texts)} queries: {e}")
+        raise
+
+def get_chunks(collection: VectorStore, ids: List[str], query_text: Optional[str] = None,
+               where: Optional[Union[str, Where]] = None) -> List[Dict[str, Any]]:
+    """
+    Fetches stored chunks by ID, e.g. hits that came from the lexical index rather than a vector query.
+
+    Args:
+        collection (VectorStore): The collection holding the chunks.
+        ids (List[str]): Chunk IDs; IDs not in the collection are skipped.
+        query_text (Optional[str]): If given, each chunk's distance to this query is computed in the
+                                    collection's distance space, so it is comparable with query results.
+        where (Optional[Union[str, Where]]): Metadata filter; chunks that do not match are skipped.
+
+    Returns:
+        List[Dict[str, Any]]: Hits with "id", "text", "distance" (None without a query) and "metadata", in `ids` order.
+    """
+    if not ids:
+        return []
+    include = ['documents', 'metadatas', 'embeddings'] if query_text is not None else ['documents', 'metadatas']
+    results = collection.get(ids=ids, where=parse_filter(where), include=include)
+    distances: List[Optional[float]] = [None] * len(results['ids'])
+    if query_text is not None and len(results['ids']):
+        vectors = np.asarray(results['embeddings'], dtype=np.float32)
+        query = embed_query(query_text)
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "cosine":
+            norms = np.maximum(np.linalg.norm(vectors, axis=1) * np.linalg.norm(query), 1e-12)
+            distances = (1.0 - vectors @ query / norms).tolist()
+        elif space == "ip":
+            distances = (1.0 - vectors @ query).tolist()
+        else: # Chroma's default: squared L2
+            distances = ((vectors - query) ** 2).sum(axis=1).tolist()
+    by_id = {
+        chunk_id: {"id": chunk_id, "text": results['documents'][i], "distance": distances[i], "metadata": results['metadatas'][i]}
+        for i, chunk_id in enumerate(results['ids'])
+    }
+    return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+def get_chunk_embeddings(collection: VectorStore, ids: List[str]) -> np.ndarray:
+    """Stored embeddings of the given chunks as a (len(ids), dim) float32 matrix, in `ids` order."""
+    if not ids:
+        return np.empty((0, 0), dtype=np.float32)
+    results = collection.get(ids=ids, include=['embeddings'])
+    rows = {chunk_id: i for i, chunk_id in enumerate(results['ids'])}
+    missing = [chunk_id for chunk_id in ids if chunk_id not in rows]
+    if missing:
+        raise KeyError(f"Chunks not found in collection '{collection.name}': {missing}")
+    embeddings = np.asarray(results['embeddings'], dtype=np.float32)
+    return embeddings[[rows[chunk_id] for chunk_id in ids]]
+
 # Sample documents from the old knowledge_base.py (can be expanded)
 SAMPLE_DOCUMENTS_FOR_DB = [
     {
         "id": "doc1",
+        "metadata": {"source": "local_kb", "tags": ["programming", "python"]},
         "text": "Python is a versatile, high-level programming language known for its readability and extensive libraries. It was created by Guido van Rossum and first released in 1991."
     },
     {
         "id": "doc2",
+        "metadata": {"source": "local_kb", "tags": ["programming", "java"]},
         "text": "Java is a class-based, object-oriented programming language designed to have as few implementation dependencies as possible. It is widely used for developing enterprise-level applications."
     },
     {
         "id": "doc3",
+        "metadata": {"source": "local_kb", "tags": ["ai"]},
         "text": "Artificial intelligence (AI) is intelligence demonstrated by machines, as opposed to the natural intelligence displayed by humans and animals. Key areas include machine learning, natural language processing, and computer vision."
     },
     {
         "id": "doc4",
+        "metadata": {"source": "local_kb", "tags": ["ai", "agents"]},
         "text": "ReAct is a paradigm that combines reasoning and acting in autonomous agents. Agents explicitly generate reasoning traces to make decisions about how to act to complete a task."
     },
     {
         "id": "doc5",
+        "metadata": {"source": "local_kb", "tags": ["ai", "rag"]},
         "text": "Retrieval Augmented Generation (RAG) is a technique where a language model's responses are augmented by retrieving relevant information from an external knowledge base before generating an answer. This helps to make responses more factual and up-to-date."
     }
 ]
@@ -176,18 +566,18 @@ def initialize_and_populate_db():
 
     collection = get_or_create_collection()
 
-    # Check if collection is empty or needs repopulation
-    # For simplicity, we'll add documents if they don't exist by ID.
-    # A more robust check might involve checking all IDs or a version number.
-    existing_ids_in_collection = set(collection.get(ids=[doc['id'] for doc in SAMPLE_DOCUMENTS_FOR_DB])['ids'])
-    documents_to_add = [doc for doc in SAMPLE_DOCUMENTS_FOR_DB if doc['id'] not in existing_ids_in_collection]
-
-    if documents_to_add:
-        print(f"Found {len(documents_to_add)} new documents to add to the collection.")
-        add_documents_to_collection(collection, documents_to_add)
-    else:
-        print("All sample documents already exist in the collection. No new documents added.")
-
+    # Sync against a content-hash manifest: new or edited sample documents are (re-)embedded,
+    # unchanged ones are skipped and documents removed from the list are deleted.
+    from react_rag_agent.index_manifest import IndexManifest, sync_documents
+    from react_rag_agent.lexical_index import ensure_consistent
+    manifest = IndexManifest(
+        collection_data_path(COLLECTION_NAME, ".samples.manifest.json"),
+        settings={"embedding_model": EMBEDDING_SPACE_ID},
+    )
+    lexical_index = get_lexical_index(COLLECTION_NAME)
+    ensure_consistent(lexical_index, collection)
+    sync_stats = sync_documents(collection, SAMPLE_DOCUMENTS_FOR_DB, manifest, encode=get_embedding_engine().encode, lexical_index=lexical_index)
+    print(f"Sample documents synced: {sync_stats['upserted']} embedded, {sync_stats['unchanged']} unchanged, {sync_stats['deleted']} deleted.")
     print(f"\nTotal documents in collection '{COLLECTION_NAME}': {collection.count()}")
 
     # Perform a sample query
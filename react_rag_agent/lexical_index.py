@@ -0,0 +1,430 @@
+# lexical_index.py
+# In-process BM25 inverted index kept alongside the Chroma collection, for exact-term retrieval.
+#   python -m react_rag_agent.lexical_index --rebuild      # (re)build from the collection
+#   python -m react_rag_agent.lexical_index "error E1234"  # query it
+import argparse
+import os
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+DEFAULT_SEGMENT_POSTINGS = 2_000_000 # Postings buffered in Python arrays before they are frozen into a NumPy segment
+MAX_TERM_FREQUENCY = 255 # tf is stored in one byte; BM25 saturates long before this
+
+# Words, plus codes joined by - . / such as "E-1234", "v2.1" or "setup.md"; the parts are indexed as well
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+_SPLIT_RE = re.compile(r"[-./]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms of `text`. "E-1234" yields "e-1234", "e" and "1234", so both spellings match."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(part for part in _SPLIT_RE.split(token) if part)
+    return tokens
+
+
+def _id_terms(chunk_id: str) -> List[str]:
+    # The document part of "<document id>#<chunk index>" is indexed too, so a query naming a document finds it
+    return tokenize(chunk_id.split("#", 1)[0])
+
+
+class _Segment:
+    """
+    Immutable postings for a range of documents in CSR layout: `terms` (sorted term IDs) and
+    `offsets` locate each term's slice of `docs` (uint32 document numbers) and `tfs` (uint8).
+    That is 5 bytes per posting, versus well over 100 for a dict of Python ints.
+    """
+
+    __slots__ = ("terms", "offsets", "docs", "tfs")
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+
+    @classmethod
+    def build(cls, terms: np.ndarray, docs: np.ndarray, tfs: np.ndarray) -> "_Segment":
+        order = np.argsort(terms, kind="stable") # Stable: each term's postings stay in document order
+        terms, docs, tfs = terms[order], docs[order], tfs[order]
+        unique_terms, starts = np.unique(terms, return_index=True)
+        offsets = np.append(starts, len(terms)).astype(np.int64)
+        return cls(unique_terms.astype(np.uint32), offsets, docs.astype(np.uint32), tfs.astype(np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        i = self.terms.searchsorted(np.uint32(term_id)) # Same dtype, or NumPy converts the whole array first
+        if i == len(self.terms) or self.terms[i] != term_id:
+            return self.docs[:0], self.tfs[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+    def expanded_terms(self) -> np.ndarray:
+        return np.repeat(self.terms, np.diff(self.offsets))
+
+    def nbytes(self) -> int:
+        return self.terms.nbytes + self.offsets.nbytes + self.docs.nbytes + self.tfs.nbytes
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk texts, updated incrementally as chunks are upserted and deleted.
+
+    New postings are appended to compact per-term arrays; once `segment_postings` of them have
+    accumulated they are frozen into an immutable NumPy segment, and segments are merged
+    log-structured (a new segment absorbs smaller predecessors), so indexing cost stays
+    O(postings x log segments). A delete only zeroes the document's length; its postings are
+    skipped at query time and dropped at the next merge. Scoring is vectorized over each query
+    term's posting slices, so a query touches only the postings of its own terms.
+
+    Thread-safe. Persisted as a single .npz file written atomically.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = DEFAULT_K1, b: float = DEFAULT_B, segment_postings: int = DEFAULT_SEGMENT_POSTINGS):
+        """
+        Args:
+            path: File the index is saved to and loaded from. None keeps it in memory only.
+            k1: Term-frequency saturation.
+            b: Document-length normalization (0 = none, 1 = full).
+            segment_postings: Buffered postings that trigger freezing a new segment.
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.segment_postings = segment_postings
+        self._lock = threading.RLock()
+        self._terms: Dict[str, int] = {}
+        self._doc_ids: List[str] = [] # Document number -> chunk ID ("" once deleted)
+        self._doc_numbers: Dict[str, int] = {}
+        self._lengths = np.zeros(1024, dtype=np.uint32) # Document number -> length in terms, 0 once deleted
+        self._total_length = 0
+        self._segments: List[_Segment] = []
+        self._buffer: Dict[int, Tuple[array, array]] = {}
+        self._buffered = 0
+        self._df_cache: Dict[int, int] = {} # Live document frequency per term; reset by any update
+        self.loaded_mtime: Optional[float] = None
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._doc_numbers
+
+    # --- Updates ---
+
+    def add(self, ids: List[str], texts: List[str]) -> None:
+        """Indexes chunks; an ID that is already indexed is replaced (upsert semantics)."""
+        with self._lock:
+            self._df_cache.clear()
+            for chunk_id, text in zip(ids, texts):
+                if chunk_id in self._doc_numbers:
+                    self._delete_one(chunk_id)
+                counts = Counter(tokenize(text))
+                counts.update(_id_terms(chunk_id))
+                number = len(self._doc_ids)
+                self._doc_ids.append(chunk_id)
+                self._doc_numbers[chunk_id] = number
+                if number >= len(self._lengths):
+                    self._lengths = np.concatenate([self._lengths, np.zeros(len(self._lengths), dtype=np.uint32)])
+                length = sum(counts.values())
+                self._lengths[number] = max(length, 1) # 0 is reserved for deleted documents
+                self._total_length += max(length, 1)
+                for term, tf in counts.items():
+                    term_id = self._terms.setdefault(term, len(self._terms))
+                    postings = self._buffer.get(term_id)
+                    if postings is None:
+                        postings = self._buffer[term_id] = (array("I"), array("B"))
+                    postings[0].append(number)
+                    postings[1].append(min(tf, MAX_TERM_FREQUENCY))
+                self._buffered += len(counts)
+            if self._buffered >= self.segment_postings:
+                self._freeze_buffer()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        """Removes chunks from the index. Returns how many were indexed."""
+        with self._lock:
+            self._df_cache.clear()
+            return sum(self._delete_one(chunk_id) for chunk_id in ids)
+
+    def _delete_one(self, chunk_id: str) -> bool:
+        number = self._doc_numbers.pop(chunk_id, None)
+        if number is None:
+            return False
+        self._total_length -= int(self._lengths[number])
+        self._lengths[number] = 0
+        self._doc_ids[number] = ""
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._terms.clear()
+            self._doc_ids.clear()
+            self._doc_numbers.clear()
+            self._lengths = np.zeros(1024, dtype=np.uint32)
+            self._total_length = 0
+            self._segments.clear()
+            self._buffer.clear()
+            self._buffered = 0
+            self._df_cache.clear()
+
+    def _freeze_buffer(self) -> None:
+        if not self._buffer:
+            return
+        term_ids = np.fromiter(self._buffer.keys(), dtype=np.uint32, count=len(self._buffer))
+        sizes = np.fromiter((len(docs) for docs, _ in self._buffer.values()), dtype=np.int64, count=len(self._buffer))
+        docs = np.concatenate([np.frombuffer(docs, dtype=np.uint32) for docs, _ in self._buffer.values()])
+        tfs = np.concatenate([np.frombuffer(tfs, dtype=np.uint8) for _, tfs in self._buffer.values()])
+        segment = _Segment.build(np.repeat(term_ids, sizes), docs, tfs)
+        self._buffer = {}
+        self._buffered = 0
+        self._segments.append(segment)
+        # Log-structured merging: fold in predecessors that are not much larger than the newest segment
+        while len(self._segments) > 1 and len(self._segments[-2]) <= 2 * len(self._segments[-1]):
+            newer = self._segments.pop()
+            older = self._segments.pop()
+            self._segments.append(self._merge([older, newer]))
+
+    def _merge(self, segments: List[_Segment]) -> _Segment:
+        terms = np.concatenate([segment.expanded_terms() for segment in segments])
+        docs = np.concatenate([segment.docs for segment in segments])
+        tfs = np.concatenate([segment.tfs for segment in segments])
+        live = self._lengths[docs] > 0 # Drop postings of deleted documents
+        return _Segment.build(terms[live], docs[live], tfs[live])
+
+    def optimize(self) -> None:
+        """Freezes buffered postings and merges everything into one segment without deleted documents."""
+        with self._lock:
+            self._freeze_buffer()
+            if self._segments:
+                self._segments = [self._merge(self._segments)]
+
+    # --- Queries ---
+
+    def search(self, query: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """
+        Ranks indexed chunks against `query` with BM25.
+
+        Terms are scored rarest first with MaxScore pruning: once the best possible total of the
+        remaining (common) terms cannot lift an unseen chunk into the top `n_results`, those terms
+        only update chunks that are already candidates, located by binary search in their
+        doc-ordered posting lists instead of scoring every posting. Results are exact.
+
+        Returns:
+            List[Tuple[str, float]]: Up to `n_results` (chunk ID, score) pairs, best first. Only
+                                     chunks sharing at least one term with the query are returned.
+        """
+        with self._lock:
+            live_documents = len(self._doc_numbers)
+            if not live_documents or n_results <= 0:
+                return []
+            average_length = self._total_length / live_documents
+            terms = []
+            for term in set(tokenize(query)):
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    continue
+                docs, tfs = self._postings(term_id)
+                document_frequency = self._document_frequency(term_id, docs)
+                if document_frequency:
+                    idf = float(np.log1p((live_documents - document_frequency + 0.5) / (document_frequency + 0.5)))
+                    terms.append((idf, docs, tfs))
+            if not terms:
+                return []
+            terms.sort(key=lambda term: term[0], reverse=True)
+            # remaining_bound[j]: the most terms j.. can add to any chunk's score (tf -> infinity)
+            remaining_bound = np.cumsum([idf * (self.k1 + 1.0) for idf, _, _ in terms][::-1])[::-1]
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+            touched: List[np.ndarray] = []
+            candidates: Optional[np.ndarray] = None
+            for j, (idf, docs, tfs) in enumerate(terms):
+                if candidates is None and j > 0:
+                    matched = self._matched(scores, touched)
+                    if len(matched) >= n_results and np.partition(scores[matched], len(matched) - n_results)[len(matched) - n_results] > remaining_bound[j]:
+                        candidates = matched
+                if candidates is not None:
+                    positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                    present = docs[positions] == candidates
+                    docs, tfs = candidates[present], tfs[positions[present]]
+                lengths = self._lengths[docs]
+                live = lengths > 0
+                tf = tfs[live].astype(np.float32)
+                norm = self.k1 * (1.0 - self.b + self.b * lengths[live].astype(np.float32) / average_length)
+                scores[docs[live]] += idf * tf * (self.k1 + 1.0) / (tf + norm) # Document numbers are unique within a term
+                if candidates is None:
+                    touched.append(docs[live])
+            matched = self._matched(scores, touched) if candidates is None else candidates
+            if len(matched) > n_results:
+                matched = matched[np.argpartition(-scores[matched], n_results - 1)[:n_results]]
+            matched = matched[np.lexsort((matched, -scores[matched]))] # Ties: earlier-indexed chunk first
+            return [(self._doc_ids[number], float(scores[number])) for number in matched]
+
+    @staticmethod
+    def _matched(scores: np.ndarray, touched: List[np.ndarray]) -> np.ndarray:
+        # Sorted uint32 numbers of scored chunks; deduplicating the postings beats scanning all scores when they are few
+        if sum(len(docs) for docs in touched) < len(scores) // 16:
+            return np.unique(np.concatenate(touched)) if touched else np.empty(0, dtype=np.uint32)
+        return np.flatnonzero(scores).astype(np.uint32)
+
+    def _document_frequency(self, term_id: int, docs: np.ndarray) -> int:
+        if len(self._doc_numbers) == len(self._doc_ids): # Nothing deleted: every posting is live
+            return len(docs)
+        document_frequency = self._df_cache.get(term_id)
+        if document_frequency is None:
+            document_frequency = self._df_cache[term_id] = int(np.count_nonzero(self._lengths[docs]))
+        return document_frequency
+
+    def _postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Segments hold consecutive document ranges, oldest first, and the buffer the newest, so the
+        # concatenation is sorted by document number (search relies on this for binary search)
+        parts = [segment.postings(term_id) for segment in self._segments]
+        buffered = self._buffer.get(term_id)
+        if buffered is not None:
+            parts.append((np.array(buffered[0], dtype=np.uint32), np.array(buffered[1], dtype=np.uint8)))
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint8)
+        return np.concatenate([docs for docs, _ in parts]), np.concatenate([tfs for _, tfs in parts])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            postings = sum(len(segment) for segment in self._segments) + self._buffered
+            return {
+                "documents": len(self._doc_numbers),
+                "terms": len(self._terms),
+                "postings": postings,
+                "segments": len(self._segments),
+                "buffered_postings": self._buffered,
+                "postings_bytes": sum(segment.nbytes() for segment in self._segments) + 5 * self._buffered,
+            }
+
+    # --- Persistence ---
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Writes the index to `path` (default: the path it was opened with) atomically."""
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            self._freeze_buffer()
+            arrays = {
+                "params": np.array([self.k1, self.b], dtype=np.float64),
+                "lengths": self._lengths[:len(self._doc_ids)],
+                "doc_ids": _pack_strings(self._doc_ids),
+                "terms": _pack_strings(sorted(self._terms, key=self._terms.__getitem__)),
+            }
+            for i, segment in enumerate(self._segments):
+                arrays.update({f"segment{i}_terms": segment.terms, f"segment{i}_offsets": segment.offsets,
+                               f"segment{i}_docs": segment.docs, f"segment{i}_tfs": segment.tfs})
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+            self.loaded_mtime = os.path.getmtime(path)
+
+    def _load(self, path: str) -> None:
+        with np.load(path) as data:
+            self.k1, self.b = (float(x) for x in data["params"])
+            lengths = data["lengths"]
+            self._doc_ids = _unpack_strings(data["doc_ids"], len(lengths))
+            self._terms = {term: i for i, term in enumerate(_unpack_strings(data["terms"]))}
+            self._lengths = np.zeros(max(1024, 2 * len(lengths)), dtype=np.uint32)
+            self._lengths[:len(lengths)] = lengths
+            self._total_length = int(lengths.sum(dtype=np.int64))
+            self._doc_numbers = {chunk_id: i for i, chunk_id in enumerate(self._doc_ids) if chunk_id}
+            i = 0
+            while f"segment{i}_terms" in data:
+                self._segments.append(_Segment(data[f"segment{i}_terms"], data[f"segment{i}_offsets"],
+                                               data[f"segment{i}_docs"], data[f"segment{i}_tfs"]))
+                i += 1
+        self.loaded_mtime = os.path.getmtime(path)
+
+    def is_stale(self) -> bool:
+        """True if the file on disk was written by someone else (e.g. an ingestion run) since it was loaded."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        return os.path.getmtime(self.path) != self.loaded_mtime
+
+
+def _pack_strings(strings: List[str]) -> np.ndarray:
+    # NUL-separated UTF-8 in a byte array: compact and loadable without pickle
+    return np.frombuffer("\0".join(strings).encode("utf-8"), dtype=np.uint8) if strings else np.empty(0, dtype=np.uint8)
+
+
+def _unpack_strings(packed: np.ndarray, count: Optional[int] = None) -> List[str]:
+    if count == 0 or (count is None and not len(packed)):
+        return []
+    return packed.tobytes().decode("utf-8").split("\0")
+
+
+def rebuild_from_collection(index: BM25Index, collection: Any, batch_size: int = 5000) -> int:
+    """Re-indexes every chunk stored in `collection`, replacing the index contents. Returns chunks indexed."""
+    index.clear()
+    offset = 0
+    while True:
+        page = collection.get(include=["documents"], limit=batch_size, offset=offset)
+        if not page["ids"]:
+            break
+        index.add(page["ids"], [text or "" for text in page["documents"]])
+        offset += len(page["ids"])
+    index.optimize()
+    return offset
+
+
+def ensure_consistent(index: BM25Index, collection: Any) -> bool:
+    """
+    Rebuilds the index if it does not cover the same number of chunks as `collection`, e.g. after
+    an interrupted ingestion run or when the collection was written without it. Returns True if rebuilt.
+    """
+    expected = collection.count()
+    if len(index) == expected:
+        return False
+    print(f"Lexical index has {len(index)} chunks but collection '{collection.name}' has {expected}; rebuilding it...")
+    started = time.perf_counter()
+    rebuild_from_collection(index, collection)
+    index.save()
+    print(f"Lexical index rebuilt: {len(index)} chunks in {time.perf_counter() - started:.1f}s.")
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from react_rag_agent.knowledge_base_manager import COLLECTION_NAME, get_lexical_index, get_or_create_collection
+
+    parser = argparse.ArgumentParser(description="Build or query the BM25 index kept next to the Chroma collection.")
+    parser.add_argument("query", nargs="?", help="Query to run against the index.")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every chunk in the collection.")
+    parser.add_argument("-n", "--n-results", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    index = get_lexical_index(args.collection)
+    if args.rebuild:
+        started = time.perf_counter()
+        count = rebuild_from_collection(index, get_or_create_collection(args.collection))
+        index.save()
+        print(f"Indexed {count} chunks in {time.perf_counter() - started:.1f}s: {index.stats()}")
+    if args.query:
+        started = time.perf_counter()
+        results = index.search(args.query, args.n_results)
+        print(f"{len(results)} results in {(time.perf_counter() - started) * 1000:.2f} ms")
+        for chunk_id, score in results:
+            print(f"  {score:8.3f}  {chunk_id}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,328 @@
+# metadata_filter.py
+# Metadata filters for retrieval: a small expression language compiled to Chroma `where` clauses,
+# and the bitmap index NumpyVectorStore evaluates them with.
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+COMPARISON_OPERATORS = ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$contains", "$not_contains")
+_NEGATED = {"$ne": "$eq", "$nin": "$in", "$not_contains": "$contains"} # Chroma semantics: also true where the key is missing
+_RANGE = ("$gt", "$gte", "$lt", "$lte")
+
+_TOKEN_RE = re.compile(r"""\s*(?:(?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|(?P<op>==|!=|<=|>=|=|<|>)|(?P<punct>[()\[\],])|(?P<word>[^\s()\[\],=!<>"']+))""")
+_EXPRESSION_OPERATORS = {"=": "$eq", "==": "$eq", "!=": "$ne", "<": "$lt", "<=": "$lte", ">": "$gt", ">=": "$gte"}
+
+Where = Dict[str, Any]
+
+
+class FilterSyntaxError(ValueError):
+    """Raised for filter expressions or `where` clauses that cannot be parsed."""
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens, position = [], 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if match is None or match.end() == position:
+            raise FilterSyntaxError(f"Unexpected character at {position} in filter {expression!r}.")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    # expression := conjunction ("or" conjunction)*
+    # conjunction := term ("and" term)*
+    # term := "(" expression ")" | KEY op VALUE | KEY ["not"] "in" "[" VALUE ("," VALUE)* "]" | KEY ["not"] "contains" VALUE
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+
+    def _peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token is None:
+            raise FilterSyntaxError(f"Unexpected end of filter {self.expression!r}.")
+        self.position += 1
+        return token
+
+    def _keyword(self, word: str) -> bool:
+        token = self._peek()
+        if token is not None and token[0] == "word" and token[1].lower() == word:
+            self.position += 1
+            return True
+        return False
+
+    def _expect(self, kind: str, text: str) -> None:
+        token = self._next()
+        if token != (kind, text):
+            raise FilterSyntaxError(f"Expected {text!r} but found {token[1]!r} in filter {self.expression!r}.")
+
+    def parse(self) -> Where:
+        where = self._expression()
+        if self._peek() is not None:
+            raise FilterSyntaxError(f"Unexpected {self._peek()[1]!r} in filter {self.expression!r}.")
+        return where
+
+    def _expression(self) -> Where:
+        terms = [self._conjunction()]
+        while self._keyword("or"):
+            terms.append(self._conjunction())
+        return terms[0] if len(terms) == 1 else {"$or": terms}
+
+    def _conjunction(self) -> Where:
+        terms = [self._term()]
+        while self._keyword("and"):
+            terms.append(self._term())
+        return terms[0] if len(terms) == 1 else {"$and": terms}
+
+    def _term(self) -> Where:
+        if self._peek() == ("punct", "("):
+            self._next()
+            where = self._expression()
+            self._expect("punct", ")")
+            return where
+        kind, key = self._next()
+        if kind not in ("word", "string"):
+            raise FilterSyntaxError(f"Expected a metadata key but found {key!r} in filter {self.expression!r}.")
+        key = _literal(kind, key) if kind == "string" else key
+        negated = self._keyword("not")
+        if self._keyword("in"):
+            self._expect("punct", "[")
+            values = [self._value()]
+            while self._peek() == ("punct", ","):
+                self._next()
+                values.append(self._value())
+            self._expect("punct", "]")
+            return {key: {"$nin" if negated else "$in": values}}
+        if self._keyword("contains"):
+            return {key: {"$not_contains" if negated else "$contains": self._value()}}
+        if negated:
+            raise FilterSyntaxError(f"'not' must be followed by 'in' or 'contains' in filter {self.expression!r}.")
+        kind, op = self._next()
+        if kind != "op":
+            raise FilterSyntaxError(f"Expected a comparison after {key!r} but found {op!r} in filter {self.expression!r}.")
+        return {key: {_EXPRESSION_OPERATORS[op]: self._value()}}
+
+    def _value(self) -> Any:
+        kind, text = self._next()
+        if kind not in ("word", "string"):
+            raise FilterSyntaxError(f"Expected a value but found {text!r} in filter {self.expression!r}.")
+        return _literal(kind, text)
+
+
+def _literal(kind: str, text: str) -> Any:
+    if kind == "string":
+        return re.sub(r"\\(.)", r"\1", text[1:-1])
+    lowered = text.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    for number in (int, float):
+        try:
+            return number(text)
+        except ValueError:
+            pass
+    return text # Bare words are strings: tenant = acme
+
+
+def parse_filter(expression: Union[str, Where, None]) -> Optional[Where]:
+    """
+    Normalizes a metadata filter to a Chroma `where` clause, or None for "no filter".
+
+    Accepts either a `where` dict ({"tenant": "acme"}, {"timestamp": {"$gte": 1700000000}},
+    {"$and": [...]}, ...) or an expression such as
+
+        tenant = acme and tags contains billing and timestamp >= 1700000000
+        source in ["wiki", "tickets"] or (tenant != "acme" and tags not contains draft)
+
+    Values are numbers, true/false, quoted strings, or bare words (taken as strings).
+
+    Raises:
+        FilterSyntaxError: If the expression or clause is malformed.
+    """
+    if expression is None:
+        return None
+    if isinstance(expression, str):
+        if not expression.strip():
+            return None
+        return _normalize(_Parser(expression).parse())
+    if not isinstance(expression, dict):
+        raise FilterSyntaxError(f"A filter must be a string or a where dict, not {type(expression).__name__}.")
+    return _normalize(expression) if expression else None
+
+
+def _normalize(where: Where) -> Where:
+    # Validates a where dict and rewrites shorthand ({"k": v}, several keys) to explicit form
+    clauses = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            if not isinstance(condition, list) or not condition:
+                raise FilterSyntaxError(f"{key} takes a non-empty list of clauses.")
+            normalized = [_normalize(clause) for clause in condition]
+            clauses.append(normalized[0] if len(normalized) == 1 else {key: normalized})
+        elif key.startswith("$"):
+            raise FilterSyntaxError(f"Unknown logical operator {key!r}.")
+        elif isinstance(condition, dict):
+            for op, value in condition.items():
+                if op not in COMPARISON_OPERATORS:
+                    raise FilterSyntaxError(f"Unknown operator {op!r} for key {key!r}.")
+                if op in ("$in", "$nin") and not isinstance(value, list):
+                    raise FilterSyntaxError(f"{op} takes a list of values.")
+                if op in _RANGE and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                    raise FilterSyntaxError(f"{op} takes a number.")
+                clauses.append({key: {op: value}})
+        else:
+            clauses.append({key: {"$eq": condition}})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _value_key(value: Any) -> Tuple[str, Any]:
+    # Metadata values compare like Chroma's: 5 == 5.0, but True is not 1
+    if isinstance(value, bool):
+        return ("b", value)
+    if isinstance(value, (int, float)):
+        return ("n", float(value))
+    return ("s", str(value))
+
+
+def matches(where: Optional[Where], metadata: Optional[Dict[str, Any]]) -> bool:
+    """Evaluates a normalized `where` clause against one metadata dict (None matches only missing-key conditions)."""
+    if where is None:
+        return True
+    metadata = metadata or {}
+    (key, condition), = where.items()
+    if key == "$and":
+        return all(matches(clause, metadata) for clause in condition)
+    if key == "$or":
+        return any(matches(clause, metadata) for clause in condition)
+    (op, operand), = condition.items()
+    if op in _NEGATED:
+        return not matches({key: {_NEGATED[op]: operand}}, metadata)
+    if key not in metadata:
+        return False
+    value = metadata[key]
+    if op == "$contains": # Only list elements; = and in only scalars, as in Chroma
+        return isinstance(value, list) and _value_key(operand) in {_value_key(item) for item in value}
+    if isinstance(value, list):
+        return False
+    if op == "$eq":
+        return _value_key(operand) == _value_key(value)
+    if op == "$in":
+        return _value_key(value) in {_value_key(item) for item in operand}
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return {"$gt": value > operand, "$gte": value >= operand, "$lt": value < operand, "$lte": value <= operand}[op]
+
+
+class MetadataIndex:
+    """
+    Bitmap index over the metadata of a row-numbered store: for every (key, value) pair the rows
+    holding it, kept apart from the rows whose list value (such as tags) holds it as an element,
+    since `=` / `in` only match scalars and `contains` only lists; for numeric keys, rows sorted by value.
+
+    A filter is evaluated by set operations on those row sets into a boolean row mask, so its cost
+    grows with the number of matching rows rather than with how many metadata dicts the store
+    holds, and the store can then score only the surviving rows. Row sets are kept as sorted int64
+    arrays (a sparse bitmap), so high-cardinality keys such as document IDs stay small. Rows are
+    appended in batches and never removed; callers combine the mask with their own liveness mask.
+    """
+
+    def __init__(self):
+        self.rows = 0 # Rows [0, rows) are indexed
+        self._postings: Dict[Tuple[str, bool, Tuple[str, Any]], List[np.ndarray]] = {} # (key, list element?, value) -> rows
+        self._numeric: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {} # key -> batches of (values, rows)
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {} # key -> (values, rows) sorted by value, built on use
+
+    def add(self, start: int, metadatas: Iterable[Optional[Dict[str, Any]]]) -> None:
+        """Indexes the metadata of rows start, start + 1, ...; `start` must equal `rows`."""
+        if start != self.rows:
+            raise ValueError(f"Metadata index covers {self.rows} rows; cannot add rows from {start}.")
+        postings: Dict[Tuple[str, bool, Tuple[str, Any]], List[int]] = {}
+        numeric: Dict[str, Tuple[List[float], List[int]]] = {}
+        row = start
+        for metadata in metadatas:
+            for key, value in (metadata or {}).items():
+                if isinstance(value, list):
+                    for item in set(map(_value_key, value)):
+                        postings.setdefault((key, True, item), []).append(row)
+                else:
+                    postings.setdefault((key, False, _value_key(value)), []).append(row)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values, rows = numeric.setdefault(key, ([], []))
+                    values.append(float(value))
+                    rows.append(row)
+            row += 1
+        self.rows = row
+        for pair, rows in postings.items():
+            self._postings.setdefault(pair, []).append(np.asarray(rows, dtype=np.int64))
+        for key, (values, rows) in numeric.items():
+            self._numeric.setdefault(key, []).append((np.asarray(values, dtype=np.float64), np.asarray(rows, dtype=np.int64)))
+            self._sorted.pop(key, None)
+
+    def _rows(self, key: str, value: Any, element: bool = False) -> np.ndarray:
+        chunks = self._postings.get((key, element, _value_key(value)))
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        if len(chunks) > 1: # Merge batches once; rows were appended in increasing order
+            chunks[:] = [np.concatenate(chunks)]
+        return chunks[0]
+
+    def _range_rows(self, key: str, op: str, operand: float) -> np.ndarray:
+        if key not in self._numeric:
+            return np.empty(0, dtype=np.int64)
+        if key not in self._sorted:
+            chunks = self._numeric[key]
+            if len(chunks) > 1:
+                chunks[:] = [(np.concatenate([values for values, _ in chunks]), np.concatenate([rows for _, rows in chunks]))]
+            values, rows = chunks[0]
+            order = np.argsort(values, kind="stable")
+            self._sorted[key] = (values[order], rows[order])
+        values, rows = self._sorted[key]
+        if op in ("$gt", "$gte"):
+            return rows[np.searchsorted(values, operand, side="right" if op == "$gt" else "left"):]
+        return rows[:np.searchsorted(values, operand, side="left" if op == "$lt" else "right")]
+
+    def mask(self, where: Where, size: int) -> np.ndarray:
+        """Boolean mask over rows [0, size) of those matching a normalized `where` clause."""
+        (key, condition), = where.items()
+        if key == "$and":
+            result = self.mask(condition[0], size)
+            for clause in condition[1:]:
+                result &= self.mask(clause, size)
+            return result
+        if key == "$or":
+            result = self.mask(condition[0], size)
+            for clause in condition[1:]:
+                result |= self.mask(clause, size)
+            return result
+        (op, operand), = condition.items()
+        if op in _NEGATED:
+            return ~self.mask({key: {_NEGATED[op]: operand}}, size)
+        result = np.zeros(size, dtype=bool)
+        if op in ("$eq", "$contains"):
+            rows = self._rows(key, operand, element=op == "$contains")
+            result[rows[rows < size]] = True
+        elif op == "$in":
+            for value in operand:
+                rows = self._rows(key, value)
+                result[rows[rows < size]] = True
+        else:
+            rows = self._range_rows(key, op, float(operand))
+            result[rows[rows < size]] = True
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "values": len(self._postings),
+            "numeric_keys": len(self._numeric),
+            "bytes": sum(chunk.nbytes for chunks in self._postings.values() for chunk in chunks) +
+                     sum(values.nbytes + rows.nbytes for chunks in self._numeric.values() for values, rows in chunks) +
+                     sum(values.nbytes + rows.nbytes for values, rows in self._sorted.values()),
+        }
@@ -0,0 +1,320 @@
+# near_duplicates.py
+# MinHash signatures with LSH banding, so chunks that nearly repeat one already in the collection (boilerplate,
+# mirrored or re-exported pages) are found in time independent of the collection size and not embedded again.
+#   python -m react_rag_agent.near_duplicates --rebuild   # (re)build signatures from the collection
+#   python -m react_rag_agent.near_duplicates --report    # kept chunks and the near-duplicates folded into them
+import argparse
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from react_rag_agent.lexical_index import _pack_strings, _unpack_strings
+
+DEFAULT_THRESHOLD = float(os.environ.get("RAG_DEDUP_THRESHOLD", 0.85)) # Estimated Jaccard similarity of word shingles
+DEFAULT_NUM_PERM = 128 # Signature length; the estimate's standard error is about 0.04 at 128
+DEFAULT_SHINGLE_WORDS = 5
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingle_hashes(text: str, size: int = DEFAULT_SHINGLE_WORDS) -> np.ndarray:
+    """CRC32s of the distinct `size`-word shingles of `text` (lower-cased words); a shorter text is one shingle."""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    (bands, rows per band) for `num_perm` hash values, chosen so that the probability of two chunks
+    sharing a bucket, 1 - (1 - s^rows)^bands, rises steeply around `threshold`: minimizes the
+    area of false candidates below it plus missed pairs above it.
+    """
+    similarities = np.linspace(0.0, 1.0, 201)
+    step = similarities[1]
+    below = similarities < threshold
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        collide = 1.0 - (1.0 - similarities ** rows) ** bands
+        error = (collide[below].sum() + (1.0 - collide[~below]).sum()) * step
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """MinHash over word shingles with `num_perm` multiply-add-shift hash functions ((a*x + b) mod 2^64 >> 32)."""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, shingle_words: int = DEFAULT_SHINGLE_WORDS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_words = shingle_words
+        # Strongly universal for 32-bit keys (CRC32s); uint64 array arithmetic wraps, which is the mod 2^64
+        self._a = rng.integers(0, np.iinfo(np.uint64).max, size=(num_perm, 1), dtype=np.uint64, endpoint=True)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, size=(num_perm, 1), dtype=np.uint64, endpoint=True)
+
+    def signature(self, text: str) -> np.ndarray:
+        """(num_perm,) uint32 signature; the fraction of equal positions estimates Jaccard similarity."""
+        hashes = shingle_hashes(text, self.shingle_words)
+        if not len(hashes):
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        return ((self._a * hashes[None, :] + self._b) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.num_perm), dtype=np.uint32)
+        return np.stack([self.signature(text) for text in texts])
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of the chunks kept in a collection, bucketed by LSH band.
+
+    find() looks a new chunk up in its `bands` buckets only, then verifies the candidates by
+    estimated Jaccard similarity, so the cost per chunk does not grow with the collection. A chunk
+    found to be a near-duplicate is not written; record_duplicate() keeps its provenance (the kept
+    chunk it was folded into, and the similarity), which duplicates() reports per kept chunk.
+
+    remove() must be called for kept chunks that are deleted or rewritten: it returns the
+    duplicates that lost their kept copy, whose documents the caller re-ingests.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 shingle_words: int = DEFAULT_SHINGLE_WORDS):
+        """
+        Args:
+            path: File the index is saved to and loaded from. None keeps it in memory only.
+            threshold: Estimated Jaccard similarity at or above which a chunk counts as a near-duplicate.
+            num_perm: MinHash signature length.
+            shingle_words: Words per shingle.
+        """
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_words)
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._band_weights = np.random.default_rng(2).integers(1, np.iinfo(np.int64).max, size=self.rows, dtype=np.uint64) | np.uint64(1)
+        self._lock = threading.RLock()
+        self._ids: List[str] = [] # Row -> chunk ID ("" once removed)
+        self._rows: Dict[str, int] = {}
+        self._signatures = np.zeros((1024, num_perm), dtype=np.uint32)
+        self._buckets: List[Dict[int, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        self.duplicate_of: Dict[str, Tuple[str, float]] = {} # Skipped chunk ID -> (kept chunk ID, similarity)
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._rows
+
+    def signature(self, text: str) -> np.ndarray:
+        return self.hasher.signature(text)
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """(n, bands) 64-bit keys, one per band of each signature (uint64 products wrap, which is fine for a hash)."""
+        banded = signatures[:, :self.bands * self.rows].astype(np.uint64).reshape(len(signatures), self.bands, self.rows)
+        return (banded * self._band_weights).sum(axis=2)
+
+    # --- Lookups ---
+
+    def find(self, signature: np.ndarray, exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """The most similar kept chunk at or above the threshold, as (chunk ID, estimated similarity), or None."""
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature[None, :])[0].tolist()):
+                candidates.update(self._buckets[band].get(key, ()))
+            if exclude is not None:
+                candidates.discard(self._rows.get(exclude))
+            if not candidates:
+                return None
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarities = (self._signatures[rows] == signature).mean(axis=1)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            return self._ids[rows[best]], float(similarities[best])
+
+    def duplicates(self, chunk_id: str) -> List[str]:
+        """IDs of the chunks that were skipped as near-duplicates of `chunk_id`."""
+        with self._lock:
+            return [duplicate for duplicate, (kept, _) in self.duplicate_of.items() if kept == chunk_id]
+
+    # --- Updates ---
+
+    def add(self, chunk_id: str, signature: np.ndarray) -> None:
+        """Records a kept chunk; an ID that is already present is replaced (upsert semantics)."""
+        with self._lock:
+            if chunk_id in self._rows:
+                self._unbucket(self._rows[chunk_id])
+            self.duplicate_of.pop(chunk_id, None)
+            row = len(self._ids)
+            if row >= len(self._signatures):
+                grown = np.zeros((2 * len(self._signatures), self._signatures.shape[1]), dtype=np.uint32)
+                grown[:row] = self._signatures[:row]
+                self._signatures = grown
+            self._ids.append(chunk_id)
+            self._rows[chunk_id] = row
+            self._signatures[row] = signature
+            for band, key in enumerate(self._band_keys(signature[None, :])[0].tolist()):
+                self._buckets[band][key].append(row)
+
+    def record_duplicate(self, chunk_id: str, kept_id: str, similarity: float) -> None:
+        with self._lock:
+            if chunk_id in self._rows:
+                self._unbucket(self._rows.pop(chunk_id))
+            self.duplicate_of[chunk_id] = (kept_id, similarity)
+
+    def remove(self, chunk_ids: List[str]) -> List[str]:
+        """
+        Forgets chunks (kept or skipped). Returns the skipped duplicates of removed kept chunks: they
+        are no longer represented in the collection, so their documents need ingesting again.
+        """
+        with self._lock:
+            removed = set()
+            for chunk_id in chunk_ids:
+                self.duplicate_of.pop(chunk_id, None)
+                row = self._rows.pop(chunk_id, None)
+                if row is not None:
+                    self._unbucket(row)
+                    removed.add(chunk_id)
+            orphans = [duplicate for duplicate, (kept, _) in self.duplicate_of.items() if kept in removed]
+            for duplicate in orphans:
+                del self.duplicate_of[duplicate]
+            return orphans
+
+    def _unbucket(self, row: int) -> None:
+        for band, key in enumerate(self._band_keys(self._signatures[row][None, :])[0].tolist()):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None and row in bucket:
+                bucket.remove(row)
+                if not bucket:
+                    del self._buckets[band][key]
+        self._ids[row] = ""
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ids, self._rows = [], {}
+            self._buckets = [defaultdict(list) for _ in range(self.bands)]
+            self.duplicate_of = {}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "kept_chunks": len(self._rows),
+                "duplicate_chunks": len(self.duplicate_of),
+                "threshold": self.threshold,
+                "bands": self.bands,
+                "rows_per_band": self.rows,
+                "buckets": sum(len(buckets) for buckets in self._buckets),
+            }
+
+    # --- Persistence ---
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Writes the kept chunks' signatures and the duplicate provenance to `path` atomically (removed rows are dropped)."""
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            ids = list(self._rows)
+            duplicates = list(self.duplicate_of)
+            arrays = {
+                "params": np.array([self.threshold, self.hasher.num_perm, self.hasher.shingle_words], dtype=np.float64),
+                "ids": _pack_strings(ids),
+                "signatures": self._signatures[[self._rows[chunk_id] for chunk_id in ids]] if ids else np.empty((0, self.hasher.num_perm), dtype=np.uint32),
+                "duplicate_ids": _pack_strings(duplicates),
+                "kept_ids": _pack_strings([self.duplicate_of[chunk_id][0] for chunk_id in duplicates]),
+                "similarities": np.array([self.duplicate_of[chunk_id][1] for chunk_id in duplicates], dtype=np.float32),
+            }
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+
+    def _load(self, path: str) -> None:
+        with np.load(path) as data:
+            threshold, num_perm, shingle_words = data["params"].tolist()
+            if (threshold, int(num_perm), int(shingle_words)) != (self.threshold, self.hasher.num_perm, self.hasher.shingle_words):
+                print(f"Near-duplicate index {path} was built with other settings; it will be rebuilt.")
+                return
+            signatures = data["signatures"]
+            ids = _unpack_strings(data["ids"], len(signatures))
+            similarities = data["similarities"]
+            duplicates = _unpack_strings(data["duplicate_ids"], len(similarities))
+            kept = _unpack_strings(data["kept_ids"], len(similarities))
+        self._ids = list(ids)
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        self._signatures = np.zeros((max(1024, 2 * len(ids)), self.hasher.num_perm), dtype=np.uint32)
+        self._signatures[:len(ids)] = signatures
+        for band, keys in enumerate(self._band_keys(signatures).T.tolist() if len(ids) else []):
+            buckets = self._buckets[band]
+            for row, key in enumerate(keys):
+                buckets[key].append(row)
+        self.duplicate_of = {chunk_id: (kept_id, float(similarity)) for chunk_id, kept_id, similarity in zip(duplicates, kept, similarities)}
+
+
+def rebuild_from_collection(index: NearDuplicateIndex, collection: Any, batch_size: int = 5000) -> int:
+    """
+    Re-computes the signatures of every chunk stored in `collection`. Provenance of skipped duplicates
+    whose kept chunk is still stored is preserved. Returns chunks indexed.
+    """
+    with index._lock:
+        provenance = dict(index.duplicate_of)
+        index.clear()
+        offset = 0
+        while True:
+            page = collection.get(include=["documents"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            for chunk_id, text in zip(page["ids"], page["documents"]):
+                index.add(chunk_id, index.signature(text or ""))
+            offset += len(page["ids"])
+        index.duplicate_of = {chunk_id: entry for chunk_id, entry in provenance.items() if entry[0] in index}
+    return offset
+
+
+def ensure_consistent(index: NearDuplicateIndex, collection: Any) -> bool:
+    """Rebuilds the index if it does not hold as many kept chunks as `collection` stores. Returns True if rebuilt."""
+    expected = collection.count()
+    if len(index) == expected:
+        return False
+    print(f"Near-duplicate index has {len(index)} chunks but collection '{collection.name}' has {expected}; rebuilding it...")
+    rebuild_from_collection(index, collection)
+    index.save()
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from react_rag_agent.knowledge_base_manager import COLLECTION_NAME, get_near_duplicate_index, get_or_create_collection
+
+    parser = argparse.ArgumentParser(description="Build or inspect the near-duplicate index of the RAG collection.")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--rebuild", action="store_true", help="Recompute signatures for every chunk in the collection.")
+    parser.add_argument("--report", action="store_true", help="List kept chunks with the near-duplicates folded into them.")
+    args = parser.parse_args(argv)
+
+    index = get_near_duplicate_index(args.collection)
+    if args.rebuild:
+        count = rebuild_from_collection(index, get_or_create_collection(args.collection))
+        index.save()
+        print(f"Indexed {count} chunks.")
+    if args.report:
+        groups: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+        for duplicate, (kept, similarity) in sorted(index.duplicate_of.items()):
+            groups[kept].append((duplicate, similarity))
+        for kept, duplicates in sorted(groups.items(), key=lambda item: -len(item[1])):
+            print(f"{kept}: {', '.join(f'{duplicate} ({similarity:.2f})' for duplicate, similarity in duplicates)}")
+    print(f"Near-duplicate index: {index.stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
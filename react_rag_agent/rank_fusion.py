@@ -0,0 +1,27 @@
+# rank_fusion.py
+# Combining rankings from different retrievers (dense, lexical, several query phrasings).
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_RRF_K = 60 # From Cormack et al.; damps the influence of the very top ranks
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = DEFAULT_RRF_K, weights: Optional[Sequence[float]] = None) -> List[Tuple[str, float]]:
+    """
+    Reciprocal rank fusion: each ID scores sum(weight / (k + rank)) over the rankings it appears in.
+    Only ranks are used, so retrievers with incomparable scores (BM25 vs vector distance) combine
+    without calibration, and an ID ranked well by several retrievers beats one ranked first by one.
+
+    Args:
+        rankings: ID lists, each best first.
+        k: Rank offset.
+        weights: Per-ranking weights (default 1.0 each).
+
+    Returns:
+        List[Tuple[str, float]]: (ID, fused score) pairs, best first. Ties keep first-seen order.
+    """
+    scores: Dict[str, float] = {}
+    for i, ranking in enumerate(rankings):
+        weight = weights[i] if weights is not None else 1.0
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,287 @@
+# reranker.py
+# Second-stage reranking of retrieved chunks with a small cross-encoder, under a latency budget.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from react_rag_agent.embedding_cache import normalize_query
+from react_rag_agent.index_manifest import content_hash
+
+RERANKER_MODEL_NAME = os.environ.get("RAG_RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2") # ~23M parameters, fast on CPU
+DEFAULT_RERANK_CANDIDATES = int(os.environ.get("RAG_RERANK_CANDIDATES", 50)) # First-stage hits handed to the reranker
+DEFAULT_RERANK_BUDGET_MS = float(os.environ.get("RAG_RERANK_BUDGET_MS", 250)) # Inference time allowed per rerank call
+DEFAULT_RERANK_BATCH_SIZE = 16
+DEFAULT_RERANK_CACHE_SIZE = int(os.environ.get("RAG_RERANK_CACHE_SIZE", 8192)) # (query, chunk) scores kept; 0 disables
+DEFAULT_MAX_LENGTH = 256 # Query + chunk word pieces; ingestion chunks are 200 tokens, so little is truncated
+DEFAULT_LOAD_RETRY_S = float(os.environ.get("RAG_RERANKER_RETRY_S", 60)) # Wait after a failed model load before trying again; doubles per failure
+_MAX_LOAD_RETRY_S = 3600.0
+_CHARS_PER_TOKEN = 4 # Rough English average, used to predict how long a batch takes
+
+
+class RerankScoreCache:
+    """
+    Thread-safe LRU of cross-encoder scores keyed on (normalized query, chunk content hash). Keying
+    on the chunk's content rather than its ID means an edited chunk is rescored, while the same
+    text reached through different IDs or retrieval paths is scored once.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_RERANK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(query: str, chunk_text: str) -> Tuple[str, str]:
+        return normalize_query(query), content_hash(chunk_text)
+
+    def get(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._entries.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key: Tuple[str, str], score: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = score
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class CrossEncoderReranker:
+    """
+    Rescores (query, chunk) pairs with a cross-encoder, which reads both texts together and ranks
+    far more precisely than embedding distance, at the cost of one forward pass per pair.
+
+    Candidates are scored in first-stage order, in batches, until the millisecond budget would be
+    exceeded: inference cost per padded character is tracked as a moving average (a batch costs
+    roughly its size times its longest pair) and each batch is shrunk to what still fits. Scored
+    candidates are ordered by score; any left unscored keep their first-stage order behind them,
+    so a tight budget degrades to "rerank the head of the list" rather than missing a deadline.
+    Time to load the model is not counted; call warm_up() ahead of traffic.
+
+    A failed model load (e.g. offline with a hub name) is remembered: until `load_retry_s` has
+    passed, doubling with each further failure, rerank() returns the first-stage order at once
+    instead of trying again on every request.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL_NAME,
+        budget_ms: float = DEFAULT_RERANK_BUDGET_MS,
+        batch_size: int = DEFAULT_RERANK_BATCH_SIZE,
+        max_length: int = DEFAULT_MAX_LENGTH,
+        cache: Optional[RerankScoreCache] = None,
+        model: Any = None,
+        load_retry_s: float = DEFAULT_LOAD_RETRY_S,
+    ):
+        """
+        Args:
+            model_name: Hub name or local directory of a sentence-transformers CrossEncoder.
+            budget_ms: Default inference budget per rerank() call.
+            batch_size: Pairs per forward pass.
+            max_length: Maximum word pieces per (query, chunk) pair.
+            cache: Score cache. Defaults to a new RerankScoreCache.
+            model: Preloaded CrossEncoder (or anything with a compatible `predict`), mainly for tests.
+            load_retry_s: Seconds to wait after a failed model load before the next attempt.
+        """
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache = cache if cache is not None else RerankScoreCache()
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.load_retry_s = load_retry_s
+        self._load_error: Optional[Exception] = None
+        self._load_failures = 0
+        self._retry_at = 0.0 # time.monotonic() before which a failed load is not retried
+        self._stats_lock = threading.Lock()
+        self._ms_per_char: Optional[float] = None # Moving average of inference time per padded character
+        self.calls = 0
+        self.pairs_scored = 0
+        self.pairs_skipped = 0 # Left unscored because the budget ran out
+        self.budget_exhausted = 0
+        self.inference_seconds = 0.0
+        self.unavailable_calls = 0 # rerank() calls answered in first-stage order because the model could not be loaded
+
+    @property
+    def model(self) -> Any:
+        """
+        The cross-encoder, loaded on first use.
+
+        Raises:
+            RuntimeError: If loading failed and the retry back-off has not passed yet; the load
+                          error is chained as its cause.
+        """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    if self._load_error is not None and time.monotonic() < self._retry_at:
+                        raise RuntimeError(f"Cross-encoder '{self.model_name}' is unavailable: {self._load_error}") from self._load_error
+                    try:
+                        from sentence_transformers import CrossEncoder
+                        print(f"Loading cross-encoder: {self.model_name}")
+                        self._model = CrossEncoder(self.model_name, device="cpu", max_length=self.max_length)
+                    except Exception as e:
+                        self._load_error = e
+                        self._load_failures += 1
+                        backoff = min(self.load_retry_s * 2 ** (self._load_failures - 1), _MAX_LOAD_RETRY_S)
+                        self._retry_at = time.monotonic() + backoff
+                        print(f"Loading cross-encoder '{self.model_name}' failed ({e}); reranking is off for {backoff:.0f}s.")
+                        raise
+                    self._load_error = None
+                    self._load_failures = 0
+        return self._model
+
+    def is_unavailable(self) -> bool:
+        """True while a failed model load is in its retry back-off."""
+        return self._model is None and self._load_error is not None and time.monotonic() < self._retry_at
+
+    def warm_up(self) -> float:
+        """Loads the model and runs one batch, returning the seconds taken. Also seeds the cost estimate."""
+        started = time.perf_counter()
+        self._predict([("warm-up query", "warm-up passage")] * min(self.batch_size, 4))
+        return time.perf_counter() - started
+
+    def _padded_chars(self, pairs: List[Tuple[str, str]]) -> int:
+        longest = max(len(query) + len(text) for query, text in pairs)
+        return len(pairs) * min(longest, self.max_length * _CHARS_PER_TOKEN)
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        model = self.model
+        started = time.perf_counter()
+        scores = np.asarray(model.predict(pairs, batch_size=len(pairs), show_progress_bar=False), dtype=np.float32).reshape(-1)
+        elapsed = time.perf_counter() - started
+        ms_per_char = elapsed * 1000.0 / max(self._padded_chars(pairs), 1)
+        with self._stats_lock:
+            self._ms_per_char = ms_per_char if self._ms_per_char is None else 0.7 * self._ms_per_char + 0.3 * ms_per_char
+            self.inference_seconds += elapsed
+        return scores
+
+    def _next_batch(self, pairs: List[Tuple[str, str]], deadline: float) -> int:
+        # Largest prefix of `pairs` (up to batch_size) predicted to finish before the deadline
+        if self._ms_per_char is None:
+            return min(self.batch_size, len(pairs))
+        remaining_ms = (deadline - time.perf_counter()) * 1000.0
+        size = 0
+        while size < min(self.batch_size, len(pairs)) and self._padded_chars(pairs[:size + 1]) * self._ms_per_char <= remaining_ms:
+            size += 1
+        return size
+
+    def rerank(self, query: str, hits: List[Dict[str, Any]], top_k: int, budget_ms: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Reorders first-stage hits by cross-encoder score and keeps the best `top_k`.
+
+        Args:
+            query: The search query.
+            hits: Candidates (dicts with at least "id" and "text"), best first-stage hit first.
+            top_k: Number of hits to return.
+            budget_ms: Inference budget for this call. Defaults to the reranker's budget_ms.
+
+        Returns:
+            List[Dict[str, Any]]: Copies of the best hits with a "rerank_score" key (None for hits
+                                  the budget did not allow scoring), best first. While the model
+                                  cannot be loaded, the first `top_k` hits unscored.
+        """
+        try:
+            self.model # Loaded outside the budget, as documented; fails at once during a load back-off
+        except Exception:
+            with self._stats_lock:
+                self.calls += 1
+                self.unavailable_calls += 1
+            return [dict(hit, rerank_score=None) for hit in hits[:top_k]]
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        scores: Dict[int, float] = {}
+        keys = [self.cache.key(query, hit["text"]) for hit in hits]
+        pending = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                pending.append(i)
+            else:
+                scores[i] = cached
+
+        pairs = [(query, hits[i]["text"]) for i in pending]
+        position = 0
+        while position < len(pending):
+            batch_size = self._next_batch(pairs[position:], deadline)
+            if batch_size <= 0:
+                with self._stats_lock:
+                    self.budget_exhausted += 1
+                break
+            batch = pending[position:position + batch_size]
+            batch_scores = self._predict(pairs[position:position + batch_size])
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                self.cache.put(keys[i], float(score))
+            position += len(batch)
+
+        with self._stats_lock:
+            self.calls += 1
+            self.pairs_scored += position
+            self.pairs_skipped += len(pending) - position
+        order = sorted(scores, key=lambda i: scores[i], reverse=True) + [i for i in range(len(hits)) if i not in scores]
+        return [dict(hits[i], rerank_score=scores.get(i)) for i in order[:top_k]]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "calls": self.calls,
+                "pairs_scored": self.pairs_scored,
+                "pairs_skipped": self.pairs_skipped,
+                "budget_exhausted": self.budget_exhausted,
+                "ms_per_char": self._ms_per_char,
+                "inference_s": self.inference_seconds,
+                "unavailable_calls": self.unavailable_calls,
+                "load_error": str(self._load_error) if self._load_error is not None else None,
+                "cache": self.cache.stats(),
+            }
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> CrossEncoderReranker:
+    """Process-wide reranker; the cross-encoder itself is loaded on first use."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = CrossEncoderReranker()
+    return _reranker
+
+
+def reranker_stats() -> Optional[Dict[str, Any]]:
+    """Stats of the shared reranker, or None if it was never created (without loading it)."""
+    return _reranker.stats() if _reranker is not None else None
@@ -0,0 +1,149 @@
+# retrieval_client.py
+# Thin client for retrieval_service.py, used by tools.py when RAG_RETRIEVAL_SERVICE is set. It loads no model and
+# opens no store: every call is one JSON request over a kept-alive HTTP connection (TCP or Unix socket).
+import http.client
+import json
+import socket
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from react_rag_agent.embedding_cache import QueryEmbeddingCache
+
+
+class RetrievalServiceError(Exception):
+    """Raised when the retrieval service is unreachable or answers with an error status."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class RetrievalClient:
+    """
+    Client for a RetrievalService at `address`: "http://host:port" or "unix:/path/to/socket".
+
+    Each thread keeps its own connection, so concurrent callers (agent threads, UI sessions in one
+    process) reach the service in parallel and are micro-batched there. A request that fails on a
+    reused connection (the service restarted, or closed an idle connection) is retried once on a new one.
+    Query embeddings fetched from the service are kept in a local LRU, like in-process retrieval does.
+    """
+
+    def __init__(self, address: str, timeout: float = 30.0, query_cache_size: int = 1024):
+        """
+        Args:
+            address: Service address, as printed by the service on start-up.
+            timeout: Seconds to wait for a connection or a response.
+            query_cache_size: Query embeddings kept in memory; 0 disables.
+        """
+        self.address = address.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+        self._embedding_cache = QueryEmbeddingCache(max_entries=query_cache_size)
+        if self.address.startswith("unix:"):
+            self._unix_path: Optional[str] = self.address[len("unix:"):]
+        else:
+            self._unix_path = None
+            target = self.address.split("://", 1)[-1]
+            host, _, port = target.partition(":")
+            self._host, self._port = host, int(port or 80)
+
+    def _connection(self, fresh: bool = False) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and fresh:
+            connection.close()
+            connection = None
+        if connection is None:
+            if self._unix_path is not None:
+                connection = _UnixHTTPConnection(self._unix_path, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Any:
+        """Sends one request and returns the decoded JSON response; raises RetrievalServiceError on failure."""
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            connection = self._connection(fresh=attempt > 0)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException, OSError) as e:
+                connection.close()
+                if attempt:
+                    raise RetrievalServiceError(f"Retrieval service at {self.address} is unreachable: {e}")
+        try:
+            decoded = json.loads(data) if data else None
+        except json.JSONDecodeError:
+            raise RetrievalServiceError(f"Retrieval service returned invalid JSON (HTTP {response.status}).", response.status)
+        if response.status != 200:
+            message = (decoded or {}).get("error", {}).get("message") if isinstance(decoded, dict) else None
+            raise RetrievalServiceError(message or f"HTTP {response.status}", response.status)
+        return decoded
+
+    def retrieve(self, queries: List[str], n_results: int = 1, mode: Optional[str] = None, where: Optional[Dict[str, Any]] = None,
+                 rerank: bool = False, candidates: Optional[int] = None, budget_ms: Optional[float] = None) -> List[List[Dict[str, Any]]]:
+        """Hits per query, as tools.retrieve_many returns them (or tools.retrieve_reranked with `rerank`)."""
+        payload: Dict[str, Any] = {"queries": queries, "n_results": n_results}
+        for name, value in (("mode", mode), ("where", where), ("candidates", candidates), ("budget_ms", budget_ms)):
+            if value is not None:
+                payload[name] = value
+        if rerank:
+            payload["rerank"] = True
+        return self.request("POST", "/v1/retrieve", payload)["results"]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Query embeddings as a (n, dim) float32 matrix, computed by the service's model."""
+        return self._embedding_cache.get_or_compute_many(
+            texts, lambda missing: np.asarray(self.request("POST", "/v1/embed", {"texts": list(missing)})["embeddings"], dtype=np.float32))
+
+    def chunks(self, ids: List[str], embeddings: bool = False) -> Dict[str, Any]:
+        """
+        Stored chunk state: "versions" (ID -> content digest; deleted chunks are absent) and, with
+        `embeddings`, "embeddings" as a (len(ids), dim) float32 matrix in `ids` order.
+        """
+        result = self.request("POST", "/v1/chunks", {"ids": ids, "embeddings": embeddings})
+        if embeddings:
+            result["embeddings"] = np.asarray(result["embeddings"], dtype=np.float32)
+        return result
+
+    def ingest(self, documents: Optional[List[Dict[str, Any]]] = None, paths: Optional[List[str]] = None, **options: Any) -> Dict[str, Any]:
+        """
+        Writes to the service's collection: `documents` ({"id", "text", "metadata"} dicts, as for
+        add_documents_to_collection) or `paths` on the service's file system, run through the ingestion
+        pipeline (options: root, source, tenant, tags, prune, deduplicate).
+        """
+        payload: Dict[str, Any] = dict(options)
+        if documents is not None:
+            payload["documents"] = documents
+        if paths is not None:
+            payload["paths"] = paths
+        return self.request("POST", "/v1/ingest", payload)
+
+    def metrics(self) -> Dict[str, Any]:
+        return self.request("GET", "/metrics")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"address": self.address, "query_embeddings": self._embedding_cache.stats()}
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,398 @@
+# retrieval_service.py
+# One process owns the embedding model, the vector store and the BM25 index and serves retrieval to every agent
+# process and UI session over HTTP (TCP or a Unix socket), instead of each of them loading its own copy.
+#   python -m react_rag_agent.retrieval_service --port 8810          (or --unix-socket /tmp/rag_retrieval.sock)
+#   RAG_RETRIEVAL_SERVICE=http://127.0.0.1:8810 python -m react_rag_agent.main
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from common.gateway.http_server import HTTPError, HTTPRequest, JSONHTTPServer
+from react_rag_agent import tools
+from react_rag_agent.answer_cache import chunk_versions
+from react_rag_agent.knowledge_base_manager import (
+    COLLECTION_NAME,
+    DEDUPLICATE,
+    WARM_UP_QUERIES,
+    add_documents_to_collection,
+    embed_queries,
+    get_chunk_embeddings,
+    get_chunks,
+    get_collection,
+    get_or_create_collection,
+    warm_up,
+)
+from react_rag_agent.metadata_filter import parse_filter
+from react_rag_agent.reranker import DEFAULT_RERANK_CANDIDATES, get_reranker
+
+SERVICE_HOST = os.environ.get("RAG_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("RAG_SERVICE_PORT", 8810))
+BATCH_WINDOW_MS = float(os.environ.get("RAG_SERVICE_BATCH_WINDOW_MS", 2)) # How long the first query of a batch waits for others
+MAX_BATCH_QUERIES = int(os.environ.get("RAG_SERVICE_MAX_BATCH", 64)) # A batch is dispatched at once when it holds this many queries
+MAX_REQUEST_QUERIES = 256
+
+# (queries, retrieval parameters or None for embedding only)
+BatchItem = Tuple[List[str], Optional[Dict[str, Any]]]
+
+
+def to_json(value: Any) -> Any:
+    """Converts NumPy scalars and arrays (distances, scores, embeddings) in hits to JSON-serializable values."""
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class QueryBatcher:
+    """
+    Micro-batches the queries of concurrent requests.
+
+    The first query to arrive opens a window of `window_ms`; requests submitted until it closes join
+    the same batch, which `run_batch` handles on the executor with one embedding forward pass. At most
+    `max_inflight` batches run at a time: while all of them are busy, arriving requests keep joining
+    the next batch (up to `max_batch_queries` queries), so batches grow with load instead of queueing
+    up one small batch per window. Must be used from a single event loop.
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, run_batch: Callable[[List[BatchItem]], List[Any]],
+                 window_ms: float = BATCH_WINDOW_MS, max_batch_queries: int = MAX_BATCH_QUERIES, max_inflight: int = 1):
+        self.executor = executor
+        self.run_batch = run_batch
+        self.window_seconds = window_ms / 1000.0
+        self.max_batch_queries = max_batch_queries
+        self.max_inflight = max_inflight
+        self._pending: List[Tuple[BatchItem, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._window_closed = False
+        self._inflight = 0
+        self.batches_dispatched = 0
+        self.requests_batched = 0
+        self.queries_batched = 0
+
+    async def submit(self, queries: List[str], params: Optional[Dict[str, Any]]) -> Any:
+        """Queues one request's queries and waits for its share of the batch result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((queries, params), future))
+        if self.window_seconds <= 0 or self._pending_queries() >= self.max_batch_queries:
+            self._close_window()
+        elif self._timer is None and not self._window_closed:
+            self._timer = loop.call_later(self.window_seconds, self._close_window)
+        return await future
+
+    def _pending_queries(self) -> int:
+        return sum(len(item[0]) for item, _ in self._pending)
+
+    def _close_window(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._window_closed = True
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        if not self._window_closed or not self._pending or self._inflight >= self.max_inflight:
+            return
+        size, queries = 0, 0
+        for item, _ in self._pending:
+            if size and queries + len(item[0]) > self.max_batch_queries:
+                break
+            size += 1
+            queries += len(item[0])
+        batch, self._pending = self._pending[:size], self._pending[size:]
+        # Requests left over have waited a full window already and go out with the next free slot
+        self._window_closed = bool(self._pending)
+        self._inflight += 1
+        self.batches_dispatched += 1
+        self.requests_batched += size
+        self.queries_batched += queries
+        done = asyncio.get_running_loop().run_in_executor(self.executor, self.run_batch, [item for item, _ in batch])
+        done.add_done_callback(lambda finished: self._resolve(finished, [future for _, future in batch]))
+
+    def _resolve(self, done: asyncio.Future, futures: List[asyncio.Future]) -> None:
+        self._inflight -= 1
+        if done.cancelled():
+            results: List[Any] = [asyncio.CancelledError()] * len(futures)
+        elif done.exception() is not None:
+            results = [done.exception()] * len(futures)
+        else:
+            results = done.result()
+        for future, result in zip(futures, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches_dispatched": self.batches_dispatched,
+            "requests_batched": self.requests_batched,
+            "queries_batched": self.queries_batched,
+            "mean_batch_queries": (self.queries_batched / self.batches_dispatched) if self.batches_dispatched else 0.0,
+            "inflight_batches": self._inflight,
+            "pending_queries": self._pending_queries(),
+        }
+
+
+class RetrievalService:
+    """
+    HTTP service in front of the agent's knowledge base (the same functions tools.py calls in-process).
+
+    Endpoints (JSON bodies, errors in the gateway's {"error": {"message", "type"}} shape):
+    - POST /v1/retrieve  {"queries": [...], "n_results", "mode", "where", "rerank", "candidates", "budget_ms"}
+                         -> {"results": [[hit, ...], ...]}, as tools.retrieve_many / retrieve_reranked.
+    - POST /v1/embed     {"texts": [...]} -> {"embeddings": [[...], ...]}
+    - POST /v1/chunks    {"ids": [...], "embeddings": bool} -> {"versions": {id: digest}, "embeddings": [...]}
+    - POST /v1/ingest    {"documents": [...]} or {"paths": [...], "root", "source", "tenant", "tags", "prune"}, and "deduplicate"
+    - GET /health, GET /metrics
+
+    Retrieve and embed requests are micro-batched (QueryBatcher), so concurrent callers share one
+    embedding forward pass per batch and, for equal parameters, one vector store query. Writes run
+    one at a time on their own thread, so this process is the collection's only writer and queries
+    never wait on another process's SQLite lock.
+    """
+
+    def __init__(self, host: str = SERVICE_HOST, port: int = SERVICE_PORT, unix_socket: Optional[str] = None,
+                 batch_window_ms: float = BATCH_WINDOW_MS, max_batch_queries: int = MAX_BATCH_QUERIES, max_concurrency: int = 2):
+        """
+        Args:
+            host, port: Listen address. Port 0 picks a free port.
+            unix_socket: Listen on this Unix domain socket instead of TCP.
+            batch_window_ms, max_batch_queries: QueryBatcher settings; a window of 0 disables batching.
+            max_concurrency: Batches processed at the same time (chunk lookups share the same threads).
+        """
+        tools.use_retrieval_service(None) # This process is the service; never forward to one
+        self.batch_window_ms = batch_window_ms
+        self.max_batch_queries = max_batch_queries
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="retrieval")
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval-writer")
+        self.batcher: Optional[QueryBatcher] = None # Created on the serving event loop
+        self.http = JSONHTTPServer(host=host, port=port, unix_socket=unix_socket)
+        self.http.route("POST", "/v1/retrieve", self.handle_retrieve)
+        self.http.route("POST", "/v1/embed", self.handle_embed)
+        self.http.route("POST", "/v1/chunks", self.handle_chunks)
+        self.http.route("POST", "/v1/ingest", self.handle_ingest)
+        self.http.route("GET", "/health", self.handle_health)
+        self.http.route("GET", "/metrics", self.handle_metrics)
+        self.requests_total = 0
+        self.errors_total = 0
+        self.ingests_total = 0
+        self.started_at = time.time()
+
+    # --- Batch execution (executor threads) ---
+
+    def run_batch(self, items: List[BatchItem]) -> List[Any]:
+        """Results for each item in order: embeddings for embed items, hit lists for retrieval items, or the exception."""
+        texts = list(dict.fromkeys(text for queries, _ in items for text in queries))
+        # One forward pass for the whole batch; retrieve_many below finds these in the query embedding cache
+        vectors = dict(zip(texts, embed_queries(texts)))
+        results: List[Any] = [None] * len(items)
+        groups: Dict[str, List[int]] = {}
+        for i, (queries, params) in enumerate(items):
+            if params is None:
+                results[i] = [vectors[text].tolist() for text in queries]
+            else:
+                groups.setdefault(json.dumps(params, sort_keys=True), []).append(i)
+        for members in groups.values():
+            queries = [query for i in members for query in items[i][0]]
+            try:
+                hits = self._retrieve(queries, items[members[0]][1])
+            except Exception as e:
+                for i in members:
+                    results[i] = e
+                continue
+            offset = 0
+            for i in members:
+                count = len(items[i][0])
+                results[i] = to_json(hits[offset:offset + count])
+                offset += count
+        return results
+
+    @staticmethod
+    def _retrieve(queries: List[str], params: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        n_results = params["n_results"]
+        if not params.get("rerank"):
+            return tools.retrieve_many(queries, n_results=n_results, mode=params.get("mode"), where=params.get("where"))
+        candidates = max(params.get("candidates") or DEFAULT_RERANK_CANDIDATES, n_results)
+        first_stage = tools.retrieve_many(queries, n_results=candidates, mode=params.get("mode"), where=params.get("where"))
+        return [get_reranker().rerank(query, hits, top_k=n_results, budget_ms=params.get("budget_ms"))
+                for query, hits in zip(queries, first_stage)]
+
+    @staticmethod
+    def _chunks(ids: List[str], embeddings: bool) -> Dict[str, Any]:
+        collection = get_collection(COLLECTION_NAME)
+        result: Dict[str, Any] = {"versions": chunk_versions(get_chunks(collection, ids))}
+        if embeddings:
+            result["embeddings"] = get_chunk_embeddings(collection, ids).tolist()
+        return result
+
+    def _ingest(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if payload.get("documents") is not None:
+            documents = payload["documents"]
+            counts = add_documents_to_collection(get_or_create_collection(COLLECTION_NAME), documents, batch_size=int(payload.get("batch_size", 100)),
+                                                 deduplicate=bool(payload.get("deduplicate", DEDUPLICATE)))
+            return dict(counts, documents=len(documents))
+        from react_rag_agent.ingestion import IngestionPipeline, default_manifest_path
+        pipeline = IngestionPipeline(
+            collection=get_or_create_collection(COLLECTION_NAME),
+            manifest_file=default_manifest_path(COLLECTION_NAME),
+            prune=bool(payload.get("prune", False)),
+            source=payload.get("source", "local_kb"),
+            tenant=payload.get("tenant"),
+            tags=payload.get("tags"),
+            deduplicate=bool(payload.get("deduplicate", DEDUPLICATE)),
+        )
+        return to_json(pipeline.run(payload["paths"], root=payload.get("root")))
+
+    # --- Handlers ---
+
+    @staticmethod
+    def _string_list(payload: Dict[str, Any], name: str, limit: Optional[int] = MAX_REQUEST_QUERIES) -> List[str]:
+        values = payload.get(name)
+        if not isinstance(values, list) or not values or not all(isinstance(value, str) for value in values):
+            raise HTTPError(400, f"'{name}' must be a non-empty list of strings.")
+        if limit is not None and len(values) > limit:
+            raise HTTPError(413, f"At most {limit} {name} per request.")
+        return values
+
+    async def handle_retrieve(self, request: HTTPRequest) -> Tuple[int, Any]:
+        self.requests_total += 1
+        payload = request.json()
+        if isinstance(payload.get("query"), str):
+            payload["queries"] = [payload["query"]]
+        queries = self._string_list(payload, "queries")
+        try:
+            params = {
+                "n_results": int(payload.get("n_results", 1)),
+                "mode": payload.get("mode"),
+                "where": parse_filter(payload.get("where")),
+                "rerank": bool(payload.get("rerank", False)),
+                "candidates": payload.get("candidates"),
+                "budget_ms": payload.get("budget_ms"),
+            }
+        except (TypeError, ValueError) as e:
+            raise HTTPError(400, str(e))
+        if params["n_results"] < 1:
+            raise HTTPError(400, "'n_results' must be at least 1.")
+        return 200, {"results": await self._submit(queries, params)}
+
+    async def handle_embed(self, request: HTTPRequest) -> Tuple[int, Any]:
+        self.requests_total += 1
+        texts = self._string_list(request.json(), "texts")
+        return 200, {"embeddings": await self._submit(texts, None)}
+
+    async def handle_chunks(self, request: HTTPRequest) -> Tuple[int, Any]:
+        self.requests_total += 1
+        payload = request.json()
+        ids = self._string_list(payload, "ids", limit=None)
+        return 200, await self._run(self.executor, self._chunks, ids, bool(payload.get("embeddings", False)))
+
+    async def handle_ingest(self, request: HTTPRequest) -> Tuple[int, Any]:
+        self.requests_total += 1
+        payload = request.json()
+        if payload.get("documents") is None:
+            self._string_list(payload, "paths", limit=None)
+        elif not isinstance(payload["documents"], list) or not all(isinstance(doc, dict) and "id" in doc and "text" in doc for doc in payload["documents"]):
+            raise HTTPError(400, "'documents' must be a list of objects with 'id' and 'text'.")
+        result = await self._run(self.writer, self._ingest, payload)
+        self.ingests_total += 1
+        return 200, result
+
+    async def handle_health(self, request: HTTPRequest) -> Tuple[int, Any]:
+        return 200, {"status": "ok", "collection": COLLECTION_NAME}
+
+    async def handle_metrics(self, request: HTTPRequest) -> Tuple[int, Any]:
+        return 200, to_json(self.stats())
+
+    async def _submit(self, queries: List[str], params: Optional[Dict[str, Any]]) -> Any:
+        try:
+            return await self.batcher.submit(queries, params)
+        except HTTPError:
+            raise
+        except (KeyError, ValueError) as e:
+            raise HTTPError(400, str(e))
+        except Exception as e:
+            self.errors_total += 1
+            raise HTTPError(500, f"Retrieval failed: {type(e).__name__} - {e}", "server_error")
+
+    async def _run(self, executor: ThreadPoolExecutor, function: Callable[..., Any], *args: Any) -> Any:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+        except (KeyError, ValueError) as e:
+            raise HTTPError(400, str(e))
+        except Exception as e:
+            self.errors_total += 1
+            raise HTTPError(500, f"{type(e).__name__} - {e}", "server_error")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "uptime_seconds": time.time() - self.started_at,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "ingests_total": self.ingests_total,
+            "batching": self.batcher.stats() if self.batcher is not None else {},
+            "caches": tools.retrieval_cache_stats(),
+        }
+
+    # --- Lifecycle ---
+
+    async def start(self, warm: bool = True) -> None:
+        if warm:
+            # Load the model and open the store before accepting connections, so no client pays for it
+            timings = await asyncio.get_running_loop().run_in_executor(
+                self.executor, functools.partial(warm_up, collection_name=COLLECTION_NAME, dummy_queries=WARM_UP_QUERIES))
+            print(f"Retrieval service warmed up: {', '.join(f'{step} {seconds:.2f}s' for step, seconds in timings.items())}")
+        self.batcher = QueryBatcher(self.executor, self.run_batch, window_ms=self.batch_window_ms,
+                                   max_batch_queries=self.max_batch_queries, max_inflight=self.max_concurrency)
+        await self.http.start()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        print(f"Retrieval service listening on {self.http.address} (collection: {COLLECTION_NAME})")
+        await self.http.serve_forever()
+
+    async def close(self) -> None:
+        await self.http.close()
+        self.executor.shutdown(wait=False)
+        self.writer.shutdown(wait=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the RAG knowledge base to agent processes over HTTP.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--unix-socket", default=os.environ.get("RAG_SERVICE_SOCKET"), help="Listen on this Unix socket instead of TCP.")
+    parser.add_argument("--batch-window-ms", type=float, default=BATCH_WINDOW_MS, help="Micro-batching window; 0 disables batching.")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_QUERIES, help="Queries per batch.")
+    parser.add_argument("--max-concurrency", type=int, default=2, help="Batches processed at the same time.")
+    args = parser.parse_args(argv)
+
+    if args.unix_socket and os.path.exists(args.unix_socket):
+        os.remove(args.unix_socket) # Left behind by a previous run
+    service = RetrievalService(host=args.host, port=args.port, unix_socket=args.unix_socket, batch_window_ms=args.batch_window_ms,
+                               max_batch_queries=args.max_batch, max_concurrency=args.max_concurrency)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("\nRetrieval service stopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,222 @@
+# snapshots.py
+# Versioned snapshots of a collection for fast restarts and deploys: vectors, chunk texts and metadata in the NumPy
+# store's memory-mappable layout with a binary row table, taken together with the BM25 index, the ingestion
+# manifests and the near-duplicate index, so a restored collection and its sidecar files agree.
+#   python -m react_rag_agent.snapshots create [--keep 3]
+#   python -m react_rag_agent.snapshots list
+#   python -m react_rag_agent.snapshots restore [--version 4]
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from react_rag_agent.knowledge_base_manager import (
+    COLLECTION_NAME,
+    EMBEDDING_SPACE_ID,
+    VECTOR_STORE_BACKEND,
+    collection_data_path,
+    delete_collection,
+    get_lexical_index,
+    get_or_create_collection,
+    invalidate_index_cache,
+)
+from react_rag_agent.lexical_index import ensure_consistent as ensure_lexical_consistent
+from react_rag_agent.vector_store import GenerationReader, GenerationWriter, NumpyVectorStore
+
+SNAPSHOT_FORMAT = 1
+DEFAULT_KEEP = int(os.environ.get("RAG_SNAPSHOT_KEEP", 3)) # Snapshots kept per collection; create_snapshot() deletes older ones
+SIDECAR_SUFFIXES = (".bm25.npz", ".manifest.json", ".samples.manifest.json", ".minhash.npz")
+_BATCH_SIZE = 5000 # Below Chroma's maximum batch size
+_LATEST_FILE = "LATEST"
+_INFO_FILE = "snapshot.json"
+
+
+def snapshots_path(collection_name: str = COLLECTION_NAME) -> str:
+    return collection_data_path(collection_name, ".snapshots")
+
+
+def list_snapshots(collection_name: str = COLLECTION_NAME) -> List[Dict[str, Any]]:
+    """The complete snapshots of `collection_name`, oldest first, each as its snapshot.json plus "path"."""
+    root = snapshots_path(collection_name)
+    if not os.path.isdir(root):
+        return []
+    snapshots = []
+    for name in os.listdir(root):
+        info_path = os.path.join(root, name, _INFO_FILE)
+        if name.startswith("v") and not name.endswith(".tmp") and os.path.exists(info_path):
+            with open(info_path) as f:
+                snapshots.append(dict(json.load(f), path=os.path.join(root, name)))
+    return sorted(snapshots, key=lambda info: info["version"])
+
+
+def snapshot_directory(collection_name: str = COLLECTION_NAME, version: Optional[int] = None) -> str:
+    """Directory of snapshot `version` of `collection_name`, or of the latest one; raises FileNotFoundError if missing."""
+    root = snapshots_path(collection_name)
+    if version is None:
+        try:
+            with open(os.path.join(root, _LATEST_FILE)) as f:
+                version = int(f.read().strip())
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No snapshot of collection '{collection_name}' in {root}.")
+    directory = os.path.join(root, f"v{version:06d}")
+    if not os.path.exists(os.path.join(directory, _INFO_FILE)):
+        raise FileNotFoundError(f"Snapshot {version} of collection '{collection_name}' not found in {root}.")
+    return directory
+
+
+def _directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def create_snapshot(collection_name: str = COLLECTION_NAME, keep: int = DEFAULT_KEEP) -> Dict[str, Any]:
+    """
+    Writes a new snapshot of `collection_name` and makes it the latest. Rows are read from the
+    collection in pages, so this works for either backend; take it while no ingestion run writes
+    to the collection, so the vectors and the copied index files describe the same chunks.
+
+    Args:
+        collection_name: Collection to snapshot.
+        keep: Snapshots to keep, this one included; older ones are deleted.
+
+    Returns:
+        Dict[str, Any]: The snapshot's info ("version", "rows", "bytes", ...) plus "path" and "seconds".
+    """
+    started = time.perf_counter()
+    collection = get_or_create_collection(collection_name)
+    existing = list_snapshots(collection_name)
+    version = existing[-1]["version"] + 1 if existing else 1
+    root = snapshots_path(collection_name)
+    directory = os.path.join(root, f"v{version:06d}")
+    tmp_directory = f"{directory}.tmp"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+
+    rows = collection.count()
+    dtype = str(collection.dtype) if isinstance(collection, NumpyVectorStore) else "float32"
+    writer: Optional[GenerationWriter] = None
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=_BATCH_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+        if writer is None:
+            writer = GenerationWriter(tmp_directory, rows, embeddings.shape[1], dtype)
+        writer.append(page["ids"], embeddings, page["documents"], page["metadatas"])
+        offset += len(page["ids"])
+    if writer is None:
+        raise ValueError(f"Collection '{collection_name}' is empty; there is nothing to snapshot.")
+    writer.close()
+
+    sidecars = []
+    for suffix in SIDECAR_SUFFIXES:
+        source = collection_data_path(collection_name, suffix)
+        if os.path.exists(source):
+            shutil.copyfile(source, os.path.join(tmp_directory, suffix.lstrip(".")))
+            sidecars.append(suffix)
+    info = {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        "collection": collection_name,
+        "backend": VECTOR_STORE_BACKEND,
+        "embedding_space": EMBEDDING_SPACE_ID,
+        "rows": len(writer),
+        "dim": int(embeddings.shape[1]),
+        "dtype": dtype,
+        "created": time.time(),
+        "sidecars": sidecars,
+        "bytes": _directory_bytes(tmp_directory),
+    }
+    with open(os.path.join(tmp_directory, _INFO_FILE), "w") as f:
+        json.dump(info, f, indent=2)
+    os.replace(tmp_directory, directory)
+    tmp_path = os.path.join(root, f"{_LATEST_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, os.path.join(root, _LATEST_FILE))
+    for old in existing[:max(len(existing) + 1 - max(keep, 1), 0)]:
+        shutil.rmtree(old["path"], ignore_errors=True)
+    return dict(info, path=directory, seconds=time.perf_counter() - started)
+
+
+def restore_snapshot(collection_name: str = COLLECTION_NAME, version: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Replaces `collection_name` and its sidecar files (BM25 index, manifests, near-duplicate index)
+    with a snapshot. A NumPy store gets the snapshot's files copied in as a new generation, which
+    readers in other processes switch to on their next call and which opens without parsing a log.
+    A Chroma collection is recreated and its rows are added back from the memory-mapped snapshot
+    in batches, without re-embedding; processes holding the old collection should be restarted.
+
+    Args:
+        collection_name: Collection to replace.
+        version: Snapshot version; defaults to the latest.
+
+    Returns:
+        Dict[str, Any]: The snapshot's info plus "path" and "seconds".
+
+    Raises:
+        FileNotFoundError: If there is no such snapshot.
+        ValueError: If the snapshot's format or embedding space does not match this configuration.
+    """
+    started = time.perf_counter()
+    directory = snapshot_directory(collection_name, version)
+    with open(os.path.join(directory, _INFO_FILE)) as f:
+        info = json.load(f)
+    if info.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Snapshot {directory} has format {info.get('format')}; this version reads format {SNAPSHOT_FORMAT}.")
+    if info["embedding_space"] != EMBEDDING_SPACE_ID:
+        raise ValueError(f"Snapshot {directory} holds '{info['embedding_space']}' embeddings but the configured model is "
+                         f"'{EMBEDDING_SPACE_ID}'; restoring it would mix vector spaces.")
+
+    if VECTOR_STORE_BACKEND == "numpy":
+        collection = get_or_create_collection(collection_name)
+        collection.restore(directory)
+    else:
+        get_or_create_collection(collection_name) # So there is a collection to delete on a fresh deploy
+        delete_collection(collection_name)
+        collection = get_or_create_collection(collection_name)
+        reader = GenerationReader(directory)
+        for start in range(0, len(reader), _BATCH_SIZE):
+            rows = reader.rows(start, start + _BATCH_SIZE)
+            collection.add(ids=rows["ids"], embeddings=rows["embeddings"].tolist(), documents=rows["documents"], metadatas=rows["metadatas"])
+
+    for suffix in SIDECAR_SUFFIXES:
+        target = collection_data_path(collection_name, suffix)
+        if suffix in info["sidecars"]:
+            tmp_path = f"{target}.tmp"
+            shutil.copyfile(os.path.join(directory, suffix.lstrip(".")), tmp_path)
+            os.replace(tmp_path, target)
+        elif os.path.exists(target):
+            os.remove(target)
+    invalidate_index_cache(collection_name)
+    ensure_lexical_consistent(get_lexical_index(collection_name), collection)
+    return dict(info, path=directory, seconds=time.perf_counter() - started)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Create, list or restore snapshots of the RAG collection.")
+    parser.add_argument("command", choices=["create", "list", "restore"])
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--version", type=int, default=None, help="Snapshot to restore (default: the latest).")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="Snapshots to keep when creating one.")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        info = create_snapshot(args.collection, keep=args.keep)
+        print(f"Snapshot {info['version']} of '{args.collection}': {info['rows']} rows, {info['bytes'] / 2**20:.1f} MB "
+              f"in {info['seconds']:.1f}s ({info['path']}).")
+    elif args.command == "list":
+        for info in list_snapshots(args.collection):
+            print(f"{info['version']:>6}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(info['created']))}  "
+                  f"{info['rows']:>9} rows  {info['bytes'] / 2**20:8.1f} MB  {info['backend']:<6}  {info['embedding_space']}")
+    else:
+        info = restore_snapshot(args.collection, args.version)
+        print(f"Restored snapshot {info['version']} of '{args.collection}' ({info['rows']} rows) in {info['seconds']:.1f}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,27 @@
+# Tests for packing retrieved chunks into the synthesis token budget.
+#   python -m pytest react_rag_agent/tests
+import numpy as np
+
+from react_rag_agent.context_builder import ContextBuilder
+
+
+def _builder(budget: int) -> ContextBuilder:
+    return ContextBuilder(budget, embed_query=lambda query: np.array([1.0, 0.0], dtype=np.float32))
+
+
+def _hit(chunk_id: str, text: str, similarity: float) -> dict:
+    return {"id": chunk_id, "text": text, "embedding": [similarity, (1 - similarity ** 2) ** 0.5]}
+
+
+def test_oversized_top_chunk_does_not_empty_the_context():
+    long_sentence = " ".join(["word"] * 100) + "."
+    hits = [_hit("a.txt", long_sentence + " Short tail.", 1.0), _hit("b.txt", "The key rotates every 90 days.", 0.6)]
+    packed, stats = _builder(40).build("key rotation", hits)
+    assert [hit["id"] for hit in packed] == ["b.txt"]
+    assert stats["chunks"] == 1 and stats["tokens"] <= 40
+
+
+def test_single_oversized_chunk_is_truncated_to_the_budget():
+    packed, stats = _builder(40).build("anything", [_hit("a.txt", " ".join(["word"] * 100) + ".", 1.0)])
+    assert len(packed) == 1 and packed[0]["text"].startswith("word word")
+    assert stats["tokens"] <= 40
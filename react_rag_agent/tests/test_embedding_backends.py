@@ -0,0 +1,43 @@
+# Parity of the fp32 embedding backends with the PyTorch path: they claim its vector space, so a
+# collection embedded with one must be searchable with the other. Skipped when the model or the
+# backend's runtime is not available. Latency is measured by benchmarks/embedding_backends.py.
+#   python -m pytest react_rag_agent/tests
+import pytest
+
+from react_rag_agent.embedding_backends import DEFAULT_PARITY_THRESHOLD, FP32_BACKENDS, load_sentence_transformer, parity_report
+from react_rag_agent.knowledge_base_manager import EMBEDDING_MODEL_NAME
+
+SENTENCES = [
+    "What is Python?",
+    "Python is a high-level, general-purpose programming language.",
+    "Retrieval augmented generation grounds answers in retrieved documents.",
+    "Access keys rotate every 90 days.",
+    "ReAct agents interleave reasoning steps with tool calls.",
+]
+
+
+def _load(backend: str, export_dir: str):
+    try:
+        return load_sentence_transformer(EMBEDDING_MODEL_NAME, backend, export_dir=export_dir)
+    except ImportError as e:
+        pytest.skip(f"{backend} backend is not installed: {e}")
+    except Exception as e:
+        pytest.skip(f"Cannot load '{EMBEDDING_MODEL_NAME}' with the {backend} backend: {e}")
+
+
+@pytest.fixture(scope="module")
+def export_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("embedding_exports"))
+
+
+@pytest.fixture(scope="module")
+def reference(export_dir):
+    pytest.importorskip("sentence_transformers")
+    return _load("torch", export_dir)
+
+
+@pytest.mark.parametrize("backend", [backend for backend in FP32_BACKENDS if backend != "torch"])
+def test_fp32_backend_matches_torch(backend, reference, export_dir):
+    report = parity_report(reference, _load(backend, export_dir), SENTENCES)
+    assert report["compatible"], f"{backend}: min cosine {report['min_cosine']:.4f} < {DEFAULT_PARITY_THRESHOLD}"
+    assert report["nearest_neighbour_agreement"] == 1.0
@@ -0,0 +1,28 @@
+# Tests for syncing the in-memory sample corpus through the content-hash manifest.
+#   python -m pytest react_rag_agent/tests
+import numpy as np
+
+from react_rag_agent.index_manifest import IndexManifest, sync_documents
+from react_rag_agent.vector_store import NumpyVectorStore
+
+
+def _encode(texts):
+    return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_metadata_changes_are_synced_and_timestamped(tmp_path):
+    store = NumpyVectorStore(str(tmp_path / "store"))
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    documents = [{"id": "python.txt", "text": "Python is a programming language.", "metadata": {"source": "local_kb"}},
+                 {"id": "rag.txt", "text": "RAG grounds answers in retrieved text."}]
+    assert sync_documents(store, documents, manifest, encode=_encode)["upserted"] == 2
+    assert sync_documents(store, documents, manifest, encode=_encode) == {"unchanged": 2, "upserted": 0, "deleted": 0}
+
+    documents[0] = dict(documents[0], metadata={"source": "local_kb", "tags": ["python"]})
+    assert sync_documents(store, documents, manifest, encode=_encode) == {"unchanged": 1, "upserted": 1, "deleted": 0}
+    page = store.get(include=["metadatas"])
+    metadata = dict(zip(page["ids"], page["metadatas"]))
+    assert metadata["python.txt"]["tags"] == ["python"]
+    assert metadata["python.txt"]["source"] == "local_kb"
+    assert isinstance(metadata["python.txt"]["timestamp"], int)
+    assert metadata["rag.txt"]["source"] == "local_kb" and "timestamp" in metadata["rag.txt"]
@@ -0,0 +1,27 @@
+# Tests for writing documents through the knowledge base manager.
+#   python -m pytest react_rag_agent/tests
+import numpy as np
+
+from react_rag_agent import knowledge_base_manager as kb
+from react_rag_agent.lexical_index import BM25Index
+from react_rag_agent.vector_store import NumpyVectorStore
+
+
+class _Encoder:
+    def encode(self, texts):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_re_adding_an_id_replaces_it_in_both_indexes(tmp_path, monkeypatch):
+    lexical_index = BM25Index(str(tmp_path / "store.bm25.npz"))
+    monkeypatch.setattr(kb, "get_embedding_engine", lambda: _Encoder())
+    monkeypatch.setattr(kb, "get_lexical_index", lambda name=None: lexical_index)
+    store = NumpyVectorStore(str(tmp_path / "store"))
+
+    kb.add_documents_to_collection(store, [{"id": "keys.txt", "text": "Access keys rotate yearly."}], deduplicate=False)
+    counts = kb.add_documents_to_collection(store, [{"id": "keys.txt", "text": "Access keys rotate every 90 days."}], deduplicate=False)
+
+    assert counts["added"] == 1 and store.count() == 1
+    assert store.get(ids=["keys.txt"], include=["documents"])["documents"] == ["Access keys rotate every 90 days."]
+    assert [chunk_id for chunk_id, _ in lexical_index.search("90 days")] == ["keys.txt"]
+    assert lexical_index.search("yearly") == []
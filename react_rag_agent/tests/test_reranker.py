@@ -0,0 +1,28 @@
+# Tests for the cross-encoder reranker's handling of a model that cannot be loaded.
+#   python -m pytest react_rag_agent/tests
+import sys
+import types
+
+from react_rag_agent.reranker import CrossEncoderReranker
+
+
+def test_failed_model_load_is_not_retried_within_the_back_off(monkeypatch):
+    attempts = []
+
+    def unavailable(*args, **kwargs):
+        attempts.append(args)
+        raise OSError("no network")
+    monkeypatch.setitem(sys.modules, "sentence_transformers", types.SimpleNamespace(CrossEncoder=unavailable))
+    reranker = CrossEncoderReranker(model_name="offline/model", load_retry_s=60)
+    hits = [{"id": f"doc{i}.txt", "text": f"passage {i}"} for i in range(5)]
+
+    for _ in range(3):
+        reranked = reranker.rerank("query", hits, top_k=2)
+        assert [hit["id"] for hit in reranked] == ["doc0.txt", "doc1.txt"]
+        assert all(hit["rerank_score"] is None for hit in reranked)
+    assert len(attempts) == 1
+    assert reranker.is_unavailable() and reranker.stats()["unavailable_calls"] == 3
+
+    monkeypatch.setattr(reranker, "_retry_at", 0.0)
+    reranker.rerank("query", hits, top_k=2)
+    assert len(attempts) == 2
@@ -0,0 +1,58 @@
+# Tests for the NumPy vector store's IVF-PQ index on embedding sizes 48 subquantizers do not divide.
+#   python -m pytest react_rag_agent/tests
+import numpy as np
+import pytest
+
+from react_rag_agent import ivfpq, vector_store
+from react_rag_agent.vector_store import NumpyVectorStore
+
+
+def _rows(count: int, dim: int, seed: int = 0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim), dtype=np.float32)
+    return [f"doc{i}.txt#0" for i in range(count)], vectors
+
+
+def test_ivfpq_index_on_64_dimensions(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "IVF_MIN_TRAIN_ROWS", 1000)
+    store = NumpyVectorStore(str(tmp_path / "store"), index="ivfpq")
+    ids, vectors = _rows(1200, 64)
+    store.add(ids[:600], vectors[:600], documents=[f"text {i}" for i in range(600)])
+    assert store._ivf is None
+    store.add(ids[600:], vectors[600:], documents=[f"text {i}" for i in range(600, 1200)])
+    assert store.count() == 1200
+    assert store._ivf is not None and store._ivf.m == 32
+
+    reopened = NumpyVectorStore(str(tmp_path / "store"), index="ivfpq")
+    result = reopened.query(query_embeddings=[vectors[700].tolist()], n_results=3)
+    assert result["ids"][0][0] == ids[700]
+
+
+def test_subquantizer_count_defaults_to_a_divisor():
+    assert ivfpq.subquantizer_count(384) == 48
+    assert ivfpq.subquantizer_count(1024) == 32
+    assert ivfpq.subquantizer_count(64) == 32
+    with pytest.raises(ValueError):
+        ivfpq.subquantizer_count(64, 48)
+
+
+def test_explicit_subquantizers_are_checked_on_open(tmp_path, monkeypatch):
+    ids, vectors = _rows(10, 64)
+    NumpyVectorStore(str(tmp_path / "store")).add(ids, vectors)
+    monkeypatch.setattr(ivfpq, "SUBQUANTIZERS_SET", True)
+    monkeypatch.setattr(ivfpq, "DEFAULT_SUBQUANTIZERS", 48)
+    with pytest.raises(ValueError, match="subquantizers do not divide dimension 64"):
+        NumpyVectorStore(str(tmp_path / "store"), index="ivfpq")
+
+
+def test_failed_index_build_keeps_the_write(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_store, "IVF_MIN_TRAIN_ROWS", 300)
+    store = NumpyVectorStore(str(tmp_path / "store"), index="ivfpq")
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("out of memory")
+    monkeypatch.setattr(store, "build_index", fail)
+    ids, vectors = _rows(400, 64)
+    store.add(ids, vectors)
+    assert store.count() == 400 and store._ivf is None
+    result = store.query(query_embeddings=[vectors[5].tolist()], n_results=1)
+    assert result["ids"][0][0] == ids[5]
@@ -1,11 +1,56 @@
 # tools.py
 # Now uses ChromaDB for retrieval via knowledge_base_manager
-from react_rag_agent.knowledge_base_manager import get_or_create_collection, query_collection, COLLECTION_NAME
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from react_rag_agent.answer_cache import chunk_versions
+from react_rag_agent.embedding_cache import normalize_query
+from react_rag_agent.knowledge_base_manager import (
+    COLLECTION_NAME,
+    embed_queries,
+    get_chunk_embeddings,
+    get_chunks,
+    get_collection,
+    get_lexical_index,
+    get_query_embedding_cache,
+    invalidate_collection_cache,
+    query_collection,
+    query_collection_many,
+)
+from react_rag_agent.lexical_index import BM25Index
+from react_rag_agent.metadata_filter import Where, parse_filter
+from react_rag_agent.rank_fusion import reciprocal_rank_fusion
+from react_rag_agent.reranker import DEFAULT_RERANK_CANDIDATES, get_reranker, reranker_stats
+from react_rag_agent.retrieval_client import RetrievalClient
+
+NO_RESULTS_MESSAGE = "No relevant document found in ChromaDB for your query."
+# "hybrid" fuses BM25 and vector rankings (falling back to dense while no BM25 index exists); "dense" uses vectors only
+RETRIEVAL_MODE = os.environ.get("RAG_RETRIEVAL_MODE", "hybrid")
+HYBRID_CANDIDATES = int(os.environ.get("RAG_HYBRID_CANDIDATES", 20)) # Candidates taken from each retriever before fusion
+# Address of a retrieval_service ("http://127.0.0.1:8810" or "unix:/path"). When set, retrieval and query embedding run
+# there and this process never loads the embedding model or opens the store.
+RETRIEVAL_SERVICE = os.environ.get("RAG_RETRIEVAL_SERVICE")
+
+_service_client: Optional[RetrievalClient] = RetrievalClient(RETRIEVAL_SERVICE) if RETRIEVAL_SERVICE else None
+
+def use_retrieval_service(address: Optional[str]) -> Optional[RetrievalClient]:
+    """Sends retrieval to the service at `address` from now on, or back to in-process retrieval with None."""
+    global _service_client
+    if _service_client is not None:
+        _service_client.close()
+    _service_client = RetrievalClient(address) if address else None
+    return _service_client
+
+def get_retrieval_service() -> Optional[RetrievalClient]:
+    """The client retrieval goes through, or None when it runs in-process."""
+    return _service_client
 
 # The old functions retrieve_document_simple and retrieve_document_structured are removed
 # as their functionality is replaced by querying ChromaDB.
 
-def retrieve_information(query: str, n_results: int = 1) -> str:
+def retrieve_information(query: str, n_results: int = 1, where: Optional[Union[str, Where]] = None) -> str:
     """
     Primary retrieval function for the agent.
     Queries the ChromaDB collection for relevant documents.
@@ -13,13 +58,22 @@ def retrieve_information(query: str, n_results: int = 1) -> str:
     Args:
         query (str): The user's query text.
         n_results (int): Number of results to retrieve from ChromaDB.
+        where (Optional[Union[str, Where]]): Only retrieve chunks whose metadata matches this filter,
+                                             e.g. "tenant = acme and timestamp >= 1700000000" or a
+                                             Chroma `where` dict; see metadata_filter.py.
 
     Returns:
         str: A formatted string containing the retrieved document(s) or a "not found" message.
     """
     try:
-        collection = get_or_create_collection(collection_name=COLLECTION_NAME)
-        query_results = query_collection(collection, query_text=query, n_results=n_results)
+        if _service_client is not None or _active_lexical_index() is not None:
+            return format_hits(retrieve_many([query], n_results=n_results, where=where)[0])
+        try:
+            query_results = query_collection(get_collection(COLLECTION_NAME), query_text=query, n_results=n_results, where=where)
+        except Exception:
+            # The cached handle may be stale (collection deleted or recreated elsewhere); look it up again once
+            invalidate_collection_cache(COLLECTION_NAME)
+            query_results = query_collection(get_collection(COLLECTION_NAME), query_text=query, n_results=n_results, where=where)
 
         if query_results and query_results.get('documents') and query_results['documents'][0]:
             # Assuming documents[0] is a list of document texts for the first query
@@ -48,11 +102,185 @@ def retrieve_information(query: str, n_results: int = 1) -> str:
             return "\n".join(formatted_results)
 
         else:
-            return "No relevant document found in ChromaDB for your query."
+            return NO_RESULTS_MESSAGE
     except Exception as e:
         print(f"Error during retrieve_information: {e}")
         return f"Error retrieving information from ChromaDB: {e}"
 
+def _active_lexical_index(mode: Optional[str] = None) -> Optional[BM25Index]:
+    if (mode or RETRIEVAL_MODE) != "hybrid":
+        return None
+    index = get_lexical_index(COLLECTION_NAME)
+    return index if len(index) else None
+
+def retrieve_many(queries: List[str], n_results: int = 1, mode: Optional[str] = None,
+                  where: Optional[Union[str, Where]] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Retrieves documents for several queries with one batched embedding pass and one Chroma query.
+    Used for multi-query expansion and offline evaluation, where per-query round-trips add up.
+
+    In hybrid mode each query's vector ranking is fused with its BM25 ranking by reciprocal rank
+    fusion, so exact terms (product codes, identifiers, document names) are found even when
+    their embeddings are not close to the query's.
+
+    With `where`, the vector store applies the filter during search, and BM25 hits (the lexical
+    index holds no metadata) that do not match it are dropped before fusion.
+
+    Args:
+        queries (List[str]): Query texts.
+        n_results (int): Number of results to retrieve per query.
+        mode (Optional[str]): "hybrid" or "dense". Defaults to RETRIEVAL_MODE.
+        where (Optional[Union[str, Where]]): Metadata filter applied to every query; see retrieve_information().
+
+    Returns:
+        List[List[Dict[str, Any]]]: For each query, in order, its hits as dictionaries with
+                                    "id", "text", "distance" and "metadata" keys, best first.
+                                    Hybrid hits also carry their fused "score" and "bm25" score.
+    """
+    if not queries:
+        return []
+    where = parse_filter(where) # Parse once, and fail before any search on a malformed expression
+    if _service_client is not None:
+        return _service_client.retrieve(queries, n_results=n_results, mode=mode, where=where)
+    lexical_index = _active_lexical_index(mode)
+    candidates = max(n_results, HYBRID_CANDIDATES) if lexical_index is not None else n_results
+    dense_hits = _retrieve_dense(queries, candidates, where)
+    if lexical_index is None:
+        return dense_hits
+    return [
+        _fuse_hits(query, hits, _filter_lexical_hits(lexical_index.search(query, candidates), where), n_results)
+        for query, hits in zip(queries, dense_hits)
+    ]
+
+def retrieve_fused(queries: List[str], n_results: int = 1, mode: Optional[str] = None,
+                   where: Optional[Union[str, Where]] = None) -> List[Dict[str, Any]]:
+    """
+    Retrieves for several phrasings of one question (a search query plus paraphrases or
+    sub-questions) with a single retrieve_many call, so the extra queries share one embedding pass
+    and one vector query, and merges their rankings with reciprocal rank fusion. A chunk found by
+    several phrasings outranks one found by a single phrasing, and the best hits of a sub-question
+    surface even when the main query misses them.
+
+    Args:
+        queries (List[str]): The phrasings, main query first; blank and repeated ones are dropped.
+        n_results (int): Number of distinct hits to return, and to retrieve per phrasing.
+        mode (Optional[str]): "hybrid" or "dense". Defaults to RETRIEVAL_MODE.
+        where (Optional[Union[str, Where]]): Metadata filter applied to every phrasing.
+
+    Returns:
+        List[Dict[str, Any]]: The best `n_results` hits, shaped as by retrieve_many. With more than
+                              one phrasing, "score" is the fused score across phrasings.
+    """
+    queries = list(dict.fromkeys(query for query in queries if query and query.strip()))
+    rankings = retrieve_many(queries, n_results=n_results, mode=mode, where=where)
+    if len(rankings) <= 1:
+        return rankings[0] if rankings else []
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for hits in rankings:
+        for hit in hits:
+            by_id.setdefault(hit["id"], hit)
+    fused = reciprocal_rank_fusion([[hit["id"] for hit in hits] for hits in rankings])[:n_results]
+    return [dict(by_id[chunk_id], score=score) for chunk_id, score in fused]
+
+def _retrieve_dense(queries: List[str], n_results: int, where: Optional[Where] = None) -> List[List[Dict[str, Any]]]:
+    try:
+        query_results = query_collection_many(get_collection(COLLECTION_NAME), queries, n_results=n_results, where=where)
+    except Exception:
+        invalidate_collection_cache(COLLECTION_NAME)
+        query_results = query_collection_many(get_collection(COLLECTION_NAME), queries, n_results=n_results, where=where)
+
+    all_hits = []
+    for q in range(len(queries)):
+        ids = query_results['ids'][q] if q < len(query_results.get('ids') or []) else []
+        all_hits.append([
+            {
+                "id": ids[i],
+                "text": query_results['documents'][q][i],
+                "distance": query_results['distances'][q][i],
+                "metadata": query_results['metadatas'][q][i],
+            }
+            for i in range(len(ids))
+        ])
+    return all_hits
+
+def _filter_lexical_hits(lexical_hits: List[Tuple[str, float]], where: Optional[Where]) -> List[Tuple[str, float]]:
+    if where is None or not lexical_hits:
+        return lexical_hits
+    matching = set(get_collection(COLLECTION_NAME).get(ids=[chunk_id for chunk_id, _ in lexical_hits], where=where, include=[])["ids"])
+    return [(chunk_id, score) for chunk_id, score in lexical_hits if chunk_id in matching]
+
+def _fuse_hits(query: str, dense_hits: List[Dict[str, Any]], lexical_hits: List[Tuple[str, float]], n_results: int) -> List[Dict[str, Any]]:
+    fused = reciprocal_rank_fusion([[hit["id"] for hit in dense_hits], [chunk_id for chunk_id, _ in lexical_hits]])[:n_results]
+    by_id = {hit["id"]: hit for hit in dense_hits}
+    lexical_only = [chunk_id for chunk_id, _ in fused if chunk_id not in by_id]
+    if lexical_only:
+        # Found only by BM25: fetch text and metadata, and compute the vector distance so hits stay comparable
+        for hit in get_chunks(get_collection(COLLECTION_NAME), lexical_only, query_text=query):
+            by_id[hit["id"]] = hit
+    bm25_scores = dict(lexical_hits)
+    return [dict(by_id[chunk_id], score=score, bm25=bm25_scores.get(chunk_id, 0.0)) for chunk_id, score in fused if chunk_id in by_id]
+
+def retrieve_reranked(query: str, n_results: int = 2, candidates: int = DEFAULT_RERANK_CANDIDATES,
+                      budget_ms: Optional[float] = None, where: Optional[Union[str, Where]] = None) -> List[Dict[str, Any]]:
+    """
+    Two-stage retrieval: `candidates` hits from retrieve_many (restricted by the `where` metadata
+    filter, if any), reordered by the cross-encoder reranker within `budget_ms`, of which the best
+    `n_results` are returned (with "rerank_score").
+    """
+    if _service_client is not None:
+        return _service_client.retrieve([query], n_results=n_results, where=parse_filter(where), rerank=True,
+                                        candidates=candidates, budget_ms=budget_ms)[0]
+    hits = retrieve_many([query], n_results=max(candidates, n_results), where=where)[0]
+    return get_reranker().rerank(query, hits, top_k=n_results, budget_ms=budget_ms)
+
+def stored_chunk_versions(ids: List[str]) -> Dict[str, str]:
+    """Current version of each chunk in the collection (see answer_cache.chunk_versions); deleted chunks are absent."""
+    if _service_client is not None:
+        return _service_client.chunks(ids)["versions"]
+    return chunk_versions(get_chunks(get_collection(COLLECTION_NAME), ids))
+
+def query_embeddings(queries: List[str]) -> np.ndarray:
+    """Embeddings of queries as a (n, dim) float32 matrix, from the query embedding cache or the retrieval service."""
+    if _service_client is not None:
+        return _service_client.embed(queries)
+    return embed_queries(queries)
+
+def chunk_embeddings(ids: List[str]) -> np.ndarray:
+    """Stored embeddings of chunks as a (len(ids), dim) float32 matrix, in `ids` order."""
+    if _service_client is not None:
+        return _service_client.chunks(ids, embeddings=True)["embeddings"]
+    return get_chunk_embeddings(get_collection(COLLECTION_NAME), ids)
+
+def format_hits(hits: List[Dict[str, Any]]) -> str:
+    """Formats hits the same way retrieve_information does, for use in synthesis prompts."""
+    if not hits:
+        return NO_RESULTS_MESSAGE
+    return "\n".join(
+        f"Doc ID {hit['id']} (Similarity: {1-hit['distance']:.2f}): {hit['text']}" if hit.get('distance') is not None
+        else f"Doc ID {hit['id']}: {hit['text']}"
+        for hit in hits
+    )
+
+def query_similarity(query_a: str, query_b: str) -> float:
+    """Cosine similarity of two queries' embeddings (1.0 for queries that normalize to the same text)."""
+    if normalize_query(query_a) == normalize_query(query_b):
+        return 1.0
+    vectors = query_embeddings([query_a, query_b])
+    norms = np.linalg.norm(vectors, axis=1)
+    if not norms.all():
+        return 0.0
+    return float(vectors[0] @ vectors[1] / (norms[0] * norms[1]))
+
+def retrieval_cache_stats() -> Dict[str, Any]:
+    """Hit rates of the caches on the retrieval path (and the BM25 index size), for logging or a metrics endpoint."""
+    if _service_client is not None:
+        return {"service": _service_client.stats()}
+    return {
+        "query_embeddings": get_query_embedding_cache().stats(),
+        "lexical_index": get_lexical_index(COLLECTION_NAME).stats(),
+        "reranker": reranker_stats(),
+    }
+
 if __name__ == '__main__':
     print("Testing tools.py with ChromaDB integration...")
     print("Ensure ChromaDB is populated by running knowledge_base_manager.py first.")
@@ -81,3 +309,9 @@ if __name__ == '__main__':
     print(f"\nQuery: \"Python programming language\"") # More specific query
     retrieved_docs_specific = retrieve_information("Python programming language", n_results=1)
     print(f"Result:\n{retrieved_docs_specific}")
+
+    print("\n--- Testing retrieve_many (one batched query) ---")
+    for q_text, hits in zip(test_queries, retrieve_many(test_queries, n_results=2)):
+        print(f"{q_text!r}: {[hit['id'] for hit in hits]}")
+
+    print(f"\nRetrieval cache stats: {retrieval_cache_stats()}")
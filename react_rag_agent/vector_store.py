@@ -0,0 +1,886 @@
+# vector_store.py
+# Where chunk vectors live. Chroma is the default backend; NumpyVectorStore is a dependency-free
+# alternative with exact search for small and medium knowledge bases and an optional IVF-PQ index
+# for large ones.
+import json
+import mmap
+import os
+import shutil
+import threading
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from react_rag_agent.ivfpq import (DEFAULT_NPROBE, DEFAULT_TRAIN_SAMPLE, PQ_CENTROIDS, IVFPQIndex, default_list_count,
+                                  subquantizer_count)
+from react_rag_agent.metadata_filter import MetadataIndex, Where, parse_filter
+
+DEFAULT_VECTOR_DTYPE = os.environ.get("RAG_VECTOR_DTYPE", "float32") # float32, or float16 to halve memory and disk
+_FLOAT16_BLOCK_ROWS = 4096 # float16 rows cast to float32 per matrix product; small enough to stay in cache
+_COPY_BLOCK_ROWS = 65536
+_MIN_CAPACITY = 1024
+_LOG_PARSE_LINES = 65536
+_COMPACT_MIN_DEAD_ROWS = 1024 # Deleted rows are compacted away once they also outnumber the live ones
+
+DEFAULT_VECTOR_INDEX = os.environ.get("RAG_VECTOR_INDEX", "flat") # flat (exact) or ivfpq (approximate, see ivfpq.py)
+DEFAULT_IVF_REFINE = int(os.environ.get("RAG_IVF_REFINE", 16)) # IVF-PQ candidates per result re-scored exactly; 0 keeps PQ distances
+IVF_MIN_TRAIN_ROWS = int(os.environ.get("RAG_IVF_MIN_ROWS", 50_000)) # Below this, exact search is fast enough to skip the index
+_IVF_RETRAIN_GROWTH = 8 # The quantizers are retrained once the store outgrows the rows they were trained on 8x
+_FILTER_SUBSET_FRACTION = 0.25 # Filters matching at most this share of rows score just those rows instead of masking a full scan
+_IVF_UNSORTED_FRACTION = 0.1 # Rows appended since the inverted lists were last sorted are scanned through a mask up to this share
+
+_CURRENT_FILE = "CURRENT"
+_VECTORS_FILE = "vectors.npy"
+_DOCUMENTS_FILE = "documents.bin"
+_METADATA_FILE = "metadata.bin"
+_ROWS_FILE = "rows.jsonl"
+_IVF_FILE = "ivfpq.npz"
+_IVF_LISTS_FILE = "ivf_lists.npy"
+_IVF_CODES_FILE = "ivf_codes.npy"
+_BASE_IDS_FILE = "base_ids.bin"
+_BASE_SPANS_FILE = "base_spans.npy"
+
+
+class VectorStore:
+    """
+    The collection operations the agent, ingestion and indexes rely on. chromadb.Collection
+    provides them natively; other backends implement this subset with the same argument names and
+    Chroma-shaped results, so every caller works against either.
+
+    Besides the methods, a store has a `name` and a `metadata` dict whose "hnsw:space" entry
+    ("l2", "cosine" or "ip") says what query() distances mean.
+    """
+
+    name: str
+    metadata: Optional[Dict[str, Any]]
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def add(self, ids: List[str], embeddings: Any, documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Inserts new records; IDs already stored are left unchanged."""
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], embeddings: Any, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Inserts or replaces records."""
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[List[str]] = None) -> None:
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Records by ID, or a page of all records, optionally restricted to those whose metadata
+        matches `where` (Chroma syntax, see metadata_filter). Returns a dict with "ids" plus whichever
+        of "documents", "metadatas" and "embeddings" are in `include` (default documents and metadatas).
+        """
+        raise NotImplementedError
+
+    def query(self, query_embeddings: Any, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Nearest records for each query vector among those matching `where`. Returns a dict with
+        "ids" plus whichever of "documents", "metadatas", "distances" and "embeddings" are in
+        `include` (default documents, metadatas and distances), each holding one list per query,
+        nearest first.
+        """
+        raise NotImplementedError
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact nearest-neighbour search over a contiguous matrix of unit-length vectors, stored as a
+    memory-mapped .npy file. A query batch is one matrix product with the live rows followed by
+    argpartition for the top k, so there is no index to build or tune, opening the store is cheap,
+    and memory is the matrix itself (paged in by the OS) plus IDs and metadata. Distances are
+    cosine distances (1 - dot product), matching `metadata["hnsw:space"] == "cosine"`.
+
+    On disk, a store is a directory holding a CURRENT file that names the live generation
+    directory, which contains:
+
+        vectors.npy   (capacity, dim) float32 or float16, rows in insertion order
+        documents.bin UTF-8 chunk texts, back to back
+        metadata.bin  JSON metadata of each row, back to back
+        rows.jsonl    append-only log: [ID, text offset, text length, metadata offset, metadata
+                      length] per inserted row (length -1 if absent), and [ID] per delete; the
+                      n-th insert line describes row n
+        base_ids.bin, base_spans.npy
+                      optional binary row table (NUL-separated IDs and an (n, 4) int64 array of
+                      the same offsets) for rows [0, n), written by compact() and restore(); the
+                      log then starts at row n
+
+    Texts and metadata are read from disk only for the rows a call returns, so what a store keeps
+    in memory per row is its ID and four integers, and opening it parses only the compact log, or
+    loads the row table of a compacted or restored generation without parsing any JSON.
+    Writes append the vectors, texts and metadata first and the log lines last, so a crash mid-write leaves
+    rows the log does not know about, which are ignored and overwritten. Upserts and deletes only
+    mark old rows dead; once dead rows outnumber live ones, compact() rewrites a new generation
+    and switches CURRENT to it atomically. Stores opened by other processes follow the log on
+    each call, so one writer (an ingestion run) and any number of readers can share a store.
+
+    With index="ivfpq", a store of IVF_MIN_TRAIN_ROWS or more live rows trains an IVFPQIndex
+    (ivfpq.npz) and keeps each row's inverted list and PQ code in ivf_lists.npy / ivf_codes.npy,
+    row-aligned with the vectors and written with them. Queries then scan only the codes of the
+    `nprobe` nearest lists (48 bytes per row by default instead of 1536) and re-score the best
+    `refine` * n_results candidates exactly, so the float32 matrix is only touched for a few rows
+    per query and need not fit in memory. Smaller stores, and stores opened with index="flat",
+    search exactly; once built, the index is kept up to date by every writer.
+
+    `where` filters are evaluated with a metadata_filter.MetadataIndex, built from metadata.bin on
+    the first filtered call and then extended as rows are written. A filter matching a small share
+    of the rows scores only those rows, so its cost follows the size of the filtered subset.
+    """
+
+    def __init__(self, path: str, name: Optional[str] = None, dtype: str = DEFAULT_VECTOR_DTYPE,
+                 index: str = DEFAULT_VECTOR_INDEX, nprobe: int = DEFAULT_NPROBE, refine: int = DEFAULT_IVF_REFINE):
+        """
+        Args:
+            path: Directory of the store; created on first write.
+            name: Collection name reported as `name`. Defaults to the directory name.
+            dtype: "float32" or "float16" for new stores; existing stores keep the dtype they were created with.
+            index: "flat" for exact search, or "ivfpq" to build and search an IVF-PQ index.
+            nprobe: Inverted lists scanned per query with the IVF-PQ index; more is slower and more accurate.
+            refine: IVF-PQ candidates per requested result that are re-scored with the exact vectors.
+        """
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported vector dtype '{dtype}'; use float32 or float16.")
+        if index not in ("flat", "ivfpq"):
+            raise ValueError(f"Unknown vector index '{index}'; use flat or ivfpq.")
+        self.index = index
+        self.nprobe = nprobe
+        self.refine = refine
+        self.path = path
+        self.name = name or os.path.basename(os.path.normpath(path))
+        self.metadata: Dict[str, Any] = {"hnsw:space": "cosine"}
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.RLock()
+        self._index_failed_rows: Optional[int] = None # Live rows when an automatic index build last failed
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self._generation: Optional[str] = None
+        self._vectors: Optional[np.memmap] = None
+        self._vectors_inode: Optional[int] = None
+        self._ids: List[str] = [] # Per row, dead rows included
+        self._spans = np.zeros((0, 4), dtype=np.int64) # Per row: text offset, text length, metadata offset, metadata length
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows: Dict[str, int] = {} # Live ID -> row
+        self._size = 0 # Rows used, dead ones included
+        self._log_position = 0
+        self._documents_fd: Optional[int] = None
+        self._metadata_fd: Optional[int] = None
+        self._metadata_index: Optional[MetadataIndex] = None # Built on the first filtered call, then kept current
+        self._ivf: Optional[IVFPQIndex] = None
+        self._ivf_mtime: Optional[float] = None
+        self._ivf_lists: Optional[np.memmap] = None # (capacity,) int32 inverted list of each row
+        self._ivf_codes: Optional[np.memmap] = None # (capacity, m) uint8 PQ code of each row
+        self._reset_inverted_lists()
+
+    def _reset_inverted_lists(self) -> None:
+        self._list_rows: Optional[np.ndarray] = None # Rows [0, _sorted_rows) sorted by inverted list
+        self._list_codes: Optional[np.ndarray] = None # (m, _sorted_rows) their PQ codes in the same order
+        self._list_offsets: Optional[np.ndarray] = None # Where each list starts in both
+        self._sorted_rows = 0
+
+    # -- files ---------------------------------------------------------------------------------
+
+    def _file(self, file_name: str, generation: Optional[str] = None) -> str:
+        return os.path.join(self.path, generation or self._generation, file_name)
+
+    def _read_current(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, _CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _close_files(self) -> None:
+        for fd in (self._documents_fd, self._metadata_fd):
+            if fd is not None:
+                os.close(fd)
+        self._documents_fd = self._metadata_fd = None
+        self._vectors = self._ivf_lists = self._ivf_codes = None
+
+    def _load(self) -> None:
+        self._close_files()
+        self._reset()
+        self._generation = self._read_current()
+        if self._generation is None:
+            return
+        self._documents_fd = os.open(self._file(_DOCUMENTS_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        self._metadata_fd = os.open(self._file(_METADATA_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        self._open_vectors()
+        self.dtype = self._vectors.dtype
+        self._check_index_dimension(self._vectors.shape[1])
+        ids, spans = read_row_table(os.path.join(self.path, self._generation))
+        if len(ids) > len(self._alive):
+            raise RuntimeError(f"Vector store '{self.path}' is inconsistent: its row table has more rows than vectors.npy.")
+        if ids:
+            self._ids, self._size = ids, len(ids)
+            self._rows = dict(zip(ids, range(len(ids))))
+            self._alive[:self._size] = True
+            self._spans[:self._size] = spans
+        self._follow_log()
+
+    def _check_index_dimension(self, dim: int) -> None:
+        # Rejects an explicit RAG_PQ_SUBQUANTIZERS that cannot split `dim` on open, rather than on
+        # the write that reaches IVF_MIN_TRAIN_ROWS
+        if self.index == "ivfpq":
+            subquantizer_count(dim)
+
+    def _open_vectors(self) -> None:
+        vectors_path = self._file(_VECTORS_FILE)
+        self._vectors = np.lib.format.open_memmap(vectors_path, mode="r+")
+        self._vectors_inode = os.stat(vectors_path).st_ino
+        if len(self._alive) < len(self._vectors):
+            alive = np.zeros(len(self._vectors), dtype=bool)
+            alive[:len(self._alive)] = self._alive
+            self._alive = alive
+            spans = np.zeros((len(self._vectors), 4), dtype=np.int64)
+            spans[:len(self._spans)] = self._spans
+            self._spans = spans
+        self._open_ivf()
+
+    def _open_ivf(self) -> None:
+        # The index files are grown before the vectors, so they always cover the vectors' capacity
+        ivf_path = self._file(_IVF_FILE)
+        mtime = os.path.getmtime(ivf_path) if os.path.exists(ivf_path) else None
+        if mtime is None:
+            self._ivf = self._ivf_lists = self._ivf_codes = self._ivf_mtime = None
+            return
+        if mtime != self._ivf_mtime:
+            self._ivf = IVFPQIndex.load(ivf_path)
+            self._ivf_mtime = mtime
+            self._reset_inverted_lists()
+        self._ivf_lists = np.lib.format.open_memmap(self._file(_IVF_LISTS_FILE), mode="r+")
+        self._ivf_codes = np.lib.format.open_memmap(self._file(_IVF_CODES_FILE), mode="r+")
+
+    def _follow_log(self) -> None:
+        # Applies log lines written since the last call (by this or another process). A partially
+        # written last line is left for the next call.
+        with open(self._file(_ROWS_FILE), "ab+") as f:
+            f.seek(self._log_position)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return
+        rows = self._rows
+        for records in self._parse_log(data[:end - 1].split(b"\n")):
+            inserts = [record for record in records if len(record) > 1]
+            if self._size + len(inserts) > len(self._alive):
+                raise RuntimeError(f"Vector store '{self.path}' is inconsistent: rows.jsonl has more rows than vectors.npy.")
+            if len(inserts) == len(records) and rows.keys().isdisjoint(record[0] for record in records):
+                # Only new IDs, the usual case when opening a store: apply the slice in bulk
+                start, self._size = self._size, self._size + len(records)
+                live_before = len(rows)
+                self._ids.extend(record[0] for record in records)
+                rows.update(zip(self._ids[start:], range(start, self._size)))
+                self._alive[start:self._size] = True
+                if len(rows) - live_before < len(records): # An ID repeated within the slice: only its last row is live
+                    self._alive[start:self._size] = False
+                    self._alive[[rows[chunk_id] for chunk_id in set(self._ids[start:])]] = True
+                self._spans[start:self._size] = np.fromiter(chain.from_iterable(record[1:] for record in records),
+                                                            dtype=np.int64, count=4 * len(records)).reshape(-1, 4)
+                continue
+            for record in records:
+                row = rows.pop(record[0], None)
+                if row is not None:
+                    self._alive[row] = False
+                if len(record) == 1: # Delete
+                    continue
+                row = self._size
+                rows[record[0]] = row
+                self._alive[row] = True
+                self._ids.append(record[0])
+                self._spans[row] = record[1:]
+                self._size += 1
+        self._log_position += end
+
+    @staticmethod
+    def _parse_log(lines: List[bytes]) -> Iterator[List[List[Any]]]:
+        # One json.loads per slice of lines rather than per line is several times faster on open;
+        # slicing bounds the transient memory of the parsed records
+        for start in range(0, len(lines), _LOG_PARSE_LINES):
+            yield json.loads(b"[" + b",".join(lines[start:start + _LOG_PARSE_LINES]) + b"]")
+
+    def refresh(self) -> None:
+        """Picks up changes another process has written (new log lines, grown matrix or a compaction)."""
+        with self._lock:
+            generation = self._read_current()
+            if generation != self._generation:
+                self._load()
+                return
+            if generation is None:
+                return
+            ivf_path = self._file(_IVF_FILE)
+            if os.stat(self._file(_VECTORS_FILE)).st_ino != self._vectors_inode or \
+                    (os.path.getmtime(ivf_path) if os.path.exists(ivf_path) else None) != self._ivf_mtime:
+                self._open_vectors()
+            if os.path.getsize(self._file(_ROWS_FILE)) != self._log_position:
+                self._follow_log()
+
+    def _create(self, dim: int) -> None:
+        generation = "g1"
+        os.makedirs(os.path.join(self.path, generation), exist_ok=True)
+        np.lib.format.open_memmap(self._file(_VECTORS_FILE, generation), mode="w+", dtype=self.dtype,
+                                  shape=(_MIN_CAPACITY, dim)).flush()
+        for file_name in (_DOCUMENTS_FILE, _METADATA_FILE, _ROWS_FILE):
+            open(self._file(file_name, generation), "wb").close()
+        self._switch_current(generation)
+        self._load()
+
+    def _switch_current(self, generation: str) -> None:
+        tmp_path = os.path.join(self.path, f"{_CURRENT_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(generation)
+        os.replace(tmp_path, os.path.join(self.path, _CURRENT_FILE))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        capacity, dim = self._vectors.shape
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, 2 * capacity)
+        if self._ivf is not None:
+            self._grow(_IVF_LISTS_FILE, self._ivf_lists, new_capacity)
+            self._grow(_IVF_CODES_FILE, self._ivf_codes, new_capacity)
+        self._grow(_VECTORS_FILE, self._vectors, new_capacity)
+        self._open_vectors()
+
+    def _grow(self, file_name: str, matrix: np.ndarray, capacity: int) -> None:
+        path = self._file(file_name)
+        tmp_path = f"{path}.tmp"
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=matrix.dtype, shape=(capacity,) + matrix.shape[1:])
+        grown[:self._size] = matrix[:self._size]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, path)
+
+    # -- writes --------------------------------------------------------------------------------
+
+    def _write(self, ids: List[str], embeddings: Any, documents: Optional[List[str]], metadatas: Optional[List[Dict[str, Any]]]) -> None:
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate IDs in one write.")
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        if self._generation is None:
+            self._check_index_dimension(vectors.shape[1])
+            self._create(vectors.shape[1])
+        if vectors.shape[1] != self._vectors.shape[1]:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store's dimension {self._vectors.shape[1]}.")
+        start = self._size
+        self._ensure_capacity(start + len(ids))
+        vectors = _normalize(vectors)
+        self._vectors[start:start + len(ids)] = vectors
+        self._vectors.flush()
+        if self._ivf is not None:
+            lists, codes = self._ivf.encode(vectors)
+            self._ivf_lists[start:start + len(ids)] = lists
+            self._ivf_codes[start:start + len(ids)] = codes
+            self._ivf_lists.flush()
+            self._ivf_codes.flush()
+
+        texts = [text.encode("utf-8") if text is not None else None for text in documents or [None] * len(ids)]
+        metadata = [json.dumps(entry, separators=(",", ":")).encode("utf-8") if entry is not None else None
+                    for entry in metadatas or [None] * len(ids)]
+        text_spans = self._append_blobs(self._documents_fd, texts)
+        metadata_spans = self._append_blobs(self._metadata_fd, metadata)
+        self._append_log([json.dumps([chunk_id, *text_spans[i], *metadata_spans[i]]) for i, chunk_id in enumerate(ids)])
+        if self._metadata_index is not None and self._metadata_index.rows == start:
+            self._metadata_index.add(start, metadatas or [None] * len(ids))
+
+    @staticmethod
+    def _append_blobs(fd: int, blobs: List[Optional[bytes]]) -> List[Tuple[int, int]]:
+        # Appends the non-None blobs in one write; returns (offset, length) per blob, (0, -1) for None
+        end = position = os.fstat(fd).st_size
+        spans = []
+        for blob in blobs:
+            if blob is None:
+                spans.append((0, -1))
+            else:
+                spans.append((position, len(blob)))
+                position += len(blob)
+        if position > end:
+            os.pwrite(fd, b"".join(blob for blob in blobs if blob is not None), end)
+        return spans
+
+    def _append_log(self, records: List[str]) -> None:
+        with open(self._file(_ROWS_FILE), "ab") as f:
+            f.truncate(self._log_position) # Drops a line left half-written by a writer that crashed
+            f.write(("\n".join(records) + "\n").encode("utf-8"))
+        self._follow_log()
+
+    def add(self, ids: List[str], embeddings: Any, documents: Optional[List[str]] = None,
+            metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        with self._lock:
+            self.refresh()
+            new = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._rows]
+            if len(new) < len(ids):
+                print(f"Vector store '{self.name}': skipping {len(ids) - len(new)} IDs that already exist (use upsert to replace them).")
+            if not new:
+                return
+            embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)[new]
+            self._write([ids[i] for i in new], embeddings,
+                        [documents[i] for i in new] if documents is not None else None,
+                        [metadatas[i] for i in new] if metadatas is not None else None)
+            self._maybe_build_index()
+
+    def upsert(self, ids: List[str], embeddings: Any, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self.refresh()
+            self._write(ids, embeddings, documents, metadatas)
+            self._maybe_compact()
+            self._maybe_build_index()
+
+    def delete(self, ids: Optional[List[str]] = None) -> None:
+        with self._lock:
+            self.refresh()
+            records = [json.dumps([chunk_id]) for chunk_id in ids or [] if chunk_id in self._rows]
+            if not records:
+                return
+            self._append_log(records)
+            self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        dead = self._size - len(self._rows)
+        if dead >= _COMPACT_MIN_DEAD_ROWS and dead > len(self._rows):
+            self.compact()
+
+    def _maybe_build_index(self) -> None:
+        if self.index != "ivfpq":
+            return
+        trained_rows = self._ivf.trained_rows if self._ivf is not None else 0
+        if len(self._rows) < max(IVF_MIN_TRAIN_ROWS, PQ_CENTROIDS, _IVF_RETRAIN_GROWTH * trained_rows):
+            return
+        if self._index_failed_rows is not None and len(self._rows) < 2 * self._index_failed_rows:
+            return # Retried once the store has doubled, not on every write
+        try:
+            self.build_index()
+            self._index_failed_rows = None
+        except Exception as e:
+            # The write that triggered the build has already been applied; searches stay exact
+            # (or keep using the previous index) until a build succeeds
+            self._index_failed_rows = len(self._rows)
+            print(f"Vector store '{self.name}': building the IVF-PQ index failed ({e}); searching without it.")
+
+    def build_index(self, n_lists: Optional[int] = None, m: Optional[int] = None, sample_size: Optional[int] = None) -> None:
+        """
+        Trains the IVF-PQ quantizers on the live rows and encodes every row. Runs automatically with
+        index="ivfpq" when the store reaches IVF_MIN_TRAIN_ROWS and whenever it has grown 8x since;
+        call it directly to build or rebuild the index at another time or with other parameters.
+
+        Args:
+            n_lists: Inverted lists. Defaults to about sqrt(live rows).
+            m: Subquantizers, i.e. bytes per code; must divide the dimension. Defaults to
+               RAG_PQ_SUBQUANTIZERS, else the largest divisor of the dimension up to 48.
+            sample_size: Rows sampled for training (default ivfpq.DEFAULT_TRAIN_SAMPLE).
+        """
+        with self._lock:
+            self.refresh()
+            live = np.flatnonzero(self._alive[:self._size])
+            n_lists = n_lists or default_list_count(len(live))
+            sample_size = sample_size or max(DEFAULT_TRAIN_SAMPLE, 40 * n_lists)
+            sample = np.sort(np.random.default_rng(0).choice(live, min(sample_size, len(live)), replace=False))
+            m = subquantizer_count(self._vectors.shape[1], m)
+            print(f"Vector store '{self.name}': training IVF-PQ ({n_lists} lists, {m} bytes per code) on {len(sample)} of {len(live)} rows...")
+            index = IVFPQIndex.train(np.asarray(self._vectors[sample], dtype=np.float32), n_lists=n_lists, m=m)
+            index.trained_rows = len(live)
+            capacity = len(self._vectors)
+            lists = np.lib.format.open_memmap(self._file(_IVF_LISTS_FILE), mode="w+", dtype=np.int32, shape=(capacity,))
+            codes = np.lib.format.open_memmap(self._file(_IVF_CODES_FILE), mode="w+", dtype=np.uint8, shape=(capacity, index.m))
+            for start in range(0, self._size, _COPY_BLOCK_ROWS):
+                block = np.asarray(self._vectors[start:min(start + _COPY_BLOCK_ROWS, self._size)], dtype=np.float32)
+                lists[start:start + len(block)], codes[start:start + len(block)] = index.encode(block)
+            lists.flush()
+            codes.flush()
+            del lists, codes
+            index.save(self._file(_IVF_FILE)) # Last: its presence means the codes cover every row
+            self._open_vectors()
+            print(f"Vector store '{self.name}': IVF-PQ index built.")
+
+    def compact(self) -> None:
+        """Rewrites the store without dead rows into a new generation and switches to it."""
+        with self._lock:
+            self.refresh()
+            if self._generation is None:
+                return
+            live = np.flatnonzero(self._alive[:self._size])
+            generation = f"g{int(self._generation[1:]) + 1}"
+            directory = os.path.join(self.path, generation)
+            shutil.rmtree(directory, ignore_errors=True) # Left over from an interrupted compaction
+            os.makedirs(directory)
+            dim = self._vectors.shape[1]
+            vectors = np.lib.format.open_memmap(self._file(_VECTORS_FILE, generation), mode="w+", dtype=self.dtype,
+                                                shape=(max(_MIN_CAPACITY, len(live)), dim))
+            for start in range(0, len(live), _COPY_BLOCK_ROWS):
+                block = live[start:start + _COPY_BLOCK_ROWS]
+                vectors[start:start + len(block)] = self._vectors[block]
+            vectors.flush()
+            del vectors
+            if self._ivf is not None:
+                for file_name, matrix in ((_IVF_LISTS_FILE, self._ivf_lists), (_IVF_CODES_FILE, self._ivf_codes)):
+                    compacted = np.lib.format.open_memmap(self._file(file_name, generation), mode="w+", dtype=matrix.dtype,
+                                                          shape=(max(_MIN_CAPACITY, len(live)),) + matrix.shape[1:])
+                    compacted[:len(live)] = matrix[live]
+                    compacted.flush()
+                    del compacted
+                shutil.copyfile(self._file(_IVF_FILE), self._file(_IVF_FILE, generation))
+            spans = np.zeros((len(live), 4), dtype=np.int64)
+            with open(self._file(_DOCUMENTS_FILE, generation), "wb") as documents, \
+                    open(self._file(_METADATA_FILE, generation), "wb") as metadata:
+                for i, row in enumerate(live.tolist()):
+                    for out, fd, span in ((documents, self._documents_fd, 0), (metadata, self._metadata_fd, 2)):
+                        blob = self._read_blob(fd, row, span)
+                        spans[i, span:span + 2] = (out.tell(), len(blob)) if blob is not None else (0, -1)
+                        if blob is not None:
+                            out.write(blob)
+            write_row_table(os.path.join(self.path, generation), [self._ids[row] for row in live.tolist()], spans)
+            open(self._file(_ROWS_FILE, generation), "wb").close()
+            old_generation = self._generation
+            self._switch_current(generation)
+            self._load()
+            shutil.rmtree(os.path.join(self.path, old_generation), ignore_errors=True)
+            print(f"Vector store '{self.name}' compacted to {len(live)} rows.")
+
+    def restore(self, directory: str) -> None:
+        """
+        Replaces the store's contents with the rows of a generation written by GenerationWriter at
+        `directory` (e.g. a snapshot, see snapshots.py). The files are copied into a new generation,
+        so later writes leave `directory` untouched; other processes switch to it on their next
+        call, as after a compaction.
+        """
+        with self._lock:
+            self.refresh()
+            generation = f"g{int(self._generation[1:]) + 1}" if self._generation else "g1"
+            target = os.path.join(self.path, generation)
+            shutil.rmtree(target, ignore_errors=True)
+            os.makedirs(target)
+            for file_name in GenerationWriter.FILES:
+                shutil.copyfile(os.path.join(directory, file_name), os.path.join(target, file_name))
+            open(os.path.join(target, _ROWS_FILE), "wb").close()
+            old_generation = self._generation
+            self._switch_current(generation)
+            self._load()
+            if old_generation is not None:
+                shutil.rmtree(os.path.join(self.path, old_generation), ignore_errors=True)
+            self._maybe_build_index()
+
+    def prefetch(self) -> int:
+        """
+        Reads one byte of every page of the data queries scan, so it is resident before the first
+        query instead of being faulted in by it: the vectors, or with an IVF-PQ index only the
+        lists and codes. Returns the bytes covered.
+        """
+        with self._lock:
+            self.refresh()
+            if self._generation is None:
+                return 0
+            matrices = (self._ivf_lists, self._ivf_codes) if self.index == "ivfpq" and self._ivf is not None else (self._vectors,)
+            covered = 0
+            for matrix in matrices:
+                data = np.asarray(matrix[:self._size]).reshape(-1).view(np.uint8)
+                int(data[::mmap.PAGESIZE].sum(dtype=np.uint64))
+                covered += data.nbytes
+            return covered
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_files()
+
+    # -- reads ---------------------------------------------------------------------------------
+
+    def _read_blob(self, fd: int, row: int, span: int) -> Optional[bytes]:
+        offset, length = self._spans[row, span:span + 2].tolist()
+        return os.pread(fd, length, offset) if length >= 0 else None
+
+    def _read_document(self, row: int) -> Optional[str]:
+        data = self._read_blob(self._documents_fd, row, 0)
+        return data.decode("utf-8") if data is not None else None
+
+    def _read_metadata(self, row: int) -> Optional[Dict[str, Any]]:
+        data = self._read_blob(self._metadata_fd, row, 2)
+        return json.loads(data) if data is not None else None
+
+    def _records(self, rows: Sequence[int], include: List[str], distances: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"ids": [self._ids[row] for row in rows], "include": include}
+        if "documents" in include:
+            result["documents"] = [self._read_document(row) for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self._read_metadata(row) for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(self._vectors[np.asarray(rows, dtype=np.int64)], dtype=np.float32)
+        if "distances" in include and distances is not None:
+            result["distances"] = distances.tolist()
+        return result
+
+    def count(self) -> int:
+        with self._lock:
+            self.refresh()
+            return len(self._rows)
+
+    def _read_metadata_block(self, start: int, end: int) -> List[Optional[Dict[str, Any]]]:
+        # Metadata of rows [start, end) with one read: rows' blobs are appended in row order
+        spans = self._spans[start:end, 2:4]
+        present = spans[:, 1] >= 0
+        if not present.any():
+            return [None] * (end - start)
+        low = int(spans[present, 0].min())
+        data = os.pread(self._metadata_fd, int((spans[present, 0] + spans[present, 1]).max()) - low, low)
+        return [json.loads(data[offset - low:offset - low + length]) if length >= 0 else None for offset, length in spans.tolist()]
+
+    def _filter_mask(self, where: Where) -> np.ndarray:
+        # Live rows matching `where`, as a boolean mask over rows [0, _size)
+        if self._metadata_index is None:
+            self._metadata_index = MetadataIndex()
+        for start in range(self._metadata_index.rows, self._size, _COPY_BLOCK_ROWS):
+            end = min(start + _COPY_BLOCK_ROWS, self._size)
+            self._metadata_index.add(start, self._read_metadata_block(start, end))
+        return self._metadata_index.mask(where, self._size) & self._alive[:self._size]
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = list(include) if include is not None else ["documents", "metadatas"]
+        where = parse_filter(where)
+        with self._lock:
+            self.refresh()
+            allowed = self._filter_mask(where) if where is not None else None
+            if ids is not None:
+                rows = [self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows]
+                rows = [row for row in rows if allowed[row]] if allowed is not None else rows
+            else:
+                live = np.flatnonzero(allowed if allowed is not None else self._alive[:self._size])
+                start = offset or 0
+                rows = live[start:start + limit if limit is not None else None].tolist()
+            return self._records(rows, include)
+
+    def _scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        # (n_queries, rows) cosine similarities with all rows, or only `rows`: a single BLAS matrix
+        # product for float32 storage
+        matrix = np.asarray(self._vectors[:self._size])
+        count = self._size if rows is None else len(rows)
+        if matrix.dtype == np.float32:
+            return queries @ (matrix if rows is None else matrix[rows]).T
+        scores = np.empty((len(queries), count), dtype=np.float32)
+        for start in range(0, count, _FLOAT16_BLOCK_ROWS):
+            block = matrix[start:start + _FLOAT16_BLOCK_ROWS] if rows is None else matrix[rows[start:start + _FLOAT16_BLOCK_ROWS]]
+            scores[:, start:start + len(block)] = queries @ np.asarray(block, dtype=np.float32).T
+        return scores
+
+    def _inverted_lists(self) -> None:
+        # Rows and codes grouped by inverted list, so a probed list is a contiguous slice. Rebuilt
+        # lazily; rows appended since are found by scanning their list numbers, until they pass a
+        # share of the store.
+        if self._list_rows is not None and self._size - self._sorted_rows <= _IVF_UNSORTED_FRACTION * self._size:
+            return
+        lists = np.asarray(self._ivf_lists[:self._size])
+        self._list_rows = np.argsort(lists, kind="stable")
+        self._list_codes = np.ascontiguousarray(np.asarray(self._ivf_codes[:self._size])[self._list_rows].T)
+        self._list_offsets = np.zeros(self._ivf.n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(lists, minlength=self._ivf.n_lists), out=self._list_offsets[1:])
+        self._sorted_rows = self._size
+
+    def _ivf_search(self, query: np.ndarray, k: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        # (rows, cosine similarities) of the approximate top k for one normalized query among the
+        # `allowed` rows (default: live ones), best first
+        allowed = allowed if allowed is not None else self._alive
+        self._inverted_lists()
+        tail_lists = np.asarray(self._ivf_lists[self._sorted_rows:self._size])
+        nprobe = self.nprobe
+        while True:
+            lists = self._ivf.probe(query, nprobe)
+            probe_index = np.full(self._ivf.n_lists, -1, dtype=np.int64)
+            probe_index[lists] = np.arange(len(lists))
+            starts, ends = self._list_offsets[lists], self._list_offsets[lists + 1]
+            tail = np.flatnonzero(probe_index[tail_lists] >= 0)
+            candidates = np.concatenate([self._list_rows[a:b] for a, b in zip(starts.tolist(), ends.tolist())] + [self._sorted_rows + tail])
+            alive = allowed[candidates]
+            live = int(alive.sum())
+            if live >= k or len(lists) == self._ivf.n_lists:
+                break
+            nprobe *= 2 # Too few live rows in the nearest lists
+        columns = np.concatenate([self._list_codes[:, a:b] for a, b in zip(starts.tolist(), ends.tolist())] +
+                                 [np.asarray(self._ivf_codes[self._sorted_rows + tail]).T], axis=1)
+        probe_of = np.concatenate([np.repeat(np.arange(len(lists)), ends - starts), probe_index[tail_lists[tail]]])
+        distances = self._ivf.adc(self._ivf.distance_tables(query, lists), probe_of, columns)
+        distances[~alive] = np.inf
+        keep = min(live, k * self.refine if self.refine > 0 else k)
+        best = np.argpartition(distances, keep - 1)[:keep] if keep < len(candidates) else np.arange(len(candidates))
+        order = np.argsort(candidates[best])
+        rows, best = candidates[best][order], best[order] # Row order reads the vectors sequentially
+        if self.refine > 0:
+            scores = np.asarray(self._vectors[rows], dtype=np.float32) @ query
+        else:
+            scores = 1.0 - distances[best] / 2.0 # Unit vectors: cosine = 1 - ||x - q||^2 / 2
+        order = np.argsort(-scores, kind="stable")[:k]
+        return rows[order], scores[order]
+
+    def query(self, query_embeddings: Any, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, Any]:
+        include = list(include) if include is not None else ["documents", "metadatas", "distances"]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = _normalize(queries.reshape(1, -1) if queries.ndim == 1 else queries)
+        where = parse_filter(where)
+        with self._lock:
+            self.refresh()
+            results: Dict[str, Any] = {key: [] for key in ["ids"] + include}
+            results["include"] = include
+            allowed = self._filter_mask(where) if where is not None else None
+            live = len(self._rows) if allowed is None else int(allowed.sum())
+            k = min(n_results, live)
+            if k <= 0:
+                for key in ["ids"] + include:
+                    results[key] = [[] for _ in queries]
+                return results
+            if queries.shape[1] != self._vectors.shape[1]:
+                raise ValueError(f"Query dimension {queries.shape[1]} does not match the store's dimension {self._vectors.shape[1]}.")
+            ivf = self._ivf if self.index == "ivfpq" else None
+            # A selective filter is cheapest (and exact) by scoring only its rows; with the IVF-PQ index,
+            # only while those are fewer than the codes a probe would scan
+            subset_limit = _FILTER_SUBSET_FRACTION * self._size if ivf is None else self._size * self.nprobe / ivf.n_lists
+            if allowed is not None and live <= subset_limit:
+                rows = np.flatnonzero(allowed)
+                scores = self._scores(queries, rows)
+            elif ivf is not None:
+                for query in queries:
+                    rows, scores = self._ivf_search(query, k, allowed)
+                    record = self._records(rows.tolist(), include, 1.0 - scores)
+                    for key in ["ids"] + include:
+                        results[key].append(record.get(key))
+                return results
+            else:
+                rows = None
+                scores = self._scores(queries)
+                if live < self._size:
+                    scores[:, ~(allowed if allowed is not None else self._alive[:self._size])] = -np.inf
+            if k < scores.shape[1]:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")[:, :k]
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            if rows is not None:
+                top = rows[top]
+            for q in range(len(queries)):
+                record = self._records(top[q].tolist(), include, 1.0 - top_scores[q])
+                for key in ["ids"] + include:
+                    results[key].append(record.get(key))
+            return results
+
+
+def read_row_table(directory: str) -> Tuple[List[str], np.ndarray]:
+    """IDs and (n, 4) spans of a generation's binary row table; empty if it has none."""
+    spans_path = os.path.join(directory, _BASE_SPANS_FILE)
+    if not os.path.exists(spans_path):
+        return [], np.zeros((0, 4), dtype=np.int64)
+    spans = np.load(spans_path)
+    with open(os.path.join(directory, _BASE_IDS_FILE), "rb") as f:
+        ids = f.read().decode("utf-8").split("\0") if len(spans) else []
+    if len(ids) != len(spans):
+        raise RuntimeError(f"Row table in '{directory}' is inconsistent: {len(ids)} IDs for {len(spans)} rows.")
+    return ids, spans
+
+
+def write_row_table(directory: str, ids: List[str], spans: np.ndarray) -> None:
+    # The spans go last, as their presence is what marks a generation as having a row table
+    with open(os.path.join(directory, _BASE_IDS_FILE), "wb") as f:
+        f.write("\0".join(ids).encode("utf-8"))
+    np.save(os.path.join(directory, _BASE_SPANS_FILE), np.asarray(spans, dtype=np.int64).reshape(-1, 4))
+
+
+class GenerationWriter:
+    """
+    Writes the rows of a NumpyVectorStore generation in one pass, listed in a binary row table
+    rather than a log, for NumpyVectorStore.restore() to install and GenerationReader to read. This
+    is the format of snapshots (snapshots.py): besides the row table it is the store's own files,
+    so restoring one is a file copy and opening the result parses nothing.
+    """
+
+    FILES = (_VECTORS_FILE, _DOCUMENTS_FILE, _METADATA_FILE, _BASE_IDS_FILE, _BASE_SPANS_FILE)
+
+    def __init__(self, directory: str, rows: int, dim: int, dtype: str = "float32"):
+        """
+        Args:
+            directory: Directory to write; created if missing.
+            rows: Rows that will be appended at most (the vectors file is allocated up front).
+            dim: Embedding dimension.
+            dtype: "float32" or "float16" storage.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._vectors = np.lib.format.open_memmap(os.path.join(directory, _VECTORS_FILE), mode="w+", dtype=np.dtype(dtype),
+                                                  shape=(max(rows, 1), dim))
+        self._documents = open(os.path.join(directory, _DOCUMENTS_FILE), "wb")
+        self._metadata = open(os.path.join(directory, _METADATA_FILE), "wb")
+        self._ids: List[str] = []
+        self._spans: List[Tuple[int, int, int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def append(self, ids: List[str], embeddings: Any, documents: Optional[List[str]] = None,
+               metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Appends rows; embeddings are stored normalized to unit length, as the store keeps them."""
+        start = len(self._ids)
+        if start + len(ids) > len(self._vectors):
+            raise ValueError(f"GenerationWriter for {len(self._vectors)} rows cannot take {start + len(ids)}.")
+        self._vectors[start:start + len(ids)] = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+        for i, chunk_id in enumerate(ids):
+            span = []
+            for out, blob in ((self._documents, documents[i].encode("utf-8") if documents and documents[i] is not None else None),
+                              (self._metadata, json.dumps(metadatas[i], separators=(",", ":")).encode("utf-8")
+                               if metadatas and metadatas[i] is not None else None)):
+                span.extend((out.tell(), len(blob)) if blob is not None else (0, -1))
+                if blob is not None:
+                    out.write(blob)
+            self._ids.append(chunk_id)
+            self._spans.append(tuple(span))
+
+    def close(self) -> None:
+        """Flushes everything and writes the row table, which makes the generation complete."""
+        self._vectors.flush()
+        self._vectors = None
+        self._documents.close()
+        self._metadata.close()
+        write_row_table(self.directory, self._ids, np.asarray(self._spans, dtype=np.int64))
+
+
+class GenerationReader:
+    """Read-only access to the rows of a generation written by GenerationWriter, memory-mapped."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.ids, self._spans = read_row_table(directory)
+        self.vectors = np.load(os.path.join(directory, _VECTORS_FILE), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, start: int, end: int) -> Dict[str, Any]:
+        """Rows [start, end) as a dict with "ids", "embeddings" (float32), "documents" and "metadatas"."""
+        end = min(end, len(self.ids))
+        result: Dict[str, Any] = {"ids": self.ids[start:end], "embeddings": np.asarray(self.vectors[start:end], dtype=np.float32)}
+        for key, file_name, column, decode in (("documents", _DOCUMENTS_FILE, 0, lambda blob: blob.decode("utf-8")),
+                                               ("metadatas", _METADATA_FILE, 2, json.loads)):
+            with open(os.path.join(self.directory, file_name), "rb") as f:
+                values = []
+                for offset, length in self._spans[start:end, column:column + 2].tolist():
+                    if length < 0:
+                        values.append(None)
+                    else:
+                        f.seek(offset)
+                        values.append(decode(f.read(length)))
+            result[key] = values
+        return result